@@ -3,3 +3,4 @@ create schema if not exists raw;
 create schema if not exists ref;
 create schema if not exists core;
 create schema if not exists mart;
+create schema if not exists ops;
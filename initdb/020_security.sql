@@ -6,7 +6,7 @@ begin
   end if;
 end$$;
 
-grant usage on schema raw, ref, core, mart to app_reader;
-grant select on all tables in schema raw, ref, core, mart to app_reader;
-alter default privileges in schema raw, ref, core, mart
+grant usage on schema raw, ref, core, mart, ops to app_reader;
+grant select on all tables in schema raw, ref, core, mart, ops to app_reader;
+alter default privileges in schema raw, ref, core, mart, ops
   grant select on tables to app_reader;
@@ -0,0 +1,46 @@
+-- Parsers behind the typed columns of raw.* (generated at load time, see
+-- 100_raw_tables.sql). Same results as core.to_numeric_safe / core.to_tstz_safe,
+-- paid once per row by COPY instead of on every MV refresh. Unparseable input
+-- yields NULL and is logged to raw.parse_errors (120_raw_parse_errors.sql).
+
+-- Strip everything but digits, '.' and '-' (commas, currency, spaces), then cast.
+create or replace function raw.parse_numeric(in_text text)
+returns numeric
+language sql
+immutable
+parallel safe
+as $$
+  select case
+    when regexp_replace(in_text, '[^0-9.-]', '', 'g') ~ '^-?([0-9]+\.?[0-9]*|\.[0-9]+)$'
+    then regexp_replace(in_text, '[^0-9.-]', '', 'g')::numeric
+  end;
+$$;
+
+-- Same formats and fallback order as core.to_tstz_safe (M/D/YYYY, YYYY-MM-DD,
+-- YYYY/MM/DD, D/M/YYYY), but parsed with to_date and pinned to midnight UTC so
+-- the stored value does not depend on the loading session's TimeZone.
+-- Parallel unsafe: the EXCEPTION block opens a subtransaction per format tried.
+-- It only feeds stored generated columns, so no read plan depends on it.
+create or replace function raw.parse_date_utc(in_text text)
+returns timestamptz
+language plpgsql
+immutable
+parallel unsafe
+as $$
+declare
+  v text := btrim(in_text);
+  fmt text;
+begin
+  if v is null or v = '' then
+    return null;
+  end if;
+  foreach fmt in array array['FMMM/FMDD/YYYY', 'YYYY-MM-DD', 'YYYY/MM/DD', 'DD/MM/YYYY'] loop
+    begin
+      return to_date(v, fmt)::timestamp at time zone 'UTC';
+    exception when others then
+      -- try the next format
+    end;
+  end loop;
+  return null;
+end;
+$$;
@@ -1,15 +1,20 @@
 -- (a) External Accounts (Merchant)
 create table if not exists raw.external_accounts (
+  raw_id bigint generated always as identity,
   source_file text,
   load_at timestamptz not null default now(),
   beneficiary_bank_account_number text,
   buy_amount                      text,
   buy_currency                    text,
-  created_date                    text
+  created_date                    text,
+  -- typed at load time; NULL where the text does not parse (see raw.parse_errors)
+  buy_amount_num numeric generated always as (raw.parse_numeric(buy_amount)) stored,
+  created_date_ts timestamptz generated always as (raw.parse_date_utc(created_date)) stored
 );
 
 -- (b) VA Transaction Report (All)
 create table if not exists raw.va_txn (
+  raw_id bigint generated always as identity,
   source_file text,
   load_at timestamptz not null default now(),
   sender_virtual_account_id       text,
@@ -22,11 +27,17 @@ create table if not exists raw.va_txn (
   receiver_va_closing_balance     text,
   amount                          text,
   date                            text,
-  remarks                         text
+  remarks                         text,
+  -- typed at load time; NULL where the text does not parse (see raw.parse_errors)
+  receiver_va_opening_balance_num numeric generated always as (raw.parse_numeric(receiver_va_opening_balance)) stored,
+  receiver_va_closing_balance_num numeric generated always as (raw.parse_numeric(receiver_va_closing_balance)) stored,
+  amount_num numeric generated always as (raw.parse_numeric(amount)) stored,
+  date_ts timestamptz generated always as (raw.parse_date_utc(date)) stored
 );
 
 -- (c) Repmt-SKU (UI Data)
 create table if not exists raw.repmt_sku (
+  raw_id bigint generated always as identity,
   source_file text,
   load_at timestamptz not null default now(),
   merchant                         text,
@@ -46,16 +57,73 @@ create table if not exists raw.repmt_sku (
   jr_interest_expected             text,
   jr_interest_paid                 text,
   spar_merchant                    text,
-  additional_interests_paid_to_fh  text
+  additional_interests_paid_to_fh  text,
+  -- typed at load time; NULL where the text does not parse (see raw.parse_errors)
+  acquirer_fees_expected_num numeric generated always as (raw.parse_numeric(acquirer_fees_expected)) stored,
+  acquirer_fees_paid_num numeric generated always as (raw.parse_numeric(acquirer_fees_paid)) stored,
+  fh_admin_fees_expected_num numeric generated always as (raw.parse_numeric(fh_admin_fees_expected)) stored,
+  fh_admin_fees_paid_num numeric generated always as (raw.parse_numeric(fh_admin_fees_paid)) stored,
+  int_difference_expected_num numeric generated always as (raw.parse_numeric(int_difference_expected)) stored,
+  int_difference_paid_num numeric generated always as (raw.parse_numeric(int_difference_paid)) stored,
+  sr_principal_expected_num numeric generated always as (raw.parse_numeric(sr_principal_expected)) stored,
+  sr_principal_paid_num numeric generated always as (raw.parse_numeric(sr_principal_paid)) stored,
+  sr_interest_expected_num numeric generated always as (raw.parse_numeric(sr_interest_expected)) stored,
+  sr_interest_paid_num numeric generated always as (raw.parse_numeric(sr_interest_paid)) stored,
+  jr_principal_expected_num numeric generated always as (raw.parse_numeric(jr_principal_expected)) stored,
+  jr_principal_paid_num numeric generated always as (raw.parse_numeric(jr_principal_paid)) stored,
+  jr_interest_expected_num numeric generated always as (raw.parse_numeric(jr_interest_expected)) stored,
+  jr_interest_paid_num numeric generated always as (raw.parse_numeric(jr_interest_paid)) stored,
+  spar_merchant_num numeric generated always as (raw.parse_numeric(spar_merchant)) stored,
+  additional_interests_paid_to_fh_num numeric generated always as (raw.parse_numeric(additional_interests_paid_to_fh)) stored
 );
 
 -- (d) Repmt-Sales Proceeds (UI Data)
 create table if not exists raw.repmt_sales (
+  raw_id bigint generated always as identity,
   source_file text,
   load_at timestamptz not null default now(),
   merchant            text,
   sku_id              text,
   total_funds_inflow  text,
   sales_proceeds      text,
-  l2e                 text
+  l2e                 text,
+  -- typed at load time; NULL where the text does not parse (see raw.parse_errors)
+  total_funds_inflow_num numeric generated always as (raw.parse_numeric(total_funds_inflow)) stored,
+  sales_proceeds_num numeric generated always as (raw.parse_numeric(sales_proceeds)) stored,
+  l2e_num numeric generated always as (raw.parse_numeric(l2e)) stored
 );
+
+-- Stable row identity for the core MVs' unique keys (REFRESH ... CONCURRENTLY).
+-- Added in place for databases created before the column existed.
+alter table raw.external_accounts add column if not exists raw_id bigint generated always as identity;
+alter table raw.va_txn            add column if not exists raw_id bigint generated always as identity;
+alter table raw.repmt_sku         add column if not exists raw_id bigint generated always as identity;
+alter table raw.repmt_sales       add column if not exists raw_id bigint generated always as identity;
+
+-- Typed columns, parsed once as rows are loaded (initdb/090_raw_parse_fns.sql).
+-- Added in place (one table rewrite) for databases created before they existed.
+alter table raw.external_accounts add column if not exists buy_amount_num numeric generated always as (raw.parse_numeric(buy_amount)) stored;
+alter table raw.external_accounts add column if not exists created_date_ts timestamptz generated always as (raw.parse_date_utc(created_date)) stored;
+alter table raw.va_txn add column if not exists receiver_va_opening_balance_num numeric generated always as (raw.parse_numeric(receiver_va_opening_balance)) stored;
+alter table raw.va_txn add column if not exists receiver_va_closing_balance_num numeric generated always as (raw.parse_numeric(receiver_va_closing_balance)) stored;
+alter table raw.va_txn add column if not exists amount_num numeric generated always as (raw.parse_numeric(amount)) stored;
+alter table raw.va_txn add column if not exists date_ts timestamptz generated always as (raw.parse_date_utc(date)) stored;
+alter table raw.repmt_sku add column if not exists acquirer_fees_expected_num numeric generated always as (raw.parse_numeric(acquirer_fees_expected)) stored;
+alter table raw.repmt_sku add column if not exists acquirer_fees_paid_num numeric generated always as (raw.parse_numeric(acquirer_fees_paid)) stored;
+alter table raw.repmt_sku add column if not exists fh_admin_fees_expected_num numeric generated always as (raw.parse_numeric(fh_admin_fees_expected)) stored;
+alter table raw.repmt_sku add column if not exists fh_admin_fees_paid_num numeric generated always as (raw.parse_numeric(fh_admin_fees_paid)) stored;
+alter table raw.repmt_sku add column if not exists int_difference_expected_num numeric generated always as (raw.parse_numeric(int_difference_expected)) stored;
+alter table raw.repmt_sku add column if not exists int_difference_paid_num numeric generated always as (raw.parse_numeric(int_difference_paid)) stored;
+alter table raw.repmt_sku add column if not exists sr_principal_expected_num numeric generated always as (raw.parse_numeric(sr_principal_expected)) stored;
+alter table raw.repmt_sku add column if not exists sr_principal_paid_num numeric generated always as (raw.parse_numeric(sr_principal_paid)) stored;
+alter table raw.repmt_sku add column if not exists sr_interest_expected_num numeric generated always as (raw.parse_numeric(sr_interest_expected)) stored;
+alter table raw.repmt_sku add column if not exists sr_interest_paid_num numeric generated always as (raw.parse_numeric(sr_interest_paid)) stored;
+alter table raw.repmt_sku add column if not exists jr_principal_expected_num numeric generated always as (raw.parse_numeric(jr_principal_expected)) stored;
+alter table raw.repmt_sku add column if not exists jr_principal_paid_num numeric generated always as (raw.parse_numeric(jr_principal_paid)) stored;
+alter table raw.repmt_sku add column if not exists jr_interest_expected_num numeric generated always as (raw.parse_numeric(jr_interest_expected)) stored;
+alter table raw.repmt_sku add column if not exists jr_interest_paid_num numeric generated always as (raw.parse_numeric(jr_interest_paid)) stored;
+alter table raw.repmt_sku add column if not exists spar_merchant_num numeric generated always as (raw.parse_numeric(spar_merchant)) stored;
+alter table raw.repmt_sku add column if not exists additional_interests_paid_to_fh_num numeric generated always as (raw.parse_numeric(additional_interests_paid_to_fh)) stored;
+alter table raw.repmt_sales add column if not exists total_funds_inflow_num numeric generated always as (raw.parse_numeric(total_funds_inflow)) stored;
+alter table raw.repmt_sales add column if not exists sales_proceeds_num numeric generated always as (raw.parse_numeric(sales_proceeds)) stored;
+alter table raw.repmt_sales add column if not exists l2e_num numeric generated always as (raw.parse_numeric(l2e)) stored;
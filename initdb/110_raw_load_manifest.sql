@@ -0,0 +1,19 @@
+-- Which export files are already in raw.*: one row per (table, source_file).
+-- prep.py --incremental skips files whose size/mtime or content hash match,
+-- and replaces a file's rows (by source_file) when its content changed.
+create table if not exists raw.load_manifest (
+  table_name    text        not null,
+  source_file   text        not null,
+  sha256        text        not null,
+  file_bytes    bigint      not null,
+  file_mtime_ns bigint      not null,
+  row_count     bigint      not null,
+  loaded_at     timestamptz not null default now(),
+  primary key (table_name, source_file)
+);
+
+-- Replacing or skipping one file must not scan the whole history.
+create index if not exists external_accounts_source_file_idx on raw.external_accounts (source_file);
+create index if not exists va_txn_source_file_idx            on raw.va_txn (source_file);
+create index if not exists repmt_sku_source_file_idx         on raw.repmt_sku (source_file);
+create index if not exists repmt_sales_source_file_idx       on raw.repmt_sales (source_file);
@@ -0,0 +1,71 @@
+-- Rejects from the typed columns of raw.*: one row per value that was present
+-- in the export but did not parse (its <col>_num / <col>_ts is NULL).
+-- Maintained by statement triggers, so every loader (load_raw.sh, prep.py --load,
+-- --incremental) records them and reloading a file replaces its rejects.
+create table if not exists raw.parse_errors (
+  table_name  text not null,
+  raw_id      bigint not null,
+  source_file text,
+  column_name text not null,
+  raw_value   text,
+  logged_at   timestamptz not null default now()
+);
+
+create index if not exists ix_parse_errors_row on raw.parse_errors (table_name, raw_id);
+
+-- Typed columns are the generated <src>_num / <src>_ts columns of the table.
+create or replace function raw.trg_log_parse_errors()
+returns trigger
+language plpgsql
+as $$
+declare
+  v_table text := format('%I.%I', TG_TABLE_SCHEMA, TG_TABLE_NAME);
+  v_checks text;
+begin
+  if TG_OP = 'TRUNCATE' then
+    delete from raw.parse_errors where table_name = v_table;
+    return null;
+  end if;
+  if TG_OP = 'DELETE' then
+    delete from raw.parse_errors e using old_rows o
+    where e.table_name = v_table and e.raw_id = o.raw_id;
+    return null;
+  end if;
+
+  select string_agg(
+           format('(%L, n.%I, n.%I is null)', src, src, a.attname), ', ' order by a.attnum)
+  into v_checks
+  from pg_attribute a
+  cross join lateral (select regexp_replace(a.attname, '_(num|ts)$', '') as src) s
+  where a.attrelid = TG_RELID and a.attgenerated = 's' and not a.attisdropped;
+  if v_checks is null then
+    return null;
+  end if;
+
+  execute format(
+    'insert into raw.parse_errors (table_name, raw_id, source_file, column_name, raw_value) '
+    'select %L, n.raw_id, n.source_file, v.col, v.val '
+    'from new_rows n cross join lateral (values %s) v(col, val, bad) '
+    'where v.bad and btrim(coalesce(v.val, '''')) <> ''''',
+    v_table, v_checks);
+  return null;
+end;
+$$;
+
+do $$
+declare
+  t text;
+begin
+  foreach t in array array['raw.external_accounts', 'raw.va_txn', 'raw.repmt_sku', 'raw.repmt_sales']
+  loop
+    execute format('drop trigger if exists parse_errors_ins on %s', t);
+    execute format('drop trigger if exists parse_errors_del on %s', t);
+    execute format('drop trigger if exists parse_errors_trunc on %s', t);
+    execute format('create trigger parse_errors_ins after insert on %s referencing new table as new_rows '
+                   'for each statement execute function raw.trg_log_parse_errors()', t);
+    execute format('create trigger parse_errors_del after delete on %s referencing old table as old_rows '
+                   'for each statement execute function raw.trg_log_parse_errors()', t);
+    execute format('create trigger parse_errors_trunc after truncate on %s '
+                   'for each statement execute function raw.trg_log_parse_errors()', t);
+  end loop;
+end$$;
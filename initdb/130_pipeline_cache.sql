@@ -0,0 +1,13 @@
+-- Last successful run of each scripts/etl.py stage. A stage is skipped while
+-- its cache_key (hash of its input files, options and upstream stage keys)
+-- is unchanged. input_files keeps [bytes, mtime_ns, sha256] per input path so
+-- unchanged files are not re-hashed. Kept in the database rather than on disk
+-- so a recreated database never looks up to date.
+create table if not exists raw.pipeline_cache (
+  stage       text        primary key,
+  cache_key   text        not null,
+  input_files jsonb       not null default '{}'::jsonb,
+  row_count   bigint,
+  seconds     numeric,
+  finished_at timestamptz not null default now()
+);
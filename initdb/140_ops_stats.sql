@@ -0,0 +1,84 @@
+-- Refresh and report instrumentation (scripts/refresh.py, scripts/ops_report.py).
+--
+-- ops.refresh_log: one row per refresh step and run. blks_hit / blks_read are
+-- the shared-buffer block accesses on the step's own relations (the MV or the
+-- maintained tables, with their indexes and TOAST) during the step, from
+-- pg_statio_all_tables; reads of the step's inputs are not attributed, since
+-- parallel steps share them. row_count is n_live_tup once the step is done.
+-- Partitioned tables (core.va_txn_flows) are counted over their leaf partitions.
+create table if not exists ops.refresh_log (
+  run_id       uuid        not null,
+  step         text        not null,
+  status       text        not null check (status in ('ok', 'failed', 'skipped')),
+  full_refresh boolean     not null default false,
+  seconds      numeric,
+  row_count    bigint,
+  blks_hit     bigint,
+  blks_read    bigint,
+  error        text,
+  finished_at  timestamptz not null default now(),
+  primary key (run_id, step)
+);
+
+create index if not exists ix_refresh_log_step on ops.refresh_log (step, finished_at desc);
+
+-- ops.plan_history: EXPLAIN (ANALYZE, BUFFERS) of the report views, one row per
+-- capture. plan_shape hashes the plan's node types and the relations/indexes
+-- they touch, in plan order, so a changed plan shows up as a new hash even
+-- when the timing has not moved (yet).
+create table if not exists ops.plan_history (
+  relation     text        not null,
+  captured_at  timestamptz not null default clock_timestamp(),
+  run_id       uuid,
+  planning_ms  numeric,
+  execution_ms numeric     not null,
+  row_count    bigint,
+  shared_hit   bigint,
+  shared_read  bigint,
+  temp_read    bigint,
+  temp_written bigint,
+  plan_shape   text        not null,
+  plan         jsonb       not null,
+  primary key (relation, captured_at)
+);
+
+-- Run the report query under EXPLAIN (ANALYZE, BUFFERS), store the plan and
+-- return its execution time in ms. The query really runs, so this costs as
+-- much as reading the whole report once.
+create or replace function ops.capture_plan(p_relation regclass, p_run_id uuid default null)
+returns numeric
+language plpgsql
+as $$
+declare
+  v_doc   jsonb;
+  v_top   jsonb;
+  v_shape text;
+begin
+  execute format('explain (analyze, buffers, format json) select * from %s', p_relation)
+    into v_doc;
+  v_top := v_doc -> 0;
+
+  select md5(coalesce(string_agg(
+           concat_ws(':', n ->> 'Node Type', coalesce(n ->> 'Index Name', n ->> 'Relation Name')),
+           '>' order by ord), ''))
+  into v_shape
+  from jsonb_path_query(v_top -> 'Plan', 'strict $.** ? (exists (@."Node Type"))')
+       with ordinality as t(n, ord);
+
+  insert into ops.plan_history (
+    relation, run_id, planning_ms, execution_ms, row_count,
+    shared_hit, shared_read, temp_read, temp_written, plan_shape, plan)
+  values (
+    p_relation::text, p_run_id,
+    (v_top ->> 'Planning Time')::numeric,
+    (v_top ->> 'Execution Time')::numeric,
+    (v_top #>> '{Plan,Actual Rows}')::bigint,
+    (v_top #>> '{Plan,Shared Hit Blocks}')::bigint,
+    (v_top #>> '{Plan,Shared Read Blocks}')::bigint,
+    (v_top #>> '{Plan,Temp Read Blocks}')::bigint,
+    (v_top #>> '{Plan,Temp Written Blocks}')::bigint,
+    v_shape, v_doc);
+
+  return (v_top ->> 'Execution Time')::numeric;
+end;
+$$;
@@ -11,18 +11,101 @@ create table if not exists ref.sku (
   merchant_id uuid not null references ref.merchant(merchant_id)
 );
 
+-- VA numbers are compared in one form everywhere: trimmed, '' as NULL.
+create or replace function ref.normalize_va(p_va text)
+returns text
+language sql
+immutable
+parallel safe
+as $$
+  select nullif(btrim(p_va), '');
+$$;
+
+-- Compact integer ids for the hot joins. Every normalized VA number seen in the
+-- mapping or in va_txn is registered once (core.refresh_va_txn_flows and the
+-- mapping trigger below); SKUs carry their own key.
+create table if not exists ref.va (
+  va_id     integer generated always as identity primary key,
+  va_number text not null unique
+);
+
+alter table ref.sku add column if not exists sku_key integer generated always as identity;
+create unique index if not exists ux_sku_key on ref.sku (sku_key);
+
+-- Id of a normalized VA number, registering it on first sight.
+create or replace function ref.va_id(p_va text)
+returns integer
+language plpgsql
+as $$
+declare
+  v_id integer;
+begin
+  if p_va is null then
+    return null;
+  end if;
+  select va_id into v_id from ref.va where va_number = p_va;
+  if v_id is null then
+    insert into ref.va (va_number) values (p_va) on conflict (va_number) do nothing returning va_id into v_id;
+    if v_id is null then
+      select va_id into v_id from ref.va where va_number = p_va;
+    end if;
+  end if;
+  return v_id;
+end;
+$$;
+
 -- Join glue across feeds
 -- NOTE: no UNIQUE constraint with expressions; we add a UNIQUE INDEX after the table.
-drop table if exists ref.note_sku_va_map cascade;
-create table ref.note_sku_va_map (
+-- Kept across bootstraps: core.va_txn_flows is maintained incrementally from its changes.
+create table if not exists ref.note_sku_va_map (
+  map_id      bigint generated always as identity,
   note_id     text,
   sku_id      text references ref.sku(sku_id),
-  va_number   text,                  -- normalized virtual/bank account number
+  va_number   text,                  -- ref.normalize_va() form, set by the trigger below
   merchant_id uuid references ref.merchant(merchant_id),
   valid_from  date,
-  valid_to    date
+  valid_to    date,
+  va_id       integer,               -- ref.va, set by the trigger below
+  sku_key     integer                -- ref.sku.sku_key, set by the trigger below
 );
 
+alter table ref.note_sku_va_map add column if not exists map_id bigint generated always as identity;
+create unique index if not exists ux_note_sku_va_map_id on ref.note_sku_va_map (map_id);
+alter table ref.note_sku_va_map add column if not exists va_id integer;
+alter table ref.note_sku_va_map add column if not exists sku_key integer;
+
+-- Normalize va_number and resolve the integer keys once, as rows are written.
+create or replace function ref.trg_note_sku_va_map_keys()
+returns trigger
+language plpgsql
+as $$
+begin
+  new.va_number := ref.normalize_va(new.va_number);
+  new.va_id := ref.va_id(new.va_number);
+  new.sku_key := (select s.sku_key from ref.sku s where s.sku_id = new.sku_id);
+  return new;
+end;
+$$;
+
+drop trigger if exists note_sku_va_map_keys on ref.note_sku_va_map;
+create trigger note_sku_va_map_keys
+  before insert or update of va_number, sku_id on ref.note_sku_va_map
+  for each row execute function ref.trg_note_sku_va_map_keys();
+
+-- Rows written before the trigger may differ only in untrimmed VA numbers
+-- (' VA1' / 'VA1'); normalized they would break the composite unique index, so
+-- keep the first of each.
+delete from ref.note_sku_va_map d
+using ref.note_sku_va_map k
+where k.map_id < d.map_id
+  and coalesce(k.note_id, '') = coalesce(d.note_id, '')
+  and coalesce(ref.normalize_va(k.va_number), '') = coalesce(ref.normalize_va(d.va_number), '')
+  and coalesce(k.sku_id, '') = coalesce(d.sku_id, '');
+
+-- Backfill rows written before the keys existed.
+update ref.note_sku_va_map set va_number = va_number
+where (va_number is not null and va_id is null) or (sku_id is not null and sku_key is null);
+
 -- Enforce uniqueness across the trio using a unique index on expressions
 create unique index if not exists ux_note_sku_va_map_composite
   on ref.note_sku_va_map (coalesce(note_id,''), coalesce(va_number,''), coalesce(sku_id,''));
@@ -31,6 +114,7 @@ create unique index if not exists ux_note_sku_va_map_composite
 create index if not exists ix_ref_note on ref.note_sku_va_map (note_id);
 create index if not exists ix_ref_va   on ref.note_sku_va_map (va_number);
 create index if not exists ix_ref_sku  on ref.note_sku_va_map (sku_id);
+create index if not exists ix_ref_va_id on ref.note_sku_va_map (va_id);
 
 -- Map VA remarks to business categories for Level 2 waterfall
 -- category_code examples:
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Benchmark MV-style refresh over text columns cast by core.to_*_safe versus
+the typed columns raw.* now parses at load time, on a synthetic va_txn.
+
+Scratch tables are created in the public schema and dropped afterwards.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import List, Tuple
+
+from pg_copy import run_sql
+
+TEXT = "public.bench_va_txn_text"
+PLAIN = "public.bench_va_txn_plain"
+TYPED = "public.bench_va_txn_typed"
+OUT = "public.bench_va_txn_out"
+
+SETUP = f"""
+drop table if exists {TEXT}, {PLAIN}, {TYPED}, {OUT};
+create unlogged table {TEXT} as
+select to_char((g % 2500000) / 100.0 * 3, 'FM9,999,990.00') as receiver_va_opening_balance,
+       to_char((g % 2500000) / 100.0 * 4, 'FM9,999,990.00') as receiver_va_closing_balance,
+       to_char((g % 2500000) / 100.0, 'FM9,999,990.00')     as amount,
+       (g % 12 + 1) || '/' || (g % 28 + 1) || '/2025'        as date
+from generate_series(1, {{rows}}) g;
+create unlogged table {PLAIN} (like {TEXT});
+create unlogged table {TYPED} (
+  like {TEXT},
+  receiver_va_opening_balance_num numeric generated always as (raw.parse_numeric(receiver_va_opening_balance)) stored,
+  receiver_va_closing_balance_num numeric generated always as (raw.parse_numeric(receiver_va_closing_balance)) stored,
+  amount_num numeric generated always as (raw.parse_numeric(amount)) stored,
+  date_ts timestamptz generated always as (raw.parse_date_utc(date)) stored
+);
+"""
+
+STEPS: List[Tuple[str, str]] = [
+    ("load: text only", f"insert into {PLAIN} select * from {TEXT}"),
+    ("load: text + typed columns", f"insert into {TYPED} select * from {TEXT}"),
+    (
+        "refresh: core.to_*_safe casts",
+        f"create unlogged table {OUT} as select "
+        f"core.to_numeric_safe(receiver_va_opening_balance) o, "
+        f"core.to_numeric_safe(receiver_va_closing_balance) c, "
+        f"core.to_numeric_safe(amount) a, core.to_tstz_safe(date) d from {PLAIN}",
+    ),
+    ("drop", f"drop table {OUT}"),
+    (
+        "refresh: pre-typed columns",
+        f"create unlogged table {OUT} as select "
+        f"receiver_va_opening_balance_num o, receiver_va_closing_balance_num c, "
+        f"amount_num a, date_ts d from {TYPED}",
+    ),
+]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Synthetic va_txn rows.")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    run_sql(SETUP.format(rows=args.rows))
+    timings: List[Tuple[str, float]] = []
+    try:
+        for label, sql in STEPS:
+            start = time.perf_counter()
+            run_sql(sql)
+            if label != "drop":
+                timings.append((label, time.perf_counter() - start))
+        mismatches = run_sql(
+            f"copy (select count(*) from {TYPED} t where "
+            f"t.amount_num is distinct from core.to_numeric_safe(t.amount) or "
+            f"t.date_ts is distinct from core.to_tstz_safe(t.date)) to stdout"
+        ).strip()
+    finally:
+        run_sql(f"drop table if exists {TEXT}, {PLAIN}, {TYPED}, {OUT}")
+
+    print(f"{'step':<32} {'secs':>8} {'rows/s':>12}")
+    for label, secs in timings:
+        print(f"{label:<32} {secs:>8.2f} {args.rows / secs:>12,.0f}")
+    cast, typed = timings[2][1], timings[3][1]
+    parse = timings[1][1] - timings[0][1]
+    print(f"refresh speed-up: {cast / typed:.1f}x (one-off parse cost at load: {parse:.2f}s)")
+    print(f"typed vs cast mismatches: {mismatches}")
+    return 0 if mismatches == "0" else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
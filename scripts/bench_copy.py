@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Benchmark CSV versus binary COPY ingest of raw.va_txn on a synthetic export.
+
+The synthetic export (bench_prep.py) is prepped to va_txn_prepped.csv and
+va_txn_prepped.pgcopy, and each is COPYd over one session into a scratch copy
+of raw.va_txn, generated typed columns included. A third file also carries the
+typed values, loaded into a copy whose typed columns are plain columns: the
+ceiling if parsing moved off the server altogether (raw.* cannot take it, as
+COPY refuses generated columns). Scratch tables are created in the public
+schema and dropped afterwards.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import tempfile
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+from typing import List, Tuple
+
+import prep
+from bench_prep import write_synthetic_va_txn
+from pg_binary import BinaryCopyWriter
+from pg_session import Session, connect
+
+CSV_TABLE = "public.bench_copy_csv"
+BINARY_TABLE = "public.bench_copy_binary"
+TYPED_TABLE = "public.bench_copy_typed"
+TABLES = f"{CSV_TABLE}, {BINARY_TABLE}, {TYPED_TABLE}"
+
+LIKE_RAW = "like raw.va_txn including defaults including identity"
+SETUP = f"""
+drop table if exists {TABLES};
+create unlogged table {CSV_TABLE} ({LIKE_RAW} including generated);
+create unlogged table {BINARY_TABLE} ({LIKE_RAW} including generated);
+create unlogged table {TYPED_TABLE} ({LIKE_RAW});
+"""
+
+TEXT_COLUMNS = prep.VA_TXN.columns
+TYPED_COLUMNS = tuple(f"{c}_num" for c in prep.VA_TXN.numeric) + tuple(
+    f"{c}_ts" for c in prep.VA_TXN.dates
+)
+ALL_COLUMNS = ", ".join(TEXT_COLUMNS + TYPED_COLUMNS)
+
+
+def write_typed(src: Path, out: Path) -> int:
+    """Binary COPY of the prepped CSV plus its typed values (the synthetic export's
+    amounts and M/D/YYYY dates need nothing beyond what raw.parse_* does here)."""
+    numeric = [TEXT_COLUMNS.index(c) for c in prep.VA_TXN.numeric]
+    dates = [TEXT_COLUMNS.index(c) for c in prep.VA_TXN.dates]
+    kinds = ["text"] * len(TEXT_COLUMNS) + ["numeric"] * len(numeric)
+    kinds += ["timestamptz"] * len(dates)
+    rows = 0
+    with open(src, newline="", encoding="utf-8") as f, open(out, "wb") as sink:
+        reader = csv.reader(f)
+        next(reader)
+        writer = BinaryCopyWriter(sink, kinds)
+        for batch in prep.batched(reader, prep.BATCH_ROWS):
+            writer.write_rows(
+                row
+                + [Decimal(row[i].replace(",", "")) if row[i] else None for i in numeric]
+                + [
+                    datetime.strptime(row[i], "%m/%d/%Y").replace(tzinfo=timezone.utc)
+                    for i in dates
+                ]
+                for row in batch
+            )
+            rows += len(batch)
+        writer.close()
+    return rows
+
+
+def best_load(
+    session: Session, table: str, columns: Tuple[str, ...], path: Path, repeat: int
+) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        session.execute(f"truncate {table}")
+        start = time.perf_counter()
+        session.copy_file(table, columns, path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def mismatches(session: Session) -> int:
+    """Rows that differ between any two scratch tables (text and typed columns)."""
+    checks = [
+        f"(select {ALL_COLUMNS} from {a} except all select {ALL_COLUMNS} from {b})"
+        for a, b in ((CSV_TABLE, BINARY_TABLE), (BINARY_TABLE, CSV_TABLE),
+                     (CSV_TABLE, TYPED_TABLE), (TYPED_TABLE, CSV_TABLE))
+    ]
+    sql = "select " + " + ".join(f"(select count(*) from {c} x)" for c in checks)
+    return int(session.query(sql)[0][0])
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Synthetic va_txn rows.")
+    parser.add_argument("--repeat", type=int, default=3, help="Loads per format; the best counts.")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    timings: List[Tuple[str, float]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        src = tmp_dir / "va_txn_synthetic.csv"
+        write_synthetic_va_txn(src, args.rows)
+        csv_out = tmp_dir / "va_txn_prepped.csv"
+        binary_out = tmp_dir / "va_txn_prepped.pgcopy"
+        typed_out = tmp_dir / "va_txn_typed.pgcopy"
+        for label, out in (("prep: csv", csv_out), ("prep: binary", binary_out)):
+            start = time.perf_counter()
+            prep.prep_file(prep.VA_TXN, src, out)
+            timings.append((label, time.perf_counter() - start))
+        write_typed(csv_out, typed_out)
+
+        session = connect()
+        try:
+            session.execute(SETUP)
+            for label, table, columns, path in (
+                ("copy: csv", CSV_TABLE, TEXT_COLUMNS, csv_out),
+                ("copy: binary", BINARY_TABLE, TEXT_COLUMNS, binary_out),
+                ("copy: binary, typed (no parse)", TYPED_TABLE, TEXT_COLUMNS + TYPED_COLUMNS, typed_out),
+            ):
+                timings.append((label, best_load(session, table, columns, path, args.repeat)))
+            bad = mismatches(session)
+            sizes = {p.name: p.stat().st_size for p in (csv_out, binary_out, typed_out)}
+        finally:
+            session.execute(f"drop table if exists {TABLES}")
+            session.close()
+
+    print(f"{'step':<32} {'secs':>8} {'rows/s':>12}")
+    for label, secs in timings:
+        print(f"{label:<32} {secs:>8.2f} {args.rows / secs:>12,.0f}")
+    for name, size in sizes.items():
+        print(f"{name:<32} {size / 1e6:>8.1f} MB")
+    copy_csv, copy_binary = timings[2][1], timings[3][1]
+    print(f"binary COPY speed-up: {copy_csv / copy_binary:.2f}x")
+    print(f"mismatched rows across tables: {bad}")
+    return 0 if bad == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""End-to-end benchmark: synthetic exports through the ETL pipeline to the reports.
+
+  1. synth_data.py writes (or, when its manifest matches, reuses) an export set
+     of the requested scale in --data.
+  2. raw.*, raw.load_manifest and ref.note_sku_va_map are emptied, then etl.py
+     runs every stage (--force --full) over the set; its run report gives the
+     bootstrap, map, load, mapping and refresh timings, refresh step by step.
+  3. The report queries (mart.v_level1/2a/2b, and mart.level1/2a/2b for the
+     last period) are fetched --repeat times; the best time counts.
+  4. parity.py checks mart.v_level1 against the generated Level-1 reference
+     (diffs in bench_e2e_parity/ next to the history), so a fast run that
+     reports the wrong numbers does not pass.
+
+Each run appends a record (git revision, host, scale, timings, row counts) to
+the JSON history (--history) and is compared with the latest earlier ok run of
+the same scale and load mode: timings more than --threshold slower (and at
+least --min-seconds slower, to ignore noise on tiny steps) are flagged.
+
+This replaces what is loaded in the database, so it only runs with
+--replace-db; point it at a scratch database (PG* / .env) rather than one with
+real exports in it.
+
+Exit status: 0 ok, 1 a stage or the parity check failed, 3 slower than the
+baseline with --fail-on-regression.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from datetime import datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import etl
+import parity
+import synth_data
+from load_parallel import RAW_TABLES
+from pg_copy import PsqlError
+from pg_session import Session, connect
+
+ROOT = Path(__file__).resolve().parent.parent
+HISTORY = Path("data/bench_e2e_history.json")
+PARITY_DIR = "bench_e2e_parity"
+QUERIES = (
+    ("mart.v_level1", "select * from mart.v_level1"),
+    ("mart.v_level2a", "select * from mart.v_level2a"),
+    ("mart.v_level2b", "select * from mart.v_level2b"),
+    ("mart.level1(period)", "select * from mart.level1('{period}')"),
+    ("mart.level2a(period)", "select * from mart.level2a('{period}')"),
+    ("mart.level2b(period)", "select * from mart.level2b('{period}')"),
+)
+RESET = f"truncate {RAW_TABLES}, raw.load_manifest;\ndelete from ref.note_sku_va_map;"
+
+
+def git_revision() -> Dict[str, object]:
+    def git(*args: str) -> str:
+        proc = subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True)
+        return proc.stdout.strip() if proc.returncode == 0 else ""
+
+    return {"rev": git("rev-parse", "--short", "HEAD") or None, "dirty": bool(git("status", "--porcelain"))}
+
+
+def host_info(session: Session) -> Dict[str, object]:
+    memory = None
+    try:
+        with open("/proc/meminfo", encoding="ascii") as fh:
+            for line in fh:
+                if line.startswith("MemTotal:"):
+                    memory = round(int(line.split()[1]) / 1024 / 1024, 1)
+                    break
+    except OSError:
+        pass
+    ((server,),) = session.query("select current_setting('server_version')")
+    return {
+        "node": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "memory_gb": memory,
+        "postgres": server,
+    }
+
+
+def run_pipeline(data_dir: Path, load: str, jobs: int) -> Tuple[int, dict]:
+    """Run every etl.py stage over ``data_dir``; returns its exit status and run report."""
+    with tempfile.TemporaryDirectory(prefix="bench_e2e_") as tmp:
+        report = Path(tmp) / "etl_report.json"
+        rc = etl.main([
+            str(data_dir), "--load", load, "--force", "--full",
+            "--jobs", str(jobs), "--report", str(report),
+        ])
+        return rc, json.loads(report.read_text(encoding="utf-8"))
+
+
+def time_queries(session: Session, period: str, repeat: int) -> Dict[str, dict]:
+    timings: Dict[str, dict] = {}
+    for label, sql in QUERIES:
+        best, rows = float("inf"), 0
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            rows = len(session.query(sql.format(period=period)))
+            best = min(best, time.perf_counter() - start)
+        timings[label] = {"seconds": round(best, 3), "rows": rows}
+        print(f"{label:<44} {'ok':<7} {best:>8.2f} {rows:>10}")
+    return timings
+
+
+def check_parity(reference: Path, out_dir: Path, tolerance: Decimal) -> dict:
+    (result,) = parity.run(["level1"], {"level1": str(reference)}, out_dir, tolerance)
+    parity.print_report([result], out_dir)
+    return {
+        "ok": result.ok,
+        "seconds": round(result.seconds, 3),
+        "expected_rows": result.expected_rows,
+        "missing": result.missing,
+        "extra": result.extra,
+        "mismatched": result.mismatched,
+        "error": result.error,
+    }
+
+
+def timings(record: dict) -> Dict[str, float]:
+    """Every timing of a run record, flattened to 'kind:name' -> seconds."""
+    flat = {f"stage:{name}": secs for name, secs in record["stages"].items()}
+    flat.update({f"step:{name}": secs for name, secs in record["steps"].items()})
+    flat.update({f"query:{name}": q["seconds"] for name, q in record["queries"].items()})
+    flat["wall"] = record["wall_seconds"]
+    return flat
+
+
+def baseline(history: Sequence[dict], record: dict) -> Optional[dict]:
+    for previous in reversed(history):
+        if (
+            previous.get("status") == "ok"
+            and previous.get("scale") == record["scale"]
+            and previous.get("load") == record["load"]
+        ):
+            return previous
+    return None
+
+
+def regressions(
+    before: dict, after: dict, threshold: float, min_seconds: float
+) -> List[Tuple[str, float, float]]:
+    old, new = timings(before), timings(after)
+    return [
+        (key, old[key], new[key])
+        for key in new
+        if key in old and new[key] > old[key] * (1 + threshold) and new[key] - old[key] >= min_seconds
+    ]
+
+
+def print_comparison(before: dict, after: dict, slower: Sequence[Tuple[str, float, float]]) -> None:
+    rev = (before.get("git") or {}).get("rev") or "?"
+    print(f"\nvs. {before['started_at']} ({rev}):")
+    old, new = timings(before), timings(after)
+    flagged = {key for key, _, _ in slower}
+    for key in new:
+        if key not in old or not (key.startswith(("stage:", "query:")) or key == "wall" or key in flagged):
+            continue
+        change = (new[key] / old[key] - 1) * 100 if old[key] else 0.0
+        mark = "  SLOWER" if key in flagged else ""
+        print(f"  {key:<42} {old[key]:>8.2f} -> {new[key]:>8.2f}  {change:+6.1f}%{mark}")
+
+
+def load_history(path: Path) -> List[dict]:
+    try:
+        history = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return []
+    if not isinstance(history, list):
+        raise SystemExit(f"{path}: expected a JSON list of run records")
+    return history
+
+
+def save_history(path: Path, history: Sequence[dict]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".part")
+    tmp.write_text(json.dumps(list(history), indent=2) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    synth_data.scale_args(parser)
+    parser.add_argument(
+        "--data", type=Path, default=Path("data/synth"),
+        help="Directory for the synthetic exports; reused while the options match (default: data/synth).",
+    )
+    parser.add_argument(
+        "--load", choices=("incremental", "stream", "fresh"), default="incremental",
+        help="etl.py load mode (default: incremental, which loads every period's exports).",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=int(os.getenv("REFRESH_JOBS", "4")),
+        help="Pooled sessions for etl.py (default: $REFRESH_JOBS or 4).",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per report query; the best counts.")
+    parser.add_argument(
+        "--tolerance", type=Decimal, default=Decimal("0.01"), help="Parity tolerance (default 0.01)."
+    )
+    parser.add_argument(
+        "--history", type=Path, default=HISTORY, help=f"JSON run history (default: {HISTORY})."
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=0.25,
+        help="Flag timings this much slower than the baseline run (default 0.25 = 25%%).",
+    )
+    parser.add_argument(
+        "--min-seconds", type=float, default=0.5,
+        help="Ignore slowdowns smaller than this many seconds (default 0.5).",
+    )
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit 3 when a timing is flagged.")
+    parser.add_argument(
+        "--replace-db", action="store_true",
+        help=f"Required: allow emptying {RAW_TABLES}, raw.load_manifest and ref.note_sku_va_map.",
+    )
+    args = parser.parse_args(argv)
+    args.scale = synth_data.scale_from(args, parser)
+    if not args.replace_db:
+        parser.error("this replaces the loaded data; pass --replace-db (and use a scratch database)")
+    return args
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    started = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    manifest = synth_data.ensure(args.scale, args.data, os.cpu_count() or 1)
+    print(f"Synthetic exports: {manifest['rows']['va_txn']:,} va_txn rows, "
+          f"{manifest['bytes'] / 1e6:,.1f} MB in {args.data}")
+
+    session = connect()
+    try:
+        host = host_info(session)
+        session.execute(RESET)
+    except PsqlError as err:
+        session.close()
+        print(f"Could not reset the database: {err}", file=sys.stderr)
+        return 1
+    session.close()
+
+    rc, report = run_pipeline(args.data, args.load, args.jobs)
+    stages = {s["name"]: s["seconds"] for s in report["stages"] if s["status"] != "skipped"}
+    steps = {
+        f"{s['name']}/{step['name']}": step["seconds"]
+        for s in report["stages"]
+        for step in s["steps"]
+        if not step.get("skipped")
+    }
+
+    queries: Dict[str, dict] = {}
+    check: Optional[dict] = None
+    if rc == 0:
+        session = connect()
+        try:
+            print()
+            queries = time_queries(session, manifest["periods"][-1], args.repeat)
+        finally:
+            session.close()
+        print()
+        check = check_parity(
+            args.data / "level1_reference.csv", args.history.parent / PARITY_DIR, args.tolerance
+        )
+
+    record = {
+        "started_at": started.isoformat(timespec="seconds"),
+        "status": "ok" if rc == 0 and check and check["ok"] else "failed",
+        "git": git_revision(),
+        "host": host,
+        "scale": asdict(args.scale),
+        "load": args.load,
+        "jobs": args.jobs,
+        "data": {k: manifest[k] for k in ("rows", "bytes")},
+        "generate_seconds": manifest["seconds"],
+        "stages": stages,
+        "steps": steps,
+        "queries": queries,
+        "parity": check,
+        "wall_seconds": round(time.perf_counter() - start, 3),
+    }
+    history = load_history(args.history)
+    before = baseline(history, record)
+    save_history(args.history, history + [record])
+    print(f"\nRecorded run {len(history) + 1} in {args.history}")
+
+    if record["status"] != "ok":
+        print("Benchmark run failed; not compared with earlier runs.", file=sys.stderr)
+        return 1
+    if before is None:
+        print("No earlier ok run of this scale and load mode to compare with.")
+        return 0
+    slower = regressions(before, record, args.threshold, args.min_seconds)
+    print_comparison(before, record, slower)
+    if slower:
+        print(f"{len(slower)} timing(s) more than {args.threshold:.0%} slower than the baseline.", file=sys.stderr)
+        return 3 if args.fail_on_regression else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Benchmark the prep engine against the legacy DictReader loop on a synthetic va_txn export."""
+from __future__ import annotations
+
+import argparse
+import csv
+import filecmp
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+import prep
+
+VA_TXN_HEADER = [
+    "Sender Virtual Account ID",
+    "Sender Virtual Account Number",
+    "Sender Note ID",
+    "Receiver Virtual Account ID",
+    "Receiver Virtual Account Number",
+    "Receiver Note ID",
+    "Receiver VA Opening Balance",
+    "Receiver VA Closing Balance",
+    "Amount",
+    "Transaction Date",
+    "Remarks",
+    "Status",
+    "Created By",
+]
+
+REMARKS = [
+    "merchant-repayment",
+    "fh-admin-fee",
+    "acquirer-fee",
+    "senior-investor-principal",
+    "senior-investor-interest",
+    "junior-investor-principal",
+    "junior-investor-interest",
+    "note-issued-transfer-to-sku",
+    "Manual adjustment, see ticket",
+]
+
+
+def write_synthetic_va_txn(path: Path, rows: int, seed: int = 7) -> None:
+    rnd = random.Random(seed)
+    vas = [f"88506{n:08d}" for n in range(2000)]
+    with path.open("w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(VA_TXN_HEADER)
+        for i in range(rows):
+            sender, receiver = rnd.sample(vas, 2)
+            amount = rnd.randint(100, 2_500_000) / 100
+            writer.writerow([
+                f"va-{sender[-6:]}",
+                sender,
+                "",
+                f"va-{receiver[-6:]}",
+                receiver,
+                f"NOTE-{i % 977}",
+                f"{amount * 3:,.2f}",
+                f"{amount * 4:,.2f}",
+                f"{amount:,.2f}",
+                f"{rnd.randint(1, 12)}/{rnd.randint(1, 28)}/2025",
+                rnd.choice(REMARKS),
+                "COMPLETED",
+                "system",
+            ])
+
+
+def legacy_prep(spec: prep.FeedSpec, src: Path, out: Path) -> int:
+    """The DictReader -> dict-per-row loop the per-feed scripts used before prep.py."""
+    with open(src, "r", newline="", encoding="utf-8-sig") as f:
+        r = csv.DictReader(f)
+        hdr = {prep.norm(h): h for h in (r.fieldnames or [])}
+        colmap = {}
+        for c in spec.columns:
+            found = None
+            for a in spec.aliases.get(c, ()):
+                if prep.norm(a) in hdr:
+                    found = hdr[prep.norm(a)]
+                    break
+            if not found and prep.norm(c) in hdr:
+                found = hdr[prep.norm(c)]
+            colmap[c] = found
+        rows = 0
+        with open(out, "w", newline="", encoding="utf-8") as g:
+            w = csv.writer(g)
+            w.writerow(spec.columns)
+            for row in r:
+                w.writerow([row.get(colmap[c], "") for c in spec.columns])
+                rows += 1
+    return rows
+
+
+def timed(label: str, fn: Callable[[], int]) -> float:
+    start = time.perf_counter()
+    rows = fn()
+    elapsed = time.perf_counter() - start
+    rate = rows / elapsed if elapsed else float("inf")
+    print(f"{label:<10} {rows:>10} rows  {elapsed:8.2f}s  {rate:>12,.0f} rows/s")
+    return rate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Synthetic va_txn rows.")
+    parser.add_argument("--src", help="Benchmark an existing va_txn export instead of generating one.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        src = Path(args.src) if args.src else tmp_dir / "va_txn_synthetic.csv"
+        if not args.src:
+            write_synthetic_va_txn(src, args.rows)
+        before_out = tmp_dir / "before.csv"
+        after_out = tmp_dir / "after.csv"
+        before = timed("before", lambda: legacy_prep(prep.VA_TXN, src, before_out))
+        after = timed("after", lambda: prep.prep_file(prep.VA_TXN, src, after_out))
+        print(f"speedup    {after / before:.2f}x")
+        if not filecmp.cmp(before_out, after_out, shallow=False):
+            raise SystemExit("Output mismatch between legacy and prep.py paths.")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,17 +9,24 @@ declare -a INIT_FILES=(
   "${SQL_DIR_INIT}/000_schemas.sql"
   "${SQL_DIR_INIT}/010_extensions.sql"
   "${SQL_DIR_INIT}/020_security.sql"
+  "${SQL_DIR_INIT}/090_raw_parse_fns.sql"
   "${SQL_DIR_INIT}/100_raw_tables.sql"
+  "${SQL_DIR_INIT}/110_raw_load_manifest.sql"
+  "${SQL_DIR_INIT}/120_raw_parse_errors.sql"
+  "${SQL_DIR_INIT}/130_pipeline_cache.sql"
+  "${SQL_DIR_INIT}/140_ops_stats.sql"
   "${SQL_DIR_INIT}/200_ref_tables.sql"
 )
 
 declare -a PHASE2_FILES=(
   "${SQL_DIR_PHASE2}/000_core_refresh_fn.sql"
   "${SQL_DIR_PHASE2}/001_core_types.sql"
+  "${SQL_DIR_PHASE2}/001_core_remark_categories.sql"
   "${SQL_DIR_PHASE2}/002_core_basic_mviews.sql"
   "${SQL_DIR_PHASE2}/002_core_mviews.sql"
   "${SQL_DIR_PHASE2}/003_core_mviews_flows.sql"
   "${SQL_DIR_PHASE2}/004_core_inter_sku_transfers.sql"
+  "${SQL_DIR_PHASE2}/009_mart_sku_facts.sql"
   "${SQL_DIR_PHASE2}/010_mart_views.sql"
   "${SQL_DIR_PHASE2}/020_mart_level2.sql"
   "${SQL_DIR_PHASE2}/021_category_funds_to_sku.sql"
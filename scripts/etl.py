@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+"""Run the ETL pipeline as a DAG of cached stages over pooled DB sessions.
+
+  stage      does                                        waits for
+  bootstrap  initdb/ + sql/phase2 files in bootstrap_db.sh
+  map        note_sku_va_map_prepped.csv from the Level-1 reference export
+  prep       *_prepped.csv from the exports (--load fresh only)
+  load       raw.* from the exports (or the prepped CSVs)  bootstrap, prep
+  mapping    merchants, SKUs and ref.note_sku_va_map       bootstrap, load, map
+  refresh    core.* / mart.* in refresh.py's waves         bootstrap, load, mapping
+  verify     scripts/run_test_suite.sh (--verify only)     refresh
+
+A stage starts as soon as the stages it waits for are done, so bootstrap, map
+and prep run side by side. Each stage's cache key hashes its input files, its
+options and the keys of the stages whose output it reads; when the key matches
+raw.pipeline_cache (and the stage's output files exist) the stage is skipped.
+Files whose size and mtime are unchanged are not re-hashed. --force reruns
+everything. SQL goes over pg_session.Pool sessions rather than a psql process
+per statement. A JSON run report (--report) records each stage's status,
+duration, row count and cache hit; refresh steps are also logged to
+ops.refresh_log like refresh.py's.
+
+--load incremental  load only exports not yet in raw.load_manifest (make etl-load)
+--load stream       truncate raw.*, then stream every export in (make etl-load-stream)
+--load fresh        prep to *_prepped.csv, truncate raw.*, COPY the files
+                    (make etl-load-fresh)
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import load_manifest
+import load_parallel
+import prep
+import refresh
+from pg_copy import PsqlError, literal
+from pg_session import Pool
+from prep_note_sku_map import build_mapping, mapping_columns
+
+ROOT = Path(__file__).resolve().parent.parent
+BOOTSTRAP_SH = ROOT / "scripts" / "bootstrap_db.sh"
+SQL_UTILS = ROOT / "scripts" / "sql-utils"
+MAPPING_SQL = (
+    SQL_UTILS / "upsert_merchants_from_sales.sql",
+    SQL_UTILS / "upsert_skus_from_sales.sql",
+    SQL_UTILS / "load_note_sku_va_map.sql",
+)
+TEST_SUITE = ROOT / "scripts" / "run_test_suite.sh"
+STAGES = ("bootstrap", "map", "prep", "load", "mapping", "refresh", "verify")
+RAW_TABLES = "raw.external_accounts, raw.va_txn, raw.repmt_sku, raw.repmt_sales, raw.load_manifest"
+CACHE = "raw.pipeline_cache"
+
+# bootstrap_db.sh stays the one list of bootstrap files; entries look like
+# "${SQL_DIR_INIT}/000_schemas.sql".
+_BOOTSTRAP_ENTRY_RE = re.compile(r'"\$\{SQL_DIR_(INIT|PHASE2)\}/([^"]+\.sql)"')
+_BOOTSTRAP_DIRS = {"INIT": ROOT / "initdb", "PHASE2": ROOT / "sql" / "phase2"}
+
+# [file_bytes, file_mtime_ns, sha256]
+FileFingerprint = List[Any]
+
+
+@dataclass
+class StepResult:
+    """One timed piece of a stage (a bootstrap file, a refreshed MV)."""
+
+    name: str
+    seconds: float = 0.0
+    error: Optional[str] = None
+    skipped: bool = False
+    note: str = ""
+
+
+@dataclass
+class StageResult:
+    name: str
+    status: str = "ok"  # ok | cached | failed | skipped
+    seconds: float = 0.0
+    rows: Optional[int] = None
+    cache_key: str = ""
+    cache_hit: bool = False
+    error: Optional[str] = None
+    note: str = ""
+    steps: List[StepResult] = field(default_factory=list)
+
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable[[StageResult], None]
+    after: Tuple[str, ...] = ()
+    inputs: Callable[[], List[Path]] = list
+    # Stages whose output this one reads: their keys are part of its key.
+    keyed_on: Tuple[str, ...] = ()
+    options: str = ""
+    outputs: Callable[[], List[Path]] = list
+    cacheable: bool = True
+
+
+class StageFailed(Exception):
+    """A stage that reported its own failure (prep.py's per-feed table, a failed MV)."""
+
+
+def bootstrap_files() -> List[Path]:
+    return [
+        _BOOTSTRAP_DIRS[kind] / name
+        for kind, name in _BOOTSTRAP_ENTRY_RE.findall(BOOTSTRAP_SH.read_text())
+    ]
+
+
+def _timed(result: StageResult, name: str, fn: Callable[[], Any]) -> Any:
+    step = StepResult(name)
+    start = time.perf_counter()
+    try:
+        return fn()
+    except (PsqlError, StageFailed, OSError) as err:
+        step.error = str(err) or type(err).__name__
+        raise
+    finally:
+        step.seconds = time.perf_counter() - start
+        result.steps.append(step)
+
+
+def _fingerprint(path: Path, known: Optional[FileFingerprint]) -> FileFingerprint:
+    """Like load_manifest.fingerprint: the recorded hash stands while size and mtime match."""
+    st = path.stat()
+    if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+        return known
+    return [st.st_size, st.st_mtime_ns, load_manifest.sha256_file(path)]
+
+
+def _relative(path: Path) -> str:
+    try:
+        return str(path.resolve().relative_to(ROOT))
+    except ValueError:
+        return str(path.resolve())
+
+
+class Pipeline:
+    def __init__(self, args: argparse.Namespace, pool: Pool) -> None:
+        self.args = args
+        self.pool = pool
+        self.inc_dir: Path = args.inc_dir
+        self.mapping_csv = self.inc_dir / "note_sku_va_map_prepped.csv"
+        self.cache: Dict[str, Tuple[str, Optional[int]]] = {}
+        self.known_files: Dict[str, FileFingerprint] = {}
+        self.keys: Dict[str, str] = {}
+        self.done: List[Tuple[StageResult, Dict[str, FileFingerprint]]] = []
+        self._lock = threading.Lock()
+
+    # ── stage graph ──────────────────────────────────────────────────────────
+
+    def stages(self) -> Dict[str, Stage]:
+        mode = self.args.load
+        fresh = mode == "fresh"
+        stages = [
+            Stage(
+                "bootstrap", self.stage_bootstrap,
+                inputs=lambda: [BOOTSTRAP_SH] + [p for p in bootstrap_files() if p.is_file()],
+            ),
+            Stage(
+                "map", self.stage_map, inputs=lambda: [self.args.map_source],
+                outputs=lambda: [self.mapping_csv],
+            ),
+            Stage(
+                "load",
+                self.stage_load,
+                after=("bootstrap", "prep") if fresh else ("bootstrap",),
+                inputs=list if fresh else self.export_files,
+                keyed_on=("prep",) if fresh else (),
+                options=f"{mode} tee={self.args.tee}",
+            ),
+            Stage(
+                "mapping",
+                self.stage_mapping,
+                after=("bootstrap", "load", "map"),
+                inputs=lambda: [self.mapping_csv, *MAPPING_SQL],
+                keyed_on=("load", "map"),
+            ),
+            Stage(
+                "refresh",
+                self.stage_refresh,
+                after=("bootstrap", "load", "mapping"),
+                keyed_on=("bootstrap", "load", "mapping"),
+                cacheable=not self.args.full,
+            ),
+        ]
+        if fresh:
+            stages.append(
+                Stage("prep", self.stage_prep, inputs=self.export_files, outputs=self.prepped_files)
+            )
+        if self.args.verify:
+            stages.append(Stage("verify", self.stage_verify, after=("refresh",), cacheable=False))
+        by_name = {s.name: s for s in stages}
+        return {name: by_name[name] for name in STAGES if name in by_name}
+
+    def export_files(self) -> List[Path]:
+        if self.args.load == "fresh":
+            # prep.py all preps the first export per feed (or the $*_SRC override)
+            return [prep.resolve_source(spec, self.inc_dir) for spec in prep.FEEDS.values()]
+        return [p for spec in prep.FEEDS.values() for p in prep.resolve_sources(spec, self.inc_dir)]
+
+    def prepped_parts(self, spec: prep.FeedSpec) -> List[Path]:
+        """A feed's *_prepped.csv, or its numbered shards."""
+        path = self.inc_dir / spec.output_name
+        if path.is_file():
+            return [path]
+        return sorted(path.parent.glob(f"{path.stem}.[0-9][0-9][0-9][0-9].csv")) or [path]
+
+    def prepped_files(self) -> List[Path]:
+        return [p for spec in prep.FEEDS.values() for p in self.prepped_parts(spec)]
+
+    # ── cache ────────────────────────────────────────────────────────────────
+
+    def read_cache(self) -> None:
+        try:
+            with self.pool.session() as session:
+                rows = session.query(
+                    f"select stage, cache_key, input_files::text, row_count from {CACHE}"
+                )
+        except PsqlError:
+            return  # not bootstrapped yet: every stage runs
+        for stage, key, files, count in rows:
+            self.cache[stage] = (key, int(count) if count else None)
+            self.known_files.update(json.loads(files))
+
+    def cache_key(self, stage: Stage) -> Tuple[str, Dict[str, FileFingerprint]]:
+        digest = hashlib.sha256(f"{stage.name}\0{stage.options}\n".encode())
+        files: Dict[str, FileFingerprint] = {}
+        for path in stage.inputs():
+            if not path.is_file():
+                raise StageFailed(f"Missing input {path}")
+            name = _relative(path)
+            files[name] = _fingerprint(path, self.known_files.get(name))
+            digest.update(f"{name}\0{files[name][2]}\n".encode())
+        with self._lock:
+            for upstream in stage.keyed_on:
+                digest.update(f"{upstream}\0{self.keys.get(upstream, '')}\n".encode())
+        return digest.hexdigest(), files
+
+    def record(self, done: Sequence[Tuple[StageResult, Dict[str, FileFingerprint]]]) -> None:
+        """Store the keys of stages that ran and succeeded. Done once at the end,
+        since stages that do not wait for bootstrap may finish before it creates
+        the cache table."""
+        if not done:
+            return
+        values = ",\n  ".join(
+            f"({literal(r.name)}, {literal(r.cache_key)}, {literal(json.dumps(files))}::jsonb, "
+            f"{'null' if r.rows is None else r.rows}, {r.seconds:.3f})"
+            for r, files in done
+        )
+        try:
+            with self.pool.session() as session:
+                session.execute(
+                    f"insert into {CACHE} (stage, cache_key, input_files, row_count, seconds)\n"
+                    f"values\n  {values}\n"
+                    "on conflict (stage) do update set cache_key = excluded.cache_key,\n"
+                    "  input_files = excluded.input_files, row_count = excluded.row_count,\n"
+                    "  seconds = excluded.seconds, finished_at = now();"
+                )
+        except PsqlError as err:
+            print(f"Cannot record stage cache in {CACHE}: {err}", file=sys.stderr)
+
+    # ── scheduling ───────────────────────────────────────────────────────────
+
+    def run_stage(self, stage: Stage) -> StageResult:
+        result = StageResult(stage.name)
+        start = time.perf_counter()
+        try:
+            result.cache_key, files = self.cache_key(stage)
+            with self._lock:
+                self.keys[stage.name] = result.cache_key
+            cached_key, cached_rows = self.cache.get(stage.name, ("", None))
+            if (
+                stage.cacheable
+                and not self.args.force
+                and cached_key == result.cache_key
+                and all(p.exists() for p in stage.outputs())
+            ):
+                result.status, result.cache_hit, result.rows = "cached", True, cached_rows
+            else:
+                stage.run(result)
+                if stage.cacheable:
+                    with self._lock:
+                        self.done.append((result, files))
+        except (PsqlError, StageFailed, prep.PrepError, OSError) as err:
+            result.status, result.error = "failed", str(err) or type(err).__name__
+        result.seconds = time.perf_counter() - start
+        return result
+
+    def run(self, selected: Sequence[str]) -> List[StageResult]:
+        """Start each selected stage once its dependencies are done; dependents
+        of a failed stage are skipped. Unselected stages count as done, with
+        their last recorded cache key."""
+        stages = self.stages()
+        self.read_cache()
+        for name in stages:
+            if name not in selected and name in self.cache:
+                self.keys[name] = self.cache[name][0]
+        results: Dict[str, StageResult] = {}
+        pending = {name: stage for name, stage in stages.items() if name in selected}
+        running: Dict[Future, str] = {}
+        with ThreadPoolExecutor(max_workers=max(len(pending), 1)) as workers:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    deps = [d for d in stage.after if d in stages and d in selected]
+                    if any(d in results and results[d].status in ("failed", "skipped") for d in deps):
+                        results[name] = StageResult(name, status="skipped", note="dependency failed")
+                        del pending[name]
+                    elif all(d in results for d in deps):
+                        running[workers.submit(self.run_stage, stage)] = name
+                        del pending[name]
+                if not running:
+                    break
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    results[running.pop(fut)] = fut.result()
+        self.record([(r, files) for r, files in self.done if r.status == "ok"])
+        return [results[name] for name in stages if name in results]
+
+    # ── stages ───────────────────────────────────────────────────────────────
+
+    def stage_bootstrap(self, result: StageResult) -> None:
+        with self.pool.session() as session:
+            for path in bootstrap_files():
+                if not path.is_file():
+                    result.steps.append(StepResult(path.name, skipped=True, note="missing"))
+                    continue
+                _timed(result, path.name, lambda p=path: session.run_file(p))
+
+    def stage_map(self, result: StageResult) -> None:
+        result.rows = build_mapping(self.args.map_source, self.mapping_csv, quiet=True)
+
+    def _prep(self, result: StageResult, *extra: str) -> None:
+        rc, feeds = prep.run(prep.parse_args(["all", str(self.inc_dir), *extra]))
+        result.rows = sum(r.rows for r in feeds if not r.skipped and not r.error)
+        if rc != 0:
+            raise StageFailed(f"prep.py exited with {rc}")
+
+    def stage_prep(self, result: StageResult) -> None:
+        self._prep(result)
+
+    def truncate_raw(self) -> None:
+        with self.pool.session() as session:
+            session.execute(f"truncate {RAW_TABLES};")
+
+    def copy_prepped(self) -> int:
+        """COPY every *_prepped.csv (or its shards) into raw.*, cut into record-aligned
+        ranges that load over the pool's sessions (load_parallel.py)."""
+        units = load_parallel.plan_units(self.inc_dir, "csv", load_parallel.CHUNK_MB * 1024 * 1024)
+        results = load_parallel.load_units(self.pool, units, self.args.jobs)
+        failed = [f"{r.label}: {r.error}" for r in results if r.error]
+        if failed:
+            raise StageFailed("; ".join(failed))
+        return sum(r.rows for r in results)
+
+    def stage_load(self, result: StageResult) -> None:
+        tee = ["--tee"] if self.args.tee else []
+        if self.args.load == "incremental":
+            _timed(result, "prep.py --incremental", lambda: self._prep(result, "--incremental", *tee))
+        elif self.args.load == "stream":
+            _timed(result, "truncate raw.*", self.truncate_raw)
+            _timed(result, "prep.py --load", lambda: self._prep(result, "--load", *tee))
+        else:
+            _timed(result, "truncate raw.*", self.truncate_raw)
+            result.rows = _timed(result, "copy prepped CSVs", self.copy_prepped)
+
+    def stage_mapping(self, result: StageResult) -> None:
+        with open(self.mapping_csv, "rb") as fh:
+            if next(fh, None) is None or next(fh, None) is None:
+                result.rows, result.note = 0, "header only, nothing to load"
+                return
+        replacements = {
+            "__CSV_PATH__": str(self.mapping_csv),
+            "__MAP_COLUMNS__": mapping_columns(self.mapping_csv),
+        }
+        with self.pool.session() as session:
+            for path in MAPPING_SQL:
+                _timed(result, path.name, lambda p=path: session.run_file(p, replacements))
+            ((count,),) = session.query("select count(*) from ref.note_sku_va_map")
+        result.rows = int(count)
+
+    def stage_refresh(self, result: StageResult) -> None:
+        with self.pool.session() as session:
+            steps = refresh.plan_steps(*refresh.read_graph(session), full=self.args.full)
+            instrument = refresh.instrumented(session)
+        run = refresh.run_steps(steps, self.pool, self.args.jobs, instrument)
+        for r in run:
+            note = "" if r.rows is None else f"{r.rows} rows, {r.blks_hit + r.blks_read} blocks"
+            result.steps.append(StepResult(r.name, r.seconds, r.error, r.skipped, note))
+        if instrument:
+            try:
+                with self.pool.session() as session:
+                    refresh.record_run(session, str(uuid.uuid4()), run, self.args.full)
+            except PsqlError as err:
+                print(f"Cannot record the refresh in {refresh.OPS_LOG}: {err}", file=sys.stderr)
+        failed = [s.name for s in result.steps if s.error and not s.skipped]
+        if failed:
+            raise StageFailed(f"refresh failed: {', '.join(failed)}")
+
+    def stage_verify(self, result: StageResult) -> None:
+        rc = subprocess.run(["bash", str(TEST_SUITE)], cwd=ROOT).returncode
+        if rc != 0:
+            raise StageFailed(f"run_test_suite.sh exited with {rc}")
+
+
+def print_report(results: Sequence[StageResult], wall: float) -> None:
+    print(f"{'stage':<44} {'status':<7} {'secs':>8} {'rows':>10}  note")
+    for r in results:
+        rows = "" if r.rows is None else r.rows
+        print(f"{r.name:<44} {r.status:<7} {r.seconds:>8.2f} {rows:>10}  {r.note}".rstrip())
+        for s in r.steps:
+            status = "skip" if s.skipped else "FAIL" if s.error else "ok"
+            print(f"  {s.name:<42} {status:<7} {s.seconds:>8.2f} {'':>10}  {s.note}".rstrip())
+    print(f"{'wall clock':<44} {'':<7} {wall:>8.2f}")
+    for r in results:
+        if r.error:
+            print(f"{r.name}: {r.error}", file=sys.stderr)
+
+
+def write_report(
+    path: Path,
+    args: argparse.Namespace,
+    started: datetime,
+    results: Sequence[StageResult],
+    wall: float,
+) -> None:
+    report = {
+        "started_at": started.isoformat(timespec="seconds"),
+        "wall_seconds": round(wall, 3),
+        "load": args.load,
+        "status": "failed" if any(r.status == "failed" for r in results) else "ok",
+        "cache_hits": sum(r.cache_hit for r in results),
+        "stages": [asdict(r) for r in results],
+    }
+    for stage in report["stages"]:
+        for item in [stage] + stage["steps"]:
+            item["seconds"] = round(item["seconds"], 3)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2) + "\n")
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("inc_dir", nargs="?", default="data/inc_data", type=Path, help="Export directory.")
+    parser.add_argument(
+        "--load", choices=("incremental", "stream", "fresh"), default="incremental",
+        help="How raw.* is loaded (default: incremental).",
+    )
+    parser.add_argument(
+        "--map-source", type=Path,
+        help="Level-1 reference export for the SKU<->VA map (default: INC_DIR/level1_reference.csv).",
+    )
+    parser.add_argument(
+        "--tee", action="store_true", help="With incremental/stream loads, also write prepped CSVs."
+    )
+    parser.add_argument(
+        "--stages",
+        help=f"Comma-separated subset of {','.join(STAGES)} to run (default: all that apply).",
+    )
+    parser.add_argument("--verify", action="store_true", help="Run scripts/run_test_suite.sh last.")
+    parser.add_argument("--force", action="store_true", help=f"Ignore {CACHE}; rerun every stage.")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=int(os.getenv("REFRESH_JOBS", "4")),
+        help="Pooled sessions for refresh and prepped-file COPY (default: $REFRESH_JOBS or 4).",
+    )
+    parser.add_argument(
+        "--full", action="store_true", help="Rebuild incrementally maintained tables on refresh."
+    )
+    parser.add_argument(
+        "--report", type=Path, default=Path("data/etl_report.json"),
+        help="JSON run report path (default: data/etl_report.json).",
+    )
+    args = parser.parse_args(argv)
+    args.stages = [s.strip() for s in (args.stages or ",".join(STAGES)).split(",") if s.strip()]
+    unknown = sorted(set(args.stages) - set(STAGES))
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+    if args.map_source is None:
+        args.map_source = args.inc_dir / "level1_reference.csv"
+    return args
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    started = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    with Pool(args.jobs) as pool:
+        results = Pipeline(args, pool).run(args.stages)
+    wall = time.perf_counter() - start
+    print_report(results, wall)
+    write_report(args.report, args, started, results, wall)
+    return 1 if any(r.status == "failed" for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""Export the Level 1 / 2a / 2b reports from mart.* to CSV, gzip or Parquet.
+
+Every output file is one ``\\copy (...) to pstdout`` over its own psql session;
+--jobs of them run at once and rows are written as they arrive (Parquet in
+record batches), so no report is ever held in memory. --shard-by splits each
+report into one file per merchant or per month; --from/--to restrict it to a
+period range (mart.level1 / level2a / level2b instead of the views).
+
+Usage:
+  export.py [REPORT ...] [--out DIR] [--format csv|csv.gz|parquet]
+            [--shard-by none|merchant|period] [--from YYYY-MM [--to YYYY-MM]]
+            [--jobs N]
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import gzip
+import io
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import IO, Dict, List, Optional, Sequence, Tuple
+
+from pg_copy import PsqlError, copy_out, literal, run_sql
+
+COPY_CHUNK = 1024 * 1024
+QUOTE = b'"'
+FORMATS = ("csv", "csv.gz", "parquet")
+PERIOD_RE = re.compile(r"^\d{4}-\d{2}$")
+
+
+@dataclass(frozen=True)
+class Report:
+    view: str
+    function: str
+    merchant_column: str
+    order_by: str
+
+
+REPORTS: Dict[str, Report] = {
+    "level1": Report("mart.v_level1", "mart.level1", "merchant", "sku_id, account_number"),
+    "level2a": Report("mart.v_level2a", "mart.level2a", '"Merchant"', '"SKU ID"'),
+    "level2b": Report("mart.v_level2b", "mart.level2b", '"Merchant"', '"SKU ID"'),
+}
+
+
+@dataclass(frozen=True)
+class ExportTask:
+    report: str
+    shard: Optional[str]
+    query: str
+    path: Path
+
+
+@dataclass
+class ExportResult:
+    task: ExportTask
+    rows: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+def _source(report: Report, period_from: Optional[str], period_to: Optional[str]) -> str:
+    if period_from is None:
+        return report.view
+    to = literal(period_to) if period_to else "NULL"
+    return f"{report.function}({literal(period_from)}, {to})"
+
+
+def _slug(value: Optional[str]) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", value or "").strip("_") or "unknown"
+
+
+def _query_column(sql: str) -> List[Optional[str]]:
+    out = run_sql(f"copy ({sql}) to stdout csv")
+    return [row[0] if row and row[0] != "" else None for row in csv.reader(io.StringIO(out))]
+
+
+def plan_tasks(
+    reports: Sequence[str],
+    out_dir: Path,
+    fmt: str,
+    shard_by: str,
+    period_from: Optional[str],
+    period_to: Optional[str],
+) -> List[ExportTask]:
+    tasks: List[ExportTask] = []
+    periods: List[Optional[str]] = []
+    if shard_by == "period":
+        where = ""
+        if period_from:
+            where = f" and period_ym between {literal(period_from)} and {literal(period_to or period_from)}"
+        periods = _query_column(
+            f"select distinct period_ym from mart.mv_flows_period where period_ym is not null{where} order by 1"
+        )
+    for name in reports:
+        report = REPORTS[name]
+        if shard_by == "none":
+            source = _source(report, period_from, period_to)
+            shards: List[Tuple[Optional[str], str]] = [(None, f"select * from {source}")]
+        elif shard_by == "period":
+            shards = [
+                (period, f"select * from {_source(report, period, None)}") for period in periods
+            ]
+        else:
+            source = _source(report, period_from, period_to)
+            merchants = _query_column(f"select distinct {report.merchant_column} from {source} order by 1")
+            shards = [
+                (
+                    merchant,
+                    f"select * from {source} where {report.merchant_column} "
+                    + ("is null" if merchant is None else f"= {literal(merchant)}"),
+                )
+                for merchant in merchants
+            ]
+        seen: Dict[str, int] = {}
+        for shard, sql in shards:
+            stem = name if shard_by == "none" else f"{name}__{_slug(shard)}"
+            seen[stem] = seen.get(stem, 0) + 1
+            if seen[stem] > 1:
+                stem = f"{stem}_{seen[stem]}"
+            tasks.append(
+                ExportTask(name, shard, f"{sql} order by {report.order_by}", out_dir / f"{stem}.{fmt}")
+            )
+    return tasks
+
+
+def _copy_csv(stream: IO[bytes], sink: IO[bytes]) -> int:
+    """Copy ``stream`` to ``sink`` chunk by chunk; return the data row count.
+
+    Only newlines outside quotes end a record: COPY doubles quotes inside a
+    field, so quote parity (carried across chunks) tells the two apart.
+    """
+    records = 0
+    quoted = False
+    while True:
+        chunk = stream.read(COPY_CHUNK)
+        if not chunk:
+            break
+        sink.write(chunk)
+        if not quoted and QUOTE not in chunk:
+            records += chunk.count(b"\n")
+            continue
+        parts = chunk.split(QUOTE)
+        for part in parts[:-1]:
+            if not quoted:
+                records += part.count(b"\n")
+            quoted = not quoted
+        if not quoted:
+            records += parts[-1].count(b"\n")
+    return max(records - 1, 0)
+
+
+@lru_cache(maxsize=None)
+def _arrow_schema(view: str):  # -> pyarrow.Schema
+    """Column types of ``view`` (the period functions return the same row type)."""
+    import pyarrow as pa
+
+    out = run_sql(
+        "copy (select attname, format_type(atttypid, atttypmod) from pg_attribute "
+        f"where attrelid = {literal(view)}::regclass and attnum > 0 "
+        "and not attisdropped order by attnum) to stdout csv"
+    )
+    types = {
+        "numeric": pa.decimal128(38, 10),
+        "bigint": pa.int64(),
+        "integer": pa.int32(),
+        "boolean": pa.bool_(),
+        "date": pa.date32(),
+    }
+    return pa.schema(
+        [(col, types.get(pg_type, pa.string())) for col, pg_type in csv.reader(io.StringIO(out))]
+    )
+
+
+def _write_parquet(task: ExportTask, stream: IO[bytes], path: Path) -> int:
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(REPORTS[task.report].view)
+    reader = pacsv.open_csv(
+        stream,
+        read_options=pacsv.ReadOptions(block_size=COPY_CHUNK),
+        convert_options=pacsv.ConvertOptions(
+            column_types=schema,
+            null_values=[""],
+            strings_can_be_null=True,
+            quoted_strings_can_be_null=False,
+        ),
+    )
+    rows = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
+
+
+def export_one(task: ExportTask, fmt: str) -> ExportResult:
+    result = ExportResult(task)
+    start = time.perf_counter()
+    tmp = task.path.with_name(task.path.name + ".part")
+    try:
+        with copy_out(task.query) as stream:
+            if fmt == "parquet":
+                result.rows = _write_parquet(task, stream, tmp)
+            elif fmt == "csv.gz":
+                with gzip.open(tmp, "wb", compresslevel=6) as sink:
+                    result.rows = _copy_csv(stream, sink)
+            else:
+                with open(tmp, "wb") as sink:
+                    result.rows = _copy_csv(stream, sink)
+        tmp.replace(task.path)
+        result.bytes = task.path.stat().st_size
+    except (PsqlError, OSError, ValueError) as err:
+        result.error = str(err)
+        tmp.unlink(missing_ok=True)
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def print_report(results: Sequence[ExportResult], wall: float) -> None:
+    print(f"{'file':<48} {'rows':>8} {'bytes':>12} {'secs':>7}")
+    for r in results:
+        status = f"FAILED: {r.error}" if r.error else ""
+        print(f"{r.task.path.name:<48} {r.rows:>8} {r.bytes:>12,} {r.seconds:>7.2f} {status}".rstrip())
+    print(f"{'wall clock':<48} {'':>8} {'':>12} {wall:>7.2f}")
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "reports", nargs="*", metavar="REPORT",
+        help=f"Reports to export ({', '.join(REPORTS)}; default: all).",
+    )
+    parser.add_argument("--out", default="data/exports", help="Output directory (default: data/exports).")
+    parser.add_argument("--format", choices=FORMATS, default="csv", help="Output format (default: csv).")
+    parser.add_argument(
+        "--shard-by", choices=("none", "merchant", "period"), default="none",
+        help="One file per merchant or per month instead of one per report.",
+    )
+    parser.add_argument("--from", dest="period_from", help="First month (YYYY-MM) to report on.")
+    parser.add_argument("--to", dest="period_to", help="Last month (YYYY-MM; default: --from).")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=int(os.getenv("EXPORT_JOBS", "4")),
+        help="Parallel psql sessions (default: $EXPORT_JOBS or 4).",
+    )
+    args = parser.parse_args(argv)
+    unknown = sorted(set(args.reports) - set(REPORTS))
+    if unknown:
+        parser.error(f"unknown report(s): {', '.join(unknown)}")
+    for period in (args.period_from, args.period_to):
+        if period is not None and not PERIOD_RE.match(period):
+            parser.error(f"periods are YYYY-MM, got {period!r}")
+    if args.period_to and not args.period_from:
+        parser.error("--to needs --from")
+    return args
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("Parquet export needs pyarrow (pip install pyarrow).", file=sys.stderr)
+            return 2
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        tasks = plan_tasks(
+            args.reports or list(REPORTS), out_dir, args.format, args.shard_by,
+            args.period_from, args.period_to,
+        )
+    except PsqlError as err:
+        print(f"Cannot plan the export: {err}", file=sys.stderr)
+        return 1
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(args.jobs, 1)) as pool:
+        results = list(pool.map(lambda t: export_one(t, args.format), tasks))
+    print_report(results, time.perf_counter() - start)
+    return 1 if any(r.error for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
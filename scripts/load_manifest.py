@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""raw.load_manifest bookkeeping for incremental loads.
+
+Each export loaded into raw.* is recorded with its size, mtime and SHA-256.
+A file whose size and mtime are unchanged is trusted without re-hashing, so
+a daily run reads only new or touched exports. A changed file has its rows
+(matched on raw.*.source_file) and manifest entry removed before reloading;
+the entry is written back only after the load succeeds, so an interrupted
+run is simply redone next time.
+"""
+from __future__ import annotations
+
+import csv
+import hashlib
+import io
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from pg_copy import literal, run_sql
+
+MANIFEST = "raw.load_manifest"
+HASH_BLOCK = 4 * 1024 * 1024
+
+Key = Tuple[str, str]
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    sha256: str
+    file_bytes: int
+    file_mtime_ns: int
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    table: str
+    source_file: str
+    fingerprint: Fingerprint
+    rows: int
+
+
+def sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint(path: Path, known: Optional[ManifestEntry] = None) -> Fingerprint:
+    """Fingerprint ``path``; reuses the recorded hash when size and mtime still match."""
+    st = path.stat()
+    if known is not None:
+        fp = known.fingerprint
+        if fp.file_bytes == st.st_size and fp.file_mtime_ns == st.st_mtime_ns:
+            return fp
+    return Fingerprint(sha256_file(path), st.st_size, st.st_mtime_ns)
+
+
+def fetch(tables: Iterable[str]) -> Dict[Key, ManifestEntry]:
+    names = ", ".join(literal(t) for t in tables)
+    out = run_sql(
+        f"copy (select table_name, source_file, sha256, file_bytes, file_mtime_ns, row_count "
+        f"from {MANIFEST} where table_name in ({names})) to stdout csv"
+    )
+    entries: Dict[Key, ManifestEntry] = {}
+    for table, source_file, sha, size, mtime, rows in csv.reader(io.StringIO(out)):
+        fp = Fingerprint(sha, int(size), int(mtime))
+        entries[(table, source_file)] = ManifestEntry(table, source_file, fp, int(rows))
+    return entries
+
+
+def discard(keys: Sequence[Key]) -> None:
+    """Delete the raw rows and manifest entries of files about to be (re)loaded.
+
+    Rows with a NULL source_file (plain load_raw.sh loads) cannot be matched to
+    an export, so they are cleared from any table being loaded incrementally.
+    """
+    if not keys:
+        return
+    statements = []
+    for table in sorted({table for table, _ in keys}):
+        files = ", ".join(literal(f) for t, f in keys if t == table)
+        statements.append(
+            f"delete from {table} where source_file in ({files}) or source_file is null;"
+        )
+        statements.append(
+            f"delete from {MANIFEST} where table_name = {literal(table)} "
+            f"and source_file in ({files});"
+        )
+    run_sql("\n".join(statements))
+
+
+def record(entries: Sequence[ManifestEntry]) -> None:
+    if not entries:
+        return
+    values = ",\n  ".join(
+        f"({literal(e.table)}, {literal(e.source_file)}, {literal(e.fingerprint.sha256)}, "
+        f"{e.fingerprint.file_bytes}, {e.fingerprint.file_mtime_ns}, {e.rows})"
+        for e in entries
+    )
+    run_sql(
+        f"insert into {MANIFEST} "
+        f"(table_name, source_file, sha256, file_bytes, file_mtime_ns, row_count)\n"
+        f"values\n  {values}\n"
+        f"on conflict (table_name, source_file) do update set\n"
+        f"  sha256 = excluded.sha256, file_bytes = excluded.file_bytes,\n"
+        f"  file_mtime_ns = excluded.file_mtime_ns, row_count = excluded.row_count,\n"
+        f"  loaded_at = now();"
+    )
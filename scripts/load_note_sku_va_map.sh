@@ -12,6 +12,13 @@ if [ "$(wc -l < "$CSV_PATH")" -le 1 ]; then
   exit 0
 fi
 
+# The staging COPY takes the file's own columns (validity columns are optional)
+MAP_COLUMNS=$(head -n1 "$CSV_PATH" | tr -d '\r')
+case "$MAP_COLUMNS" in
+  "note_id,sku_id,va_number"|"note_id,sku_id,va_number,valid_from,valid_to") ;;
+  *) echo "Unexpected mapping header in $CSV_PATH: $MAP_COLUMNS" >&2; exit 2 ;;
+esac
+
 # Ensure merchants and SKUs exist before loading
 scripts/run_sql.sh -f scripts/sql-utils/upsert_merchants_from_sales.sql
 scripts/run_sql.sh -f scripts/sql-utils/upsert_skus_from_sales.sql
@@ -19,7 +26,7 @@ scripts/run_sql.sh -f scripts/sql-utils/upsert_skus_from_sales.sql
 # Load mappings from CSV into ref.note_sku_va_map
 tmp_sql=$(mktemp)
 trap 'rm -f "$tmp_sql"' EXIT
-sed "s|__CSV_PATH__|$CSV_PATH|g" scripts/sql-utils/load_note_sku_va_map.sql > "$tmp_sql"
+sed -e "s|__CSV_PATH__|$CSV_PATH|g" -e "s|__MAP_COLUMNS__|$MAP_COLUMNS|g" scripts/sql-utils/load_note_sku_va_map.sql > "$tmp_sql"
 scripts/run_sql.sh -f "$tmp_sql"
 
 # Report coverage
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""Load the prepped feeds into raw.* over N parallel COPY connections.
+
+Every <feed>_prepped.csv (or each of its numbered shards) larger than
+--chunk-mb is cut into record-aligned byte ranges (prep_chunks.py) and each
+range is streamed over its own pooled session. The ranges of all four feeds
+share one queue, largest first, so --jobs connections stay busy until the
+last feed is in. Binary .pgcopy files (prep.py --format pgcopy) cannot be cut
+and load one per connection.
+
+Modes:
+  (default)  append to raw.*, like `make load-all`
+  --fresh    truncate raw.* and raw.load_manifest first, like `load-all-fresh`
+  --swap     load into UNLOGGED raw.<table>_load staging tables, then replace
+             all four raw tables in one transaction. Readers never see a
+             half-loaded raw.*, and a failed load leaves it untouched; the
+             final INSERT ... SELECT (and the typed-column parse) is serial.
+
+Usage:
+  load_parallel.py [INC_DIR] [--jobs N] [--chunk-mb MB] [--format csv|pgcopy]
+                   [--fresh | --swap]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence
+
+from pg_copy import PsqlError
+from pg_session import COPY_CHUNK, Pool
+from prep import FEEDS, FeedSpec, PrepError, TaskResult, print_report
+from prep_chunks import existing_shards, plan_chunks
+
+CHUNK_MB = int(os.getenv("LOAD_CHUNK_MB", "64"))
+STAGING_SUFFIX = "_load"
+RAW_TABLES = ", ".join(spec.table for spec in FEEDS.values())
+
+
+@dataclass(frozen=True)
+class LoadUnit:
+    """One COPY: bytes ``start``..``end`` of a prepped file (data rows only)."""
+
+    spec: FeedSpec
+    path: Path
+    start: int
+    end: int
+    binary: bool = False
+
+
+def staging_table(spec: FeedSpec) -> str:
+    return spec.table + STAGING_SUFFIX
+
+
+def prepped_files(spec: FeedSpec, inc_dir: Path, fmt: str = "csv") -> List[Path]:
+    """A feed's <feed>_prepped.<fmt>, or its numbered shards."""
+    path = inc_dir / spec.output_file(fmt)
+    if path.is_file():
+        return [path]
+    shards = existing_shards(path)
+    if not shards:
+        raise PrepError(f"Missing {path.name} (or its shards) in {inc_dir}")
+    return shards
+
+
+def plan_units(
+    inc_dir: Path,
+    fmt: str = "csv",
+    chunk_bytes: int = 0,
+    specs: Optional[Sequence[FeedSpec]] = None,
+) -> List[LoadUnit]:
+    """Split every prepped file into record-aligned COPY units (0 = one per file)."""
+    units: List[LoadUnit] = []
+    for spec in specs or list(FEEDS.values()):
+        for path in prepped_files(spec, inc_dir, fmt):
+            size = path.stat().st_size
+            if fmt == "pgcopy":
+                units.append(LoadUnit(spec, path, 0, size, binary=True))
+                continue
+            plan = plan_chunks(path, path, chunk_bytes if chunk_bytes > 0 else size)
+            if plan.chunks and plan.header != spec.columns:
+                raise PrepError(
+                    f"{path.name}: header does not match {spec.table}",
+                    [f"Expected: {list(spec.columns)}", f"Found: {list(plan.header)}"],
+                )
+            units.extend(LoadUnit(spec, path, c.start, c.end) for c in plan.chunks)
+    return units
+
+
+def _blocks(unit: LoadUnit) -> Iterator[bytes]:
+    with open(unit.path, "rb") as fh:
+        fh.seek(unit.start)
+        remaining = unit.end - unit.start
+        while remaining > 0:
+            block = fh.read(min(COPY_CHUNK, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def load_units(
+    pool: Pool, units: Sequence[LoadUnit], jobs: int, staging: bool = False
+) -> List[TaskResult]:
+    """COPY ``units`` over up to ``jobs`` pooled sessions; one result per feed, in FEEDS order."""
+
+    def load_one(unit: LoadUnit) -> TaskResult:
+        table = staging_table(unit.spec) if staging else unit.spec.table
+        result = TaskResult(unit.spec.description, str(unit.path))
+        start = time.perf_counter()
+        try:
+            with pool.session() as session:
+                result.rows = session.copy_from(
+                    table,
+                    unit.spec.columns,
+                    _blocks(unit),
+                    "with (format binary)" if unit.binary else "csv",
+                )
+        except PsqlError as err:
+            result.error = str(err)
+        result.seconds = time.perf_counter() - start
+        return result
+
+    order = sorted(range(len(units)), key=lambda i: units[i].end - units[i].start, reverse=True)
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as workers:
+        done = dict(zip(order, workers.map(lambda i: load_one(units[i]), order)))
+
+    results: List[TaskResult] = []
+    for spec in FEEDS.values():
+        mine = [i for i, u in enumerate(units) if u.spec is spec]
+        if not mine:
+            continue
+        target = staging_table(spec) if staging else spec.table
+        chunks = f" [{len(mine)} chunks]" if len(mine) > 1 else ""
+        paths = sorted({str(units[i].path) for i in mine})
+        feed = TaskResult(
+            f"{spec.description}{chunks} -> {target}",
+            paths[0] if len(paths) == 1 else f"{len(paths)} files",
+        )
+        parts = [done[i] for i in mine]
+        feed.rows = sum(p.rows for p in parts)
+        feed.seconds = max(p.seconds for p in parts)
+        feed.error = next((p.error for p in parts if p.error), None)
+        results.append(feed)
+    return results
+
+
+def create_staging(pool: Pool, specs: Sequence[FeedSpec]) -> None:
+    """Empty UNLOGGED copies of each raw table's loaded columns (no typed columns)."""
+    sql = "".join(
+        f"drop table if exists {staging_table(spec)};\n"
+        f"create unlogged table {staging_table(spec)} as "
+        f"select source_file, {', '.join(spec.columns)} from {spec.table} with no data;\n"
+        for spec in specs
+    )
+    with pool.session() as session:
+        session.execute(sql)
+
+
+def drop_staging(pool: Pool, specs: Sequence[FeedSpec]) -> None:
+    with pool.session() as session:
+        session.execute(f"drop table if exists {', '.join(staging_table(s) for s in specs)};")
+
+
+def swap_in(pool: Pool, specs: Sequence[FeedSpec]) -> None:
+    """Replace every raw table with its staging table's rows in one transaction."""
+    inserts = "".join(
+        f"insert into {spec.table} (source_file, {', '.join(spec.columns)})\n"
+        f"  select source_file, {', '.join(spec.columns)} from {staging_table(spec)};\n"
+        for spec in specs
+    )
+    with pool.session() as session:
+        session.execute(
+            f"begin;\ntruncate {RAW_TABLES}, raw.load_manifest;\n{inserts}"
+            f"drop table {', '.join(staging_table(s) for s in specs)};\ncommit;"
+        )
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("inc_dir", nargs="?", default="data/inc_data", help="Directory of prepped feeds.")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=int(os.getenv("LOAD_JOBS", "0")) or os.cpu_count() or 1,
+        help="Parallel COPY connections (default: $LOAD_JOBS or CPU count).",
+    )
+    parser.add_argument(
+        "--chunk-mb",
+        type=int,
+        default=CHUNK_MB,
+        help="Split CSVs larger than this into record-aligned ranges (default: $LOAD_CHUNK_MB "
+        "or 64; 0 = one COPY per file or shard).",
+    )
+    parser.add_argument(
+        "--format",
+        choices=("csv", "pgcopy"),
+        default="pgcopy" if os.getenv("PREP_FORMAT") == "pgcopy" else "csv",
+        help="Load <feed>_prepped.csv or the binary <feed>_prepped.pgcopy files "
+        "(default: pgcopy when $PREP_FORMAT=pgcopy, else csv).",
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--fresh", action="store_true", help="Truncate raw.* first.")
+    mode.add_argument(
+        "--swap",
+        action="store_true",
+        help="Load into UNLOGGED staging tables and replace raw.* in one transaction.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    specs = list(FEEDS.values())
+    chunk_bytes = max(args.chunk_mb, 0) * 1024 * 1024
+    try:
+        units = plan_units(Path(args.inc_dir), args.format, chunk_bytes, specs)
+    except PrepError as err:
+        print(err, file=sys.stderr)
+        for line in err.details:
+            print(line, file=sys.stderr)
+        return 2
+
+    start = time.perf_counter()
+    with Pool(args.jobs) as pool:
+        try:
+            if args.fresh:
+                with pool.session() as session:
+                    session.execute(f"truncate {RAW_TABLES}, raw.load_manifest;")
+            if args.swap:
+                create_staging(pool, specs)
+            results = load_units(pool, units, args.jobs, staging=args.swap)
+            failed = any(r.error for r in results)
+            swap_seconds = None
+            if args.swap and failed:
+                drop_staging(pool, specs)
+            elif args.swap:
+                swap_start = time.perf_counter()
+                swap_in(pool, specs)
+                swap_seconds = time.perf_counter() - swap_start
+        except PsqlError as err:
+            print(f"Load failed: {err}", file=sys.stderr)
+            return 1
+    print_report(results, time.perf_counter() - start)
+    if swap_seconds is not None:
+        print(f"Replaced {RAW_TABLES} from the staging tables in {swap_seconds:.2f}s")
+    elif args.swap:
+        print("Load failed; raw.* left untouched and staging tables dropped.", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
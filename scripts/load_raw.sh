@@ -1,17 +1,44 @@
 #!/usr/bin/env bash
 set -euo pipefail
 if [ $# -lt 3 ]; then
-  echo "Usage: $0 <table> <comma-separated-cols> <file.csv|.csv.gz>" >&2
+  echo "Usage: $0 <table> <comma-separated-cols> <file.csv|.csv.gz|.pgcopy|.pgcopy.gz> [more files...]" >&2
+  echo "       A missing <name>.csv falls back to its shards <name>.0001.csv, <name>.0002.csv, ..." >&2
   exit 2
 fi
-TABLE="$1"; COLS="$2"; FILE="$3"
+TABLE="$1"; COLS="$2"; shift 2
+FILES=("$@")
+
+# Shards written by `prep.py --shards N` stand in for the single prepped file.
+if [ ${#FILES[@]} -eq 1 ] && [ ! -f "${FILES[0]}" ] && [[ "${FILES[0]}" == *.csv ]]; then
+  shopt -s nullglob
+  shards=("${FILES[0]%.csv}".[0-9][0-9][0-9][0-9].csv)
+  shopt -u nullglob
+  if [ ${#shards[@]} -gt 0 ]; then
+    FILES=("${shards[@]}")
+  fi
+fi
+
+if [ ${#FILES[@]} -gt 1 ]; then
+  # One \copy per file over parallel connections; xargs exits non-zero if any load fails.
+  LOAD_JOBS="${LOAD_JOBS:-$(nproc 2>/dev/null || echo 4)}"
+  printf '%s\0' "${FILES[@]}" | xargs -0 -n1 -P "$LOAD_JOBS" "$0" "$TABLE" "$COLS"
+  exit 0
+fi
+
+FILE="${FILES[0]}"
 if [ ! -f "$FILE" ]; then
   echo "No such file: $FILE" >&2
   exit 2
 fi
+# Binary COPY files (prep.py --format pgcopy) carry the same columns without a header.
+if [[ "$FILE" =~ \.pgcopy(\.gz)?$ ]]; then
+  OPTS="with (format binary)"
+else
+  OPTS="csv header"
+fi
 if [[ "$FILE" =~ \.gz$ ]]; then
-  SQL="\\copy ${TABLE}(${COLS}) from program 'gzip -dc \"${FILE}\"' csv header"
+  SQL="\\copy ${TABLE}(${COLS}) from program 'gzip -dc \"${FILE}\"' ${OPTS}"
 else
-  SQL="\\copy ${TABLE}(${COLS}) from '${FILE}' csv header"
+  SQL="\\copy ${TABLE}(${COLS}) from '${FILE}' ${OPTS}"
 fi
 scripts/run_sql.sh -c "$SQL"
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""Report on refresh runs and report-view plans recorded in ops.*.
+
+refresh.py (and etl.py's refresh stage) log every step to ops.refresh_log;
+``refresh.py --explain`` adds EXPLAIN (ANALYZE, BUFFERS) captures of the
+report views to ops.plan_history. This prints:
+
+  * the slowest steps of the latest run, each against the median of the same
+    step over the earlier runs in the window (--runs) of the same kind
+    (incremental or --full), flagged when more than --threshold slower and at
+    least --min-seconds slower;
+  * per report view, the latest plan against the earlier captures: flagged
+    when the plan shape (node types and relations, in order) changed since
+    the previous capture, or when execution time regressed the same way.
+
+Exit status: 0 ok, 1 the ops tables cannot be read, 3 a regression was
+flagged with --fail-on-regression.
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from pg_copy import PsqlError
+from pg_session import connect
+
+STEPS_SQL = """
+select l.run_id, to_char(r.finished_at, 'YYYY-MM-DD HH24:MI:SS'), r.full_refresh, l.step,
+       l.status, l.seconds, l.row_count, l.blks_hit, l.blks_read
+from (
+  select run_id, max(finished_at) as finished_at, bool_or(full_refresh) as full_refresh
+  from ops.refresh_log group by run_id order by 2 desc limit {runs}
+) r
+join ops.refresh_log l using (run_id)
+order by r.finished_at desc, l.step
+"""
+
+PLANS_SQL = """
+select relation, to_char(captured_at, 'YYYY-MM-DD HH24:MI:SS'), execution_ms,
+       coalesce(shared_hit, 0) + coalesce(shared_read, 0), coalesce(temp_written, 0),
+       row_count, plan_shape
+from (
+  select *, row_number() over (partition by relation order by captured_at desc) as n
+  from ops.plan_history
+) p
+where n <= {runs}
+order by relation, captured_at desc
+"""
+
+
+@dataclass
+class StepRun:
+    run_id: str
+    finished_at: str
+    full: bool
+    step: str
+    status: str
+    seconds: float
+    rows: Optional[int]
+    blocks: Optional[int]
+
+
+@dataclass
+class Capture:
+    relation: str
+    captured_at: str
+    ms: float
+    blocks: int
+    temp_written: int
+    rows: Optional[int]
+    shape: str
+
+
+@dataclass
+class Finding:
+    name: str
+    latest: float
+    baseline: Optional[float]
+    flag: str = ""
+
+
+def _int(value: str) -> Optional[int]:
+    return int(value) if value != "" else None
+
+
+def read_steps(rows: Sequence[Sequence[str]]) -> List[StepRun]:
+    return [
+        StepRun(
+            run_id, finished, full == "t", step, status, float(secs or 0), _int(count),
+            None if hit == "" else int(hit) + int(read or 0),
+        )
+        for run_id, finished, full, step, status, secs, count, hit, read in rows
+    ]
+
+
+def read_captures(rows: Sequence[Sequence[str]]) -> List[Capture]:
+    return [
+        Capture(rel, at, float(ms), int(blocks), int(temp), _int(count), shape)
+        for rel, at, ms, blocks, temp, count, shape in rows
+    ]
+
+
+def _slower(latest: float, baseline: float, threshold: float, minimum: float) -> bool:
+    return latest > baseline * (1 + threshold) and latest - baseline >= minimum
+
+
+def step_findings(
+    runs: Sequence[StepRun], threshold: float, min_seconds: float
+) -> List[Finding]:
+    """The latest run's steps, slowest first, each against the median of its
+    earlier ok runs of the same kind. ``runs`` is newest first."""
+    if not runs:
+        return []
+    latest = [r for r in runs if r.run_id == runs[0].run_id]
+    history: Dict[str, List[float]] = {}
+    for r in runs:
+        if r.run_id != runs[0].run_id and r.full == runs[0].full and r.status == "ok":
+            history.setdefault(r.step, []).append(r.seconds)
+    findings = []
+    for r in sorted(latest, key=lambda r: r.seconds, reverse=True):
+        earlier = history.get(r.step)
+        base = statistics.median(earlier) if earlier else None
+        flag = r.status.upper() if r.status != "ok" else ""
+        if not flag and base is not None and _slower(r.seconds, base, threshold, min_seconds):
+            flag = "SLOWER"
+        findings.append(Finding(r.step, r.seconds, base, flag))
+    return findings
+
+
+def plan_findings(
+    captures: Sequence[Capture], threshold: float, min_ms: float
+) -> List[Finding]:
+    """Per relation, the latest capture against the earlier ones. ``captures``
+    is grouped by relation, newest first."""
+    by_relation: Dict[str, List[Capture]] = {}
+    for c in captures:
+        by_relation.setdefault(c.relation, []).append(c)
+    findings = []
+    for relation, history in sorted(by_relation.items()):
+        latest, earlier = history[0], history[1:]
+        base = statistics.median(c.ms for c in earlier) if earlier else None
+        flags = []
+        if earlier and latest.shape != earlier[0].shape:
+            flags.append("PLAN CHANGED")
+        if base is not None and _slower(latest.ms, base, threshold, min_ms):
+            flags.append("SLOWER")
+        findings.append(Finding(relation, latest.ms, base, ", ".join(flags)))
+    return findings
+
+
+def _change(f: Finding) -> str:
+    if f.baseline is None:
+        return f"{'-':>9} {'':>7}"
+    pct = (f.latest / f.baseline - 1) * 100 if f.baseline else 0.0
+    return f"{f.baseline:>9.2f} {pct:>+6.1f}%"
+
+
+def print_steps(runs: Sequence[StepRun], findings: Sequence[Finding], top: int) -> None:
+    if not runs:
+        print("No refresh runs in ops.refresh_log yet (make refresh).")
+        return
+    head = runs[0]
+    kind = "full" if head.full else "incremental"
+    earlier = len({r.run_id for r in runs if r.full == head.full}) - 1
+    print(f"Refresh run {head.run_id} ({kind}, {head.finished_at}); "
+          f"baseline: median of {earlier} earlier {kind} run(s)")
+    latest = {r.step: r for r in runs if r.run_id == head.run_id}
+    print(f"  {'step':<40} {'secs':>8} {'median':>9} {'change':>7} {'rows':>10} {'blocks':>10}")
+    for f in findings[:top]:
+        r = latest[f.name]
+        rows = "" if r.rows is None else r.rows
+        blocks = "" if r.blocks is None else r.blocks
+        print(f"  {f.name:<40} {f.latest:>8.2f} {_change(f)} {rows:>10} {blocks:>10}  {f.flag}".rstrip())
+    hidden = [f for f in findings[top:] if f.flag]
+    for f in hidden:
+        print(f"  {f.name:<40} {f.latest:>8.2f} {_change(f)} {'':>10} {'':>10}  {f.flag}")
+
+
+def print_plans(captures: Sequence[Capture], findings: Sequence[Finding]) -> None:
+    if not captures:
+        print("No plans in ops.plan_history yet (make refresh EXPLAIN=1).")
+        return
+    latest = {}
+    for c in captures:
+        latest.setdefault(c.relation, c)
+    print("Report view plans (latest capture vs. median of earlier ones, ms)")
+    print(f"  {'view':<40} {'ms':>8} {'median':>9} {'change':>7} {'rows':>10} {'blocks':>10}")
+    for f in findings:
+        c = latest[f.name]
+        rows = "" if c.rows is None else c.rows
+        temp = f" temp={c.temp_written}" if c.temp_written else ""
+        print(f"  {f.name:<40} {f.latest:>8.1f} {_change(f)} {rows:>10} {c.blocks:>10}  "
+              f"{c.captured_at}{temp}  {f.flag}".rstrip())
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--runs", type=int, default=10, help="History window per step/view (default 10).")
+    parser.add_argument("--top", type=int, default=10, help="Slowest steps to list (default 10).")
+    parser.add_argument(
+        "--threshold", type=float, default=0.25,
+        help="Flag timings this much slower than the median (default 0.25 = 25%%).",
+    )
+    parser.add_argument(
+        "--min-seconds", type=float, default=0.5,
+        help="Ignore slowdowns smaller than this many seconds (default 0.5).",
+    )
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit 3 when anything is flagged.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    window = max(args.runs, 1) + 1  # the latest plus --runs earlier ones
+    session = connect()
+    try:
+        runs = read_steps(session.query(STEPS_SQL.format(runs=window)))
+        captures = read_captures(session.query(PLANS_SQL.format(runs=window)))
+    except PsqlError as err:
+        print(f"Cannot read ops.refresh_log / ops.plan_history (make initdb?): {err}", file=sys.stderr)
+        return 1
+    finally:
+        session.close()
+
+    steps = step_findings(runs, args.threshold, args.min_seconds)
+    plans = plan_findings(captures, args.threshold, args.min_seconds * 1000)
+    print_steps(runs, steps, args.top)
+    print()
+    print_plans(captures, plans)
+    flagged = [f for f in steps + plans if f.flag]
+    if flagged:
+        print(f"\n{len(flagged)} step(s)/view(s) flagged.", file=sys.stderr)
+        return 3 if args.fail_on_regression else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""Compare mart.v_level1 / v_level2a / v_level2b with reference exports.
+
+Both sides are streamed in key order and merge-compared: the report comes out
+of the database ``ORDER BY`` its key (in the "C" collation, which is Python's
+string order), and the reference export is sorted in runs of $PARITY_SORT_ROWS rows
+spilled to temporary files and merged back, so memory stays bounded however
+many rows the export has. Every difference is written, not just the first:
+
+  <out>/<level>.diff.jsonl   one JSON object per difference
+                             {"kind": "missing" | "extra" | "mismatch", "key": {...},
+                              "fields": {column: {"expected", "actual", "delta"}}}
+  <out>/parity_summary.json  per level: rows on each side, counts by kind, and
+                             reference columns the report does not have
+
+Columns present on both sides are compared: numbers (thousands separators,
+"-" or blank as 0, "(x)" as -x) within --tolerance, anything else as trimmed
+text. The levels run concurrently, one psql COPY each.
+
+Usage:
+  parity.py [LEVEL ...] [--level1 CSV] [--level2a CSV] [--level2b CSV]
+            [--tolerance 0.01] [--out DIR]
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import heapq
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from itertools import groupby, islice
+from pathlib import Path
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from pg_copy import PsqlError, copy_out
+
+SORT_ROWS = int(os.getenv("PARITY_SORT_ROWS", "200000"))
+# Trimmed from keys on both sides (btrim in the ORDER BY, str.strip here) so the
+# database and Python agree on the order.
+KEY_TRIM = " \t\r\n"
+
+Key = Tuple[str, ...]
+Row = Tuple[Key, Dict[str, str]]
+
+
+@dataclass(frozen=True)
+class Level:
+    """A report and how its rows are keyed; ``columns`` maps reference headers to SQL."""
+
+    name: str
+    view: str
+    key: Tuple[str, ...]
+    columns: Tuple[Tuple[str, str], ...] = ()
+    references: Tuple[str, ...] = ()
+
+    def query(self) -> str:
+        if self.columns:
+            select = ", ".join(f'{expr} AS "{name}"' for name, expr in self.columns)
+        else:
+            select = "*"
+        trim = KEY_TRIM.replace("\t", "\\t").replace("\r", "\\r").replace("\n", "\\n")
+        order = ", ".join(f'btrim(r."{k}", E\'{trim}\') COLLATE "C"' for k in self.key)
+        return f"SELECT * FROM (SELECT {select} FROM {self.view}) r ORDER BY {order}"
+
+
+LEVELS: Dict[str, Level] = {
+    "level1": Level(
+        "level1",
+        "mart.v_level1",
+        ("SKU ID", "Account Number"),
+        (
+            ("SKU ID", "sku_id"),
+            ("Account Number", "account_number"),
+            ("Merchant", "merchant"),
+            ("Amount Pulled", "amount_pulled"),
+            ("Amount Received", "amount_received"),
+            ("Variance Pulled vs Received", "variance_pulled_vs_received"),
+            ("Sales Proceeds", "sales_proceeds"),
+            ("Variance Received vs Sales", "variance_received_vs_sales"),
+        ),
+        (
+            "data/inc_data/level1_reference.csv",
+            "data/inc_data/level1_formula_output.csv",
+            "data/inc_data/Sample Files((1) Formula & Output).csv",
+        ),
+    ),
+    "level2a": Level(
+        "level2a",
+        "mart.v_level2a",
+        ("SKU ID",),
+        references=(
+            "data/inc_data/level2a_reference.csv",
+            "data/inc_data/Sample Files((2a) Formula & Output).csv",
+        ),
+    ),
+    "level2b": Level(
+        "level2b",
+        "mart.v_level2b",
+        ("SKU ID",),
+        references=(
+            "data/inc_data/level2b_reference.csv",
+            "data/inc_data/Sample Files((2b) Formula & Output).csv",
+        ),
+    ),
+}
+
+
+@dataclass
+class LevelResult:
+    level: str
+    reference: Optional[str] = None
+    expected_rows: int = 0
+    actual_rows: int = 0
+    missing: int = 0
+    extra: int = 0
+    mismatched: int = 0
+    unmatched_columns: List[str] = field(default_factory=list)
+    seconds: float = 0.0
+    skipped: bool = False
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not (self.skipped or self.missing or self.extra or self.mismatched)
+
+
+def parse_decimal(value: Optional[str]) -> Optional[Decimal]:
+    """A reference/report number, or None if the cell is not numeric."""
+    text = (value or "").strip().replace(",", "")
+    if not text or text == "-":
+        return Decimal(0)
+    negative = text.startswith("(") and text.endswith(")")
+    if negative:
+        text = text[1:-1]
+    try:
+        number = Decimal(text)
+    except InvalidOperation:
+        return None
+    if not number.is_finite():
+        return None
+    return -number if negative else number
+
+
+# ── reading ──────────────────────────────────────────────────────────────────
+
+
+def _normalize_key(row: Dict[str, str], key: Sequence[str]) -> Key:
+    return tuple((row.get(k) or "").strip(KEY_TRIM) for k in key)
+
+
+def reference_rows(path: Path, level: Level) -> Tuple[List[str], Iterator[Row]]:
+    """Header and data rows of a reference export (any preamble above the header
+    skipped). Headers that are the report's own column names, as in an
+    export.py CSV of mart.v_level1, are read as the reference names."""
+    renamed = {expr: name for name, expr in level.columns}
+    handle = path.open(newline="", encoding="utf-8-sig")
+    reader = csv.reader(handle)
+    for header in reader:
+        names = [renamed.get(h.strip(), h.strip()) for h in header]
+        if all(k in names for k in level.key):
+            break
+    else:
+        handle.close()
+        raise ValueError(f"{path}: no header row with {', '.join(level.key)}")
+
+    def rows() -> Iterator[Row]:
+        with handle:
+            for cells in reader:
+                row = dict(zip(names, cells))
+                key = _normalize_key(row, level.key)
+                first = key[0]
+                if not first or first.lower().startswith("total"):
+                    continue
+                yield key, row
+
+    return names, rows()
+
+
+def _spill(run: List[Row], columns: List[str], tmp_dir: Path, index: int) -> Path:
+    path = tmp_dir / f"run{index:05d}.jsonl"
+    with path.open("w", encoding="utf-8") as f:
+        for key, row in run:
+            f.write(json.dumps([list(key), [row.get(c, "") for c in columns]]))
+            f.write("\n")
+    return path
+
+
+def _read_run(path: Path, columns: List[str]) -> Iterator[Row]:
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            key, values = json.loads(line)
+            yield tuple(key), dict(zip(columns, values))
+
+
+def sorted_rows(rows: Iterable[Row], columns: List[str], tmp_dir: Path, run_rows: int = SORT_ROWS) -> Iterator[Row]:
+    """``rows`` in key order: one in-memory sort, or sorted runs merged from disk."""
+    rows = iter(rows)
+    first = sorted(islice(rows, run_rows), key=lambda r: r[0])
+    if len(first) < run_rows:
+        yield from first
+        return
+    runs = [_spill(first, columns, tmp_dir, 0)]
+    del first
+    while True:
+        run = sorted(islice(rows, run_rows), key=lambda r: r[0])
+        if not run:
+            break
+        runs.append(_spill(run, columns, tmp_dir, len(runs)))
+    yield from heapq.merge(*(_read_run(p, columns) for p in runs), key=lambda r: r[0])
+
+
+def report_rows(stream: IO[bytes], level: Level) -> Tuple[List[str], Iterator[Row]]:
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    reader = csv.reader(text)
+    names = next(reader, [])
+
+    def rows() -> Iterator[Row]:
+        try:
+            for cells in reader:
+                row = dict(zip(names, cells))
+                yield _normalize_key(row, level.key), row
+        finally:
+            # Leave ``stream`` open for copy_out to drain and close.
+            text.detach()
+
+    return names, rows()
+
+
+# ── comparing ────────────────────────────────────────────────────────────────
+
+
+def compare_rows(expected: Dict[str, str], actual: Dict[str, str], columns: Sequence[str], tolerance: Decimal) -> Dict[str, dict]:
+    fields: Dict[str, dict] = {}
+    for col in columns:
+        exp, act = expected.get(col, ""), actual.get(col, "")
+        exp_num, act_num = parse_decimal(exp), parse_decimal(act)
+        if exp_num is not None and act_num is not None:
+            delta = act_num - exp_num
+            if delta.copy_abs() > tolerance:
+                fields[col] = {"expected": str(exp_num), "actual": str(act_num), "delta": str(delta)}
+        elif exp.strip() != act.strip():
+            fields[col] = {"expected": exp.strip(), "actual": act.strip(), "delta": None}
+    return fields
+
+
+def merge_diff(
+    expected: Iterator[Row],
+    actual: Iterator[Row],
+    key_names: Sequence[str],
+    columns: Sequence[str],
+    tolerance: Decimal,
+) -> Iterator[dict]:
+    """Walk both key-ordered streams once; rows sharing a key pair up in order."""
+    exp_groups = groupby(expected, key=lambda r: r[0])
+    act_groups = groupby(actual, key=lambda r: r[0])
+    exp = next(exp_groups, None)
+    act = next(act_groups, None)
+    while exp is not None or act is not None:
+        if act is None or (exp is not None and exp[0] < act[0]):
+            for _, row in exp[1]:
+                yield {"kind": "missing", "key": dict(zip(key_names, exp[0])), "fields": {}}
+            exp = next(exp_groups, None)
+        elif exp is None or act[0] < exp[0]:
+            for _, row in act[1]:
+                yield {"kind": "extra", "key": dict(zip(key_names, act[0])), "fields": {}}
+            act = next(act_groups, None)
+        else:
+            exp_list = [row for _, row in exp[1]]
+            act_list = [row for _, row in act[1]]
+            for e, a in zip(exp_list, act_list):
+                fields = compare_rows(e, a, columns, tolerance)
+                if fields:
+                    yield {"kind": "mismatch", "key": dict(zip(key_names, exp[0])), "fields": fields}
+            for _ in exp_list[len(act_list):]:
+                yield {"kind": "missing", "key": dict(zip(key_names, exp[0])), "fields": {}}
+            for _ in act_list[len(exp_list):]:
+                yield {"kind": "extra", "key": dict(zip(key_names, act[0])), "fields": {}}
+            exp = next(exp_groups, None)
+            act = next(act_groups, None)
+
+
+class _Counted:
+    """Count rows as a stream is consumed."""
+
+    def __init__(self, rows: Iterator[Row]) -> None:
+        self.rows = rows
+        self.count = 0
+
+    def __iter__(self) -> Iterator[Row]:
+        for row in self.rows:
+            self.count += 1
+            yield row
+
+
+def diff_level(
+    level: Level,
+    ref_columns: List[str],
+    ref_rows: Iterator[Row],
+    act_columns: List[str],
+    act_rows: Iterator[Row],
+    out_dir: Path,
+    result: LevelResult,
+    tolerance: Decimal,
+) -> None:
+    """Merge-compare a reference export with report rows in key order, writing
+    <out>/<level>.diff.jsonl and counting rows and differences into ``result``."""
+    diff_path = out_dir / f"{level.name}.diff.jsonl"
+    tmp_path = diff_path.with_name(diff_path.name + ".part")
+    try:
+        with tempfile.TemporaryDirectory(prefix=f"parity_{level.name}_") as tmp:
+            compared = [c for c in ref_columns if c and c in act_columns and c not in level.key]
+            result.unmatched_columns = [c for c in ref_columns if c and c not in act_columns]
+            expected = _Counted(sorted_rows(ref_rows, ref_columns, Path(tmp)))
+            actual = _Counted(act_rows)
+            with tmp_path.open("w", encoding="utf-8") as sink:
+                for diff in merge_diff(iter(expected), iter(actual), level.key, compared, tolerance):
+                    sink.write(json.dumps(diff))
+                    sink.write("\n")
+                    if diff["kind"] == "missing":
+                        result.missing += 1
+                    elif diff["kind"] == "extra":
+                        result.extra += 1
+                    else:
+                        result.mismatched += 1
+            result.expected_rows, result.actual_rows = expected.count, actual.count
+        tmp_path.replace(diff_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def check_level(level: Level, reference: Path, out_dir: Path, tolerance: Decimal) -> LevelResult:
+    result = LevelResult(level.name, str(reference))
+    start = time.perf_counter()
+    try:
+        ref_columns, ref_rows = reference_rows(reference, level)
+        with copy_out(level.query()) as stream:
+            act_columns, act_rows = report_rows(stream, level)
+            diff_level(level, ref_columns, ref_rows, act_columns, act_rows, out_dir, result, tolerance)
+    except (PsqlError, OSError, ValueError) as err:
+        result.error = str(err)
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def resolve_reference(level: Level, explicit: Optional[str]) -> Optional[Path]:
+    env = os.getenv(f"{level.name.upper()}_REFERENCE_CSV")
+    for candidate in (explicit, env, *level.references):
+        if candidate and Path(candidate).is_file():
+            return Path(candidate)
+    if explicit:
+        raise SystemExit(f"Reference CSV not found: {explicit}")
+    return None
+
+
+def run(
+    levels: Sequence[str],
+    references: Dict[str, Optional[str]],
+    out_dir: Path,
+    tolerance: Decimal,
+) -> List[LevelResult]:
+    """Check every level that has a reference export, concurrently."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    todo: List[Tuple[Level, Path]] = []
+    results: Dict[str, LevelResult] = {}
+    for name in levels:
+        level = LEVELS[name]
+        reference = resolve_reference(level, references.get(name))
+        if reference is None:
+            results[name] = LevelResult(name, skipped=True)
+        else:
+            todo.append((level, reference))
+    if todo:
+        with ThreadPoolExecutor(max_workers=len(todo)) as workers:
+            for res in workers.map(lambda t: check_level(t[0], t[1], out_dir, tolerance), todo):
+                results[res.level] = res
+    ordered = [results[name] for name in levels]
+    summary = {r.level: {k: v for k, v in vars(r).items() if k != "level"} for r in ordered}
+    (out_dir / "parity_summary.json").write_text(json.dumps(summary, indent=2) + "\n", encoding="utf-8")
+    return ordered
+
+
+def print_report(results: Sequence[LevelResult], out_dir: Path) -> None:
+    print(f"{'level':<9} {'expected':>9} {'actual':>9} {'missing':>8} {'extra':>7} {'mismatch':>9} {'secs':>7}  status")
+    for r in results:
+        if r.skipped:
+            print(f"{r.level:<9} {'':>9} {'':>9} {'':>8} {'':>7} {'':>9} {'':>7}  skipped (no reference export)")
+            continue
+        status = "ok" if r.ok else (f"ERROR: {r.error}" if r.error else "DIFF")
+        print(
+            f"{r.level:<9} {r.expected_rows:>9} {r.actual_rows:>9} {r.missing:>8} {r.extra:>7} "
+            f"{r.mismatched:>9} {r.seconds:>7.2f}  {status}"
+        )
+        if r.unmatched_columns and not r.error:
+            print(f"  not in the report (not compared): {', '.join(r.unmatched_columns)}")
+    print(f"Diffs and summary in {out_dir}")
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("levels", nargs="*", metavar="LEVEL",
+                        help=f"Levels to check ({', '.join(LEVELS)}; default: all).")
+    for name in LEVELS:
+        parser.add_argument(f"--{name}", metavar="CSV",
+                            help=f"{name} reference export (default: ${name.upper()}_REFERENCE_CSV or data/inc_data).")
+    parser.add_argument("--tolerance", type=Decimal, default=Decimal(os.getenv("PARITY_TOLERANCE", "0.01")),
+                        help="Largest accepted absolute difference (default: $PARITY_TOLERANCE or 0.01).")
+    parser.add_argument("--out", default="data/parity", help="Directory for the diff files (default: data/parity).")
+    parser.add_argument("--require", action="store_true",
+                        help="Fail when a level has no reference export (default: it is reported and skipped).")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.levels if name not in LEVELS]
+    if unknown:
+        parser.error(f"unknown level(s): {', '.join(unknown)} (choose from {', '.join(LEVELS)})")
+    return args
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    levels = list(dict.fromkeys(args.levels or LEVELS))
+    out_dir = Path(args.out)
+    results = run(levels, {name: getattr(args, name) for name in levels}, out_dir, args.tolerance)
+    print_report(results, out_dir)
+    failed = [r for r in results if not r.ok and (args.require or not r.skipped)]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""psql helpers: run statements and stream CSV rows through ``\\copy`` (into
+tables from pstdin, out of queries to pstdout).
+
+run_sql.sh already knows how to reach the database in every DB_MODE (local
+psql or ``docker compose exec -T``), so rows are piped into its stdin rather
+than opening a driver connection. A failed producer must not end the COPY
+cleanly: psql runs under bash (or ``docker compose exec``), so killing the
+child would leave psql reading the closed pipe as end-of-data and committing
+the rows sent so far. abort_copy() instead sends bytes the server rejects,
+so the COPY errors and nothing from the stream lands.
+"""
+from __future__ import annotations
+
+import io
+import os
+import subprocess
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator, Sequence
+
+RUN_SQL = Path(__file__).resolve().parent / "run_sql.sh"
+PIPE_BUFFER = 1024 * 1024
+# 0xff is never valid UTF-8 and breaks binary COPY framing, wherever in a row
+# it lands, so a COPY fed this after a failure is rejected as a whole.
+ABORT_COPY = b"\xff\n"
+
+
+class PsqlError(Exception):
+    """Raised when psql rejects a statement or a streamed COPY."""
+
+
+def literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def run_sql(sql: str) -> str:
+    """Run ``sql`` through run_sql.sh and return psql's stdout."""
+    proc = subprocess.run(
+        [str(RUN_SQL), "-c", sql],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env=dict(os.environ, PGCLIENTENCODING="UTF8"),
+    )
+    if proc.returncode != 0:
+        message = proc.stderr.decode("utf-8", "replace").strip()
+        raise PsqlError(message or f"psql exited with {proc.returncode}")
+    return proc.stdout.decode("utf-8")
+
+
+def abort_copy(proc: subprocess.Popen) -> None:
+    """Make the COPY fed through ``proc``'s stdin fail on the server, then reap it."""
+    assert proc.stdin is not None
+    try:
+        proc.stdin.write(ABORT_COPY)
+    except (BrokenPipeError, ValueError):
+        pass  # psql is gone (or the pipe closed) before end-of-data: nothing committed
+    proc.communicate()
+
+
+def copy_sql(table: str, columns: Sequence[str]) -> str:
+    return f"\\copy {table}({','.join(columns)}) from pstdin csv"
+
+
+@contextmanager
+def copy_in(table: str, columns: Sequence[str]) -> Iterator[IO[str]]:
+    """Yield a text stream whose CSV content (no header) is COPYed into ``table``."""
+    env = dict(os.environ, PGCLIENTENCODING="UTF8")
+    proc = subprocess.Popen(
+        [str(RUN_SQL), "-c", copy_sql(table, columns)],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        bufsize=PIPE_BUFFER,
+        env=env,
+    )
+    assert proc.stdin is not None and proc.stderr is not None
+    stream = io.TextIOWrapper(proc.stdin, encoding="utf-8", newline="")
+    try:
+        try:
+            yield stream
+            stream.close()
+        except BrokenPipeError:
+            pass  # psql exited early; its stderr says why
+    except BaseException:
+        try:
+            stream.flush()
+        except (BrokenPipeError, ValueError):
+            pass
+        abort_copy(proc)
+        raise
+    err = proc.stderr.read()
+    proc.wait()
+    if proc.returncode != 0 or not stream.closed:
+        message = err.decode("utf-8", "replace").strip() or f"psql exited with {proc.returncode}"
+        raise PsqlError(f"COPY into {table} failed: {message}")
+
+
+@contextmanager
+def copy_out(query: str, header: bool = True) -> Iterator[IO[bytes]]:
+    """Yield a binary stream of ``query``'s result as CSV, read while psql produces it."""
+    env = dict(os.environ, PGCLIENTENCODING="UTF8")
+    options = "csv header" if header else "csv"
+    proc = subprocess.Popen(
+        [str(RUN_SQL), "-c", f"\\copy ({query}) to pstdout {options}"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        bufsize=PIPE_BUFFER,
+        env=env,
+    )
+    assert proc.stdout is not None and proc.stderr is not None
+    try:
+        yield proc.stdout
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        raise
+    proc.stdout.read()
+    err = proc.stderr.read()
+    proc.wait()
+    if proc.returncode != 0:
+        message = err.decode("utf-8", "replace").strip() or f"psql exited with {proc.returncode}"
+        raise PsqlError(f"COPY out of ({query}) failed: {message}")
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""Long-lived database sessions for jobs that run many statements.
+
+run_sql() starts psql (plus ``docker compose exec`` in container modes) and a
+new connection for every statement. A Session keeps one connection open
+instead: through psycopg when it is installed, otherwise one psql process fed
+statements over run_sql.sh's stdin, which works in every DB_MODE run_sql.sh
+supports. PG_DRIVER=psql or PG_DRIVER=psycopg forces a backend.
+
+A Pool hands sessions to worker threads and reuses them, so N parallel steps
+pay connection setup N times rather than once per statement. Both backends
+return query rows as CSV text fields, the same values ``copy ... to stdout
+csv`` through run_sql() yields, and raise PsqlError on failure.
+"""
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import os
+import re
+import subprocess
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from pg_copy import PIPE_BUFFER, RUN_SQL, PsqlError, abort_copy, literal
+
+COPY_CHUNK = 1024 * 1024
+
+# \copy <target> from '<file>' <options> -- the only meta-command SQL files use.
+_META_COPY_RE = re.compile(
+    r"^\\copy\s+(?P<target>.+?)\s+from\s+'(?P<path>[^']*)'\s*(?P<options>.*?)\s*;?$",
+    re.IGNORECASE,
+)
+_COPY_TAG_RE = re.compile(rb"^COPY (\d+)$", re.MULTILINE)
+
+# Same fallbacks as run_sql.sh, per DB_MODE: (variable, override variable, default).
+_MODE_DEFAULTS = {
+    "remote": (
+        ("PGHOST", "REMOTE_PGHOST", "localhost"),
+        ("PGPORT", "REMOTE_PGPORT", "5432"),
+        ("PGDATABASE", "REMOTE_PGDATABASE", "appdb"),
+        ("PGUSER", "REMOTE_PGUSER", "appuser"),
+        ("PGPASSWORD", "REMOTE_PGPASSWORD", "changeme"),
+        ("PGSSLMODE", "REMOTE_PGSSLMODE", "require"),
+    ),
+    "host": (
+        ("PGHOST", None, "localhost"),
+        ("PGPORT", None, "5433"),
+        ("PGDATABASE", None, "appdb"),
+        ("PGUSER", None, "appuser"),
+        ("PGPASSWORD", None, "changeme"),
+        ("PGSSLMODE", None, "disable"),
+    ),
+    "container": (
+        ("PGHOST", None, "postgres"),
+        ("PGPORT", None, "5432"),
+        ("PGDATABASE", None, "appdb"),
+        ("PGUSER", None, "appuser"),
+        ("PGPASSWORD", None, "changeme"),
+        ("PGSSLMODE", None, "disable"),
+    ),
+}
+_LIBPQ_KEYS = {
+    "PGHOST": "host",
+    "PGPORT": "port",
+    "PGDATABASE": "dbname",
+    "PGUSER": "user",
+    "PGPASSWORD": "password",
+    "PGSSLMODE": "sslmode",
+}
+
+
+def _read_env_file(path: Path) -> Dict[str, str]:
+    values: Dict[str, str] = {}
+    for line in path.read_text().splitlines():
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, _, value = line.removeprefix("export ").partition("=")
+        value = value.strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+            value = value[1:-1]
+        values[key.strip()] = value
+    return values
+
+
+def connection_env() -> Dict[str, str]:
+    """PG* settings resolved the way run_sql.sh resolves them (.env, then DB_MODE)."""
+    env = dict(os.environ)
+    if not env.get("SKIP_ENV_FILE") and not env.get("PGHOST") and Path(".env").is_file():
+        env.update(_read_env_file(Path(".env")))
+    if env.get("PGHOST") and env.get("PGPORT"):
+        return env
+    mode = env.get("DB_MODE", "container-bind")
+    for var, override, default in _MODE_DEFAULTS.get(mode, _MODE_DEFAULTS["container"]):
+        if not env.get(var):
+            env[var] = (env.get(override) if override else None) or default
+    return env
+
+
+def _session_gucs() -> Dict[str, str]:
+    """Custom settings run_sql.sh passes to every psql session."""
+    gucs: Dict[str, str] = {}
+    if os.getenv("FAIL_ON_LEVEL1_VARIANCE"):
+        gucs["etlsuite.fail_on_level1_variance"] = os.environ["FAIL_ON_LEVEL1_VARIANCE"]
+    return gucs
+
+
+def _open_source(path: Path) -> IO[bytes]:
+    return gzip.open(path, "rb") if path.suffix == ".gz" else open(path, "rb")
+
+
+def _copy_options(path: Path) -> str:
+    """COPY options for a prepped file: CSV with a header, or binary for .pgcopy[.gz]."""
+    binary = ".pgcopy" in path.suffixes[-2:]
+    return "with (format binary)" if binary else "csv header"
+
+
+class Session(ABC):
+    """One database connection reused across statements."""
+
+    backend = ""
+
+    @abstractmethod
+    def execute(self, sql: str) -> None:
+        """Run one or more statements (no psql meta-commands)."""
+
+    @abstractmethod
+    def copy_out(self, sql: str) -> bytes:
+        """Return the CSV produced by ``copy (sql) to stdout csv``."""
+
+    @abstractmethod
+    def copy_file(self, table: str, columns: Sequence[str], path: Path) -> int:
+        """COPY a prepped file (CSV with header, or binary if ``.pgcopy``; gzip if ``.gz``)
+        into ``table``; return rows."""
+
+    @abstractmethod
+    def copy_from(
+        self, table: str, columns: Sequence[str], blocks: Iterable[bytes], options: str = "csv"
+    ) -> int:
+        """COPY the concatenated ``blocks`` (no header row) into ``table``; return rows."""
+
+    @abstractmethod
+    def run_script(self, text: str) -> None:
+        """Run a SQL file's contents, including ``\\copy ... from 'file'`` lines."""
+
+    @abstractmethod
+    def close(self) -> None:
+        """Close the connection."""
+
+    def query(self, sql: str) -> List[List[str]]:
+        return list(csv.reader(io.StringIO(self.copy_out(sql).decode("utf-8"))))
+
+    def run_file(self, path: Path, replacements: Optional[Dict[str, str]] = None) -> None:
+        text = path.read_text()
+        for old, new in (replacements or {}).items():
+            text = text.replace(old, new)
+        self.run_script(text)
+
+
+class PsqlSession(Session):
+    """A single ``run_sql.sh -f -`` process; each statement is followed by an
+    ``\\echo`` marker so its output can be told apart from the next one's.
+
+    With ON_ERROR_STOP psql exits on the first error; the session then raises
+    PsqlError with psql's stderr and starts a fresh process on next use.
+    """
+
+    backend = "psql"
+
+    def __init__(self) -> None:
+        self._proc: Optional[subprocess.Popen] = None
+        self._stderr: List[bytes] = []
+        self._drain: Optional[threading.Thread] = None
+
+    def _start(self) -> subprocess.Popen:
+        proc = subprocess.Popen(
+            [str(RUN_SQL), "-f", "-"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=PIPE_BUFFER,
+            env=dict(os.environ, PGCLIENTENCODING="UTF8"),
+        )
+        stderr: List[bytes] = []
+        # NOTICEs go to stderr; keep the pipe drained so psql never blocks on it.
+        self._drain = threading.Thread(
+            target=lambda: stderr.extend(iter(proc.stderr.readline, b"")), daemon=True
+        )
+        self._drain.start()
+        self._proc, self._stderr = proc, stderr
+        return proc
+
+    def _send(self, sql: str) -> bytes:
+        proc = self._proc if self._proc is not None and self._proc.poll() is None else self._start()
+        assert proc.stdin is not None and proc.stdout is not None
+        marker = f"--pg-session-{uuid.uuid4().hex}--".encode()
+        self._stderr.clear()
+        try:
+            proc.stdin.write(sql.encode("utf-8") + b"\n;\n\\echo " + marker + b"\n")
+            proc.stdin.flush()
+        except BrokenPipeError:
+            pass  # psql already exited; its stderr says why
+        out: List[bytes] = []
+        for line in iter(proc.stdout.readline, b""):
+            if line.rstrip(b"\r\n") == marker:
+                return b"".join(out)
+            out.append(line)
+        proc.wait()
+        if self._drain is not None:
+            self._drain.join()
+        self._proc = None
+        message = b"".join(self._stderr).decode("utf-8", "replace").strip()
+        raise PsqlError(message or f"psql exited with {proc.returncode}")
+
+    def execute(self, sql: str) -> None:
+        self._send(sql)
+
+    def copy_out(self, sql: str) -> bytes:
+        return self._send(f"copy ({sql}) to stdout csv")
+
+    def copy_file(self, table: str, columns: Sequence[str], path: Path) -> int:
+        source = literal(str(path))
+        if path.suffix == ".gz":
+            source = "program " + literal(f'gzip -dc "{path}"')
+        out = self._send(f"\\copy {table}({','.join(columns)}) from {source} {_copy_options(path)}")
+        match = _COPY_TAG_RE.search(out)
+        return int(match.group(1)) if match else 0
+
+    def copy_from(
+        self, table: str, columns: Sequence[str], blocks: Iterable[bytes], options: str = "csv"
+    ) -> int:
+        # This session's stdin carries its statements, so the data goes through a one-off psql.
+        proc = subprocess.Popen(
+            [str(RUN_SQL), "-c", f"\\copy {table}({','.join(columns)}) from pstdin {options}"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=PIPE_BUFFER,
+            env=dict(os.environ, PGCLIENTENCODING="UTF8"),
+        )
+        assert proc.stdin is not None
+        try:
+            try:
+                for block in blocks:
+                    proc.stdin.write(block)
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass  # psql exited early; its stderr says why
+        except BaseException:
+            abort_copy(proc)  # a killed run_sql.sh would leave psql to commit the partial COPY
+            raise
+        assert proc.stdout is not None and proc.stderr is not None
+        out, err = proc.stdout.read(), proc.stderr.read()
+        proc.wait()
+        if proc.returncode != 0:
+            message = err.decode("utf-8", "replace").strip() or f"psql exited with {proc.returncode}"
+            raise PsqlError(f"COPY into {table} failed: {message}")
+        match = _COPY_TAG_RE.search(out)
+        return int(match.group(1)) if match else 0
+
+    def run_script(self, text: str) -> None:
+        self._send(text)
+
+    def close(self) -> None:
+        if self._proc is not None:
+            assert self._proc.stdin is not None
+            try:
+                self._proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            self._proc.wait()
+            self._proc = None
+
+
+class PsycopgSession(Session):
+    """An autocommit psycopg connection; explicit BEGIN/COMMIT in scripts still apply."""
+
+    backend = "psycopg"
+
+    def __init__(self) -> None:
+        import psycopg
+
+        self._psycopg = psycopg
+        self._conn = self._connect()
+
+    def _connect(self):
+        env = connection_env()
+        params = {key: env[var] for var, key in _LIBPQ_KEYS.items() if env.get(var)}
+        try:
+            conn = self._psycopg.connect(autocommit=True, client_encoding="UTF8", **params)
+            for name, value in _session_gucs().items():
+                conn.execute("select set_config(%s, %s, false)", (name, value))
+        except self._psycopg.Error as err:
+            raise PsqlError(str(err).strip()) from err
+        return conn
+
+    @contextmanager
+    def _errors(self) -> Iterator[None]:
+        if self._conn.closed:
+            self._conn = self._connect()
+        try:
+            yield
+        except self._psycopg.Error as err:
+            if not self._conn.closed and self._conn.info.transaction_status != self._psycopg.pq.TransactionStatus.IDLE:
+                self._conn.rollback()  # leave no aborted BEGIN behind for the next caller
+            raise PsqlError(str(err).strip()) from err
+
+    def execute(self, sql: str) -> None:
+        with self._errors():
+            self._conn.execute(sql)
+
+    def copy_out(self, sql: str) -> bytes:
+        with self._errors(), self._conn.cursor() as cur:
+            with cur.copy(f"copy ({sql}) to stdout csv") as copy:
+                return b"".join(bytes(block) for block in copy)
+
+    def _copy_in(self, statement: str, path: Path) -> int:
+        with self._errors(), self._conn.cursor() as cur, _open_source(path) as src:
+            with cur.copy(statement) as copy:
+                for block in iter(lambda: src.read(COPY_CHUNK), b""):
+                    copy.write(block)
+            return cur.rowcount
+
+    def copy_file(self, table: str, columns: Sequence[str], path: Path) -> int:
+        return self._copy_in(
+            f"copy {table}({','.join(columns)}) from stdin {_copy_options(path)}", path
+        )
+
+    def copy_from(
+        self, table: str, columns: Sequence[str], blocks: Iterable[bytes], options: str = "csv"
+    ) -> int:
+        with self._errors(), self._conn.cursor() as cur:
+            with cur.copy(f"copy {table}({','.join(columns)}) from stdin {options}") as copy:
+                for block in blocks:
+                    copy.write(block)
+            return cur.rowcount
+
+    def run_script(self, text: str) -> None:
+        pending: List[str] = []
+        for line in text.splitlines(keepends=True):
+            stripped = line.strip()
+            if not stripped.startswith("\\"):
+                pending.append(line)
+                continue
+            match = _META_COPY_RE.match(stripped)
+            if match is None:
+                raise PsqlError(f"psql meta-command not supported over psycopg: {stripped.split()[0]}")
+            if "".join(pending).strip():
+                self.execute("".join(pending))
+            pending = []
+            self._copy_in(
+                f"copy {match['target']} from stdin {match['options']}", Path(match["path"])
+            )
+        if "".join(pending).strip():
+            self.execute("".join(pending))
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def connect() -> Session:
+    """Open a session with psycopg if available (and reachable), else over psql."""
+    driver = os.getenv("PG_DRIVER", "auto")
+    if driver not in ("auto", "psql", "psycopg"):
+        raise PsqlError(f"PG_DRIVER must be auto, psql or psycopg, not {driver!r}")
+    if driver != "psql":
+        try:
+            return PsycopgSession()
+        except ImportError:
+            if driver == "psycopg":
+                raise PsqlError("PG_DRIVER=psycopg needs psycopg (pip install 'psycopg[binary]').")
+        except PsqlError:
+            if driver == "psycopg":
+                raise
+    return PsqlSession()
+
+
+class Pool:
+    """Up to ``size`` sessions shared by threads; each is opened on first use
+    and reused until close()."""
+
+    def __init__(self, size: int = 1) -> None:
+        self._slots = threading.BoundedSemaphore(max(size, 1))
+        self._lock = threading.Lock()
+        self._idle: List[Session] = []
+        self._open: List[Session] = []
+
+    @contextmanager
+    def session(self) -> Iterator[Session]:
+        with self._slots:
+            with self._lock:
+                session = self._idle.pop() if self._idle else None
+            if session is None:
+                session = connect()
+                with self._lock:
+                    self._open.append(session)
+            try:
+                yield session
+            finally:
+                with self._lock:
+                    self._idle.append(session)
+
+    def close(self) -> None:
+        with self._lock:
+            sessions, self._open, self._idle = self._open, [], []
+        for session in sessions:
+            session.close()
+
+    def __enter__(self) -> "Pool":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
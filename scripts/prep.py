@@ -0,0 +1,954 @@
+#!/usr/bin/env python3
+"""Shared prep engine for the monthly CSV feeds.
+
+Each feed is described once by a FeedSpec (canonical columns plus header
+aliases). Headers are resolved to column positions a single time and every
+data row is projected by index, so no per-row dict is built.
+
+Usage:
+  prep.py <feed> <src.csv> <out.csv>        prep a single feed
+  prep.py all [INC_DIR] [--jobs N] [--map]  prep every feed found in INC_DIR
+                                            concurrently (plus the SKU<->VA map)
+  prep.py <feed> <src.csv> [<out.csv>] --load
+  prep.py all [INC_DIR] --load [--tee]      stream projected rows straight into
+                                            raw.* via COPY (optionally also
+                                            writing the prepped CSV)
+  prep.py all [INC_DIR] --incremental       load only exports that are new or
+                                            changed since raw.load_manifest
+  prep.py all [INC_DIR] --format parquet    write typed <feed>_prepped.parquet
+                                            instead (prep_arrow.py, needs pyarrow)
+  prep.py all [INC_DIR] --format pgcopy     write <feed>_prepped.pgcopy in binary
+                                            COPY format for load_raw.sh
+  prep.py all [INC_DIR] --batch [--recursive]
+                                            prep every matching export (not just
+                                            the first per feed) to per-file outputs
+                                            plus <feed>_batch_prepped.csv tagged
+                                            with source_file (prep_batch.py)
+
+Sources larger than --chunk-mb are split at record boundaries and prepped
+chunk-by-chunk in the same pool (see prep_chunks.py); in --load mode each
+chunk streams over its own COPY connection.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import load_manifest
+from load_manifest import Fingerprint, ManifestEntry
+from pg_binary import BinaryCopyWriter
+from pg_copy import PsqlError, copy_in
+from prep_chunks import ChunkPlan, assemble, clear_outputs, plan_chunks, project_chunk
+from prep_note_sku_map import build_mapping
+
+
+def norm(s: Optional[str]) -> str:
+    s = (s or "").strip().lower()
+    s = re.sub(r"[^a-z0-9]+", " ", s)
+    s = re.sub(r"\s+", " ", s)
+    return s.strip()
+
+
+class PrepError(Exception):
+    """Raised when a source file cannot be mapped onto its feed spec."""
+
+    def __init__(self, message: str, details: Sequence[str] = ()) -> None:
+        super().__init__(message)
+        self.details = list(details)
+
+
+@dataclass(frozen=True)
+class FeedSpec:
+    name: str
+    table: str
+    pattern: str
+    env_var: str
+    description: str
+    columns: Tuple[str, ...]
+    aliases: Dict[str, Tuple[str, ...]]
+    # Columns behind raw.*'s generated <col>_num / <col>_ts (100_raw_tables.sql).
+    numeric: Tuple[str, ...] = ()
+    dates: Tuple[str, ...] = ()
+
+    @property
+    def output_name(self) -> str:
+        return self.output_file("csv")
+
+    def output_file(self, fmt: str) -> str:
+        return f"{self.name}_prepped.{fmt}"
+
+    def load_target(self, src: Path) -> LoadTarget:
+        return LoadTarget(self.table, self.columns, src.name)
+
+    def resolve(self, header: Sequence[str]) -> List[int]:
+        """Return the source column index for each canonical column."""
+        positions: Dict[str, int] = {}
+        for idx, name in enumerate(header):
+            positions[norm(name)] = idx
+        indices: List[int] = []
+        missing: List[str] = []
+        for col in self.columns:
+            found = None
+            for alias in self.aliases.get(col, ()) + (col,):
+                found = positions.get(norm(alias))
+                if found is not None:
+                    break
+            if found is None:
+                missing.append(col)
+            else:
+                indices.append(found)
+        if missing:
+            raise PrepError(
+                f"ERROR: missing required columns: {missing}",
+                [
+                    f"Found headers: {list(header)}",
+                    f"Found normalized: {[norm(h) for h in header]}",
+                ],
+            )
+        return indices
+
+
+@dataclass(frozen=True)
+class LoadTarget:
+    """Where --load mode COPYs a feed; ``source_file`` tags every row."""
+
+    table: str
+    columns: Tuple[str, ...]
+    source_file: str
+
+
+EXTERNAL_ACCOUNTS = FeedSpec(
+    name="external_accounts",
+    table="raw.external_accounts",
+    pattern="external_accounts_*.csv",
+    env_var="EXTERNAL_ACCOUNTS_SRC",
+    description="External Accounts",
+    columns=(
+        "beneficiary_bank_account_number",
+        "buy_amount",
+        "buy_currency",
+        "created_date",
+    ),
+    aliases={
+        "beneficiary_bank_account_number": (
+            "beneficiary bank account number",
+            "beneficiary bank account no",
+            "beneficiary account number",
+            "bank account number",
+            "receiver bank account number",
+            "receiver virtual account number",
+            "receiver va number",
+        ),
+        "buy_amount": ("buy amount", "amount", "total amount", "pull amount"),
+        "buy_currency": ("buy currency", "currency", "buy ccy", "ccy"),
+        "created_date": (
+            "created date",
+            "transaction date",
+            "completed date",
+            "value date",
+            "date",
+        ),
+    },
+    numeric=("buy_amount",),
+    dates=("created_date",),
+)
+
+VA_TXN = FeedSpec(
+    name="va_txn",
+    table="raw.va_txn",
+    pattern="va_txn_*.csv",
+    env_var="VA_TXN_SRC",
+    description="VA Transaction Report",
+    columns=(
+        "sender_virtual_account_id",
+        "sender_virtual_account_number",
+        "sender_note_id",
+        "receiver_virtual_account_id",
+        "receiver_virtual_account_number",
+        "receiver_note_id",
+        "receiver_va_opening_balance",
+        "receiver_va_closing_balance",
+        "amount",
+        "date",
+        "remarks",
+    ),
+    aliases={
+        "sender_virtual_account_id": ("sender virtual account id", "sender va id"),
+        "sender_virtual_account_number": (
+            "sender virtual account number",
+            "sender va number",
+            "sender bank account number",
+            "sender account number",
+        ),
+        "sender_note_id": (
+            "sender note id",
+            "sender ref id",
+            "sender reference id",
+            "sender note",
+        ),
+        "receiver_virtual_account_id": ("receiver virtual account id", "receiver va id"),
+        "receiver_virtual_account_number": (
+            "receiver virtual account number",
+            "receiver va number",
+            "beneficiary bank account number",
+            "receiver bank account number",
+            "receiver account number",
+        ),
+        "receiver_note_id": (
+            "receiver note id",
+            "receiver ref id",
+            "receiver reference id",
+            "receiver note",
+        ),
+        "receiver_va_opening_balance": (
+            "receiver va opening balance",
+            "opening balance receiver",
+            "receiver opening balance",
+        ),
+        "receiver_va_closing_balance": (
+            "receiver va closing balance",
+            "closing balance receiver",
+            "receiver closing balance",
+        ),
+        "amount": ("amount", "transaction amount", "amt"),
+        "date": (
+            "date",
+            "transaction date",
+            "created date",
+            "completed date",
+            "value date",
+        ),
+        "remarks": ("remarks", "comment", "memo", "description"),
+    },
+    numeric=("receiver_va_opening_balance", "receiver_va_closing_balance", "amount"),
+    dates=("date",),
+)
+
+REPMT_SKU = FeedSpec(
+    name="repmt_sku",
+    table="raw.repmt_sku",
+    pattern="repmt_sku_*.csv",
+    env_var="REPMT_SKU_SRC",
+    description="Repmt-SKU (by Note)",
+    columns=(
+        "merchant",
+        "sku_id",
+        "acquirer_fees_expected",
+        "acquirer_fees_paid",
+        "fh_admin_fees_expected",
+        "fh_admin_fees_paid",
+        "int_difference_expected",
+        "int_difference_paid",
+        "sr_principal_expected",
+        "sr_principal_paid",
+        "sr_interest_expected",
+        "sr_interest_paid",
+        "jr_principal_expected",
+        "jr_principal_paid",
+        "jr_interest_expected",
+        "jr_interest_paid",
+        "spar_merchant",
+        "additional_interests_paid_to_fh",
+    ),
+    aliases={
+        "merchant": ("merchant", "merchant name", "spar merchant"),
+        "sku_id": ("sku id", "sku", "note id"),
+        "acquirer_fees_expected": ("acquirer fees expected", "acquirer fee expected"),
+        "acquirer_fees_paid": ("acquirer fees paid", "acquirer fee paid"),
+        "fh_admin_fees_expected": (
+            "fh admin fees expected",
+            "administrative fees expected",
+            "admin fees expected",
+        ),
+        "fh_admin_fees_paid": (
+            "fh admin fees paid",
+            "administrative fees paid",
+            "admin fees paid",
+        ),
+        "int_difference_expected": (
+            "int difference expected",
+            "interest difference expected",
+        ),
+        "int_difference_paid": ("int difference paid", "interest difference paid"),
+        "sr_principal_expected": ("sr principal expected", "senior principal expected"),
+        "sr_principal_paid": ("sr principal paid", "senior principal paid"),
+        "sr_interest_expected": ("sr interest expected", "senior interest expected"),
+        "sr_interest_paid": ("sr interest paid", "senior interest paid"),
+        "jr_principal_expected": ("jr principal expected", "junior principal expected"),
+        "jr_principal_paid": ("jr principal paid", "junior principal paid"),
+        "jr_interest_expected": ("jr interest expected", "junior interest expected"),
+        "jr_interest_paid": ("jr interest paid", "junior interest paid"),
+        "spar_merchant": ("spar merchant", "spar"),
+        "additional_interests_paid_to_fh": (
+            "additional interests paid to fh",
+            "fh platform fee",
+            "platform fee",
+        ),
+    },
+    numeric=(
+        "acquirer_fees_expected",
+        "acquirer_fees_paid",
+        "fh_admin_fees_expected",
+        "fh_admin_fees_paid",
+        "int_difference_expected",
+        "int_difference_paid",
+        "sr_principal_expected",
+        "sr_principal_paid",
+        "sr_interest_expected",
+        "sr_interest_paid",
+        "jr_principal_expected",
+        "jr_principal_paid",
+        "jr_interest_expected",
+        "jr_interest_paid",
+        "spar_merchant",
+        "additional_interests_paid_to_fh",
+    ),
+)
+
+REPMT_SALES = FeedSpec(
+    name="repmt_sales",
+    table="raw.repmt_sales",
+    pattern="repmt_sales_*.csv",
+    env_var="REPMT_SALES_SRC",
+    description="Repmt-Sales Proceeds (by Note)",
+    columns=("merchant", "sku_id", "total_funds_inflow", "sales_proceeds", "l2e"),
+    aliases={
+        "merchant": ("merchant", "merchant name"),
+        "sku_id": ("sku id", "sku", "note id"),
+        "total_funds_inflow": (
+            "total funds inflow",
+            "total inflow",
+            "fund inflow",
+            "funds inflow",
+        ),
+        "sales_proceeds": ("sales proceeds", "sales proceed", "proceeds"),
+        "l2e": ("l2 e", "l2e", "l2+e", "l2_e"),
+    },
+    numeric=("total_funds_inflow", "sales_proceeds", "l2e"),
+)
+
+FEEDS: Dict[str, FeedSpec] = {
+    spec.name: spec for spec in (EXTERNAL_ACCOUNTS, VA_TXN, REPMT_SKU, REPMT_SALES)
+}
+
+
+def projector(indices: Sequence[int]) -> Callable[[List[str]], Sequence[str]]:
+    """Build a row -> canonical-columns function for the resolved indices."""
+    width = max(indices) + 1
+    pick = itemgetter(*indices)
+    if len(indices) == 1:
+        fast = lambda row: (pick(row),)  # noqa: E731
+    else:
+        fast = pick
+
+    def project(row: List[str]) -> Sequence[str]:
+        if len(row) >= width:
+            return fast(row)
+        # Short (ragged) rows: pad missing cells with "" like DictReader did.
+        size = len(row)
+        return tuple(row[i] if i < size else "" for i in indices)
+
+    return project
+
+
+def project_rows(reader: Iterable[List[str]], indices: Sequence[int]) -> Iterator[Sequence[str]]:
+    project = projector(indices)
+    for row in reader:
+        if row:
+            yield project(row)
+
+
+def write_rows(
+    rows: Iterator[Sequence[str]],
+    out: Optional[Path],
+    header: Sequence[str] = (),
+    load: Optional[LoadTarget] = None,
+) -> int:
+    """Write projected rows to ``out`` and/or COPY them into ``load.table``; returns rows.
+
+    An ``out`` ending in .pgcopy is written in binary COPY format (text columns, no header).
+    """
+    count = 0
+    with ExitStack() as stack:
+        tee = copy = None
+        if out is not None and out.suffix == ".pgcopy":
+            binary = BinaryCopyWriter(stack.enter_context(open(out, "wb")), ["text"] * len(header))
+            stack.callback(binary.close)
+            tee = binary.write_rows
+        elif out is not None:
+            writer = csv.writer(stack.enter_context(open(out, "w", newline="", encoding="utf-8")))
+            if header:
+                writer.writerow(header)
+            tee = writer.writerows
+        if load is not None:
+            stream = stack.enter_context(copy_in(load.table, ("source_file",) + load.columns))
+            copy = csv.writer(stream, lineterminator="\n").writerows
+            tag = (load.source_file,)
+        for batch in batched(rows, BATCH_ROWS):
+            if tee is not None:
+                tee(batch)
+            if copy is not None:
+                copy([tag + row for row in batch])
+            count += len(batch)
+    return count
+
+
+def prep_file(
+    spec: FeedSpec, src: Path, out: Optional[Path], load: Optional[LoadTarget] = None
+) -> int:
+    """Project ``src`` onto the canonical columns of ``spec``; returns data rows written.
+
+    With ``load`` the rows are streamed into the raw table; ``out`` is then optional.
+    """
+    with open(src, "r", newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        indices = spec.resolve(next(reader, []))
+        return write_rows(project_rows(reader, indices), out, spec.columns, load)
+
+
+BATCH_ROWS = 8192
+
+
+def batched(rows: Iterator[Sequence[str]], size: int) -> Iterator[List[Sequence[str]]]:
+    batch: List[Sequence[str]] = []
+    append = batch.append
+    for row in rows:
+        append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+            append = batch.append
+    if batch:
+        yield batch
+
+
+# What prep itself writes: <name>_prepped.csv (batch outputs included) and its
+# numbered shards <name>_prepped.0001.csv (prep_chunks.shard_path). Feed patterns
+# such as va_txn_*.csv match them too, but they are never source exports.
+PREPPED_RE = re.compile(r"_prepped(\.\d{4})?\.csv$")
+
+
+def source_exports(paths: Iterable[Path]) -> List[Path]:
+    """The files among ``paths`` that are not prep outputs, in name order."""
+    return sorted(p for p in paths if p.is_file() and not PREPPED_RE.search(p.name))
+
+
+def resolve_source(spec: FeedSpec, inc_dir: Path) -> Path:
+    """Pick the source export for ``spec``: $ENV override first, else the first glob match."""
+    return resolve_sources(spec, inc_dir)[0]
+
+
+def resolve_sources(spec: FeedSpec, inc_dir: Path) -> List[Path]:
+    """All exports for ``spec`` in name order (just the $ENV override when it is set)."""
+    provided = os.getenv(spec.env_var, "")
+    if provided:
+        for candidate in (Path(provided), inc_dir / provided):
+            if candidate.is_file():
+                return [candidate]
+        raise PrepError(
+            f"Missing {spec.description} CSV: '{provided}' (set {spec.env_var} to a valid path "
+            f"or place a file matching '{spec.pattern}' in {inc_dir})"
+        )
+    matches = source_exports(inc_dir.glob(spec.pattern))
+    if not matches:
+        raise PrepError(
+            f"Missing {spec.description} CSV. Place a file matching '{spec.pattern}' in {inc_dir} "
+            f"or set {spec.env_var}."
+        )
+    return matches
+
+
+def quiet() -> bool:
+    return os.getenv("QUIET", "1") != "0"
+
+
+def _report_error(err: PrepError) -> None:
+    print(err, file=sys.stderr)
+    for line in err.details:
+        print(line, file=sys.stderr)
+
+
+@dataclass
+class TaskResult:
+    label: str
+    source: str
+    rows: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+    skipped: bool = False
+
+
+Task = Tuple[str, str, Callable[..., int], Tuple[Any, ...]]
+
+
+@dataclass
+class FeedJob:
+    spec: FeedSpec
+    tasks: List[Task]
+    plan: Optional[ChunkPlan] = None
+    out: Optional[Path] = None
+    load: bool = False
+
+
+def _prep_feed_task(name: str, src: str, out: Optional[str], load: bool) -> int:
+    spec = FEEDS[name]
+    target = spec.load_target(Path(src)) if load else None
+    return prep_file(spec, Path(src), Path(out) if out else None, target)
+
+
+def _prep_parquet_task(name: str, src: str, out: str) -> int:
+    from prep_arrow import prep_parquet
+
+    return prep_parquet(FEEDS[name], Path(src), Path(out))
+
+
+def _prep_map_task(source: str, out: str) -> int:
+    return build_mapping(Path(source), Path(out), quiet=True)
+
+
+def feed_job(
+    spec: FeedSpec,
+    src: Path,
+    out: Optional[Path],
+    jobs: int,
+    chunk_bytes: int,
+    shards: int,
+    load: bool = False,
+    fmt: str = "csv",
+) -> FeedJob:
+    """Plan the work for one feed: one whole-file task, or one task per record-aligned chunk.
+
+    ``out`` may be None in load mode, in which case no prepped CSV is written.
+    Parquet output is always one task (Arrow's CSV reader is multi-threaded itself), and
+    so is binary COPY output, whose parts could not simply be concatenated.
+    """
+    if fmt == "parquet" and out is not None:
+        task = (spec.description, str(src), _prep_parquet_task, (spec.name, str(src), str(out)))
+        return FeedJob(spec, [task], None, out)
+    if fmt == "pgcopy" and out is not None:
+        task = (spec.description, str(src), _prep_feed_task, (spec.name, str(src), str(out), False))
+        return FeedJob(spec, [task], None, out)
+    if out is not None:
+        clear_outputs(out)
+    target = spec.load_target(src) if load else None
+    split = shards > 0 or (jobs > 1 and chunk_bytes > 0 and src.stat().st_size > chunk_bytes)
+    if split:
+        plan = plan_chunks(src, out or src, chunk_bytes, shards)
+        if plan.chunks:
+            indices = spec.resolve(plan.header)
+            header = spec.columns if plan.sharded else ()
+            tasks: List[Task] = [
+                (spec.description, str(src), project_chunk,
+                 (str(src), c.start, c.end, indices,
+                  str(plan.part_path(c)) if out else "", header, target))
+                for c in plan.chunks
+            ]
+            return FeedJob(spec, tasks, plan, out, load)
+    task: Task = (
+        spec.description,
+        str(src),
+        _prep_feed_task,
+        (spec.name, str(src), str(out) if out else None, load),
+    )
+    return FeedJob(spec, [task], None, out, load)
+
+
+def finish_job(job: FeedJob, results: Sequence[TaskResult]) -> TaskResult:
+    """Fold per-chunk results into one feed result, stitching parts in original order."""
+    arrow = f" -> {job.spec.table}" if job.load else ""
+    if job.plan is None:
+        results[0].label += arrow
+        return results[0]
+    plan = job.plan
+    merged = TaskResult(job.spec.description + arrow, str(plan.src))
+    merged.rows = sum(r.rows for r in results)
+    merged.seconds = max(r.seconds for r in results)
+    errors = [r.error for r in results if r.error]
+    if errors:
+        merged.error = errors[0]
+        if job.out is not None:
+            for chunk in plan.chunks:
+                plan.part_path(chunk).unlink(missing_ok=True)
+        return merged
+    merged.label = f"{job.spec.description} [{len(plan.chunks)} chunks]{arrow}"
+    if job.out is None:
+        return merged
+    start = time.perf_counter()
+    written = assemble(plan, job.spec.columns)
+    merged.seconds += time.perf_counter() - start
+    if plan.sharded:
+        merged.source = f"{plan.src} -> {len(written)} shards"
+    return merged
+
+
+def _timed_task(label: str, source: str, fn: Callable[..., int], *args: Any) -> TaskResult:
+    result = TaskResult(label, source)
+    start = time.perf_counter()
+    try:
+        result.rows = fn(*args)
+    except PrepError as err:
+        result.error = "; ".join([str(err)] + err.details)
+    except (Exception, SystemExit) as err:  # reported per feed; the run still exits non-zero
+        result.error = str(err) or type(err).__name__
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def run_tasks(tasks: Sequence[Task], jobs: int) -> List[TaskResult]:
+    """Run (label, source, fn, args) tasks in a process pool, largest source first.
+
+    Results come back in the order the tasks were given.
+    """
+    def size(i: int) -> int:
+        try:
+            return os.path.getsize(tasks[i][1])
+        except OSError:
+            return 0
+
+    order = sorted(range(len(tasks)), key=size, reverse=True)
+    if jobs <= 1 or len(tasks) <= 1:
+        done = {i: _timed_task(tasks[i][0], tasks[i][1], tasks[i][2], *tasks[i][3]) for i in order}
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as pool:
+            futures = {
+                i: pool.submit(_timed_task, tasks[i][0], tasks[i][1], tasks[i][2], *tasks[i][3])
+                for i in order
+            }
+            done = {i: f.result() for i, f in futures.items()}
+    return [done[i] for i in range(len(tasks))]
+
+
+def run_jobs(jobs_: Sequence[FeedJob], extra: Sequence[Task], workers: int) -> List[TaskResult]:
+    tasks: List[Task] = [t for job in jobs_ for t in job.tasks] + list(extra)
+    results = run_tasks(tasks, workers)
+    merged: List[TaskResult] = []
+    pos = 0
+    for job in jobs_:
+        merged.append(finish_job(job, results[pos:pos + len(job.tasks)]))
+        pos += len(job.tasks)
+    return merged + results[pos:]
+
+
+def run_single(
+    feed: str,
+    src: str,
+    out: Optional[str],
+    jobs: int = 1,
+    chunk_bytes: int = 0,
+    shards: int = 0,
+    load: bool = False,
+    fmt: str = "csv",
+) -> int:
+    spec = FEEDS[feed]
+    try:
+        job = feed_job(
+            spec, Path(src), Path(out) if out else None, jobs, chunk_bytes, shards, load, fmt
+        )
+    except PrepError as err:
+        _report_error(err)
+        return 3
+    (result,) = run_jobs([job], [], jobs)
+    if result.error:
+        print(result.error, file=sys.stderr)
+        return 3
+    if not quiet():
+        if load:
+            print(f"Loaded {result.rows} rows into {spec.table} from {Path(src).name}")
+        if out:
+            print(f"Wrote {out}" + (f" ({result.label})" if job.plan else ""))
+    return 0
+
+
+def print_report(results: Sequence[TaskResult], wall: float) -> None:
+    print(f"{'feed':<50} {'status':<6} {'rows':>10} {'secs':>8}  source")
+    for r in results:
+        status = "FAIL" if r.error else "skip" if r.skipped else "ok"
+        print(f"{r.label:<50} {status:<6} {r.rows:>10} {r.seconds:>8.2f}  {r.source}")
+    rows = sum(r.rows for r in results if not r.skipped)
+    print(f"{'wall clock':<50} {'':<6} {rows:>10} {wall:>8.2f}")
+    for r in results:
+        if r.error:
+            print(f"{r.label}: {r.error}", file=sys.stderr)
+
+
+def run_all(
+    inc_dir: Path,
+    out_dir: Path,
+    jobs: int,
+    map_source: Optional[Path] = None,
+    chunk_bytes: int = 0,
+    shards: int = 0,
+    load: bool = False,
+    tee: bool = True,
+    fmt: str = "csv",
+) -> Tuple[int, List[TaskResult]]:
+    sources: Dict[str, Path] = {}
+    missing = False
+    for spec in FEEDS.values():
+        try:
+            sources[spec.name] = resolve_source(spec, inc_dir)
+        except PrepError as err:
+            _report_error(err)
+            missing = True
+    if missing:
+        print("Aborting prep-all due to missing source files.", file=sys.stderr)
+        return 2, []
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    feed_jobs: List[FeedJob] = []
+    failed: List[TaskResult] = []
+    for name, src in sources.items():
+        spec = FEEDS[name]
+        # Sharding only applies to feeds big enough to be split.
+        feed_shards = shards if chunk_bytes <= 0 or src.stat().st_size > chunk_bytes else 0
+        try:
+            out = out_dir / spec.output_file(fmt) if tee or not load else None
+            feed_jobs.append(
+                feed_job(spec, src, out, jobs, chunk_bytes, feed_shards, load, fmt)
+            )
+        except PrepError as err:
+            error = "; ".join([str(err)] + err.details)
+            failed.append(TaskResult(spec.description, str(src), error=error))
+    results = run_jobs(feed_jobs, map_tasks(map_source, out_dir), jobs) + failed
+    print_report(results, time.perf_counter() - start)
+    return (1 if any(r.error for r in results) else 0), results
+
+
+def map_tasks(map_source: Optional[Path], out_dir: Path) -> List[Task]:
+    if map_source is None:
+        return []
+    return [(
+        "SKU<->VA map",
+        str(map_source),
+        _prep_map_task,
+        (str(map_source), str(out_dir / "note_sku_va_map_prepped.csv")),
+    )]
+
+
+def run_incremental(
+    inc_dir: Path,
+    out_dir: Path,
+    jobs: int,
+    map_source: Optional[Path] = None,
+    chunk_bytes: int = 0,
+    tee: bool = False,
+) -> Tuple[int, List[TaskResult]]:
+    """Load every export in ``inc_dir`` that raw.load_manifest does not already hold.
+
+    Unchanged files are skipped, new ones appended and changed ones replaced by
+    source_file. With ``tee`` each loaded export also gets a <stem>_prepped.csv.
+    """
+    sources: Dict[str, List[Path]] = {}
+    missing = False
+    for spec in FEEDS.values():
+        try:
+            sources[spec.name] = resolve_sources(spec, inc_dir)
+        except PrepError as err:
+            _report_error(err)
+            missing = True
+    if missing:
+        print("Aborting incremental load due to missing source files.", file=sys.stderr)
+        return 2, []
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    try:
+        known = load_manifest.fetch(spec.table for spec in FEEDS.values())
+    except PsqlError as err:
+        print(f"Cannot read {load_manifest.MANIFEST}: {err}", file=sys.stderr)
+        return 1, []
+
+    skipped: List[TaskResult] = []
+    touched: List[ManifestEntry] = []
+    pending: List[Tuple[FeedSpec, Path, Fingerprint]] = []
+    for name, paths in sources.items():
+        spec = FEEDS[name]
+        for src in paths:
+            entry = known.get((spec.table, src.name))
+            fp = load_manifest.fingerprint(src, entry)
+            if entry is not None and entry.fingerprint.sha256 == fp.sha256:
+                label = f"{spec.description} -> {spec.table}"
+                skipped.append(TaskResult(label, str(src), entry.rows, skipped=True))
+                if entry.fingerprint != fp:
+                    touched.append(ManifestEntry(spec.table, src.name, fp, entry.rows))
+                continue
+            pending.append((spec, src, fp))
+
+    feed_jobs: List[FeedJob] = []
+    failed: List[TaskResult] = []
+    try:
+        load_manifest.discard([(spec.table, src.name) for spec, src, _ in pending])
+    except PsqlError as err:
+        print(f"Cannot clear previous rows: {err}", file=sys.stderr)
+        return 1, []
+    planned: List[Tuple[FeedSpec, Path, Fingerprint]] = []
+    for spec, src, fp in pending:
+        out = out_dir / f"{src.stem}_prepped.csv" if tee else None
+        try:
+            feed_jobs.append(feed_job(spec, src, out, jobs, chunk_bytes, 0, load=True))
+            planned.append((spec, src, fp))
+        except PrepError as err:
+            error = "; ".join([str(err)] + err.details)
+            failed.append(TaskResult(spec.description, str(src), error=error))
+
+    results = run_jobs(feed_jobs, map_tasks(map_source, out_dir), jobs)
+    loaded = [
+        ManifestEntry(spec.table, src.name, fp, result.rows)
+        for (spec, src, fp), result in zip(planned, results)
+        if not result.error
+    ]
+    try:
+        load_manifest.record(loaded + touched)
+    except PsqlError as err:
+        failed.append(TaskResult(load_manifest.MANIFEST, "", error=str(err)))
+    results = skipped + results + failed
+    print_report(results, time.perf_counter() - start)
+    return (1 if any(r.error for r in results) else 0), results
+
+
+def main_single(feed: str) -> None:
+    """Entry point kept for the legacy prep_<feed>.py wrappers."""
+    if len(sys.argv) < 3:
+        print("Usage: prep_<name>.py <src.csv> <out.csv>", file=sys.stderr)
+        sys.exit(2)
+    sys.exit(run_single(feed, sys.argv[1], sys.argv[2]))
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("feed", choices=sorted(FEEDS) + ["all"], help="Feed to prep, or 'all'.")
+    parser.add_argument("paths", nargs="*", help="<src> <out> for a single feed; [INC_DIR] for 'all'.")
+    parser.add_argument("--out-dir", help="Output directory for 'all' (defaults to INC_DIR).")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=int(os.getenv("PREP_JOBS", "0")) or os.cpu_count() or 1,
+        help="Worker processes (default: $PREP_JOBS or CPU count; 1 = sequential).",
+    )
+    parser.add_argument(
+        "--chunk-mb",
+        type=int,
+        default=int(os.getenv("PREP_CHUNK_MB", "64")),
+        help="Split sources larger than this into record-aligned chunks prepped in parallel "
+        "(default: $PREP_CHUNK_MB or 64; 0 = never split).",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=int(os.getenv("PREP_SHARDS", "0")),
+        help="Write split feeds as N numbered shards (<name>_prepped.0001.csv ...) instead of "
+        "one file; load_raw.sh COPYs shards in parallel.",
+    )
+    parser.add_argument(
+        "--load",
+        action="store_true",
+        help="COPY projected rows straight into raw.* (tagging source_file) instead of only "
+        "writing *_prepped.csv. Tables are appended to; truncate first for a clean reload.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="With 'all': load every matching export not yet in raw.load_manifest, replace "
+        "exports whose content changed, and skip the rest (implies --load).",
+    )
+    parser.add_argument(
+        "--tee",
+        action="store_true",
+        help="With --load and 'all', also write the prepped CSVs for audit. For a single "
+        "feed, passing <out> does the same.",
+    )
+    parser.add_argument(
+        "--map",
+        nargs="?",
+        const="",
+        metavar="SOURCE",
+        help="Also build note_sku_va_map_prepped.csv from the Level-1 reference export "
+        "(default: INC_DIR/level1_reference.csv).",
+    )
+    parser.add_argument(
+        "--format",
+        choices=("csv", "parquet", "pgcopy"),
+        default=os.getenv("PREP_FORMAT", "csv"),
+        help="Prepped output: text CSV (default: $PREP_FORMAT or csv), Parquet with typed "
+        "<col>_num / <col>_ts columns parsed like raw.* (needs pyarrow), or PostgreSQL binary "
+        "COPY (.pgcopy) that load_raw.sh loads without CSV parsing.",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="With 'all': prep every export matching a feed pattern into <stem>_prepped.csv "
+        "plus a combined <feed>_batch_prepped.csv whose rows start with source_file.",
+    )
+    parser.add_argument(
+        "--recursive", action="store_true", help="With --batch, also search subdirectories of INC_DIR."
+    )
+    args = parser.parse_args(argv)
+    if args.incremental and args.feed != "all":
+        parser.error("--incremental only applies to 'all'")
+    if args.batch and (args.feed != "all" or args.load or args.incremental or args.format != "csv"):
+        parser.error("--batch only applies to 'all' with CSV output (no --load/--incremental)")
+    if args.recursive and not args.batch:
+        parser.error("--recursive only applies to --batch")
+    if args.format != "csv" and (args.load or args.incremental):
+        parser.error(f"--format {args.format} writes files only; drop --load/--incremental")
+    if args.feed == "all":
+        if len(args.paths) > 1:
+            parser.error("'all' takes at most one INC_DIR argument")
+    elif len(args.paths) != 2 and not (args.load and len(args.paths) == 1):
+        parser.error(f"'{args.feed}' needs <src> <out> (or <src> [<out>] with --load)")
+    return args
+
+
+def run(args: argparse.Namespace) -> Tuple[int, List[TaskResult]]:
+    """Run parsed arguments; returns the exit code and, for 'all', the per-feed results."""
+    chunk_bytes = max(args.chunk_mb, 0) * 1024 * 1024
+    if args.format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("--format parquet needs pyarrow (pip install pyarrow).", file=sys.stderr)
+            return 2, []
+    if args.feed == "all":
+        inc_dir = Path(args.paths[0] if args.paths else "data/inc_data")
+        map_source = None
+        if args.map is not None:
+            map_source = Path(args.map) if args.map else inc_dir / "level1_reference.csv"
+        out_dir = Path(args.out_dir) if args.out_dir else inc_dir
+        if args.batch:
+            from prep_batch import run_batch
+
+            return run_batch(inc_dir, out_dir, args.jobs, map_source, args.recursive)
+        if args.incremental:
+            return run_incremental(
+                inc_dir, out_dir, args.jobs, map_source, chunk_bytes, tee=args.tee
+            )
+        return run_all(
+            inc_dir, out_dir, args.jobs, map_source, chunk_bytes, args.shards,
+            load=args.load, tee=args.tee, fmt=args.format,
+        )
+    src, out = (args.paths + [None])[:2]
+    rc = run_single(
+        args.feed, src, out, args.jobs, chunk_bytes, args.shards, args.load, args.format
+    )
+    return rc, []
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    return run(parse_args(argv))[0]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""Columnar prep engine: feeds -> typed Parquet via Arrow record batches.
+
+The row engine (prep.py) projects text cells and leaves parsing to the
+generated <col>_num / <col>_ts columns of raw.* at load time. This engine reads
+the same feeds with pyarrow's multi-threaded CSV reader, projects the canonical
+columns a batch at a time and adds the typed columns next to the text ones,
+parsed with Arrow compute kernels to the same rules as raw.parse_numeric and
+raw.parse_date_utc (090_raw_parse_fns.sql):
+
+  <col>_num  strip everything but digits, '.' and '-', then decimal(38, 10);
+             blanks, '-' and anything else unparseable are null
+  <col>_ts   M/D/YYYY, YYYY-MM-DD, YYYY/MM/DD, D/M/YYYY (first that parses),
+             any time-of-day ignored, at midnight UTC
+
+pyarrow is optional and only imported here; prep.py --format parquet is the
+entry point.
+"""
+from __future__ import annotations
+
+import csv
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, List
+
+from prep import BATCH_ROWS, FeedSpec, PrepError, batched, project_rows
+
+if TYPE_CHECKING:  # pragma: no cover
+    import pyarrow as pa
+
+BLOCK_BYTES = 8 * 1024 * 1024
+NUMERIC_PRECISION, NUMERIC_SCALE = 38, 10
+NUMERIC_RE = r"^-?([0-9]+\.?[0-9]*|\.[0-9]+)$"
+# raw.parse_date_utc's formats in its fallback order, separators folded to '/'
+# (to_date matches any separator against any other), with the field holding the day.
+DATE_FORMATS = (("%m/%d/%Y", "f1"), ("%Y/%m/%d", "f2"), ("%d/%m/%Y", "f0"))
+DATE_RE = r"^(?P<f0>[0-9]{1,4})/(?P<f1>[0-9]{1,4})/(?P<f2>[0-9]{1,4})$"
+
+
+def require_arrow() -> None:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise PrepError("The columnar prep engine needs pyarrow (pip install pyarrow).") from None
+
+
+def schema(spec: FeedSpec) -> "pa.Schema":
+    """Text columns in canonical order, then <col>_num and <col>_ts like raw.*."""
+    import pyarrow as pa
+
+    numeric = pa.decimal128(NUMERIC_PRECISION, NUMERIC_SCALE)
+    fields = [pa.field(col, pa.string()) for col in spec.columns]
+    fields += [pa.field(f"{col}_num", numeric) for col in spec.numeric]
+    fields += [pa.field(f"{col}_ts", pa.timestamp("us", tz="UTC")) for col in spec.dates]
+    return pa.schema(fields)
+
+
+def parse_numeric(values: "pa.Array") -> "pa.Array":
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    cleaned = pc.replace_substring_regex(values, r"[^0-9.-]", "")
+    valid = pc.match_substring_regex(cleaned, NUMERIC_RE)
+    kept = pc.if_else(valid, cleaned, pa.scalar(None, pa.string()))
+    return pc.cast(kept, pa.decimal128(NUMERIC_PRECISION, NUMERIC_SCALE))
+
+
+def parse_date_utc(values: "pa.Array") -> "pa.Array":
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    text = pc.utf8_trim_whitespace(values)
+    text = pc.replace_substring_regex(text, r"\s.*$", "")
+    text = pc.replace_substring_regex(text, r"[-.]", "/")
+    fields = pc.extract_regex(text, DATE_RE)
+    missing = pa.scalar(None, pa.timestamp("us"))
+    parsed = []
+    for fmt, day_field in DATE_FORMATS:
+        ts = pc.strptime(text, format=fmt, unit="us", error_is_null=True)
+        # strptime rolls 2/30 over into March; to_date rejects it, so must we.
+        day = pc.cast(pc.struct_field(fields, day_field), pa.int64())
+        parsed.append(pc.if_else(pc.equal(pc.day(ts), day), ts, missing))
+    return pc.coalesce(*parsed).cast(pa.timestamp("us", tz="UTC"))
+
+
+def _arrow_batches(spec: FeedSpec, src: Path) -> Iterator["pa.RecordBatch"]:
+    """Stream ``src`` through Arrow's CSV reader as batches of the canonical text columns."""
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    with open(src, "r", newline="", encoding="utf-8-sig") as f:
+        header = next(csv.reader(f), [])
+    indices = spec.resolve(header)
+    names = [f"c{i}" for i in range(len(header))]
+    picked = sorted(set(indices))
+    try:
+        reader = pacsv.open_csv(
+            src,
+            read_options=pacsv.ReadOptions(
+                column_names=names, skip_rows=1, block_size=BLOCK_BYTES
+            ),
+            parse_options=pacsv.ParseOptions(newlines_in_values=True),
+            convert_options=pacsv.ConvertOptions(
+                include_columns=[names[i] for i in picked],
+                column_types={names[i]: pa.string() for i in picked},
+                strings_can_be_null=False,
+            ),
+        )
+    except pa.ArrowInvalid as err:
+        if "Empty CSV file" in str(err):
+            return
+        raise
+    for batch in reader:
+        yield pa.RecordBatch.from_arrays(
+            [batch.column(names[i]) for i in indices], names=list(spec.columns)
+        )
+
+
+def _row_batches(spec: FeedSpec, src: Path) -> Iterator["pa.RecordBatch"]:
+    """Same batches via the row engine's reader, which pads ragged rows like prep_file."""
+    import pyarrow as pa
+
+    with open(src, "r", newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        indices = spec.resolve(next(reader, []))
+        for rows in batched(project_rows(reader, indices), BATCH_ROWS):
+            yield pa.RecordBatch.from_arrays(
+                [pa.array(col, pa.string()) for col in zip(*rows)], names=list(spec.columns)
+            )
+
+
+def typed_batch(spec: FeedSpec, batch: "pa.RecordBatch", target: "pa.Schema") -> "pa.RecordBatch":
+    """Append the parsed <col>_num / <col>_ts arrays to a batch of text columns."""
+    import pyarrow as pa
+
+    arrays = [batch.column(col) for col in spec.columns]
+    arrays += [parse_numeric(batch.column(col)) for col in spec.numeric]
+    arrays += [parse_date_utc(batch.column(col)) for col in spec.dates]
+    return pa.RecordBatch.from_arrays(arrays, schema=target)
+
+
+def _ragged(err: Exception) -> bool:
+    return "Expected" in str(err) and "columns, got" in str(err)
+
+
+def prep_parquet(spec: FeedSpec, src: Path, out: Path) -> int:
+    """Write ``src`` as typed Parquet to ``out``; returns data rows written.
+
+    Arrow's reader rejects rows with the wrong number of cells; such files are
+    re-read with the csv module instead (short rows padded with "").
+    """
+    require_arrow()
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    target = schema(spec)
+    tmp = out.with_name(out.name + ".part")
+
+    def write(batches: Iterator["pa.RecordBatch"]) -> int:
+        rows = 0
+        with pq.ParquetWriter(tmp, target, compression="zstd") as writer:
+            for batch in batches:
+                writer.write_batch(typed_batch(spec, batch, target))
+                rows += batch.num_rows
+        return rows
+
+    try:
+        try:
+            rows = write(_arrow_batches(spec, src))
+        except pa.ArrowInvalid as err:
+            if not _ragged(err):
+                raise
+            rows = write(_row_batches(spec, src))
+        tmp.replace(out)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return rows
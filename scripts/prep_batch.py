@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""Batch prep: every export of every feed in a directory, in one run.
+
+``prep.py all`` preps one export per feed. With --batch every file matching a
+feed's pattern is prepped (--recursive also descends into subdirectories),
+so a year of monthly, per-merchant exports is one invocation. For each source
+it writes
+
+  * ``<stem>_prepped.csv``, the usual prepped layout, next to where the
+    source sits relative to INC_DIR under --out-dir, and
+  * its rows, prefixed with ``source_file``, into one combined
+    ``<feed>_batch_prepped.csv`` per feed, whose columns match raw.<feed>'s
+    load columns. ``source_file`` is the export's file name, the key
+    raw.load_manifest and ``prep.py --incremental`` match and discard rows
+    by, so two exports of a feed with the same name in different
+    subdirectories are rejected rather than merged under one key. Sources
+    follow their relative paths in name order, which with --recursive is not
+    necessarily chronological; use ``source_file`` to tell exports apart.
+
+Headers are read in the parent and resolved once per distinct header
+signature (the normalized column names) by a HeaderCache: exports sharing a
+layout skip alias resolution, and a layout that does not map is reported once
+per file without being retried. Files are prepped in the process pool,
+largest first; each worker writes its per-file output and its tagged part of
+the combined stream in the same pass, and the parts are concatenated at the
+end.
+"""
+from __future__ import annotations
+
+import csv
+import shutil
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from prep import (
+    BATCH_ROWS,
+    FEEDS,
+    FeedSpec,
+    PrepError,
+    Task,
+    TaskResult,
+    batched,
+    map_tasks,
+    norm,
+    print_report,
+    project_rows,
+    run_tasks,
+    source_exports,
+)
+
+Signature = Tuple[str, ...]
+
+
+@dataclass
+class HeaderCache:
+    """Column indices per (feed, header signature); failures are cached too."""
+
+    resolved: Dict[Tuple[str, Signature], Union[List[int], PrepError]] = field(default_factory=dict)
+    hits: int = 0
+
+    def resolve(self, spec: FeedSpec, header: Sequence[str]) -> List[int]:
+        key = (spec.name, tuple(norm(h) for h in header))
+        found = self.resolved.get(key)
+        if found is None:
+            try:
+                found = spec.resolve(header)
+            except PrepError as err:
+                found = err
+            self.resolved[key] = found
+        else:
+            self.hits += 1
+        if isinstance(found, PrepError):
+            raise found
+        return found
+
+    def layouts(self, spec: FeedSpec) -> int:
+        return sum(1 for name, _ in self.resolved if name == spec.name)
+
+
+def read_header(src: Path) -> List[str]:
+    with open(src, "r", newline="", encoding="utf-8-sig") as f:
+        return next(csv.reader(f), [])
+
+
+def batch_sources(spec: FeedSpec, inc_dir: Path, recursive: bool = False) -> List[Path]:
+    """Every export matching ``spec.pattern`` under ``inc_dir``, prepped outputs excluded."""
+    found = inc_dir.rglob(spec.pattern) if recursive else inc_dir.glob(spec.pattern)
+    return source_exports(found)
+
+
+def combined_path(spec: FeedSpec, out_dir: Path) -> Path:
+    return out_dir / f"{spec.name}_batch_prepped.csv"
+
+
+def prep_tagged(
+    name: str, src: str, out: str, tagged: str, indices: Sequence[int], source_file: str
+) -> int:
+    """Write ``src``'s projected rows to ``out`` (with header) and, prefixed with
+    ``source_file``, to ``tagged`` (no header); returns data rows."""
+    count = 0
+    tag = (source_file,)
+    with open(src, "r", newline="", encoding="utf-8-sig") as f, \
+            open(out, "w", newline="", encoding="utf-8") as o, \
+            open(tagged, "w", newline="", encoding="utf-8") as t:
+        reader = csv.reader(f)
+        next(reader, None)
+        writer, tagged_writer = csv.writer(o), csv.writer(t)
+        writer.writerow(FEEDS[name].columns)
+        for batch in batched(project_rows(reader, indices), BATCH_ROWS):
+            writer.writerows(batch)
+            tagged_writer.writerows([tag + tuple(row) for row in batch])
+            count += len(batch)
+    return count
+
+
+def concat_parts(spec: FeedSpec, combined: Path, parts: Sequence[Path]) -> None:
+    with open(combined, "w", newline="", encoding="utf-8") as g:
+        csv.writer(g).writerow(("source_file",) + spec.columns)
+    with open(combined, "ab") as g:
+        for part in parts:
+            with open(part, "rb") as p:
+                shutil.copyfileobj(p, g, 1024 * 1024)
+            part.unlink()
+
+
+def run_batch(
+    inc_dir: Path,
+    out_dir: Path,
+    jobs: int,
+    map_source: Optional[Path] = None,
+    recursive: bool = False,
+) -> Tuple[int, List[TaskResult]]:
+    cache = HeaderCache()
+    start = time.perf_counter()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tasks: List[Task] = []
+    planned: List[Tuple[FeedSpec, Path]] = []  # (feed, tagged part) per task
+    failed: List[TaskResult] = []
+    feeds: Dict[str, int] = {}
+    for spec in FEEDS.values():
+        sources = batch_sources(spec, inc_dir, recursive)
+        feeds[spec.name] = len(sources)
+        combined = combined_path(spec, out_dir)
+        if sources:
+            combined.unlink(missing_ok=True)
+        tagged: Dict[str, Path] = {}  # source_file -> the export it was given to
+        for i, src in enumerate(sources, 1):
+            rel = src.relative_to(inc_dir)
+            label = f"{spec.description}: {rel}"
+            if src.name in tagged:
+                failed.append(TaskResult(label, str(src), error=(
+                    f"source_file {src.name!r} is already used by "
+                    f"{tagged[src.name].relative_to(inc_dir)} (exports are keyed by file name)")))
+                continue
+            tagged[src.name] = src
+            try:
+                indices = cache.resolve(spec, read_header(src))
+            except (PrepError, OSError, UnicodeDecodeError) as err:
+                details = err.details if isinstance(err, PrepError) else []
+                failed.append(TaskResult(label, str(src), error="; ".join([str(err)] + details)))
+                continue
+            out = out_dir / rel.parent / f"{src.stem}_prepped.csv"
+            out.parent.mkdir(parents=True, exist_ok=True)
+            part = combined.with_name(f"{combined.name}.part{i:04d}")
+            tasks.append((label, str(src), prep_tagged,
+                          (spec.name, str(src), str(out), str(part), indices, src.name)))
+            planned.append((spec, part))
+    if not tasks and not failed:
+        print(f"No exports matching {', '.join(s.pattern for s in FEEDS.values())} in {inc_dir}.",
+              file=sys.stderr)
+        return 2, []
+
+    results = run_tasks(tasks + map_tasks(map_source, out_dir), jobs)
+    for spec in FEEDS.values():
+        pairs = [(part, r) for (s, part), r in zip(planned, results) if s is spec]
+        parts = [part for part, r in pairs if not r.error]
+        for part, r in pairs:
+            if r.error:
+                part.unlink(missing_ok=True)
+        if parts:
+            concat_parts(spec, combined_path(spec, out_dir), parts)
+    results = results + failed
+    print_report(results, time.perf_counter() - start)
+    layouts = ", ".join(
+        f"{name} {count} file(s)/{cache.layouts(FEEDS[name])} layout(s)"
+        for name, count in feeds.items() if count
+    )
+    print(f"header cache: {layouts}; {cache.hits} resolution(s) skipped")
+    return (1 if any(r.error for r in results) else 0), results
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""Byte-range chunking for prepping very large exports in parallel.
+
+The source is memory-mapped and cut into chunks that end on a record
+boundary: a newline with an even number of double quotes before it, so a
+newline inside a quoted remarks value never splits a record. Workers
+project their own byte range into a numbered part file; parts are then
+concatenated in order into one output, or kept as numbered shards
+(``va_txn_prepped.0001.csv`` ...) that load_raw.sh can COPY in parallel.
+In --load mode each worker streams its range over its own COPY instead.
+Ranges are read through a READ_BUFFER-sized window rather than sliced whole,
+so a worker's memory stays flat whatever the chunk, shard or file size.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import mmap
+import os
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, BinaryIO, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from prep import LoadTarget
+
+QUOTE = ord('"')
+NEWLINE = b"\n"
+SCAN_WINDOW = 16 * 1024 * 1024
+READ_BUFFER = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class Chunk:
+    index: int
+    start: int
+    end: int
+
+
+@dataclass(frozen=True)
+class ChunkPlan:
+    src: Path
+    out: Path
+    header: Tuple[str, ...]
+    chunks: Tuple[Chunk, ...]
+    sharded: bool
+
+    def part_path(self, chunk: Chunk) -> Path:
+        if self.sharded:
+            return shard_path(self.out, chunk.index)
+        return self.out.with_name(f"{self.out.name}.part{chunk.index:04d}")
+
+
+def shard_path(out: Path, index: int) -> Path:
+    return out.with_name(f"{out.stem}.{index:04d}{out.suffix}")
+
+
+def existing_shards(out: Path) -> List[Path]:
+    return sorted(out.parent.glob(f"{out.stem}.[0-9][0-9][0-9][0-9]{out.suffix}"))
+
+
+class _RangeReader(io.RawIOBase):
+    """Raw reader over bytes ``start..end`` of an open file."""
+
+    def __init__(self, fh: BinaryIO, start: int, end: int) -> None:
+        self._fh = fh
+        self._pos = start
+        self._end = end
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: bytearray) -> int:
+        size = min(len(buffer), self._end - self._pos)
+        if size <= 0:
+            return 0
+        self._fh.seek(self._pos)
+        data = self._fh.read(size)
+        buffer[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+
+def open_range(fh: BinaryIO, start: int, end: int) -> IO[str]:
+    """Text stream of bytes ``start..end`` of ``fh``, decoded as UTF-8 as it is read."""
+    raw = io.BufferedReader(_RangeReader(fh, start, end), READ_BUFFER)
+    return io.TextIOWrapper(raw, encoding="utf-8", newline="")
+
+
+def _count_quotes(mm: mmap.mmap, start: int, end: int) -> int:
+    count = 0
+    for pos in range(start, end, SCAN_WINDOW):
+        count += mm[pos:min(end, pos + SCAN_WINDOW)].count(QUOTE)
+    return count
+
+
+def _next_boundary(mm: mmap.mmap, pos: int, in_quotes: bool) -> int:
+    """Offset just past the first newline at or after ``pos`` that sits outside quotes."""
+    size = len(mm)
+    while pos < size:
+        nl = mm.find(NEWLINE, pos)
+        if nl < 0:
+            return size
+        if _count_quotes(mm, pos, nl) % 2:
+            in_quotes = not in_quotes
+        pos = nl + 1
+        if not in_quotes:
+            return pos
+    return size
+
+
+def find_boundaries(mm: mmap.mmap, first: int, chunk_bytes: int) -> List[int]:
+    """Record-aligned offsets ``[first, ..., len(mm)]`` roughly ``chunk_bytes`` apart."""
+    size = len(mm)
+    bounds = [first]
+    pos, in_quotes = first, False
+    while pos + chunk_bytes < size:
+        target = pos + chunk_bytes
+        # Quote parity at the target tells us whether we landed inside a quoted field.
+        if _count_quotes(mm, pos, target) % 2:
+            in_quotes = not in_quotes
+        pos = _next_boundary(mm, target, in_quotes)
+        in_quotes = False
+        if pos >= size:
+            break
+        bounds.append(pos)
+    bounds.append(size)
+    return bounds
+
+
+def plan_chunks(
+    src: Path, out: Path, chunk_bytes: int = 0, shards: int = 0
+) -> ChunkPlan:
+    """Split ``src`` into record-aligned chunks; ``shards`` overrides ``chunk_bytes``."""
+    with open(src, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return ChunkPlan(src, out, (), (), shards > 0)
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header_end = _next_boundary(mm, 0, False)
+            header_text = mm[:header_end].decode("utf-8-sig")
+            header = tuple(next(csv.reader(io.StringIO(header_text, newline="")), []))
+            data_bytes = len(mm) - header_end
+            if shards > 0:
+                chunk_bytes = -(-data_bytes // shards)
+            bounds = find_boundaries(mm, header_end, max(chunk_bytes, 1))
+    chunks = tuple(
+        Chunk(i + 1, start, end)
+        for i, (start, end) in enumerate(zip(bounds, bounds[1:]))
+        if end > start
+    )
+    return ChunkPlan(src, out, header, chunks, shards > 0)
+
+
+def project_chunk(
+    src: str,
+    start: int,
+    end: int,
+    indices: Sequence[int],
+    part: str,
+    header: Sequence[str],
+    load: Optional[LoadTarget] = None,
+) -> int:
+    """Project one byte range of ``src`` into ``part`` (header first when given).
+
+    With ``load`` the rows are also COPYed into the raw table; ``part`` may then be "".
+    """
+    from prep import project_rows, write_rows
+
+    with open(src, "rb") as fh:
+        reader = csv.reader(open_range(fh, start, end))
+        return write_rows(project_rows(reader, indices), Path(part) if part else None, header, load)
+
+
+def clear_outputs(out: Path) -> None:
+    """Remove a previous single-file output and any numbered shards of ``out``."""
+    for stale in [out] + existing_shards(out):
+        if stale.exists():
+            stale.unlink()
+
+
+def assemble(plan: ChunkPlan, columns: Sequence[str]) -> List[Path]:
+    """Stitch part files into ``plan.out`` in chunk order; returns the written paths."""
+    if plan.sharded:
+        return [plan.part_path(c) for c in plan.chunks]
+    with open(plan.out, "w", newline="", encoding="utf-8") as g:
+        csv.writer(g).writerow(columns)
+    with open(plan.out, "ab") as g:
+        for chunk in plan.chunks:
+            part = plan.part_path(chunk)
+            with open(part, "rb") as p:
+                shutil.copyfileobj(p, g, 1024 * 1024)
+            part.unlink()
+    return [plan.out]
@@ -1,41 +1,89 @@
 #!/usr/bin/env python3
-"""Generate note_sku_va_map_prepped.csv from the Level-1 reference export."""
+"""Generate note_sku_va_map_prepped.csv from the Level-1 reference export.
+
+The export is read in one forward pass: rows are skipped until the "SKU ID"
+header, the SKU/VA block beneath it is collected, and reading stops at the
+first row that ends the block, so memory is bounded by the mapping rather than
+the file. Sources may be gzipped (.csv.gz).
+
+--history DIR|GLOB merges one reference export per period
+(level1_reference_YYYY-MM.csv[.gz]) into a single deduplicated mapping with
+valid_from (first day of the first period a pair appears in) and valid_to
+(last day of the last period it appears in; blank while it is still in the
+newest export). Exports are scanned in parallel, and each one's pairs are
+cached next to the output by size and mtime, so a rerun only reads new or
+changed periods.
+"""
 from __future__ import annotations
 
 import argparse
+import calendar
 import csv
+import gzip
+import json
 import os
+import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Iterable, List
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+HEADER = ["note_id", "sku_id", "va_number"]
+HISTORY_HEADER = HEADER + ["valid_from", "valid_to"]
+PERIOD_RE = re.compile(r"(?<!\d)(\d{4})[-_](\d{2})(?!\d)")
+
+Pair = Tuple[str, str]
 
 
-def parse_args() -> argparse.Namespace:
-    parser = argparse.ArgumentParser(description=__doc__)
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument(
         "--source",
         default="data/inc_data/level1_reference.csv",
-        help="Path to the Level-1 reference CSV.",
+        help="Path to the Level-1 reference CSV (.csv or .csv.gz).",
+    )
+    parser.add_argument(
+        "--history",
+        metavar="DIR_OR_GLOB",
+        help="Merge every level1_reference_YYYY-MM.csv[.gz] in DIR (or matching GLOB) into one "
+        "mapping with valid_from/valid_to instead of reading --source.",
     )
     parser.add_argument(
         "--output",
         default="data/inc_data/note_sku_va_map_prepped.csv",
         help="Path to write the SKU<->VA mapping CSV.",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=int(os.getenv("PREP_JOBS", "0")) or os.cpu_count() or 1,
+        help="Reference exports scanned in parallel with --history (default: $PREP_JOBS or CPU count).",
+    )
     parser.add_argument(
         "--quiet",
         action="store_true",
         help="Suppress informational messages about fallback source detection.",
     )
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
 
-def read_rows(path: Path) -> List[List[str]]:
+def open_text(path: Path) -> IO[str]:
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", newline="", encoding="utf-8-sig")
+    return path.open(newline="", encoding="utf-8-sig")
+
+
+def iter_rows(path: Path) -> Iterator[List[str]]:
     try:
-        with path.open(newline="", encoding="utf-8-sig") as handle:
-            return [row for row in csv.reader(handle)]
+        handle = open_text(path)
     except FileNotFoundError as exc:
         raise SystemExit(f"Source file not found: {path}") from exc
+    with handle:
+        yield from csv.reader(handle)
+
+
+def read_rows(path: Path) -> List[List[str]]:
+    return list(iter_rows(path))
 
 
 def resolve_source(explicit: Path, out_dir: Path, quiet: bool) -> Path:
@@ -63,20 +111,22 @@ def resolve_source(explicit: Path, out_dir: Path, quiet: bool) -> Path:
                 print(f"Source {explicit} not found; using {candidate}")
             return candidate
 
-    # Fall back to other Formula & Output CSVs in the directory.
-    formula_files = [
-        p.resolve(strict=False)
-        for p in out_dir.glob("*.csv")
-        if "formula" in p.name.lower() and "output" in p.name.lower()
-    ]
-    if formula_files:
-        # Prefer ones that look like Level 1 (contain '1' or 'level1').
-        def score(path: Path) -> tuple[int, str]:
-            name = path.name.lower()
-            has_level1 = int("level1" in name or "(1" in name or "_1" in name)
-            return (has_level1, name)
-
-        chosen = sorted(formula_files, key=score, reverse=True)[0]
+    # Fall back to other Formula & Output CSVs in the directory, preferring ones
+    # that look like Level 1 (contain '1' or 'level1').
+    def score(name: str) -> Tuple[int, str]:
+        has_level1 = int("level1" in name or "(1" in name or "_1" in name)
+        return (has_level1, name)
+
+    best: Optional[Tuple[Tuple[int, str], str]] = None
+    if out_dir.is_dir():
+        with os.scandir(out_dir) as entries:
+            for entry in entries:
+                name = entry.name.lower()
+                if name.endswith(".csv") and "formula" in name and "output" in name:
+                    if best is None or score(name) > best[0]:
+                        best = (score(name), entry.path)
+    if best is not None:
+        chosen = Path(best[1]).resolve(strict=False)
         if not quiet:
             print(f"Source {explicit} not found; using {chosen}")
         return chosen
@@ -86,22 +136,26 @@ def resolve_source(explicit: Path, out_dir: Path, quiet: bool) -> Path:
     )
 
 
+def is_header(row: List[str]) -> bool:
+    if not row:
+        return False
+    if row[0].strip().lower() == "sku id":
+        return True
+    # fallback: rows like "[category name], SKU ID"
+    return len(row) > 1 and row[1].strip().lower() == "sku id"
+
+
 def find_header_index(rows: Iterable[List[str]]) -> int:
     for idx, row in enumerate(rows):
-        if not row:
-            continue
-        first = row[0].strip().lower()
-        if first == "sku id":
-            return idx
-        # fallback: rows like "[category name], SKU ID"
-        if len(row) > 1 and row[1].strip().lower() == "sku id":
+        if is_header(row):
             return idx
     raise SystemExit("Could not locate 'SKU ID' header in reference export.")
 
 
-def extract_pairs(rows: List[List[str]], start_idx: int) -> List[tuple[str, str]]:
-    pairs: list[tuple[str, str]] = []
-    for row in rows[start_idx + 1 :]:
+def take_pairs(rows: Iterable[List[str]]) -> List[Pair]:
+    """SKU/VA pairs from the rows right below the header, up to the end of the block."""
+    pairs: List[Pair] = []
+    for row in rows:
         if len(row) < 2:
             break
         sku = row[0].strip() or row[1].strip()
@@ -119,32 +173,176 @@ def extract_pairs(rows: List[List[str]], start_idx: int) -> List[tuple[str, str]
     return pairs
 
 
-def write_output(path: Path, pairs: List[tuple[str, str]]) -> None:
+def extract_pairs(rows: List[List[str]], start_idx: int) -> List[Pair]:
+    return take_pairs(rows[start_idx + 1 :])
+
+
+def scan_pairs(rows: Iterable[List[str]]) -> List[Pair]:
+    """Find the header and take the pairs beneath it in one pass over ``rows``."""
+    it = iter(rows)
+    for row in it:
+        if is_header(row):
+            return take_pairs(it)
+    raise SystemExit("Could not locate 'SKU ID' header in reference export.")
+
+
+def read_pairs(path: Path) -> List[Pair]:
+    rows = iter_rows(path)
+    try:
+        return scan_pairs(rows)
+    finally:
+        rows.close()
+
+
+def write_output(path: Path, pairs: Iterable[Pair]) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
     with path.open("w", newline="", encoding="utf-8") as handle:
         writer = csv.writer(handle)
-        writer.writerow(["note_id", "sku_id", "va_number"])
+        writer.writerow(HEADER)
         # note_id left blank until provided in future exports.
         for sku, va in pairs:
             writer.writerow(["", sku, va])
 
 
-def main() -> None:
-    args = parse_args()
-    env_quiet = os.getenv("QUIET", "1") != "0"
-    quiet = args.quiet or env_quiet
-    output_path = Path(args.output)
+def build_mapping(source: Path, output_path: Path, quiet: bool = True) -> int:
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    source_path = resolve_source(Path(args.source), output_path.parent, quiet)
-
-    rows = read_rows(source_path)
-    header_idx = find_header_index(rows)
-    pairs = extract_pairs(rows, header_idx)
+    source_path = resolve_source(source, output_path.parent, quiet)
+    pairs = read_pairs(source_path)
 
     write_output(output_path, pairs)
+    return len(pairs)
+
+
+# ── history ──────────────────────────────────────────────────────────────────
+
+
+def reference_period(path: Path) -> Optional[str]:
+    """'YYYY-MM' from a name like level1_reference_2025-09.csv.gz, else None."""
+    match = PERIOD_RE.search(path.name)
+    if not match or not 1 <= int(match.group(2)) <= 12:
+        return None
+    return f"{match.group(1)}-{match.group(2)}"
+
+
+def history_sources(spec: str) -> List[Path]:
+    """Reference exports with a period in their name, in DIR or matching GLOB."""
+    root = Path(spec)
+    if root.is_dir():
+        candidates = root.glob("level1_reference*")
+    else:
+        candidates = root.parent.glob(root.name)
+    sources = [
+        p
+        for p in candidates
+        if p.is_file() and p.name.lower().endswith((".csv", ".csv.gz")) and reference_period(p)
+    ]
+    if not sources:
+        raise SystemExit(f"No level1_reference_YYYY-MM.csv[.gz] exports found for {spec}")
+    return sources
+
+
+def _scan_task(path: str) -> List[Pair]:
+    return read_pairs(Path(path))
+
+
+def merge_history(periods: Dict[str, Sequence[Pair]]) -> List[List[str]]:
+    """One row per SKU/VA pair: first period seen .. last period seen (open if in the newest)."""
+    newest = max(periods)
+    first: Dict[Pair, str] = {}
+    last: Dict[Pair, str] = {}
+    for period in sorted(periods):
+        for pair in periods[period]:
+            first.setdefault(pair, period)
+            last[pair] = period
+
+    rows = []
+    for pair in sorted(first):
+        start, end = first[pair], last[pair]
+        year, month = int(end[:4]), int(end[5:])
+        valid_to = "" if end == newest else f"{end}-{calendar.monthrange(year, month)[1]:02d}"
+        rows.append(["", pair[0], pair[1], f"{start}-01", valid_to])
+    return rows
+
+
+def cache_path(output_path: Path) -> Path:
+    return output_path.with_name(output_path.name + ".sources.json")
+
+
+def build_history(
+    sources: Sequence[Path], output_path: Path, jobs: int = 1, quiet: bool = True
+) -> int:
+    """Write the merged mapping of ``sources``; returns the number of rows written."""
+    by_period: Dict[str, Path] = {}
+    for path in sources:
+        period = reference_period(path)
+        if period is None:
+            raise SystemExit(f"Cannot tell the period of {path.name}; expected a YYYY-MM in its name.")
+        if period in by_period:
+            raise SystemExit(f"Two reference exports for {period}: {by_period[period].name}, {path.name}")
+        by_period[period] = path
+
+    cache_file = cache_path(output_path)
+    try:
+        cached = json.loads(cache_file.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        cached = {}
+
+    entries: Dict[str, dict] = {}
+    stale: List[str] = []
+    for period, path in by_period.items():
+        st = path.stat()
+        key = str(path.resolve())
+        entry = cached.get(key)
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            entries[key] = entry
+        else:
+            entries[key] = {"period": period, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+            stale.append(key)
+
+    if stale:
+        workers = max(1, min(jobs, len(stale)))
+        if workers == 1:
+            scanned = [_scan_task(key) for key in stale]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                scanned = list(pool.map(_scan_task, stale))
+        for key, pairs in zip(stale, scanned):
+            entries[key]["pairs"] = [list(pair) for pair in pairs]
+    if not quiet:
+        print(f"Scanned {len(stale)} of {len(entries)} reference export(s); the rest were cached")
+
+    rows = merge_history({e["period"]: [tuple(p) for p in e["pairs"]] for e in entries.values()})
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(HISTORY_HEADER)
+        writer.writerows(rows)
+    cache_file.write_text(json.dumps(entries), encoding="utf-8")
+    return len(rows)
+
+
+def mapping_columns(path: Path) -> str:
+    """Column list for COPYing a mapping CSV into the loader's staging table."""
+    with open_text(path) as handle:
+        header = next(csv.reader(handle), [])
+    if header not in (HEADER, HISTORY_HEADER):
+        raise SystemExit(f"{path}: unexpected mapping header {header}")
+    return ", ".join(header)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    env_quiet = os.getenv("QUIET", "1") != "0"
+    quiet = args.quiet or env_quiet
+    output_path = Path(args.output)
+
+    if args.history:
+        count = build_history(history_sources(args.history), output_path, args.jobs, quiet)
+    else:
+        count = build_mapping(Path(args.source), output_path, quiet)
     if not quiet:
-        print(f"Wrote {len(pairs)} SKU<->VA mappings to {output_path}")
+        print(f"Wrote {count} SKU<->VA mappings to {output_path}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,863 @@
+#!/usr/bin/env python3
+"""Level 1 / 2a / 2b computed from prepped CSVs in-process, without Postgres.
+
+Reads what prep.py writes (per feed <feed>_batch_prepped.csv when present,
+else <feed>_prepped.csv or its numbered shards) and
+note_sku_va_map_prepped.csv, and reproduces what the mapping load and the
+refresh build in the database:
+
+  * amounts and dates parsed like raw.parse_numeric / raw.parse_date_utc,
+    VA numbers like ref.normalize_va, remarks like core.normalize_remark;
+  * ref.merchant / ref.sku from the extracts and the mapping
+    (scripts/sql-utils/upsert_*.sql, load_note_sku_va_map.sql);
+  * remarks categorized once per distinct remark against the rules seeded by
+    the bootstrap SQL (INSERTs into ref.remarks_category_map), plus --rules:
+    the best exact rule, unless a regex rule of lower priority matches;
+  * inflow/outflow rows per mapped VA and inter-SKU transfers
+    (core.v_va_txn_flows_calc / v_inter_sku_transfers_calc);
+  * mart.mv_sku_va_facts / mv_sku_facts and the report columns of
+    mart.v_level1 / v_level2a / v_level2b (mart.level1 / level2a / level2b
+    with --from/--to), pulled amounts on the first SKU of a VA and sales
+    proceeds on the first VA of a SKU.
+
+Each feed is read column-wise and aggregated with hash group-bys keyed by
+SKU/VA/merchant; amounts stay Decimal, so totals are exactly what numeric
+gives. Merchants are keyed by their ref.merchant name. Reports go to
+<out>/<level>.csv in the reference exports' headers. With --check (or
+--level1/--level2a/--level2b CSV) each one is merge-compared like parity.py
+against its reference export or an export.py CSV of the SQL report, with
+the diffs in <out>/<level>.diff.jsonl.
+
+Exit status: 0 ok, 1 a check found differences, 2 inputs missing or the
+mapping cannot be resolved.
+
+Usage:
+  recon_offline.py [LEVEL ...] [--data DIR] [--map CSV] [--rules CSV]
+                   [--from YYYY-MM [--to YYYY-MM]] [--out DIR]
+                   [--check] [--level1 CSV] [--level2a CSV] [--level2b CSV]
+                   [--tolerance 0.01]
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import re
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from functools import lru_cache
+from operator import itemgetter
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import parity
+from etl import bootstrap_files
+from prep import FEEDS, FeedSpec
+
+MAP_FILE = "note_sku_va_map_prepped.csv"
+ZERO = Decimal(0)
+PLATFORM_FEE_RATE = Decimal("0.10")
+NUMERIC_RE = re.compile(r"^-?([0-9]+\.?[0-9]*|\.[0-9]+)$")
+NON_NUMERIC_RE = re.compile(r"[^0-9.-]")
+# raw.parse_date_utc's formats in its fallback order, separators folded to '/'.
+DATE_FORMATS = ("%m/%d/%Y", "%Y/%m/%d", "%d/%m/%Y")
+RULE_INSERT_RE = re.compile(
+    r"insert\s+into\s+(?:ref\.)?remarks_category_map\s*\(([^)]*)\)\s*values(.*?)(?:on\s+conflict|;)",
+    re.IGNORECASE | re.DOTALL,
+)
+RULE_VALUES_RE = re.compile(
+    r"\(\s*'((?:[^']|'')*)'\s*,\s*'((?:[^']|'')*)'\s*,\s*(true|false)\s*,\s*(-?\d+)\s*\)",
+    re.IGNORECASE,
+)
+
+Value = Optional[Decimal]
+Facts = Dict[str, object]
+
+
+class ReconError(Exception):
+    """Raised when the inputs cannot be read or resolved like the database would."""
+
+
+# ── parsing ──────────────────────────────────────────────────────────────────
+
+
+@lru_cache(maxsize=1 << 16)
+def parse_numeric(text: str) -> Value:
+    """raw.parse_numeric: strip everything but digits, '.' and '-', then cast."""
+    cleaned = NON_NUMERIC_RE.sub("", text)
+    return Decimal(cleaned) if NUMERIC_RE.match(cleaned) else None
+
+
+@lru_cache(maxsize=1 << 16)
+def parse_period(text: str) -> Optional[str]:
+    """'YYYY-MM' of a raw.parse_date_utc date, None if it does not parse."""
+    value = text.strip()
+    if not value:
+        return None
+    value = re.sub(r"[-.]", "/", re.sub(r"\s.*$", "", value))
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime("%Y-%m")
+        except ValueError:
+            continue
+    return None
+
+
+def normalize_va(text: str) -> Optional[str]:
+    return text.strip(" ") or None
+
+
+def normalize_remark(text: str) -> str:
+    return text.strip(" ").lower()
+
+
+def _sub(a: Value, b: Value) -> Value:
+    return None if a is None or b is None else a - b
+
+
+def _fmt(value: object) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, Decimal) and value.is_zero():
+        value = value.copy_abs()
+    return str(value)
+
+
+# ── remark rules ─────────────────────────────────────────────────────────────
+
+
+@dataclass(frozen=True)
+class Rule:
+    pattern: str
+    category: str
+    is_regex: bool
+    priority: int
+
+
+def seed_rules(paths: Optional[Sequence[Path]] = None) -> List[Rule]:
+    """The ref.remarks_category_map rows the bootstrap files insert, in order;
+    a repeated (pattern, category) keeps its first row like ON CONFLICT DO NOTHING."""
+    rules: Dict[Tuple[str, str], Rule] = {}
+    for path in bootstrap_files() if paths is None else paths:
+        if not path.is_file():
+            continue
+        for columns, values in RULE_INSERT_RE.findall(path.read_text(encoding="utf-8")):
+            names = [c.strip().lower() for c in columns.split(",")]
+            if names != ["raw_pattern", "category_code", "is_regex", "priority"]:
+                continue
+            for pattern, category, is_regex, priority in RULE_VALUES_RE.findall(values):
+                rule = Rule(pattern.replace("''", "'"), category.replace("''", "'"),
+                            is_regex.lower() == "true", int(priority))
+                rules.setdefault((rule.pattern, rule.category), rule)
+    return list(rules.values())
+
+
+def read_rules(path: Path) -> List[Rule]:
+    """Rules from a CSV with raw_pattern, category_code[, is_regex, priority] columns."""
+    with path.open(newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        missing = {"raw_pattern", "category_code"} - set(reader.fieldnames or ())
+        if missing:
+            raise ReconError(f"{path}: missing column(s) {', '.join(sorted(missing))}")
+        return [
+            Rule(row["raw_pattern"], row["category_code"].strip(),
+                 (row.get("is_regex") or "").strip().lower() in ("t", "true", "1", "yes"),
+                 int((row.get("priority") or "").strip() or 100))
+            for row in reader if row["raw_pattern"]
+        ]
+
+
+class Categorizer:
+    """core.categorize_remarks over a rule list, cached per normalized remark."""
+
+    def __init__(self, rules: Sequence[Rule]) -> None:
+        self.exact: Dict[str, Tuple[int, str]] = {}
+        for rule in rules:
+            if not rule.is_regex:
+                key = rule.pattern.lower()
+                if key not in self.exact or rule.priority < self.exact[key][0]:
+                    self.exact[key] = (rule.priority, rule.category)
+        self.regex = sorted(
+            ((r.priority, re.compile(r.pattern, re.IGNORECASE), r.category) for r in rules if r.is_regex),
+            key=itemgetter(0),
+        )
+        self.cache: Dict[str, str] = {}
+
+    def __call__(self, remarks: str) -> str:
+        found = self.cache.get(remarks)
+        if found is None:
+            priority, found = self.exact.get(remarks, (None, "uncategorized"))
+            for rx_priority, pattern, category in self.regex:
+                if priority is not None and rx_priority >= priority:
+                    break
+                if pattern.search(remarks):
+                    found = category
+                    break
+            self.cache[remarks] = found
+        return found
+
+
+# ── inputs ───────────────────────────────────────────────────────────────────
+
+
+def prepped_files(spec: FeedSpec, data_dir: Path) -> List[Path]:
+    """The feed's combined batch file, else its *_prepped.csv or numbered shards."""
+    batch = data_dir / f"{spec.name}_batch_prepped.csv"
+    if batch.is_file():
+        return [batch]
+    single = data_dir / spec.output_name
+    if single.is_file():
+        return [single]
+    return sorted(data_dir.glob(f"{single.stem}.[0-9][0-9][0-9][0-9].csv"))
+
+
+def read_columns(paths: Sequence[Path], columns: Sequence[str]) -> Dict[str, List[str]]:
+    """``columns`` of every file, by header name, as one list per column."""
+    out: Dict[str, List[str]] = {c: [] for c in columns}
+    for path in paths:
+        with path.open(newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            header = [h.strip() for h in next(reader, [])]
+            missing = [c for c in columns if c not in header]
+            if missing:
+                raise ReconError(f"{path}: missing column(s) {', '.join(missing)}")
+            picked = itemgetter(*(header.index(c) for c in columns))
+            try:
+                for name, values in zip(columns, zip(*map(picked, reader))):
+                    out[name].extend(values)
+            except IndexError:
+                raise ReconError(f"{path}: short row near line {reader.line_num}") from None
+    return out
+
+
+def read_feed(spec: FeedSpec, data_dir: Path, columns: Sequence[str]) -> Dict[str, List[str]]:
+    paths = prepped_files(spec, data_dir)
+    if not paths:
+        raise ReconError(f"No {spec.output_name} (or {spec.name}_batch_prepped.csv) in {data_dir} (make prep-all)")
+    return read_columns(paths, columns)
+
+
+def numbers(values: Sequence[str]) -> List[Value]:
+    return [parse_numeric(v) for v in values]
+
+
+def trimmed(values: Sequence[str]) -> List[str]:
+    return [v.strip(" ") for v in values]
+
+
+# ── reference data ───────────────────────────────────────────────────────────
+
+
+@dataclass(frozen=True)
+class Mapping:
+    note_id: Optional[str]
+    sku_id: str
+    va_number: str
+
+
+@dataclass
+class Refs:
+    """ref.sku as SKU -> merchant name, and ref.note_sku_va_map rows."""
+
+    sku_merchant: Dict[str, str]
+    mappings: List[Mapping]
+    by_va: Dict[str, List[Tuple[str, str]]] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        for m in self.mappings:
+            self.by_va.setdefault(m.va_number, []).append((m.sku_id, self.sku_merchant[m.sku_id]))
+
+
+def build_refs(
+    sales: Dict[str, List[str]], skus: Dict[str, List[str]], map_rows: Dict[str, List[str]]
+) -> Refs:
+    """What upsert_merchants_from_sales, upsert_skus_from_sales and
+    load_note_sku_va_map build, for a database holding only these inputs."""
+    merchants: Dict[str, str] = {}
+    for name in sorted(set(trimmed(sales["merchant"]))):
+        if name:
+            merchants.setdefault(name.lower(), name)
+
+    sku_merchant: Dict[str, str] = {}
+    for sku, name in sorted(set(zip(trimmed(sales["sku_id"]), trimmed(sales["merchant"])))):
+        if sku and name.lower() in merchants:
+            sku_merchant.setdefault(sku, merchants[name.lower()])
+
+    source: Dict[str, set] = {}
+    for feed in (sales, skus):
+        for sku, name in zip(trimmed(feed["sku_id"]), trimmed(feed["merchant"])):
+            if sku and name:
+                source.setdefault(sku, set()).add(merchants.get(name.lower()))
+
+    mappings: Dict[Tuple[str, str, str], Mapping] = {}
+    unresolved, ambiguous = set(), set()
+    for note, sku, va in zip(map_rows["note_id"], trimmed(map_rows["sku_id"]), map_rows["va_number"]):
+        va = normalize_va(va)
+        if not sku or va is None:
+            continue
+        found = source.get(sku, {None})
+        if None in found:
+            unresolved.add(sku)
+        elif len(found) > 1:
+            ambiguous.add(sku)
+        else:
+            sku_merchant[sku] = next(iter(found))
+        note = note.strip() or None
+        mappings[(note or "", va, sku)] = Mapping(note, sku, va)
+    if unresolved:
+        raise ReconError("Missing merchant mapping for SKU(s) in the mapping: " + ", ".join(sorted(unresolved)[:10]))
+    if ambiguous:
+        raise ReconError("More than one merchant for SKU(s) in the mapping: " + ", ".join(sorted(ambiguous)[:10]))
+    return Refs(sku_merchant, list(mappings.values()))
+
+
+# ── report columns ───────────────────────────────────────────────────────────
+
+# (key, header stem) of the paid/expected pairs of mart.mv_sku_facts, in v_level2a order.
+PARTS = (
+    ("management_fee", "Management Fee"),
+    ("admin_fee", "Administrative Fee"),
+    ("additional_admin_fee", "Additional Administrative Fee"),
+    ("interest_difference", "Interest Difference"),
+    ("sr_principal", "Senior Principal"),
+    ("sr_interest", "Senior Interest"),
+    ("sr_add_interest", "Senior Additional Interest"),
+    ("jr_principal", "Junior Principal"),
+    ("jr_interest", "Junior Interest"),
+    ("jr_add_interest", "Junior Additional Interest"),
+    ("spar", "SPAR"),
+)
+# Outflow category -> paid column (core.v_flows_pivot).
+PAID_CATEGORIES = {
+    "mgmt_fee": "management_fee",
+    "admin_fee": "admin_fee",
+    "fh_add_admin_fee": "additional_admin_fee",
+    "int_diff": "interest_difference",
+    "sr_prin": "sr_principal",
+    "sr_int": "sr_interest",
+    "senior_add_investor_interest": "sr_add_interest",
+    "jr_prin": "jr_principal",
+    "jr_int": "jr_interest",
+    "junior_add_investor_interest": "jr_add_interest",
+    "spar": "spar",
+}
+PIVOT_COLUMNS = ("amount_received",) + tuple(f"{key}_paid" for key, _ in PARTS)
+# raw.repmt_sku column -> expected part.
+EXPECTED_COLUMNS = {
+    "acquirer_fees_expected": "management_fee",
+    "fh_admin_fees_expected": "admin_fee",
+    "int_difference_expected": "interest_difference",
+    "sr_principal_expected": "sr_principal",
+    "sr_interest_expected": "sr_interest",
+    "jr_principal_expected": "jr_principal",
+    "jr_interest_expected": "jr_interest",
+    "spar_merchant": "spar",
+}
+# raw.repmt_sku column -> UI paid part.
+UI_COLUMNS = {
+    "acquirer_fees_paid": "management_fee",
+    "fh_admin_fees_paid": "admin_fee",
+    "int_difference_paid": "interest_difference",
+    "sr_principal_paid": "sr_principal",
+    "sr_interest_paid": "sr_interest",
+    "jr_principal_paid": "jr_principal",
+    "jr_interest_paid": "jr_interest",
+    "spar_merchant": "spar",
+    "additional_interests_paid_to_fh": "fh_platform",
+}
+FLAGGED = (
+    ("Mgmt Fee", "management_fee"),
+    ("Admin Fee", "admin_fee"),
+    ("Int Diff", "interest_difference"),
+    ("Sr Principal", "sr_principal"),
+    ("Sr Interest", "sr_interest"),
+    ("Jr Principal", "jr_principal"),
+    ("Jr Interest", "jr_interest"),
+)
+# (CF header, comparison header, part) of v_level2b.
+LEVEL2B_PARTS = (
+    ("Management Fee Paid", "Management Fee Paid", "management_fee"),
+    ("Adminstrative Fee Paid", "Administrative Fee Paid", "admin_fee"),
+    ("Interest Difference Paid", "Interest Difference Paid", "interest_difference"),
+    ("Senior Principal Paid", "Senior Principal Paid", "sr_principal"),
+    ("Senior Interest Paid", "Senior Interest Paid", "sr_interest"),
+    ("Junior Principal Paid", "Junior Principal Paid", "jr_principal"),
+    ("Junior Interest Paid", "Junior Interest Paid", "jr_interest"),
+    ("SPAR", "SPAR", "spar"),
+)
+
+Column = Tuple[str, Callable[[Facts], object]]
+
+
+def _get(key: str) -> Callable[[Facts], object]:
+    return lambda f: f.get(key)
+
+
+def _yes(condition: bool) -> str:
+    return "Yes" if condition else "No"
+
+
+def _gt(a: Value, b: Value) -> bool:
+    return a is not None and b is not None and a > b
+
+
+def _distributed(f: Facts) -> Value:
+    paid = [f[f"{key}_paid"] for key, _ in PARTS]
+    return None if any(v is None for v in paid) else sum(paid, ZERO)
+
+
+def _variance(f: Facts) -> Value:
+    received, distributed = f["amount_received"], _distributed(f)
+    if received is None or distributed is None:
+        return None
+    return received + f["transfer_in"] - distributed - f["transfer_out"]
+
+
+def _settled(f: Facts, key: str) -> bool:
+    outstanding = _sub(f[f"{key}_expected"], f[f"{key}_paid"])
+    return outstanding is not None and outstanding <= 0
+
+
+def _level2a_columns() -> List[Column]:
+    cols: List[Column] = [
+        ("SKU ID", _get("sku_id")),
+        ("Merchant", _get("merchant_name")),
+        ("Amount Received", _get("amount_received")),
+        ("Amount Distributed Down the Repayment Waterfall", _distributed),
+        ("Fund Transferred to Other SKU", _get("transfer_out")),
+        ("Variance", _variance),
+    ]
+    cols += [(f"{label} Paid > Expected?",
+              lambda f, k=key: _yes(_gt(f[f"{k}_paid"], f[f"{k}_expected"]))) for label, key in FLAGGED]
+    cols += [(f"{label} Settled?", lambda f, k=key: _yes(_settled(f, k))) for label, key in FLAGGED]
+    cols += [
+        ("Sales Proceeds", _get("sales_proceeds")),
+        ("Merchant Top Up", _get("merchant_top_up")),
+        ("Disbursement Surplus", _get("disbursement_surplus")),
+        ("Fund Transferred from Other SKU", _get("transfer_in")),
+        ("Other", lambda f: _sub(_sub(_sub(f["amount_received"], f["sales_proceeds"]),
+                                      f["merchant_top_up"]), f["disbursement_surplus"])),
+    ]
+    cols += [(f"{stem} Paid", _get(f"{key}_paid")) for key, stem in PARTS]
+    cols += [(f"{stem} Expected", _get(f"{key}_expected")) for key, stem in PARTS]
+    cols += [(f"{stem} Outstanding", lambda f, k=key: _sub(f[f"{k}_expected"], f[f"{k}_paid"]))
+             for key, stem in PARTS]
+    return cols
+
+
+def _cf(f: Facts, key: str) -> Decimal:
+    value = f.get(key)
+    return ZERO if value is None else value
+
+
+def _platform_calc(f: Facts) -> Decimal:
+    return (_cf(f, "sr_interest_paid") + _cf(f, "jr_interest_paid")) * PLATFORM_FEE_RATE
+
+
+def _level2b_columns() -> List[Column]:
+    cols: List[Column] = [
+        ("SKU ID", _get("sku_id")),
+        ("Merchant", _get("merchant_name")),
+        ("Total Fund Inflow", lambda f: _cf(f, "amount_received")),
+    ]
+    cols += [(head, lambda f, k=key: _cf(f, f"{k}_paid")) for head, _, key in LEVEL2B_PARTS]
+    cols += [("FH Platform Fee", _platform_calc)]
+    cols += [("Total Fund Inflow Variance",
+              lambda f: _cf(f, "total_funds_inflow_ui") - _cf(f, "amount_received"))]
+    cols += [(f"{label} Variance", lambda f, k=key: _cf(f, f"{k}_ui") - _cf(f, f"{k}_paid"))
+             for _, label, key in LEVEL2B_PARTS]
+    cols += [("FH Platform Fee Variance", lambda f: _cf(f, "fh_platform_ui") - _platform_calc(f))]
+    for _, label, key in LEVEL2B_PARTS:
+        cols += [(f"{label} (UI)", lambda f, k=key: _cf(f, f"{k}_ui")),
+                 (f"{label} (CF)", lambda f, k=key: _cf(f, f"{k}_paid"))]
+    cols += [
+        ("FH Platform Fee (UI)", lambda f: _cf(f, "fh_platform_ui")),
+        ("FH Platform Fee (Calc.)", _platform_calc),
+        ("Total Fund Inflow (UI)", lambda f: _cf(f, "total_funds_inflow_ui")),
+        ("Amount Received (CF)", lambda f: _cf(f, "amount_received")),
+    ]
+    return cols
+
+
+LEVEL1_COLUMNS: List[Column] = [
+    ("SKU ID", _get("sku_id")),
+    ("Account Number", _get("account_number")),
+    ("Merchant", _get("merchant_name")),
+    ("Amount Pulled", _get("amount_pulled")),
+    ("Amount Received", _get("amount_received")),
+    ("Variance Pulled vs Received", lambda f: f["amount_pulled"] - f["amount_received"]),
+    ("Sales Proceeds", _get("sales_proceeds")),
+    ("Variance Received vs Sales", lambda f: f["sales_proceeds"] - f["amount_received"]),
+]
+COLUMNS: Dict[str, List[Column]] = {
+    "level1": LEVEL1_COLUMNS,
+    "level2a": _level2a_columns(),
+    "level2b": _level2b_columns(),
+}
+
+
+# ── the engine ───────────────────────────────────────────────────────────────
+
+
+@dataclass
+class Window:
+    """Months --from..--to; no bounds = everything, undated rows included."""
+
+    start: Optional[str] = None
+    end: Optional[str] = None
+
+    def __contains__(self, period: Optional[str]) -> bool:
+        if self.start is None:
+            return True
+        return period is not None and self.start <= period <= (self.end or self.start)
+
+
+@dataclass
+class Stats:
+    rows: Dict[str, int] = field(default_factory=dict)
+    flows: int = 0
+    transfers: int = 0
+    uncategorized: Counter = field(default_factory=Counter)
+    seconds: float = 0.0
+
+
+@dataclass
+class Reports:
+    facts: Dict[str, List[Facts]]
+    stats: Stats
+
+    def rows(self, level: str) -> List[List[str]]:
+        return [[_fmt(get(f)) for _, get in COLUMNS[level]] for f in self.facts[level]]
+
+    def header(self, level: str) -> List[str]:
+        return [name for name, _ in COLUMNS[level]]
+
+
+@dataclass
+class PivotGroup:
+    """One (SKU, merchant) of core.v_flows_pivot, built in O(1) per flow. Every
+    column is SUM(CASE WHEN <its flows> THEN amount ELSE 0 END) over the group,
+    so it is NULL only when each flow counted is one of its own with a NULL amount."""
+
+    counted: int = 0
+    sums: Dict[str, Decimal] = field(default_factory=dict)
+    nulls: Counter = field(default_factory=Counter)
+
+    def add(self, column: Optional[str], amount: Value) -> None:
+        self.counted += 1
+        if column is None:
+            return
+        if amount is None:
+            self.nulls[column] += 1
+        else:
+            self.sums[column] = self.sums.get(column, ZERO) + amount
+
+    def totals(self) -> Optional[Dict[str, Value]]:
+        """The pivot row, or None when no flow of the group is in the window."""
+        if not self.counted:
+            return None
+        return {name: None if self.nulls[name] == self.counted else self.sums.get(name, ZERO)
+                for name in PIVOT_COLUMNS}
+
+
+def _flow_facts(
+    txn: Dict[str, List[str]], refs: Refs, categorize: Categorizer, window: Window, stats: Stats
+) -> Tuple[Dict[Tuple[str, str], Decimal], Dict[Tuple[str, str], PivotGroup],
+           Dict[Tuple[str, str], Dict[str, Decimal]]]:
+    """Received per (SKU, VA), the flows pivot per (SKU, merchant) and the
+    transfer totals per (SKU, merchant), in one pass over the transactions."""
+    received: Dict[Tuple[str, str], Decimal] = {}
+    pivot: Dict[Tuple[str, str], PivotGroup] = {}
+    transfers: Dict[Tuple[str, str], Dict[str, Decimal]] = {}
+    by_va = refs.by_va
+    mapped: Dict[str, List[Tuple[str, str]]] = {}  # raw VA text -> its mapping rows
+    remark_category: Dict[str, str] = {}
+
+    for sender, receiver, amount, date, remark in zip(
+        txn["sender_virtual_account_number"], txn["receiver_virtual_account_number"],
+        txn["amount"], txn["date"], txn["remarks"],
+    ):
+        senders = mapped.get(sender)
+        if senders is None:
+            senders = mapped[sender] = by_va.get(normalize_va(sender) or "", [])
+        receivers = mapped.get(receiver)
+        if receivers is None:
+            receivers = mapped[receiver] = by_va.get(normalize_va(receiver) or "", [])
+        if not senders and not receivers:
+            continue
+        category = remark_category.get(remark)
+        if category is None:
+            category = remark_category[remark] = categorize(normalize_remark(remark))
+        if category == "uncategorized":
+            stats.uncategorized[normalize_remark(remark)] += 1
+        value = parse_numeric(amount)
+        counted = parse_period(date) in window
+        stats.flows += len(senders) + len(receivers)
+        if receivers:
+            repayment = category == "merchant_repayment"
+            for sku, merchant in receivers:
+                group = pivot.get((sku, merchant)) or pivot.setdefault((sku, merchant), PivotGroup())
+                if not counted:
+                    continue
+                group.add("amount_received" if repayment else None, value)
+                if repayment and value is not None:
+                    key = (sku, normalize_va(receiver))
+                    received[key] = received.get(key, ZERO) + value
+        if senders:
+            part = PAID_CATEGORIES.get(category)
+            column = f"{part}_paid" if part else None
+            for sku, merchant in senders:
+                group = pivot.get((sku, merchant)) or pivot.setdefault((sku, merchant), PivotGroup())
+                if counted:
+                    group.add(column, value)
+        if senders and receivers and counted:
+            for from_sku, from_merchant in senders:
+                for to_sku, to_merchant in receivers:
+                    if from_sku == to_sku:
+                        continue
+                    stats.transfers += 1
+                    for key, side in (((from_sku, from_merchant), "out"), ((to_sku, to_merchant), "in")):
+                        totals = transfers.setdefault(key, {"out": ZERO, "in": ZERO})
+                        if value is not None:
+                            totals[side] += value
+    return received, pivot, transfers
+
+
+def _sums(groups: Sequence[str], columns: Dict[str, List[Value]]) -> Dict[str, Dict[str, Decimal]]:
+    """COALESCE(SUM(column), 0) per group for each of ``columns``."""
+    out: Dict[str, Dict[str, Decimal]] = {}
+    names = list(columns)
+    for i, group in enumerate(groups):
+        totals = out.get(group)
+        if totals is None:
+            totals = out[group] = dict.fromkeys(names, ZERO)
+        for name in names:
+            value = columns[name][i]
+            if value is not None:
+                totals[name] += value
+    return out
+
+
+def reconcile(
+    data_dir: Path,
+    map_path: Optional[Path] = None,
+    rules: Optional[Sequence[Rule]] = None,
+    window: Optional[Window] = None,
+) -> Reports:
+    """Level 1, 2a and 2b facts from the prepped CSVs in ``data_dir``."""
+    start = time.perf_counter()
+    window = window or Window()
+    stats = Stats()
+    map_path = map_path or data_dir / MAP_FILE
+    if not map_path.is_file():
+        raise ReconError(f"No mapping {map_path} (make prep-map)")
+
+    ext = read_feed(FEEDS["external_accounts"], data_dir,
+                    ("beneficiary_bank_account_number", "buy_amount", "created_date"))
+    txn = read_feed(FEEDS["va_txn"], data_dir, (
+        "sender_virtual_account_number", "receiver_virtual_account_number", "amount", "date", "remarks"))
+    sku_feed = read_feed(FEEDS["repmt_sku"], data_dir, FEEDS["repmt_sku"].columns)
+    sales = read_feed(FEEDS["repmt_sales"], data_dir, ("merchant", "sku_id", "total_funds_inflow", "sales_proceeds"))
+    map_rows = read_columns([map_path], ("note_id", "sku_id", "va_number"))
+    for name, feed in (("external_accounts", ext), ("va_txn", txn), ("repmt_sku", sku_feed),
+                       ("repmt_sales", sales), ("note_sku_va_map", map_rows)):
+        stats.rows[name] = len(next(iter(feed.values())))
+
+    refs = build_refs(sales, sku_feed, map_rows)
+    categorize = Categorizer(seed_rules() if rules is None else rules)
+    received, pivot, transfers = _flow_facts(txn, refs, categorize, window, stats)
+
+    # Pulled per VA (core.mv_external_accounts), in the window.
+    pulled: Dict[str, Decimal] = {}
+    for va, amount, created in zip(ext["beneficiary_bank_account_number"], ext["buy_amount"], ext["created_date"]):
+        value = parse_numeric(amount)
+        if value is not None and parse_period(created) in window:
+            key = normalize_va(va)
+            pulled[key] = pulled.get(key, ZERO) + value
+
+    sales_skus = trimmed(sales["sku_id"])
+    sales_totals = _sums(sales_skus, {"total_funds_inflow_ui": numbers(sales["total_funds_inflow"]),
+                                      "sales_proceeds": numbers(sales["sales_proceeds"])})
+    sku_ids = trimmed(sku_feed["sku_id"])
+    ui = _sums(sku_ids, {f"{part}_ui": numbers(sku_feed[col]) for col, part in UI_COLUMNS.items()})
+    expected_cols = {f"{part}_expected": numbers(sku_feed[col]) for col, part in EXPECTED_COLUMNS.items()}
+    in_ref = [i for i, sku in enumerate(sku_ids) if sku in refs.sku_merchant]
+    expected = _sums([sku_ids[i] for i in in_ref], {k: [v[i] for i in in_ref] for k, v in expected_cols.items()})
+
+    # Level 1: one row per mapping, ranked within its SKU and within its VA.
+    level1: List[Facts] = []
+    first_of_va: Dict[str, Mapping] = {}
+    for m in sorted(refs.mappings, key=lambda m: (m.va_number, m.sku_id, m.note_id or "")):
+        first_of_va.setdefault(m.va_number, m)
+    first_of_sku: Dict[str, Mapping] = {}
+    for m in sorted(refs.mappings, key=lambda m: (m.sku_id, m.va_number, m.note_id or "")):
+        first_of_sku.setdefault(m.sku_id, m)
+        sales_proceeds = sales_totals.get(m.sku_id, {}).get("sales_proceeds", ZERO)
+        level1.append({
+            "sku_id": m.sku_id,
+            "account_number": m.va_number,
+            "merchant_name": refs.sku_merchant[m.sku_id],
+            "amount_pulled": pulled.get(m.va_number, ZERO) if first_of_va[m.va_number] is m else ZERO,
+            "amount_received": received.get((m.sku_id, m.va_number), ZERO),
+            "sales_proceeds": sales_proceeds if first_of_sku[m.sku_id] is m else ZERO,
+        })
+
+    # Level 2: every (SKU, merchant) in the flows, the expectations or ref.sku.
+    expected_keys = {(sku, refs.sku_merchant[sku]) for sku in expected}
+    ref_keys = set(refs.sku_merchant.items())
+    level2a: List[Facts] = []
+    level2b: List[Facts] = []
+    for key in sorted(set(pivot) | expected_keys | ref_keys):
+        sku, merchant = key
+        group = pivot.get(key)
+        paid = group.totals() if group else None
+        facts: Facts = {"sku_id": sku, "merchant_name": merchant}
+        facts.update(paid or dict.fromkeys(PIVOT_COLUMNS))
+        facts.update(
+            {f"{k}_expected": (expected[sku].get(f"{k}_expected", ZERO) if key in expected_keys else None)
+             for k, _ in PARTS}
+        )
+        facts.update(ui.get(sku, {}))
+        facts.update(sales_totals.get(sku, {}))
+        facts.setdefault("sales_proceeds", ZERO)
+        # Placeholders in core.mv_repmt_sales until the extract carries them.
+        facts["merchant_top_up"] = facts["disbursement_surplus"] = ZERO
+        xfer = transfers.get(key, {})
+        facts["transfer_out"] = xfer.get("out", ZERO)
+        facts["transfer_in"] = xfer.get("in", ZERO)
+        if paid is not None or key in expected_keys:
+            level2a.append(facts)
+        if key in ref_keys:
+            level2b.append(facts)
+
+    stats.seconds = time.perf_counter() - start
+    return Reports({"level1": level1, "level2a": level2a, "level2b": level2b}, stats)
+
+
+# ── output ───────────────────────────────────────────────────────────────────
+
+
+def write_report(path: Path, header: Sequence[str], rows: Sequence[Sequence[str]]) -> None:
+    tmp = path.with_name(path.name + ".part")
+    with tmp.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    tmp.replace(path)
+
+
+def _keyed(reports: Reports, level: parity.Level) -> Iterator[parity.Row]:
+    header = reports.header(level.name)
+    rows = (dict(zip(header, cells)) for cells in reports.rows(level.name))
+    keyed = ((tuple(row[k].strip(parity.KEY_TRIM) for k in level.key), row) for row in rows)
+    return iter(sorted(keyed, key=itemgetter(0)))
+
+
+def check(
+    reports: Reports,
+    levels: Sequence[str],
+    references: Dict[str, Optional[str]],
+    out_dir: Path,
+    tolerance: Decimal,
+) -> List[parity.LevelResult]:
+    """Merge-compare each level with its reference export (parity.py's lookup)."""
+    results = []
+    for name in levels:
+        level = parity.LEVELS[name]
+        reference = parity.resolve_reference(level, references.get(name))
+        if reference is None:
+            results.append(parity.LevelResult(name, skipped=True))
+            continue
+        result = parity.LevelResult(name, str(reference))
+        start = time.perf_counter()
+        try:
+            ref_columns, ref_rows = parity.reference_rows(reference, level)
+            parity.diff_level(level, ref_columns, ref_rows, reports.header(name),
+                              _keyed(reports, level), out_dir, result, tolerance)
+        except (OSError, ValueError) as err:
+            result.error = str(err)
+        result.seconds = time.perf_counter() - start
+        results.append(result)
+    return results
+
+
+def print_summary(reports: Reports, levels: Sequence[str], out_dir: Path, top: int) -> None:
+    stats = reports.stats
+    print("read: " + ", ".join(f"{name} {count}" for name, count in stats.rows.items()))
+    print(f"flows: {stats.flows} mapped VA row(s), {stats.transfers} inter-SKU transfer(s)")
+    if stats.uncategorized:
+        total = sum(stats.uncategorized.values())
+        print(f"uncategorized: {total} mapped transaction(s), {len(stats.uncategorized)} distinct remark(s)")
+        for remark, count in stats.uncategorized.most_common(top):
+            print(f"  {count:>8}  {remark!r}")
+    for name in levels:
+        print(f"{name:<8} {len(reports.facts[name]):>8} row(s) -> {out_dir / (name + '.csv')}")
+    print(f"computed in {stats.seconds:.2f}s")
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("levels", nargs="*", metavar="LEVEL",
+                        help=f"Reports to write ({', '.join(COLUMNS)}; default: all).")
+    parser.add_argument("--data", default="data/inc_data",
+                        help="Directory with the *_prepped.csv files (default: data/inc_data).")
+    parser.add_argument("--map", help=f"SKU/VA mapping CSV (default: DATA/{MAP_FILE}).")
+    parser.add_argument("--rules", help="Remark rules CSV (raw_pattern, category_code, is_regex, priority) "
+                        "added to the bootstrap seeds.")
+    parser.add_argument("--from", dest="period_from", metavar="YYYY-MM",
+                        help="First month of flows, transfers and pulls counted (like mart.level1/2a/2b).")
+    parser.add_argument("--to", dest="period_to", metavar="YYYY-MM", help="Last month (default: --from).")
+    parser.add_argument("--out", default="data/recon_offline",
+                        help="Directory for the reports and diffs (default: data/recon_offline).")
+    parser.add_argument("--check", action="store_true",
+                        help="Compare every report with its reference export (parity.py's defaults).")
+    for name in COLUMNS:
+        parser.add_argument(f"--{name}", metavar="CSV",
+                            help=f"Compare {name} with this reference or export.py CSV (implies --check).")
+    parser.add_argument("--tolerance", type=Decimal, default=Decimal(os.getenv("PARITY_TOLERANCE", "0.01")),
+                        help="Largest accepted absolute difference (default: $PARITY_TOLERANCE or 0.01).")
+    parser.add_argument("--top", type=int, default=10, help="Uncategorized remarks to list (default 10).")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.levels if name not in COLUMNS]
+    if unknown:
+        parser.error(f"unknown level(s): {', '.join(unknown)} (choose from {', '.join(COLUMNS)})")
+    for period in (args.period_from, args.period_to):
+        if period and not re.match(r"^\d{4}-\d{2}$", period):
+            parser.error(f"not a YYYY-MM month: {period}")
+    if args.period_to and not args.period_from:
+        parser.error("--to needs --from")
+    return args
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    levels = list(dict.fromkeys(args.levels or COLUMNS))
+    out_dir = Path(args.out)
+    try:
+        rules = seed_rules() + (read_rules(Path(args.rules)) if args.rules else [])
+        reports = reconcile(Path(args.data), Path(args.map) if args.map else None, rules,
+                            Window(args.period_from, args.period_to))
+    except (ReconError, OSError) as err:
+        print(f"ERROR: {err}", file=sys.stderr)
+        return 2
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for name in levels:
+        write_report(out_dir / f"{name}.csv", reports.header(name), reports.rows(name))
+    print_summary(reports, levels, out_dir, args.top)
+
+    references = {name: getattr(args, name) for name in levels}
+    if not (args.check or any(references.values())):
+        return 0
+    compared = levels if args.check else [name for name in levels if references[name]]
+    print()
+    results = check(reports, compared, references, out_dir, args.tolerance)
+    parity.print_report(results, out_dir)
+    return 1 if any(not r.ok and not r.skipped for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
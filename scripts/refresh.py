@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""Refresh the core layer in dependency order, independent steps in parallel sessions.
+
+The dependency graph is read from the catalog (pg_depend through view rewrite
+rules), so a materialized view is refreshed only after every materialized view
+or incrementally maintained table it reads from, looking through plain views.
+Steps whose inputs are ready run concurrently on up to --jobs pooled sessions
+(pg_session.Pool, opened once and reused across waves); MVs with a unique key
+are refreshed CONCURRENTLY (core.refresh_matview), so readers of mart.* never
+wait. Wall clock approaches the longest chain.
+
+Each run is logged to ops.refresh_log (initdb/140_ops_stats.sql) under one
+run id: per step its duration, the live rows it leaves and the shared-buffer
+blocks hit and read on its own relations. --explain then captures EXPLAIN
+(ANALYZE, BUFFERS) of the report views into ops.plan_history;
+scripts/ops_report.py (make ops-report) compares runs.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from pg_copy import PsqlError, literal
+from pg_session import Pool, Session
+
+SCHEMAS = ("core", "mart")
+REPORT_VIEWS = ("mart.v_level1", "mart.v_level2a", "mart.v_level2b")
+OPS_LOG = "ops.refresh_log"
+
+# Tables kept up to date by a function instead of REFRESH MATERIALIZED VIEW.
+# name -> (step name, SQL); several tables may share one step.
+MAINTAINED: Dict[str, Tuple[str, str]] = {
+    "core.va_txn_flows": ("core.va_txn_flows", "select core.refresh_va_txn_flows({full})"),
+    "core.va_txn_typed": ("core.va_txn_flows", "select core.refresh_va_txn_flows({full})"),
+    "core.inter_sku_transfers": ("core.va_txn_flows", "select core.refresh_va_txn_flows({full})"),
+    "core.remark_category_cache": ("core.va_txn_flows", "select core.refresh_va_txn_flows({full})"),
+}
+
+GRAPH_SQL = """
+select distinct c.oid::regclass::text, c.relkind, rc.oid::regclass::text, rc.relkind
+from pg_class c
+join pg_namespace n on n.oid = c.relnamespace
+left join pg_rewrite rw on rw.ev_class = c.oid
+left join pg_depend d
+  on d.classid = 'pg_rewrite'::regclass and d.objid = rw.oid
+ and d.refclassid = 'pg_class'::regclass and d.refobjid <> c.oid
+left join pg_class rc on rc.oid = d.refobjid
+where c.relkind in ('m', 'v') and n.nspname in ({schemas})
+"""
+
+# Block accesses and live rows of a step's relations, TOAST and indexes included.
+# A partitioned table (core.va_txn_flows) has no storage of its own, so it is
+# expanded to its leaf partitions; pg_partition_tree returns nothing for a
+# materialized view, which is then counted as itself.
+STATS_SQL = """
+with rels as (
+  select coalesce(p.relid, r.rel) as relid
+  from unnest(array[{relids}]::regclass[]) r(rel)
+  left join lateral pg_partition_tree(r.rel) p on p.isleaf
+)
+select coalesce(sum(coalesce(io.heap_blks_hit, 0) + coalesce(io.idx_blks_hit, 0)
+                  + coalesce(io.toast_blks_hit, 0) + coalesce(io.tidx_blks_hit, 0)), 0),
+       coalesce(sum(coalesce(io.heap_blks_read, 0) + coalesce(io.idx_blks_read, 0)
+                  + coalesce(io.toast_blks_read, 0) + coalesce(io.tidx_blks_read, 0)), 0),
+       coalesce(sum(st.n_live_tup), 0)
+from pg_statio_all_tables io
+join pg_stat_all_tables st using (relid)
+where io.relid in (select relid from rels)
+"""
+
+
+@dataclass
+class Step:
+    name: str
+    sql: str
+    deps: Set[str] = field(default_factory=set)
+    # Relations the step writes; their block accesses and rows are logged.
+    relations: List[str] = field(default_factory=list)
+
+
+@dataclass
+class StepResult:
+    name: str
+    seconds: float = 0.0
+    error: Optional[str] = None
+    skipped: bool = False
+    rows: Optional[int] = None
+    blks_hit: Optional[int] = None
+    blks_read: Optional[int] = None
+
+
+def read_graph(session: Session) -> Tuple[Set[str], Dict[str, Set[str]], Set[str]]:
+    """Return (matviews, direct relation deps of every view/MV, plain views)."""
+    rows = session.query(GRAPH_SQL.format(schemas=", ".join(literal(s) for s in SCHEMAS)))
+    matviews: Set[str] = set()
+    views: Set[str] = set()
+    deps: Dict[str, Set[str]] = {}
+    for name, kind, ref, _ in rows:
+        (matviews if kind == "m" else views).add(name)
+        deps.setdefault(name, set())
+        if ref:
+            deps[name].add(ref)
+    return matviews, deps, views
+
+
+def plan_steps(
+    matviews: Set[str], deps: Dict[str, Set[str]], views: Set[str], full: bool
+) -> Dict[str, Step]:
+    steps: Dict[str, Step] = {}
+    for step_name, sql in {v for v in MAINTAINED.values()}:
+        steps[step_name] = Step(step_name, sql.format(full="true" if full else "false"))
+    for table, (step_name, _) in sorted(MAINTAINED.items()):
+        steps[step_name].relations.append(table)
+    for mv in matviews:
+        steps[mv] = Step(mv, f"select core.refresh_matview({literal(mv)})", relations=[mv])
+
+    def producers(rel: str, seen: Set[str]) -> Set[str]:
+        """Steps that produce ``rel``'s inputs, looking through plain views."""
+        found: Set[str] = set()
+        for ref in deps.get(rel, ()):
+            if ref in seen:
+                continue
+            seen.add(ref)
+            if ref in matviews:
+                found.add(ref)
+            elif ref in MAINTAINED:
+                found.add(MAINTAINED[ref][0])
+            elif ref in views:
+                found |= producers(ref, seen)
+        return found
+
+    for mv in matviews:
+        steps[mv].deps = producers(mv, {mv}) - {mv}
+    return steps
+
+
+def levels(steps: Dict[str, Step]) -> List[List[str]]:
+    """Group steps into waves; every step's deps sit in earlier waves."""
+    remaining = dict(steps)
+    done: Set[str] = set()
+    waves: List[List[str]] = []
+    while remaining:
+        ready = sorted(n for n, s in remaining.items() if s.deps <= done)
+        if not ready:
+            raise SystemExit(f"Dependency cycle among: {sorted(remaining)}")
+        waves.append(ready)
+        done.update(ready)
+        for n in ready:
+            del remaining[n]
+    return waves
+
+
+def instrumented(session: Session) -> bool:
+    """Whether this database has the ops tables (initdb/140_ops_stats.sql) and
+    pg_stat_force_next_flush() (PostgreSQL 15+)."""
+    ((ready,),) = session.query(
+        f"select to_regclass({literal(OPS_LOG)}) is not null"
+        " and to_regproc('pg_stat_force_next_flush') is not null"
+    )
+    return ready == "t"
+
+
+def _relation_stats(session: Session, step: Step) -> Tuple[int, int, int]:
+    """(blocks hit, blocks read, live rows) of the step's relations. The
+    session's own counters reach pg_stat only when it goes idle, so the flush
+    is forced by one statement and read by the next."""
+    session.execute("select pg_stat_force_next_flush()")
+    relids = ", ".join(f"to_regclass({literal(r)})" for r in step.relations)
+    ((hit, read, rows),) = session.query(STATS_SQL.format(relids=relids))
+    return int(hit), int(read), int(rows)
+
+
+def _run_step(pool: Pool, step: Step, instrument: bool = False) -> StepResult:
+    result = StepResult(step.name)
+    start = time.perf_counter()
+    try:
+        with pool.session() as session:
+            before = _relation_stats(session, step) if instrument else None
+            start = time.perf_counter()
+            session.execute(step.sql)
+            result.seconds = time.perf_counter() - start
+            if before is not None:
+                hit, read, result.rows = _relation_stats(session, step)
+                result.blks_hit, result.blks_read = hit - before[0], read - before[1]
+    except PsqlError as err:
+        result.error = str(err)
+        result.seconds = time.perf_counter() - start
+    return result
+
+
+def run_steps(
+    steps: Dict[str, Step], pool: Pool, jobs: int, instrument: bool = False
+) -> List[StepResult]:
+    """Start each step as soon as its deps finish; dependents of a failure are
+    skipped. With ``instrument`` each step's block accesses and rows are measured."""
+    results: Dict[str, StepResult] = {}
+    pending = dict(steps)
+    running: Dict[Future, str] = {}
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as workers:
+        while pending or running:
+            for name in sorted(pending):
+                step = pending[name]
+                if any(results.get(d) and (results[d].error or results[d].skipped) for d in step.deps):
+                    results[name] = StepResult(name, skipped=True, error="dependency failed")
+                    del pending[name]
+                elif all(d in results for d in step.deps):
+                    running[workers.submit(_run_step, pool, step, instrument)] = name
+                    del pending[name]
+            if not running:
+                if pending:
+                    raise SystemExit(f"Dependency cycle among: {sorted(pending)}")
+                break
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for fut in finished:
+                results[running.pop(fut)] = fut.result()
+    return [results[n] for wave in levels(steps) for n in wave]
+
+
+def _num(value: Optional[int]) -> str:
+    return "null" if value is None else str(value)
+
+
+def record_run(
+    session: Session, run_id: str, results: Sequence[StepResult], full: bool
+) -> None:
+    """Append one run's steps to ops.refresh_log."""
+    if not results:
+        return
+    values = ",\n  ".join(
+        f"({literal(run_id)}::uuid, {literal(r.name)}, "
+        f"{literal('skipped' if r.skipped else 'failed' if r.error else 'ok')}, {str(full).lower()}, "
+        f"{r.seconds:.3f}, {_num(r.rows)}, {_num(r.blks_hit)}, {_num(r.blks_read)}, "
+        f"{'null' if r.error is None else literal(r.error)})"
+        for r in results
+    )
+    session.execute(
+        f"insert into {OPS_LOG} (run_id, step, status, full_refresh, seconds, row_count,\n"
+        f"  blks_hit, blks_read, error)\nvalues\n  {values};"
+    )
+
+
+def capture_plans(session: Session, run_id: str) -> List[Tuple[str, float]]:
+    """EXPLAIN (ANALYZE, BUFFERS) each report view into ops.plan_history, one
+    after another so their timings do not disturb each other."""
+    captured = []
+    for view in REPORT_VIEWS:
+        ((ms,),) = session.query(f"select ops.capture_plan({literal(view)}, {literal(run_id)}::uuid)")
+        captured.append((view, float(ms)))
+    return captured
+
+
+def print_report(results: Sequence[StepResult], wall: float) -> None:
+    print(f"{'step':<40} {'status':<6} {'secs':>8} {'rows':>10} {'blks hit':>10} {'blks read':>10}")
+    for r in results:
+        status = "skip" if r.skipped else "FAIL" if r.error else "ok"
+        extra = " ".join(f"{'' if v is None else v:>10}" for v in (r.rows, r.blks_hit, r.blks_read))
+        print(f"{r.name:<40} {status:<6} {r.seconds:>8.2f} {extra}".rstrip())
+    print(f"{'wall clock':<40} {'':<6} {wall:>8.2f}")
+    for r in results:
+        if r.error:
+            print(f"{r.name}: {r.error}", file=sys.stderr)
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=int(os.getenv("REFRESH_JOBS", "4")),
+        help="Parallel sessions (default: $REFRESH_JOBS or 4; 1 = sequential).",
+    )
+    parser.add_argument(
+        "--full", action="store_true", help="Rebuild incrementally maintained tables from scratch."
+    )
+    parser.add_argument(
+        "--plan", action="store_true", help="Print the dependency waves and exit."
+    )
+    parser.add_argument(
+        "--explain",
+        action="store_true",
+        help=f"Afterwards capture EXPLAIN (ANALYZE, BUFFERS) of {', '.join(REPORT_VIEWS)}.",
+    )
+    parser.add_argument(
+        "--no-log", action="store_true", help=f"Do not measure steps or write {OPS_LOG}."
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    with Pool(args.jobs) as pool:
+        try:
+            with pool.session() as session:
+                steps = plan_steps(*read_graph(session), full=args.full)
+                has_ops = instrumented(session)
+        except PsqlError as err:
+            print(f"Cannot read the dependency graph: {err}", file=sys.stderr)
+            return 1
+        if args.plan:
+            for i, wave in enumerate(levels(steps), 1):
+                for name in wave:
+                    after = ", ".join(sorted(steps[name].deps)) or "-"
+                    print(f"wave {i}  {name:<40} after: {after}")
+            return 0
+        if (args.explain or not args.no_log) and not has_ops:
+            print(f"{OPS_LOG} is missing (make initdb) or the server predates PostgreSQL 15; "
+                  "nothing is logged.", file=sys.stderr)
+        instrument = has_ops and not args.no_log
+        run_id = str(uuid.uuid4())
+        start = time.perf_counter()
+        results = run_steps(steps, pool, args.jobs, instrument)
+        wall = time.perf_counter() - start
+        plans: List[Tuple[str, float]] = []
+        try:
+            with pool.session() as session:
+                if instrument:
+                    record_run(session, run_id, results, args.full)
+                if has_ops and args.explain and not any(r.error for r in results):
+                    plans = capture_plans(session, run_id)
+        except PsqlError as err:
+            print(f"Cannot record the run in ops.*: {err}", file=sys.stderr)
+    print_report(results, wall)
+    for view, ms in plans:
+        print(f"{'explain ' + view:<40} {'ok':<6} {ms / 1000:>8.2f}")
+    if instrument or plans:
+        print(f"run {run_id} logged to ops.*")
+    return 1 if any(r.error for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -78,7 +78,7 @@ for guc in "${!PSQL_GUCS[@]}"; do
   PSQL+=("-c" "select set_config('$guc', '${PSQL_GUCS[$guc]}', false);")
 done
 
-usage(){ echo "Usage: $0 [-c SQL] [-f file.sql] [-v name=value]"; exit 2; }
+usage(){ echo "Usage: $0 [-c SQL] [-f file.sql|-] [-v name=value]"; exit 2; }
 
 SQL_CMD=""
 SQL_FILE=""
@@ -98,7 +98,8 @@ export PGPASSWORD PGSSLMODE PGHOST PGPORT PGDATABASE PGUSER
 if [ -n "$SQL_CMD" ]; then
   "${PSQL[@]}" "${EXTRA_ARGS[@]}" -c "$SQL_CMD"
 elif [ -n "$SQL_FILE" ]; then
-  if [ ! -f "$SQL_FILE" ]; then
+  # "-f -" reads statements from stdin (a long-lived session, see pg_session.py)
+  if [ "$SQL_FILE" != "-" ] && [ ! -f "$SQL_FILE" ]; then
     echo "No such file: $SQL_FILE" >&2
     exit 2
   fi
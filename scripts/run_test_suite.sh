@@ -103,6 +103,8 @@ run_step "Mapping coverage check" warn scripts/run_sql.sh -f scripts/sql-tests/c
 
 run_step "Mart row count parity" fail scripts/run_sql.sh -f scripts/sql-tests/check_mart_row_counts.sql || true
 
+run_step "Refresh log counts flow partitions" fail scripts/run_sql.sh -f scripts/sql-tests/check_refresh_log_flows.sql || true
+
 run_step "Level 1 totals parity" fail scripts/run_sql.sh -f scripts/sql-tests/check_level1_totals.sql || true
 
 step "Level 1 parity vs spreadsheet"
@@ -22,7 +22,7 @@ BEGIN
   SELECT SUM(CASE WHEN category_code = 'merchant_repayment' AND direction='inflow'
                   THEN signed_amount ELSE 0 END)
     INTO raw_received
-  FROM core.mv_va_txn_flows;
+  FROM core.va_txn_flows;
 
   IF ABS(COALESCE(lvl_received,0) - COALESCE(raw_received,0)) > 0.01 THEN
     RAISE EXCEPTION 'Level 1 received total mismatch: mart=%, raw=%', lvl_received, raw_received;
@@ -0,0 +1,25 @@
+-- scripts/sql-tests/check_refresh_log_flows.sql
+-- The latest logged core.va_txn_flows step (scripts/refresh.py) must count the
+-- rows in the flow partitions, not the empty partitioned parent.
+DO $$
+DECLARE
+  logged bigint;
+  flows bigint;
+BEGIN
+  SELECT row_count INTO logged
+  FROM ops.refresh_log
+  WHERE step = 'core.va_txn_flows' AND status = 'ok' AND row_count IS NOT NULL
+  ORDER BY finished_at DESC
+  LIMIT 1;
+
+  IF NOT FOUND THEN
+    RAISE NOTICE 'No core.va_txn_flows step in ops.refresh_log yet (make refresh)';
+    RETURN;
+  END IF;
+
+  SELECT COUNT(*) INTO flows FROM core.va_txn_flows;
+  IF flows > 0 AND logged = 0 THEN
+    RAISE EXCEPTION 'ops.refresh_log row_count for core.va_txn_flows is 0 with % flow rows', flows;
+  END IF;
+  RAISE NOTICE 'core.va_txn_flows: logged % rows, % now', logged, flows;
+END $$;
@@ -2,6 +2,6 @@
 -- Purpose: Summarize the impact of Option B (should see funds_to_sku inflows counted).
 
 SELECT sku_id, category_code, direction, COUNT(*) AS n, SUM(signed_amount) AS sum_signed
-FROM core.mv_va_txn_flows
+FROM core.va_txn_flows
 GROUP BY 1,2,3
 ORDER BY 1,2,3;
@@ -24,8 +24,8 @@ BEGIN
     IF EXISTS (SELECT 1 FROM pg_matviews WHERE schemaname='core' AND matviewname='mv_repmt_sales') THEN
       REFRESH MATERIALIZED VIEW core.mv_repmt_sales;
     END IF;
-    IF EXISTS (SELECT 1 FROM pg_matviews WHERE schemaname='core' AND matviewname='mv_va_txn_flows') THEN
-      REFRESH MATERIALIZED VIEW core.mv_va_txn_flows;
+    IF to_regproc('core.refresh_va_txn_flows') IS NOT NULL THEN
+      PERFORM core.refresh_va_txn_flows();
     END IF;
   END IF;
 END$$;
@@ -1,17 +1,23 @@
   BEGIN;
     CREATE TEMP TABLE tmp_note_sku_va_map (
-      note_id   text,
-      sku_id    text,
-      va_number text
+      note_id    text,
+      sku_id     text,
+      va_number  text,
+      valid_from date,
+      valid_to   date
     ) ON COMMIT DROP;
 
-    \copy tmp_note_sku_va_map(note_id, sku_id, va_number) FROM '__CSV_PATH__' WITH (FORMAT csv, HEADER true);
+    -- __MAP_COLUMNS__: the file's header, with or without valid_from/valid_to
+    -- (prep_note_sku_map.py --history writes both).
+    \copy tmp_note_sku_va_map(__MAP_COLUMNS__) FROM '__CSV_PATH__' WITH (FORMAT csv, HEADER true);
 
     CREATE TEMP TABLE tmp_validated ON COMMIT DROP AS
     SELECT
       NULLIF(TRIM(t.note_id),'') AS note_id,
       TRIM(t.sku_id)             AS sku_id,
-      TRIM(t.va_number)          AS va_number,
+      ref.normalize_va(t.va_number) AS va_number,
+      t.valid_from,
+      t.valid_to,
       m.merchant_id
     FROM tmp_note_sku_va_map t
     LEFT JOIN (
@@ -25,7 +31,7 @@
     ) src ON src.sku_id = TRIM(t.sku_id)
     LEFT JOIN ref.merchant m ON lower(m.merchant_name) = lower(src.merchant_name)
     WHERE TRIM(t.sku_id) IS NOT NULL AND TRIM(t.sku_id) <> ''
-      AND TRIM(t.va_number) IS NOT NULL AND TRIM(t.va_number) <> '';
+      AND ref.normalize_va(t.va_number) IS NOT NULL;
 
     INSERT INTO ref.sku (sku_id, merchant_id)
     SELECT sku_id, merchant_id
@@ -35,8 +41,14 @@
     ) s
     ON CONFLICT (sku_id) DO UPDATE SET merchant_id = EXCLUDED.merchant_id;
 
-    DELETE FROM ref.note_sku_va_map
-    WHERE sku_id IN (SELECT sku_id FROM tmp_validated);
+    -- Drop only the reloaded SKUs' pairs that are gone; the rest are upserted below,
+    -- so unchanged pairs keep their rows (and their flows are not re-derived).
+    DELETE FROM ref.note_sku_va_map n
+    WHERE n.sku_id IN (SELECT sku_id FROM tmp_validated)
+      AND NOT EXISTS (
+        SELECT 1 FROM tmp_validated t
+        WHERE t.sku_id = n.sku_id AND t.va_number = n.va_number
+          AND t.note_id IS NOT DISTINCT FROM n.note_id);
 
     DO $$
     BEGIN
@@ -45,15 +57,23 @@
       END IF;
     END $$;
 
-    INSERT INTO ref.note_sku_va_map (note_id, sku_id, va_number, merchant_id)
+    -- A file without validity columns is the current mapping: its pairs are open-ended
+    -- and keep the valid_from they already had.
+    INSERT INTO ref.note_sku_va_map AS n (note_id, sku_id, va_number, merchant_id, valid_from, valid_to)
     SELECT
       note_id,
       sku_id,
       va_number,
-      merchant_id
+      merchant_id,
+      valid_from,
+      valid_to
     FROM tmp_validated
     ON CONFLICT (coalesce(note_id,''), coalesce(va_number,''), coalesce(sku_id,''))
-    DO UPDATE SET merchant_id = EXCLUDED.merchant_id;
+    DO UPDATE SET merchant_id = EXCLUDED.merchant_id,
+                  valid_from  = COALESCE(EXCLUDED.valid_from, n.valid_from),
+                  valid_to    = EXCLUDED.valid_to
+    WHERE (n.merchant_id, n.valid_from, n.valid_to)
+          IS DISTINCT FROM (EXCLUDED.merchant_id, COALESCE(EXCLUDED.valid_from, n.valid_from), EXCLUDED.valid_to);
 
     SELECT COUNT(*) AS mappings_loaded,
            COUNT(DISTINCT sku_id) AS distinct_skus
@@ -1,3 +1 @@
 select core.refresh_all();
-
-REFRESH MATERIALIZED VIEW core.mv_va_txn_flows;
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""Generate a deterministic synthetic export set at a chosen scale.
+
+Writes, for each of --periods months starting at --start:
+  external_accounts_YYYY-MM.csv  pulls into the SKU VAs
+  va_txn_YYYY-MM.csv             merchant repayments into the SKU VAs, fee and
+                                 investor payouts out of them and inter-SKU
+                                 transfers, with remarks that match
+                                 ref.remarks_category_map (plus a share the map
+                                 does not know)
+  repmt_sku_YYYY-MM.csv          expected/paid fees per SKU
+  repmt_sales_YYYY-MM.csv        inflow and sales proceeds per SKU
+and once:
+  level1_reference.csv           the SKU/VA block of a Level-1 export whose
+                                 amounts are what mart.v_level1 should report
+                                 once every period is loaded
+  synth_manifest.json            the options and row counts, so a rerun with
+                                 the same options can be skipped (--reuse)
+
+The same options and --seed always give byte-identical files: each period draws
+from its own generator seeded with (seed, period), so periods are written in
+parallel (--jobs) without changing the output. Files are streamed; memory is
+bounded by the number of SKUs and VAs, not transactions.
+
+Every VA belongs to exactly one SKU (the first VA of a SKU, in account-number
+order, carries its sales proceeds), so the reference amounts follow from the
+generated rows without re-implementing the mart views. SKU ids start with
+SYN- and accounts with 88599 so they cannot collide with real exports.
+
+Usage:
+  synth_data.py OUT_DIR [--txns N] [--skus N] [--vas-per-sku N] [--periods N]
+                [--start YYYY-MM] [--seed N] [--jobs N] [--reuse]
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from bench_prep import VA_TXN_HEADER
+
+EXTERNAL_HEADER = ["Beneficiary Bank Account Number", "Buy Amount", "Buy Currency", "Created Date"]
+SALES_HEADER = ["Merchant", "SKU ID", "Total Funds Inflow", "Sales Proceeds", "L2E"]
+SKU_FEES = [
+    "Acquirer Fees",
+    "FH Admin Fees",
+    "Int Difference",
+    "Sr Principal",
+    "Sr Interest",
+    "Jr Principal",
+    "Jr Interest",
+]
+SKU_HEADER = (
+    ["Merchant", "SKU ID"]
+    + [f"{fee} {kind}" for fee in SKU_FEES for kind in ("Expected", "Paid")]
+    + ["SPAR Merchant", "Additional Interests Paid to FH"]
+)
+REFERENCE_HEADER = [
+    "SKU ID", "Account Number", "Merchant", "Amount Pulled", "Amount Received", "Sales Proceeds"
+]
+MANIFEST = "synth_manifest.json"
+
+REPAYMENT = "merchant-repayment"
+TRANSFER = "note-issued-transfer-to-sku"
+# Payouts from a SKU VA, by remark (ref.remarks_category_map patterns) and weight.
+PAYOUTS = [
+    ("fh-admin-fee", 3),
+    ("acquirer-fee", 2),
+    ("Management fee Q3", 1),
+    ("senior-investor-principal", 6),
+    ("senior-investor-interest", 5),
+    ("junior-investor-principal", 3),
+    ("junior-investor-interest", 3),
+    ("SPAR merchant share", 1),
+    ("int-diff", 1),
+]
+UNMAPPED = ["Manual adjustment, see ticket", "reversal", "Top up\nper merchant request"]
+# Share of va_txn rows by kind; the rest are payouts.
+REPAYMENT_SHARE = 0.40
+TRANSFER_SHARE = 0.03
+UNMAPPED_SHARE = 0.02
+PULLS_PER_TXN = 0.10
+PAYOUT_ACCOUNTS = 500
+
+
+@dataclass(frozen=True)
+class Scale:
+    txns: int
+    skus: int
+    vas_per_sku: int
+    merchants: int
+    periods: int
+    start: str
+    seed: int
+
+    @property
+    def vas(self) -> int:
+        return self.skus * self.vas_per_sku
+
+    def period(self, index: int) -> str:
+        year, month = int(self.start[:4]), int(self.start[5:7]) - 1 + index
+        return f"{year + month // 12:04d}-{month % 12 + 1:02d}"
+
+    def period_txns(self, index: int) -> int:
+        share, rest = divmod(self.txns, self.periods)
+        return share + (1 if index < rest else 0)
+
+
+def sku_id(n: int) -> str:
+    return f"SYN-{n:07d}"
+
+
+def merchant_name(n: int) -> str:
+    return f"SYN Merchant {n:04d}"
+
+
+def sku_va(n: int) -> str:
+    return f"88599{n:08d}"
+
+
+def merchant_va(n: int) -> str:
+    return f"88598{n:08d}"
+
+
+def payout_va(n: int) -> str:
+    return f"88597{n:08d}"
+
+
+def money(cents: int) -> str:
+    sign, cents = ("-", -cents) if cents < 0 else ("", cents)
+    return f"{sign}{cents // 100:,}.{cents % 100:02d}"
+
+
+def _period_task(scale: Scale, index: int, out_dir: str) -> Dict[str, object]:
+    """Write one period's four exports; return its row counts and per-VA/SKU totals."""
+    period = scale.period(index)
+    rnd = random.Random(f"{scale.seed}:{period}")
+    year, month = int(period[:4]), int(period[5:])
+    out = Path(out_dir)
+    pulled = [0] * scale.vas
+    received = [0] * scale.vas
+    sales = [0] * scale.skus
+    rows: Dict[str, int] = {}
+
+    def date() -> str:
+        return f"{month}/{rnd.randint(1, 28)}/{year}"
+
+    def pick_sku() -> int:
+        # Skewed towards low SKU numbers: a few SKUs carry most of the volume.
+        return int(scale.skus * rnd.random() ** 2)
+
+    def pick_va(sku: int) -> int:
+        return sku * scale.vas_per_sku + rnd.randrange(scale.vas_per_sku)
+
+    payout_remarks = [r for r, _ in PAYOUTS]
+    payout_weights = [w for _, w in PAYOUTS]
+    txns = scale.period_txns(index)
+    with (out / f"va_txn_{period}.csv").open("w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(VA_TXN_HEADER)
+        for i in range(txns):
+            sku = pick_sku()
+            va = pick_va(sku)
+            cents = rnd.randint(100, 2_500_000)
+            draw = rnd.random()
+            if draw < REPAYMENT_SHARE:
+                merchant = sku % scale.merchants
+                sender, receiver, remark = merchant_va(merchant), sku_va(va), REPAYMENT
+                received[va] += cents
+            elif draw < REPAYMENT_SHARE + TRANSFER_SHARE:
+                other = pick_va(pick_sku())
+                sender, receiver, remark = sku_va(other), sku_va(va), TRANSFER
+            elif draw < REPAYMENT_SHARE + TRANSFER_SHARE + UNMAPPED_SHARE:
+                sender = merchant_va(sku % scale.merchants)
+                receiver, remark = sku_va(va), rnd.choice(UNMAPPED)
+            else:
+                sender, receiver = sku_va(va), payout_va(rnd.randrange(PAYOUT_ACCOUNTS))
+                remark = rnd.choices(payout_remarks, payout_weights)[0]
+            opening = rnd.randint(0, 50_000_000)
+            writer.writerow([
+                f"va-{sender}",
+                sender,
+                "",
+                f"va-{receiver}",
+                receiver,
+                f"NOTE-{sku_id(sku)}",
+                money(opening),
+                money(opening + cents),
+                money(cents),
+                date(),
+                remark,
+                "COMPLETED",
+                "system",
+            ])
+    rows["va_txn"] = txns
+
+    pulls = max(scale.vas, int(txns * PULLS_PER_TXN))
+    with (out / f"external_accounts_{period}.csv").open("w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(EXTERNAL_HEADER)
+        for i in range(pulls):
+            # Every VA is pulled from at least once a period, the rest at random.
+            va = i if i < scale.vas else pick_va(pick_sku())
+            cents = rnd.randint(10_000, 10_000_000)
+            pulled[va] += cents
+            writer.writerow([sku_va(va), money(cents), "SGD", date()])
+    rows["external_accounts"] = pulls
+
+    with (out / f"repmt_sales_{period}.csv").open("w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(SALES_HEADER)
+        for sku in range(scale.skus):
+            cents = rnd.randint(100_000, 50_000_000)
+            sales[sku] += cents
+            inflow = cents + rnd.randint(0, 1_000_000)
+            writer.writerow([merchant_name(sku % scale.merchants), sku_id(sku), money(inflow), money(cents), ""])
+    rows["repmt_sales"] = scale.skus
+
+    with (out / f"repmt_sku_{period}.csv").open("w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(SKU_HEADER)
+        for sku in range(scale.skus):
+            amounts: List[str] = []
+            for _ in SKU_FEES:
+                expected = rnd.randint(0, 5_000_000)
+                # Most fees are paid in full; some short, a few not at all.
+                paid = rnd.choice((expected, expected, expected, expected * 9 // 10, 0))
+                amounts += [money(expected), money(paid)]
+            amounts += [money(rnd.randint(0, 500_000)), money(rnd.randint(0, 100_000))]
+            writer.writerow([merchant_name(sku % scale.merchants), sku_id(sku)] + amounts)
+    rows["repmt_sku"] = scale.skus
+
+    return {"period": period, "rows": rows, "pulled": pulled, "received": received, "sales": sales}
+
+
+def write_reference(path: Path, scale: Scale, pulled: List[int], received: List[int], sales: List[int]) -> int:
+    with path.open("w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(["Level 1", "", "", ""])
+        writer.writerow(REFERENCE_HEADER)
+        for sku in range(scale.skus):
+            for k in range(scale.vas_per_sku):
+                va = sku * scale.vas_per_sku + k
+                writer.writerow([
+                    sku_id(sku),
+                    sku_va(va),
+                    merchant_name(sku % scale.merchants),
+                    money(pulled[va]),
+                    money(received[va]),
+                    money(sales[sku] if k == 0 else 0),
+                ])
+    return scale.vas
+
+
+def read_manifest(out_dir: Path) -> Optional[dict]:
+    try:
+        return json.loads((out_dir / MANIFEST).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def generate(scale: Scale, out_dir: Path, jobs: int = 1) -> dict:
+    """Write the export set for ``scale`` into ``out_dir``; returns the manifest."""
+    previous = read_manifest(out_dir)
+    if previous is None and out_dir.is_dir() and any(out_dir.glob("*.csv")):
+        raise SystemExit(f"{out_dir} holds CSVs but no {MANIFEST}; pick an empty or synthetic directory.")
+    # A rerun replaces the previous set, including periods the new options no longer write.
+    for name in (previous or {}).get("files", []) + [MANIFEST]:
+        (out_dir / name).unlink(missing_ok=True)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    indexes = range(scale.periods)
+    workers = max(1, min(jobs, scale.periods))
+    if workers == 1:
+        parts = [_period_task(scale, i, str(out_dir)) for i in indexes]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_period_task, [scale] * scale.periods, indexes, [str(out_dir)] * scale.periods))
+
+    pulled = [sum(col) for col in zip(*(p["pulled"] for p in parts))]
+    received = [sum(col) for col in zip(*(p["received"] for p in parts))]
+    sales = [sum(col) for col in zip(*(p["sales"] for p in parts))]
+    rows: Dict[str, int] = {}
+    for part in parts:
+        for feed, count in part["rows"].items():
+            rows[feed] = rows.get(feed, 0) + count
+    rows["level1_reference"] = write_reference(out_dir / "level1_reference.csv", scale, pulled, received, sales)
+
+    files = [f"{feed}_{p['period']}.csv" for p in parts for feed in p["rows"]] + ["level1_reference.csv"]
+    manifest = {
+        "scale": asdict(scale),
+        "periods": [p["period"] for p in parts],
+        "files": files,
+        "rows": rows,
+        "bytes": sum((out_dir / name).stat().st_size for name in files),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    (out_dir / MANIFEST).write_text(json.dumps(manifest, indent=2) + "\n", encoding="utf-8")
+    return manifest
+
+
+def ensure(scale: Scale, out_dir: Path, jobs: int = 1) -> dict:
+    """The manifest of ``out_dir`` if it was generated with ``scale``, else generate it."""
+    manifest = read_manifest(out_dir)
+    if manifest and manifest.get("scale") == asdict(scale):
+        return manifest
+    return generate(scale, out_dir, jobs)
+
+
+def scale_args(parser: argparse.ArgumentParser) -> None:
+    """The --txns/--skus/... options, shared with bench_e2e.py."""
+    parser.add_argument("--txns", type=int, default=100_000, help="va_txn rows over all periods (default 100000).")
+    parser.add_argument("--skus", type=int, default=500, help="SKUs (default 500).")
+    parser.add_argument("--vas-per-sku", type=int, default=2, help="VAs mapped to each SKU (default 2).")
+    parser.add_argument(
+        "--merchants", type=int, default=0, help="Merchants the SKUs belong to (default: one per 20 SKUs)."
+    )
+    parser.add_argument("--periods", type=int, default=3, help="Months of exports (default 3).")
+    parser.add_argument("--start", default="2025-09", help="First period, YYYY-MM (default 2025-09).")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed (default 7).")
+
+
+def scale_from(args: argparse.Namespace, parser: argparse.ArgumentParser) -> Scale:
+    if args.txns < 1 or args.skus < 1 or args.vas_per_sku < 1 or args.periods < 1:
+        parser.error("--txns, --skus, --vas-per-sku and --periods must be positive")
+    if len(args.start) != 7 or args.start[4] != "-" or not 1 <= int(args.start[5:] or 0) <= 12:
+        parser.error(f"--start must be YYYY-MM, got {args.start!r}")
+    merchants = args.merchants if args.merchants > 0 else max(1, args.skus // 20)
+    return Scale(
+        txns=args.txns,
+        skus=args.skus,
+        vas_per_sku=args.vas_per_sku,
+        merchants=min(merchants, args.skus),
+        periods=args.periods,
+        start=args.start,
+        seed=args.seed,
+    )
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("out_dir", type=Path, help="Directory to write the exports to.")
+    scale_args(parser)
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=int(os.getenv("PREP_JOBS", "0")) or os.cpu_count() or 1,
+        help="Periods written in parallel (default: $PREP_JOBS or CPU count).",
+    )
+    parser.add_argument(
+        "--reuse", action="store_true", help=f"Keep OUT_DIR as is if its {MANIFEST} has the same options."
+    )
+    args = parser.parse_args(argv)
+    args.scale = scale_from(args, parser)
+    return args
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.reuse:
+        manifest = ensure(args.scale, args.out_dir, args.jobs)
+    else:
+        manifest = generate(args.scale, args.out_dir, args.jobs)
+    for feed, count in manifest["rows"].items():
+        print(f"{feed:<20} {count:>12,} rows")
+    print(f"{'total':<20} {manifest['bytes'] / 1e6:>12,.1f} MB in {manifest['seconds']:.2f}s -> {args.out_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,34 +8,73 @@ BEGIN
   END IF;
 END$$;
 
-CREATE OR REPLACE FUNCTION core.refresh_all()
+-- Refresh one MV, CONCURRENTLY when it is already populated and has a plain unique
+-- index (readers keep seeing the old rows instead of blocking on the refresh lock).
+CREATE OR REPLACE FUNCTION core.refresh_matview(p_mv regclass)
 RETURNS void
 LANGUAGE plpgsql
 AS $$
 BEGIN
-  -- Rebuild typed/business materialized views in a safe order.
-  -- (No CONCURRENTLY since we haven't defined unique indexes on the MVs.)
+  IF EXISTS (
+    SELECT 1
+    FROM pg_class c
+    JOIN pg_index i ON i.indrelid = c.oid
+    WHERE c.oid = p_mv
+      AND c.relispopulated
+      AND i.indisunique AND i.indisvalid
+      AND i.indpred IS NULL AND i.indexprs IS NULL
+  ) THEN
+    EXECUTE format('REFRESH MATERIALIZED VIEW CONCURRENTLY %s', p_mv);
+  ELSE
+    EXECUTE format('REFRESH MATERIALIZED VIEW %s', p_mv);
+  END IF;
+END;
+$$;
+
+DROP FUNCTION IF EXISTS core.refresh_all();
+
+-- p_full => rebuild core.va_txn_flows from scratch instead of applying queued changes.
+-- Sequential; scripts/refresh.py runs the same steps in parallel sessions.
+CREATE OR REPLACE FUNCTION core.refresh_all(p_full boolean DEFAULT false)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  -- Flows (depends on ref.note_sku_va_map and remark mappings): a table maintained
+  -- incrementally by 003_core_mviews_flows.sql, so only the queued delta is applied.
+  -- Runs first: core.mv_va_txn is built from core.va_txn_typed.
+  IF to_regproc('core.refresh_va_txn_flows') IS NOT NULL THEN
+    PERFORM core.refresh_va_txn_flows(p_full);
+  END IF;
+
+  -- Basic inputs (independent of each other)
+  IF to_regclass('core.mv_external_accounts') IS NOT NULL THEN
+    PERFORM core.refresh_matview('core.mv_external_accounts');
+  END IF;
+
+  IF to_regclass('core.mv_va_txn') IS NOT NULL THEN
+    PERFORM core.refresh_matview('core.mv_va_txn');
+  END IF;
 
-  -- Basic inputs
-  IF EXISTS (SELECT 1 FROM pg_matviews WHERE schemaname='core' AND matviewname='mv_external_accounts') THEN
-    REFRESH MATERIALIZED VIEW core.mv_external_accounts;
+  IF to_regclass('core.mv_repmt_sku') IS NOT NULL THEN
+    PERFORM core.refresh_matview('core.mv_repmt_sku');
   END IF;
 
-  IF EXISTS (SELECT 1 FROM pg_matviews WHERE schemaname='core' AND matviewname='mv_va_txn') THEN
-    REFRESH MATERIALIZED VIEW core.mv_va_txn;
+  IF to_regclass('core.mv_repmt_sales') IS NOT NULL THEN
+    PERFORM core.refresh_matview('core.mv_repmt_sales');
   END IF;
 
-  IF EXISTS (SELECT 1 FROM pg_matviews WHERE schemaname='core' AND matviewname='mv_repmt_sku') THEN
-    REFRESH MATERIALIZED VIEW core.mv_repmt_sku;
+  -- Report facts read by mart.v_level1 / v_level2a / v_level2b (built from the above)
+  IF to_regclass('mart.mv_sku_va_facts') IS NOT NULL THEN
+    PERFORM core.refresh_matview('mart.mv_sku_va_facts');
   END IF;
 
-  IF EXISTS (SELECT 1 FROM pg_matviews WHERE schemaname='core' AND matviewname='mv_repmt_sales') THEN
-    REFRESH MATERIALIZED VIEW core.mv_repmt_sales;
+  IF to_regclass('mart.mv_sku_facts') IS NOT NULL THEN
+    PERFORM core.refresh_matview('mart.mv_sku_facts');
   END IF;
 
-  -- Flows (depends on ref.note_sku_va_map and remark mappings)
-  IF EXISTS (SELECT 1 FROM pg_matviews WHERE schemaname='core' AND matviewname='mv_va_txn_flows') THEN
-    REFRESH MATERIALIZED VIEW core.mv_va_txn_flows;
+  IF to_regclass('mart.mv_flows_period') IS NOT NULL THEN
+    PERFORM core.refresh_matview('mart.mv_flows_period');
   END IF;
 END;
 $$;
@@ -0,0 +1,132 @@
+-- sql/phase2/001_core_remark_categories.sql
+-- Remarks categorization: each distinct normalized remark is resolved against
+-- ref.remarks_category_map once and cached. Exact rules are a hash lookup; regex
+-- rules are evaluated only for remarks not yet in the cache. Edits to the map
+-- invalidate just the cached remarks the changed rules match.
+
+SET search_path = core, public;
+
+CREATE OR REPLACE FUNCTION core.normalize_remark(p_remarks text)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE
+AS $$
+  SELECT lower(btrim(coalesce(p_remarks, '')));
+$$;
+
+-- category_code NULL = no rule matches the remark.
+CREATE TABLE IF NOT EXISTS core.remark_category_cache (
+  remarks       text PRIMARY KEY,
+  category_code text
+);
+
+-- Remarks whose cached category was invalidated by a map edit; drained by
+-- core.refresh_va_txn_flows(), which re-categorizes rows carrying them.
+CREATE TABLE IF NOT EXISTS core.remark_category_stale (remarks text NOT NULL);
+
+-- First matching rule by priority, uncached (ad-hoc checks against the cache).
+CREATE OR REPLACE FUNCTION core.remark_category(p_remarks text)
+RETURNS text
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT m.category_code
+  FROM ref.remarks_category_map m
+  WHERE (CASE WHEN m.is_regex THEN p_remarks ~* m.raw_pattern ELSE p_remarks = lower(m.raw_pattern) END)
+  ORDER BY m.priority ASC
+  LIMIT 1;
+$$;
+
+-- Categories for p_remarks (normalized), resolving and caching any misses.
+-- The SHARE lock on the map keeps rule edits out until this transaction ends:
+-- otherwise a rule committed meanwhile would fire trg_remark_cache_invalidate,
+-- whose DELETE cannot see the cache rows inserted here from the older map, and
+-- those stale categories would be committed without being queued as stale.
+-- Concurrent refreshes share the lock; a waiting edit invalidates once they commit.
+CREATE OR REPLACE FUNCTION core.categorize_remarks(p_remarks text[])
+RETURNS TABLE (remarks text, category_code text)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+BEGIN
+  LOCK TABLE ref.remarks_category_map IN SHARE MODE;
+
+  INSERT INTO core.remark_category_cache (remarks, category_code)
+  SELECT m.remarks,
+         COALESCE(
+           -- A regex rule wins only when it outranks the best exact rule.
+           (SELECT rx.category_code
+            FROM ref.remarks_category_map rx
+            WHERE rx.is_regex
+              AND (e.priority IS NULL OR rx.priority < e.priority)
+              AND m.remarks ~* rx.raw_pattern
+            ORDER BY rx.priority
+            LIMIT 1),
+           e.category_code)
+  FROM (
+    SELECT DISTINCT u.remarks
+    FROM unnest(p_remarks) AS u(remarks)
+    WHERE u.remarks IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM core.remark_category_cache c WHERE c.remarks = u.remarks)
+  ) m
+  LEFT JOIN LATERAL (
+    SELECT x.category_code, x.priority
+    FROM ref.remarks_category_map x
+    WHERE NOT x.is_regex AND lower(x.raw_pattern) = m.remarks
+    ORDER BY x.priority
+    LIMIT 1
+  ) e ON true
+  ON CONFLICT (remarks) DO NOTHING;
+
+  RETURN QUERY
+  SELECT c.remarks, c.category_code
+  FROM core.remark_category_cache c
+  JOIN (SELECT DISTINCT u.remarks FROM unnest(p_remarks) AS u(remarks)) u ON u.remarks = c.remarks;
+END;
+$$;
+
+-- A rule added, removed or changed can only recategorize remarks it matches.
+CREATE OR REPLACE FUNCTION core.trg_remark_cache_invalidate()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF TG_OP = 'TRUNCATE' THEN
+    WITH gone AS (DELETE FROM core.remark_category_cache RETURNING remarks)
+    INSERT INTO core.remark_category_stale SELECT remarks FROM gone;
+    RETURN NULL;
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    WITH gone AS (
+      DELETE FROM core.remark_category_cache c
+      USING (SELECT DISTINCT raw_pattern, is_regex FROM new_rows) q
+      WHERE (CASE WHEN q.is_regex THEN c.remarks ~* q.raw_pattern ELSE c.remarks = lower(q.raw_pattern) END)
+      RETURNING c.remarks
+    )
+    INSERT INTO core.remark_category_stale SELECT remarks FROM gone;
+  END IF;
+  IF TG_OP IN ('DELETE', 'UPDATE') THEN
+    WITH gone AS (
+      DELETE FROM core.remark_category_cache c
+      USING (SELECT DISTINCT raw_pattern, is_regex FROM old_rows) q
+      WHERE (CASE WHEN q.is_regex THEN c.remarks ~* q.raw_pattern ELSE c.remarks = lower(q.raw_pattern) END)
+      RETURNING c.remarks
+    )
+    INSERT INTO core.remark_category_stale SELECT remarks FROM gone;
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS remark_cache_ins ON ref.remarks_category_map;
+DROP TRIGGER IF EXISTS remark_cache_upd ON ref.remarks_category_map;
+DROP TRIGGER IF EXISTS remark_cache_del ON ref.remarks_category_map;
+DROP TRIGGER IF EXISTS remark_cache_trunc ON ref.remarks_category_map;
+CREATE TRIGGER remark_cache_ins AFTER INSERT ON ref.remarks_category_map
+  REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION core.trg_remark_cache_invalidate();
+CREATE TRIGGER remark_cache_upd AFTER UPDATE ON ref.remarks_category_map
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION core.trg_remark_cache_invalidate();
+CREATE TRIGGER remark_cache_del AFTER DELETE ON ref.remarks_category_map
+  REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION core.trg_remark_cache_invalidate();
+CREATE TRIGGER remark_cache_trunc AFTER TRUNCATE ON ref.remarks_category_map
+  FOR EACH STATEMENT EXECUTE FUNCTION core.trg_remark_cache_invalidate();
@@ -1,62 +1,71 @@
 -- sql/phase2/002_core_basic_mviews.sql (UPDATED)
 SET search_path = core, public;
 
+-- Each MV carries its raw row's raw_id under a unique index so it can be
+-- refreshed CONCURRENTLY (see core.refresh_matview) without blocking readers.
+
 -- (Re)create external accounts MV
-DROP MATERIALIZED VIEW IF EXISTS core.mv_external_accounts;
+DROP MATERIALIZED VIEW IF EXISTS core.mv_external_accounts CASCADE;
 CREATE MATERIALIZED VIEW core.mv_external_accounts AS
 SELECT
-  btrim(e.beneficiary_bank_account_number)            AS va_number,
-  core.to_numeric_safe(e.buy_amount)                   AS buy_amount,
+  e.raw_id,
+  ref.normalize_va(e.beneficiary_bank_account_number) AS va_number,
+  e.buy_amount_num                                     AS buy_amount,
   btrim(e.buy_currency)                                AS buy_currency,
-  core.to_tstz_safe(e.created_date)                    AS created_at_utc,
-  to_char(core.to_tstz_safe(e.created_date)::date,'YYYY-MM') AS period_ym
+  e.created_date_ts                                    AS created_at_utc,
+  to_char(e.created_date_ts::date,'YYYY-MM') AS period_ym
 FROM raw.external_accounts e;
 
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_ext_raw_id ON core.mv_external_accounts(raw_id);
 CREATE INDEX IF NOT EXISTS ix_mv_ext_va     ON core.mv_external_accounts(va_number);
 CREATE INDEX IF NOT EXISTS ix_mv_ext_period ON core.mv_external_accounts(period_ym);
 
 -- (Re)create Repayment-SKU MV (expectations by SKU)
-DROP MATERIALIZED VIEW IF EXISTS core.mv_repmt_sku;
+DROP MATERIALIZED VIEW IF EXISTS core.mv_repmt_sku CASCADE;
 CREATE MATERIALIZED VIEW core.mv_repmt_sku AS
 SELECT
+  s.raw_id,
   btrim(s.merchant)                           AS merchant_name,
   btrim(s.sku_id)                             AS sku_id,
-  core.to_numeric_safe(s.acquirer_fees_expected)      AS acquirer_fees_expected,
-  core.to_numeric_safe(s.acquirer_fees_paid)          AS acquirer_fees_paid,
-  core.to_numeric_safe(s.fh_admin_fees_expected)      AS fh_admin_fees_expected,
-  core.to_numeric_safe(s.fh_admin_fees_paid)          AS fh_admin_fees_paid,
-  core.to_numeric_safe(s.int_difference_expected)     AS int_difference_expected,
-  core.to_numeric_safe(s.int_difference_paid)         AS int_difference_paid,
-  core.to_numeric_safe(s.sr_principal_expected)       AS sr_principal_expected,
-  core.to_numeric_safe(s.sr_principal_paid)           AS sr_principal_paid,
-  core.to_numeric_safe(s.sr_interest_expected)        AS sr_interest_expected,
-  core.to_numeric_safe(s.sr_interest_paid)            AS sr_interest_paid,
-  core.to_numeric_safe(s.jr_principal_expected)       AS jr_principal_expected,
-  core.to_numeric_safe(s.jr_principal_paid)           AS jr_principal_paid,
-  core.to_numeric_safe(s.jr_interest_expected)        AS jr_interest_expected,
-  core.to_numeric_safe(s.jr_interest_paid)            AS jr_interest_paid,
-  core.to_numeric_safe(s.spar_merchant)               AS spar_merchant,
-  core.to_numeric_safe(s.additional_interests_paid_to_fh) AS additional_interests_paid_to_fh,
+  s.acquirer_fees_expected_num                        AS acquirer_fees_expected,
+  s.acquirer_fees_paid_num                            AS acquirer_fees_paid,
+  s.fh_admin_fees_expected_num                        AS fh_admin_fees_expected,
+  s.fh_admin_fees_paid_num                            AS fh_admin_fees_paid,
+  s.int_difference_expected_num                       AS int_difference_expected,
+  s.int_difference_paid_num                           AS int_difference_paid,
+  s.sr_principal_expected_num                         AS sr_principal_expected,
+  s.sr_principal_paid_num                             AS sr_principal_paid,
+  s.sr_interest_expected_num                          AS sr_interest_expected,
+  s.sr_interest_paid_num                              AS sr_interest_paid,
+  s.jr_principal_expected_num                         AS jr_principal_expected,
+  s.jr_principal_paid_num                             AS jr_principal_paid,
+  s.jr_interest_expected_num                          AS jr_interest_expected,
+  s.jr_interest_paid_num                              AS jr_interest_paid,
+  s.spar_merchant_num                                 AS spar_merchant,
+  s.additional_interests_paid_to_fh_num               AS additional_interests_paid_to_fh,
   -- Placeholders for new 'expected' columns. These need to be added to the source CSV and load process.
   0::numeric AS additional_admin_fee_expected,
   0::numeric AS sr_add_interest_expected,
   0::numeric AS jr_add_interest_expected
 FROM raw.repmt_sku s;
 
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_sku_raw_id ON core.mv_repmt_sku(raw_id);
 CREATE INDEX IF NOT EXISTS ix_mv_sku_id ON core.mv_repmt_sku(sku_id);
 
 -- (Re)create Repayment-Sales Proceeds MV (UI inflows by SKU)
-DROP MATERIALIZED VIEW IF EXISTS core.mv_repmt_sales;
+DROP MATERIALIZED VIEW IF EXISTS core.mv_repmt_sales CASCADE;
 CREATE MATERIALIZED VIEW core.mv_repmt_sales AS
 SELECT
+  r.raw_id,
   btrim(r.merchant)                           AS merchant_name,
   btrim(r.sku_id)                             AS sku_id,
-  core.to_numeric_safe(r.total_funds_inflow)  AS total_funds_inflow,
-  core.to_numeric_safe(r.sales_proceeds)      AS sales_proceeds,
-  core.to_numeric_safe(r.l2e)                 AS l2e,
+  r.total_funds_inflow_num                    AS total_funds_inflow,
+  r.sales_proceeds_num                        AS sales_proceeds,
+  r.l2e_num                                   AS l2e,
   -- Placeholders for new inflow columns. These need to be added to the source CSV and load process.
   0::numeric AS merchant_top_up,
   0::numeric AS disbursement_surplus
 FROM raw.repmt_sales r;
 
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_sales_raw_id ON core.mv_repmt_sales(raw_id);
 CREATE INDEX IF NOT EXISTS ix_mv_sales_sku_id ON core.mv_repmt_sales(sku_id);
\ No newline at end of file
@@ -1,95 +1,551 @@
 -- sql/phase2/003_core_mviews_flows.sql
 SET search_path = core, public;
 
--- Recreate flows MV and base pivot. (022_update_flows_pivot.sql will override the pivot.)
-DROP MATERIALIZED VIEW IF EXISTS core.mv_va_txn_flows;
-DROP VIEW IF EXISTS core.v_flows_pivot;
-
-CREATE MATERIALIZED VIEW core.mv_va_txn_flows AS
-WITH typed AS (
-  SELECT
-    r.sender_virtual_account_number   AS sender_va,
-    NULLIF(r.sender_note_id,'')       AS sender_note_id,
-    r.receiver_virtual_account_number AS receiver_va,
-    NULLIF(r.receiver_note_id,'')     AS receiver_note_id,
-    core.to_numeric_safe(r.amount)    AS amount,
-    core.to_tstz_safe(r.date)         AS occurred_at_utc,
-    lower(btrim(coalesce(r.remarks,''))) AS remarks
-  FROM raw.va_txn r
-),
-categorized AS (
-  SELECT
-    t.*,
-    COALESCE(
-      (SELECT m.category_code
-       FROM ref.remarks_category_map m
-       WHERE (CASE WHEN m.is_regex THEN t.remarks ~* m.raw_pattern ELSE t.remarks = lower(m.raw_pattern) END)
-       ORDER BY m.priority ASC
-       LIMIT 1),
-    'uncategorized') AS category_code
-  FROM typed t
-),
-recv_match AS (
-  SELECT
-    c.receiver_va  AS va_number,
-    n.sku_id,
-    n.merchant_id,
-    c.category_code,
-    'inflow'::text AS direction,
-    c.amount,
-    c.occurred_at_utc,
-    c.remarks
-  FROM categorized c
-  JOIN ref.note_sku_va_map n
-    ON n.va_number = c.receiver_va
-),
-send_match AS (
-  SELECT
-    c.sender_va    AS va_number,
-    n.sku_id,
-    n.merchant_id,
-    c.category_code,
-    'outflow'::text AS direction,
-    c.amount,
-    c.occurred_at_utc,
-    c.remarks
-  FROM categorized c
-  JOIN ref.note_sku_va_map n
-    ON n.va_number = c.sender_va
-)
+-- Flows are maintained incrementally instead of as a materialized view:
+--   core.va_txn_typed         one row per raw.va_txn row, typed and categorized once;
+--                             the only reader of raw.va_txn (core.mv_va_txn and the
+--                             inter-SKU transfers derive from it)
+--   core.va_txn_flows         typed rows joined to ref.note_sku_va_map (inflow/outflow),
+--                             partitioned by month (period_ym)
+--   core.inter_sku_transfers  typed rows whose sender and receiver map to different SKUs
+-- Triggers queue what changed (raw load batches, mapped VAs, and remarks whose
+-- cached category was invalidated, see 001_core_remark_categories.sql) and
+-- core.refresh_va_txn_flows() applies only that delta. (022_update_flows_pivot.sql
+-- will override the pivot.)
+-- VA numbers are stored in ref.normalize_va() form with their ref.va ids, and the
+-- mapping joins, transfers and VA remaps go through those integer ids.
+
+-- Replace the old materialized view; dependents are recreated later in bootstrap.
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_matviews WHERE schemaname='core' AND matviewname='mv_va_txn_flows') THEN
+    EXECUTE 'DROP MATERIALIZED VIEW core.mv_va_txn_flows CASCADE';
+  END IF;
+END$$;
+
+CREATE TABLE IF NOT EXISTS core.va_txn_typed (
+  txn_id           bigint GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+  source_file      text,
+  load_at          timestamptz NOT NULL,
+  sender_va        text,
+  sender_note_id   text,
+  receiver_va      text,
+  receiver_note_id text,
+  amount           numeric,
+  occurred_at_utc  timestamptz,
+  remarks          text NOT NULL,
+  category_code    text NOT NULL,
+  sender_va_id     integer,
+  receiver_va_id   integer
+);
+
+-- Typed rows from before the VA ids existed are rebuilt with them.
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_attribute
+                 WHERE attrelid = 'core.va_txn_typed'::regclass AND attname = 'sender_va_id') THEN
+    ALTER TABLE core.va_txn_typed ADD COLUMN sender_va_id integer, ADD COLUMN receiver_va_id integer;
+    IF to_regclass('core.flows_state') IS NOT NULL THEN
+      UPDATE core.flows_state SET needs_rebuild = true;
+    END IF;
+  END IF;
+END$$;
+
+DROP INDEX IF EXISTS core.ix_va_txn_typed_sender;
+DROP INDEX IF EXISTS core.ix_va_txn_typed_receiver;
+CREATE INDEX IF NOT EXISTS ix_va_txn_typed_batch    ON core.va_txn_typed(load_at, source_file);
+CREATE INDEX IF NOT EXISTS ix_va_txn_typed_sender   ON core.va_txn_typed(sender_va_id);
+CREATE INDEX IF NOT EXISTS ix_va_txn_typed_receiver ON core.va_txn_typed(receiver_va_id);
+CREATE INDEX IF NOT EXISTS ix_va_txn_typed_remarks  ON core.va_txn_typed(remarks);
+
+-- Flows used to be a plain table; it is rebuilt as a partitioned one.
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_class WHERE oid = to_regclass('core.va_txn_flows') AND relkind = 'r') THEN
+    EXECUTE 'DROP TABLE core.va_txn_flows CASCADE';
+    IF to_regclass('core.flows_state') IS NOT NULL THEN
+      UPDATE core.flows_state SET needs_rebuild = true;
+    END IF;
+  END IF;
+END$$;
+
+-- One partition per month, created by core.ensure_flows_partitions() as periods
+-- appear; rows without a date go to va_txn_flows_undated.
+CREATE TABLE IF NOT EXISTS core.va_txn_flows (
+  txn_id          bigint NOT NULL,
+  va_number       text,
+  sku_id          text,
+  merchant_id     uuid,
+  category_code   text,
+  direction       text,
+  raw_amount      numeric,
+  signed_amount   numeric,
+  occurred_at_utc timestamptz,
+  period_ym       text,
+  remarks         text,
+  va_id           integer
+) PARTITION BY LIST (period_ym);
+
+ALTER TABLE core.va_txn_flows ADD COLUMN IF NOT EXISTS va_id integer;
+
+CREATE TABLE IF NOT EXISTS core.va_txn_flows_undated PARTITION OF core.va_txn_flows FOR VALUES IN (NULL);
+
+CREATE INDEX IF NOT EXISTS ix_flows_txn     ON core.va_txn_flows(txn_id);
+CREATE INDEX IF NOT EXISTS ix_flows_sku     ON core.va_txn_flows(sku_id);
+CREATE INDEX IF NOT EXISTS ix_flows_va      ON core.va_txn_flows(va_number);
+CREATE INDEX IF NOT EXISTS ix_flows_va_id   ON core.va_txn_flows(va_id);
+CREATE INDEX IF NOT EXISTS ix_flows_cat     ON core.va_txn_flows(category_code);
+CREATE INDEX IF NOT EXISTS ix_flows_dir     ON core.va_txn_flows(direction);
+CREATE INDEX IF NOT EXISTS ix_flows_period  ON core.va_txn_flows(period_ym);
+
+CREATE TABLE IF NOT EXISTS core.inter_sku_transfers (
+  txn_id           bigint NOT NULL,
+  sender_va        text,
+  receiver_va      text,
+  amount           numeric,
+  occurred_at_utc  timestamptz,
+  from_sku_id      text,
+  from_merchant_id uuid,
+  to_sku_id        text,
+  to_merchant_id   uuid,
+  period_ym        text,
+  sender_va_id     integer,
+  receiver_va_id   integer
+);
+
+ALTER TABLE core.inter_sku_transfers
+  ADD COLUMN IF NOT EXISTS sender_va_id integer,
+  ADD COLUMN IF NOT EXISTS receiver_va_id integer;
+
+CREATE INDEX IF NOT EXISTS ix_xfer_txn      ON core.inter_sku_transfers(txn_id);
+CREATE INDEX IF NOT EXISTS ix_xfer_from_sku ON core.inter_sku_transfers(from_sku_id);
+CREATE INDEX IF NOT EXISTS ix_xfer_to_sku   ON core.inter_sku_transfers(to_sku_id);
+DROP INDEX IF EXISTS core.ix_xfer_sender;
+DROP INDEX IF EXISTS core.ix_xfer_receiver;
+CREATE INDEX IF NOT EXISTS ix_xfer_sender   ON core.inter_sku_transfers(sender_va_id);
+CREATE INDEX IF NOT EXISTS ix_xfer_receiver ON core.inter_sku_transfers(receiver_va_id);
+CREATE INDEX IF NOT EXISTS ix_xfer_period   ON core.inter_sku_transfers(period_ym);
+
+-- Months detached from core.va_txn_flows (core.archive_flows_period); refreshes
+-- leave them alone, so archived flows stay as they were when detached.
+CREATE TABLE IF NOT EXISTS core.flows_archived_period (
+  period_ym   text PRIMARY KEY,
+  archived_as text NOT NULL,
+  archived_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION core.flows_partition_name(p_period text)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE
+AS $$
+  SELECT 'va_txn_flows_p' || replace(p_period, '-', '_');
+$$;
+
+-- Create the monthly partitions flows for p_periods will be inserted into.
+CREATE OR REPLACE FUNCTION core.ensure_flows_partitions(p_periods text[])
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_period text;
+BEGIN
+  FOR v_period IN
+    SELECT DISTINCT u.period_ym
+    FROM unnest(p_periods) AS u(period_ym)
+    WHERE u.period_ym IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM core.flows_archived_period a WHERE a.period_ym = u.period_ym)
+  LOOP
+    EXECUTE format('CREATE TABLE IF NOT EXISTS core.%I PARTITION OF core.va_txn_flows FOR VALUES IN (%L)',
+                   core.flows_partition_name(v_period), v_period);
+  END LOOP;
+END;
+$$;
+
+-- Detach one month of flows and move it to p_schema; Level 1/2 reports then
+-- cover the attached months only. core.restore_flows_period() undoes it.
+CREATE OR REPLACE FUNCTION core.archive_flows_period(p_period text, p_schema text DEFAULT 'archive')
+RETURNS regclass
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_part text := core.flows_partition_name(p_period);
+BEGIN
+  IF to_regclass(format('core.%I', v_part)) IS NULL THEN
+    RAISE EXCEPTION 'No flows partition for period %', p_period;
+  END IF;
+  PERFORM 1 FROM core.flows_state FOR UPDATE;
+  EXECUTE format('CREATE SCHEMA IF NOT EXISTS %I', p_schema);
+  EXECUTE format('ALTER TABLE core.va_txn_flows DETACH PARTITION core.%I', v_part);
+  EXECUTE format('ALTER TABLE core.%I SET SCHEMA %I', v_part, p_schema);
+  INSERT INTO core.flows_archived_period (period_ym, archived_as)
+  VALUES (p_period, format('%I.%I', p_schema, v_part));
+  RETURN format('%I.%I', p_schema, v_part)::regclass;
+END;
+$$;
+
+-- Re-attach an archived month as it was detached. Changes queued for its
+-- transactions meanwhile were skipped; run a full refresh to re-derive it.
+CREATE OR REPLACE FUNCTION core.restore_flows_period(p_period text)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_archived text;
+BEGIN
+  PERFORM 1 FROM core.flows_state FOR UPDATE;
+  DELETE FROM core.flows_archived_period WHERE period_ym = p_period RETURNING archived_as INTO v_archived;
+  IF v_archived IS NULL THEN
+    RAISE EXCEPTION 'Period % is not archived', p_period;
+  END IF;
+  EXECUTE format('ALTER TABLE %s SET SCHEMA core', v_archived);
+  -- Months archived before core.va_txn_flows had va_id cannot attach without it.
+  EXECUTE format('ALTER TABLE core.%I ADD COLUMN IF NOT EXISTS va_id integer',
+                 core.flows_partition_name(p_period));
+  EXECUTE format('ALTER TABLE core.va_txn_flows ATTACH PARTITION core.%I FOR VALUES IN (%L)',
+                 core.flows_partition_name(p_period), p_period);
+END;
+$$;
+
+-- Raw rows are identified by their load batch (source_file, load_at).
+CREATE INDEX IF NOT EXISTS ix_raw_va_txn_load_at ON raw.va_txn(load_at);
+
+-- Work queues filled by the triggers below, drained by refresh_va_txn_flows().
+CREATE TABLE IF NOT EXISTS core.flows_pending_batch (source_file text, load_at timestamptz NOT NULL);
+-- The VA queue used to hold va_number text; it now holds ref.va ids.
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_attribute
+             WHERE attrelid = to_regclass('core.flows_pending_va') AND attname = 'va_number') THEN
+    DROP TABLE core.flows_pending_va;
+    IF to_regclass('core.flows_state') IS NOT NULL THEN
+      UPDATE core.flows_state SET needs_rebuild = true;
+    END IF;
+  END IF;
+END$$;
+CREATE TABLE IF NOT EXISTS core.flows_pending_va    (va_id integer NOT NULL);
+
+-- Remark rule edits are now queued as invalidated remarks (core.remark_category_stale).
+DROP TRIGGER IF EXISTS flows_rule_ins ON ref.remarks_category_map;
+DROP TRIGGER IF EXISTS flows_rule_upd ON ref.remarks_category_map;
+DROP TRIGGER IF EXISTS flows_rule_del ON ref.remarks_category_map;
+DROP TRIGGER IF EXISTS flows_rule_trunc ON ref.remarks_category_map;
+DROP FUNCTION IF EXISTS core.trg_flows_queue_rule();
+DROP TABLE IF EXISTS core.flows_pending_rule;
+
+CREATE TABLE IF NOT EXISTS core.flows_state (
+  singleton     boolean PRIMARY KEY DEFAULT true CHECK (singleton),
+  needs_rebuild boolean NOT NULL DEFAULT true,
+  refreshed_at  timestamptz
+);
+INSERT INTO core.flows_state DEFAULT VALUES ON CONFLICT DO NOTHING;
+
+-- Backfill tables added after the typed layer was first built.
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM core.va_txn_typed) AND NOT EXISTS (SELECT 1 FROM core.inter_sku_transfers) THEN
+    UPDATE core.flows_state SET needs_rebuild = true;
+  END IF;
+END$$;
+
+-- Flow rows for typed transactions outside archived months; filters on txn_id /
+-- va_id push into both branches.
+CREATE OR REPLACE VIEW core.v_va_txn_flows_calc AS
 SELECT
-  va_number,
-  sku_id,
-  merchant_id,
-  category_code,
-  direction,
-  amount AS raw_amount,
-  CASE WHEN direction = 'inflow' THEN amount ELSE -amount END AS signed_amount,
-  occurred_at_utc,
-  to_char(occurred_at_utc::date, 'YYYY-MM') AS period_ym,
-  remarks
-FROM recv_match
+  t.txn_id,
+  t.receiver_va AS va_number,
+  n.sku_id,
+  n.merchant_id,
+  t.category_code,
+  'inflow'::text AS direction,
+  t.amount AS raw_amount,
+  t.amount AS signed_amount,
+  t.occurred_at_utc,
+  to_char(t.occurred_at_utc::date, 'YYYY-MM') AS period_ym,
+  t.remarks,
+  t.receiver_va_id AS va_id
+FROM core.va_txn_typed t
+JOIN ref.note_sku_va_map n ON n.va_id = t.receiver_va_id
+WHERE NOT EXISTS (
+  SELECT 1 FROM core.flows_archived_period a
+  WHERE a.period_ym = to_char(t.occurred_at_utc::date, 'YYYY-MM'))
 UNION ALL
 SELECT
-  va_number,
-  sku_id,
-  merchant_id,
-  category_code,
-  direction,
-  amount AS raw_amount,
-  CASE WHEN direction = 'inflow' THEN amount ELSE -amount END AS signed_amount,
-  occurred_at_utc,
-  to_char(occurred_at_utc::date, 'YYYY-MM') AS period_ym,
-  remarks
-FROM send_match
-;
-
-CREATE INDEX IF NOT EXISTS ix_mv_flows_sku     ON core.mv_va_txn_flows(sku_id);
-CREATE INDEX IF NOT EXISTS ix_mv_flows_va      ON core.mv_va_txn_flows(va_number);
-CREATE INDEX IF NOT EXISTS ix_mv_flows_cat     ON core.mv_va_txn_flows(category_code);
-CREATE INDEX IF NOT EXISTS ix_mv_flows_dir     ON core.mv_va_txn_flows(direction);
-CREATE INDEX IF NOT EXISTS ix_mv_flows_period  ON core.mv_va_txn_flows(period_ym);
+  t.txn_id,
+  t.sender_va AS va_number,
+  n.sku_id,
+  n.merchant_id,
+  t.category_code,
+  'outflow'::text AS direction,
+  t.amount AS raw_amount,
+  -t.amount AS signed_amount,
+  t.occurred_at_utc,
+  to_char(t.occurred_at_utc::date, 'YYYY-MM') AS period_ym,
+  t.remarks,
+  t.sender_va_id AS va_id
+FROM core.va_txn_typed t
+JOIN ref.note_sku_va_map n ON n.va_id = t.sender_va_id
+WHERE NOT EXISTS (
+  SELECT 1 FROM core.flows_archived_period a
+  WHERE a.period_ym = to_char(t.occurred_at_utc::date, 'YYYY-MM'));
+
+-- Transfers between two different mapped SKUs; filters on txn_id / VA push into the scan.
+CREATE OR REPLACE VIEW core.v_inter_sku_transfers_calc AS
+SELECT
+  t.txn_id,
+  t.sender_va,
+  t.receiver_va,
+  t.amount,
+  t.occurred_at_utc,
+  s.sku_id      AS from_sku_id,
+  s.merchant_id AS from_merchant_id,
+  r.sku_id      AS to_sku_id,
+  r.merchant_id AS to_merchant_id,
+  to_char(t.occurred_at_utc::date, 'YYYY-MM') AS period_ym,
+  t.sender_va_id,
+  t.receiver_va_id
+FROM core.va_txn_typed t
+JOIN ref.note_sku_va_map s ON s.va_id = t.sender_va_id
+JOIN ref.note_sku_va_map r ON r.va_id = t.receiver_va_id
+WHERE s.sku_key <> r.sku_key;
+
+-- Queueing triggers (statement level, transition tables).
+CREATE OR REPLACE FUNCTION core.trg_flows_queue_batch()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO core.flows_pending_batch SELECT DISTINCT source_file, load_at FROM new_rows;
+  END IF;
+  IF TG_OP IN ('DELETE', 'UPDATE') THEN
+    INSERT INTO core.flows_pending_batch SELECT DISTINCT source_file, load_at FROM old_rows;
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION core.trg_flows_queue_va()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO core.flows_pending_va SELECT DISTINCT va_id FROM new_rows WHERE va_id IS NOT NULL;
+  END IF;
+  IF TG_OP IN ('DELETE', 'UPDATE') THEN
+    INSERT INTO core.flows_pending_va SELECT DISTINCT va_id FROM old_rows WHERE va_id IS NOT NULL;
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION core.trg_flows_needs_rebuild()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  UPDATE core.flows_state SET needs_rebuild = true;
+  RETURN NULL;
+END;
+$$;
+
+DO $$
+DECLARE
+  t record;
+BEGIN
+  FOR t IN
+    SELECT * FROM (VALUES
+      ('raw.va_txn',                'flows_batch', 'core.trg_flows_queue_batch()'),
+      ('ref.note_sku_va_map',       'flows_va',    'core.trg_flows_queue_va()')
+    ) AS v(tbl, prefix, fn)
+  LOOP
+    EXECUTE format('DROP TRIGGER IF EXISTS %I ON %s', t.prefix || '_ins', t.tbl);
+    EXECUTE format('DROP TRIGGER IF EXISTS %I ON %s', t.prefix || '_upd', t.tbl);
+    EXECUTE format('DROP TRIGGER IF EXISTS %I ON %s', t.prefix || '_del', t.tbl);
+    EXECUTE format('DROP TRIGGER IF EXISTS %I ON %s', t.prefix || '_trunc', t.tbl);
+    EXECUTE format('CREATE TRIGGER %I AFTER INSERT ON %s REFERENCING NEW TABLE AS new_rows '
+                   'FOR EACH STATEMENT EXECUTE FUNCTION %s', t.prefix || '_ins', t.tbl, t.fn);
+    EXECUTE format('CREATE TRIGGER %I AFTER UPDATE ON %s REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows '
+                   'FOR EACH STATEMENT EXECUTE FUNCTION %s', t.prefix || '_upd', t.tbl, t.fn);
+    EXECUTE format('CREATE TRIGGER %I AFTER DELETE ON %s REFERENCING OLD TABLE AS old_rows '
+                   'FOR EACH STATEMENT EXECUTE FUNCTION %s', t.prefix || '_del', t.tbl, t.fn);
+    EXECUTE format('CREATE TRIGGER %I AFTER TRUNCATE ON %s '
+                   'FOR EACH STATEMENT EXECUTE FUNCTION core.trg_flows_needs_rebuild()', t.prefix || '_trunc', t.tbl);
+  END LOOP;
+END$$;
+
+-- Apply queued changes; p_full (or a TRUNCATE of a source) rebuilds everything.
+CREATE OR REPLACE FUNCTION core.refresh_va_txn_flows(p_full boolean DEFAULT false)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_last_txn bigint;
+  v_batches  bigint;
+  v_typed    bigint;
+  v_recat    bigint;
+  v_vas      integer[];
+BEGIN
+  -- One refresh at a time; loads can keep queueing meanwhile.
+  PERFORM 1 FROM core.flows_state FOR UPDATE;
+  IF to_regclass('pg_temp._flows_batch') IS NOT NULL THEN
+    DROP TABLE _flows_batch, _flows_recat;
+  END IF;
+
+  IF p_full OR (SELECT needs_rebuild FROM core.flows_state) THEN
+    -- DELETE rather than TRUNCATE: readers keep the old rows until this commits.
+    DELETE FROM core.va_txn_flows;
+    DELETE FROM core.inter_sku_transfers;
+    DELETE FROM core.va_txn_typed;
+    DELETE FROM core.flows_pending_batch;
+    DELETE FROM core.flows_pending_va;
+    DELETE FROM core.remark_category_stale;
+    DELETE FROM core.remark_category_cache;
+    INSERT INTO core.flows_pending_batch SELECT DISTINCT source_file, load_at FROM raw.va_txn;
+    UPDATE core.flows_state SET needs_rebuild = false;
+  END IF;
+
+  -- 1) Raw batches loaded/deleted since last time: drop their typed rows and re-type
+  --    whatever raw rows the batch still has (none if it was deleted).
+  CREATE TEMP TABLE _flows_batch ON COMMIT DROP AS
+  WITH q AS (DELETE FROM core.flows_pending_batch RETURNING source_file, load_at)
+  SELECT DISTINCT source_file, load_at FROM q;
+  GET DIAGNOSTICS v_batches = ROW_COUNT;
+
+  IF v_batches > 0 THEN
+    DELETE FROM core.va_txn_flows f
+    USING core.va_txn_typed t, _flows_batch b
+    WHERE f.txn_id = t.txn_id
+      AND t.load_at = b.load_at AND t.source_file IS NOT DISTINCT FROM b.source_file;
+    DELETE FROM core.inter_sku_transfers x
+    USING core.va_txn_typed t, _flows_batch b
+    WHERE x.txn_id = t.txn_id
+      AND t.load_at = b.load_at AND t.source_file IS NOT DISTINCT FROM b.source_file;
+    DELETE FROM core.va_txn_typed t
+    USING _flows_batch b
+    WHERE t.load_at = b.load_at AND t.source_file IS NOT DISTINCT FROM b.source_file;
+
+    SELECT COALESCE(max(txn_id), 0) INTO v_last_txn FROM core.va_txn_typed;
+
+    -- Register the batch's VA numbers so every typed row carries both ids.
+    INSERT INTO ref.va (va_number)
+    SELECT DISTINCT v.va_number
+    FROM raw.va_txn r
+    JOIN _flows_batch b
+      ON r.load_at = b.load_at AND r.source_file IS NOT DISTINCT FROM b.source_file
+    CROSS JOIN LATERAL (VALUES (ref.normalize_va(r.sender_virtual_account_number)),
+                               (ref.normalize_va(r.receiver_virtual_account_number))) AS v(va_number)
+    WHERE v.va_number IS NOT NULL
+    ON CONFLICT (va_number) DO NOTHING;
+
+    WITH src AS (
+      SELECT
+        r.source_file,
+        r.load_at,
+        ref.normalize_va(r.sender_virtual_account_number)   AS sender_va,
+        NULLIF(r.sender_note_id,'')       AS sender_note_id,
+        ref.normalize_va(r.receiver_virtual_account_number) AS receiver_va,
+        NULLIF(r.receiver_note_id,'')     AS receiver_note_id,
+        r.amount_num                      AS amount,
+        r.date_ts                         AS occurred_at_utc,
+        core.normalize_remark(r.remarks)  AS remarks
+      FROM raw.va_txn r
+      JOIN _flows_batch b
+        ON r.load_at = b.load_at AND r.source_file IS NOT DISTINCT FROM b.source_file
+    ),
+    cat AS (
+      -- Cached per distinct remark; regex rules only run for unseen remarks.
+      SELECT c.remarks, COALESCE(c.category_code, 'uncategorized') AS category_code
+      FROM core.categorize_remarks(ARRAY(SELECT DISTINCT remarks FROM src)) c
+    )
+    INSERT INTO core.va_txn_typed
+      (source_file, load_at, sender_va, sender_note_id, receiver_va, receiver_note_id,
+       amount, occurred_at_utc, remarks, category_code, sender_va_id, receiver_va_id)
+    SELECT s.source_file, s.load_at, s.sender_va, s.sender_note_id, s.receiver_va, s.receiver_note_id,
+           s.amount, s.occurred_at_utc, s.remarks, c.category_code, sv.va_id, rv.va_id
+    FROM src s
+    JOIN cat c ON c.remarks = s.remarks
+    LEFT JOIN ref.va sv ON sv.va_number = s.sender_va
+    LEFT JOIN ref.va rv ON rv.va_number = s.receiver_va;
+    GET DIAGNOSTICS v_typed = ROW_COUNT;
+
+    PERFORM core.ensure_flows_partitions(ARRAY(
+      SELECT DISTINCT to_char(occurred_at_utc::date, 'YYYY-MM')
+      FROM core.va_txn_typed WHERE txn_id > v_last_txn));
+    INSERT INTO core.va_txn_flows
+    SELECT * FROM core.v_va_txn_flows_calc WHERE txn_id > v_last_txn;
+    INSERT INTO core.inter_sku_transfers
+    SELECT * FROM core.v_inter_sku_transfers_calc WHERE txn_id > v_last_txn;
+  END IF;
+
+  -- 2) Remarks rules added/changed/removed: re-categorize only the remarks whose
+  --    cached category the edit invalidated.
+  CREATE TEMP TABLE _flows_recat ON COMMIT DROP AS
+  WITH q AS (DELETE FROM core.remark_category_stale RETURNING remarks)
+  SELECT c.remarks, COALESCE(c.category_code, 'uncategorized') AS category_code
+  FROM core.categorize_remarks(ARRAY(SELECT DISTINCT remarks FROM q)) c;
+
+  UPDATE core.va_txn_typed t
+  SET category_code = r.category_code
+  FROM _flows_recat r
+  WHERE t.remarks = r.remarks AND t.category_code <> r.category_code;
+  GET DIAGNOSTICS v_recat = ROW_COUNT;
+
+  IF v_recat > 0 THEN
+    UPDATE core.va_txn_flows f
+    SET category_code = r.category_code
+    FROM _flows_recat r
+    WHERE f.remarks = r.remarks AND f.category_code <> r.category_code;
+  END IF;
+
+  -- 3) VAs whose SKU mapping changed: rebuild just their inflow/outflow and transfer rows.
+  WITH q AS (DELETE FROM core.flows_pending_va RETURNING va_id)
+  SELECT array_agg(DISTINCT va_id) INTO v_vas FROM q;
+
+  IF v_vas IS NOT NULL THEN
+    DELETE FROM core.va_txn_flows WHERE va_id = ANY (v_vas);
+    PERFORM core.ensure_flows_partitions(ARRAY(
+      SELECT DISTINCT to_char(occurred_at_utc::date, 'YYYY-MM')
+      FROM core.va_txn_typed WHERE receiver_va_id = ANY (v_vas) OR sender_va_id = ANY (v_vas)));
+    INSERT INTO core.va_txn_flows
+    SELECT * FROM core.v_va_txn_flows_calc WHERE va_id = ANY (v_vas);
+    DELETE FROM core.inter_sku_transfers
+    WHERE sender_va_id = ANY (v_vas) OR receiver_va_id = ANY (v_vas);
+    INSERT INTO core.inter_sku_transfers
+    SELECT * FROM core.v_inter_sku_transfers_calc
+    WHERE sender_va_id = ANY (v_vas) OR receiver_va_id = ANY (v_vas);
+  END IF;
+
+  UPDATE core.flows_state SET refreshed_at = now();
+  RAISE NOTICE 'va_txn_flows: % batch(es), % row(s) typed, % re-categorized, % VA(s) remapped',
+    v_batches, COALESCE(v_typed, 0), v_recat, COALESCE(array_length(v_vas, 1), 0);
+END;
+$$;
+
+-- Receiver-mapped view of the typed layer. Recreated each bootstrap so the unique
+-- (txn_id, map_id) key is always present; refreshed after core.va_txn_typed.
+DROP MATERIALIZED VIEW IF EXISTS core.mv_va_txn CASCADE;
+CREATE MATERIALIZED VIEW core.mv_va_txn AS
+SELECT
+  t.txn_id,
+  COALESCE(n.map_id, 0)                    AS map_id,
+  COALESCE(t.receiver_va, t.sender_va)     AS va_number,
+  n.sku_id,
+  n.merchant_id,
+  NULLIF(t.category_code, 'uncategorized') AS category_code,
+  t.amount,
+  t.occurred_at_utc,
+  to_char(t.occurred_at_utc::date, 'YYYY-MM') AS period_ym,
+  t.remarks
+FROM core.va_txn_typed t
+LEFT JOIN ref.note_sku_va_map n ON n.va_id = t.receiver_va_id;
 
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_vatxn_key ON core.mv_va_txn(txn_id, map_id);
+CREATE INDEX IF NOT EXISTS ix_mv_vatxn_va ON core.mv_va_txn(va_number);
+CREATE INDEX IF NOT EXISTS ix_mv_vatxn_sku ON core.mv_va_txn(sku_id);
+CREATE INDEX IF NOT EXISTS ix_mv_vatxn_cat ON core.mv_va_txn(category_code);
+CREATE INDEX IF NOT EXISTS ix_mv_vatxn_period ON core.mv_va_txn(period_ym);
 
 CREATE OR REPLACE VIEW core.v_flows_pivot AS
 SELECT
@@ -107,5 +563,5 @@ SELECT
     sum(CASE WHEN category_code = 'fh_add_admin_fee'::text AND direction = 'outflow'::text THEN -signed_amount ELSE 0::numeric END) AS additional_admin_fee_paid,
     sum(CASE WHEN category_code = 'senior_add_investor_interest'::text AND direction = 'outflow'::text THEN -signed_amount ELSE 0::numeric END) AS sr_add_interest_paid,
     sum(CASE WHEN category_code = 'junior_add_investor_interest'::text AND direction = 'outflow'::text THEN -signed_amount ELSE 0::numeric END) AS jr_add_interest_paid
-   FROM core.mv_va_txn_flows
-  GROUP BY sku_id, merchant_id;
\ No newline at end of file
+   FROM core.va_txn_flows
+  GROUP BY sku_id, merchant_id;
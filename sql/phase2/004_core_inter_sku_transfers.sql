@@ -1,33 +1,22 @@
 -- sql/phase2/004_core_inter_sku_transfers.sql
 SET search_path = core, public;
 
+-- Materialized in core.inter_sku_transfers by core.refresh_va_txn_flows()
+-- (003_core_mviews_flows.sql), so Level 2a never re-reads raw.va_txn. Archived
+-- months are left out, as they are from core.va_txn_flows.
 CREATE OR REPLACE VIEW core.v_inter_sku_transfers AS
-WITH t AS (
-  SELECT
-    v.sender_virtual_account_number   AS sender_va,
-    v.receiver_virtual_account_number AS receiver_va,
-    core.to_numeric_safe(v.amount)    AS amount,
-    core.to_tstz_safe(v.date)         AS occurred_at_utc
-  FROM raw.va_txn v
-),
-m AS (
-  SELECT
-    t.*,
-    s.sku_id        AS from_sku_id,
-    s.merchant_id   AS from_merchant_id,
-    r.sku_id        AS to_sku_id,
-    r.merchant_id   AS to_merchant_id
-  FROM t
-  LEFT JOIN ref.note_sku_va_map s ON s.va_number = t.sender_va
-  LEFT JOIN ref.note_sku_va_map r ON r.va_number = t.receiver_va
-)
 SELECT
-  m.*,
-  to_char(m.occurred_at_utc::date,'YYYY-MM') AS period_ym
-FROM m
-WHERE from_sku_id IS NOT NULL
-  AND to_sku_id   IS NOT NULL
-  AND from_sku_id <> to_sku_id;
+  sender_va,
+  receiver_va,
+  amount,
+  occurred_at_utc,
+  from_sku_id,
+  from_merchant_id,
+  to_sku_id,
+  to_merchant_id,
+  period_ym
+FROM core.inter_sku_transfers x
+WHERE NOT EXISTS (SELECT 1 FROM core.flows_archived_period a WHERE a.period_ym = x.period_ym);
 
 CREATE OR REPLACE VIEW core.v_inter_sku_transfers_agg AS
 WITH base AS (SELECT * FROM core.v_inter_sku_transfers)
@@ -0,0 +1,313 @@
+-- sql/phase2/009_mart_sku_facts.sql
+-- Per-refresh fact layer behind the report views: the flows pivot, expectations,
+-- UI extracts and inter-SKU transfers are aggregated once here, so mart.v_level1,
+-- mart.v_level2a and mart.v_level2b only read and combine pre-computed rows
+-- (mart.mv_flows_period does the same per month for the period-sliced reports).
+SET search_path = mart, public;
+
+-- Level 1 grain: one row per SKU/VA mapping. Pulled and sales amounts are
+-- attributed to the first VA of the SKU (resp. first SKU of the VA) so they are
+-- not counted twice across mappings.
+DROP MATERIALIZED VIEW IF EXISTS mart.mv_sku_va_facts CASCADE;
+CREATE MATERIALIZED VIEW mart.mv_sku_va_facts AS
+WITH universe AS (
+  SELECT DISTINCT
+    n.sku_id,
+    n.va_number      AS account_number,
+    m.merchant_name,
+    ROW_NUMBER() OVER(PARTITION BY n.sku_id ORDER BY n.va_number) as sku_va_rank,
+    ROW_NUMBER() OVER(PARTITION BY n.va_number ORDER BY n.sku_id) as va_sku_rank
+  FROM ref.note_sku_va_map n
+  JOIN ref.merchant m ON m.merchant_id = n.merchant_id
+),
+pulled AS (
+  SELECT
+    va_number AS account_number,
+    SUM(buy_amount) AS amount_pulled
+  FROM core.mv_external_accounts
+  GROUP BY 1
+),
+received AS (
+  SELECT
+    f.sku_id,
+    f.va_number AS account_number,
+    SUM(CASE WHEN f.direction = 'inflow' AND f.category_code = 'merchant_repayment' THEN f.signed_amount ELSE 0 END) AS amount_received
+  FROM core.va_txn_flows f
+  GROUP BY 1,2
+),
+sales AS (
+  SELECT
+    s.sku_id,
+    SUM(s.sales_proceeds) AS sales_proceeds
+  FROM core.mv_repmt_sales s
+  GROUP BY 1
+)
+SELECT
+  u.sku_id,
+  u.account_number,
+  u.merchant_name,
+  u.sku_va_rank,
+  u.va_sku_rank,
+  CASE WHEN u.va_sku_rank = 1 THEN COALESCE(p.amount_pulled, 0) ELSE 0 END  AS amount_pulled,
+  COALESCE(r.amount_received, 0)                                            AS amount_received,
+  CASE WHEN u.sku_va_rank = 1 THEN COALESCE(s.sales_proceeds, 0) ELSE 0 END AS sales_proceeds
+FROM universe u
+LEFT JOIN pulled p   ON p.account_number = u.account_number
+LEFT JOIN received r ON r.sku_id = u.sku_id AND r.account_number = u.account_number
+LEFT JOIN sales s    ON s.sku_id = u.sku_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_sku_va_facts_key ON mart.mv_sku_va_facts(sku_id, sku_va_rank);
+CREATE INDEX IF NOT EXISTS ix_mv_sku_va_facts_va ON mart.mv_sku_va_facts(account_number);
+
+-- Level 2 grain: one row per SKU/merchant seen in the flows, the expectations
+-- (core.mv_repmt_sku joined to ref.sku) or ref.sku itself. Totals stay NULL when
+-- the source has no row for the key; the report views decide how to default them.
+--   in_level2a  => present in the flows or the expectations (mart.v_level2a rows)
+--   in_sku_ref  => present in ref.sku (mart.v_level2b rows)
+DROP MATERIALIZED VIEW IF EXISTS mart.mv_sku_facts CASCADE;
+CREATE MATERIALIZED VIEW mart.mv_sku_facts AS
+WITH paid AS (
+  SELECT
+    sku_id,
+    merchant_id,
+    amount_received,
+    management_fee_paid,
+    admin_fee_paid,
+    additional_admin_fee_paid,
+    interest_difference_paid,
+    sr_principal_paid,
+    sr_interest_paid,
+    sr_add_interest_paid,
+    jr_principal_paid,
+    jr_interest_paid,
+    jr_add_interest_paid,
+    spar_paid
+  FROM core.v_flows_pivot
+),
+expected AS (
+  SELECT
+    s.sku_id,
+    k.merchant_id,
+    COALESCE(SUM(s.acquirer_fees_expected),0) AS management_fee_expected,
+    COALESCE(SUM(s.fh_admin_fees_expected),0) AS admin_fee_expected,
+    COALESCE(SUM(s.additional_admin_fee_expected),0) AS additional_admin_fee_expected,
+    COALESCE(SUM(s.int_difference_expected),0) AS interest_difference_expected,
+    COALESCE(SUM(s.sr_principal_expected),0) AS sr_principal_expected,
+    COALESCE(SUM(s.sr_interest_expected),0) AS sr_interest_expected,
+    COALESCE(SUM(s.sr_add_interest_expected),0) AS sr_add_interest_expected,
+    COALESCE(SUM(s.jr_principal_expected),0) AS jr_principal_expected,
+    COALESCE(SUM(s.jr_interest_expected),0) AS jr_interest_expected,
+    COALESCE(SUM(s.jr_add_interest_expected),0) AS jr_add_interest_expected,
+    COALESCE(SUM(s.spar_merchant),0) AS spar_expected
+  FROM core.mv_repmt_sku s
+  JOIN ref.sku k ON k.sku_id = s.sku_id
+  GROUP BY 1,2
+),
+ui_paid AS (
+  SELECT
+    s.sku_id,
+    COALESCE(SUM(s.acquirer_fees_paid), 0::numeric) AS management_fee_ui,
+    COALESCE(SUM(s.fh_admin_fees_paid), 0::numeric) AS admin_fee_ui,
+    COALESCE(SUM(s.int_difference_paid), 0::numeric) AS interest_difference_ui,
+    COALESCE(SUM(s.sr_principal_paid), 0::numeric) AS sr_principal_ui,
+    COALESCE(SUM(s.sr_interest_paid), 0::numeric) AS sr_interest_ui,
+    COALESCE(SUM(s.jr_principal_paid), 0::numeric) AS jr_principal_ui,
+    COALESCE(SUM(s.jr_interest_paid), 0::numeric) AS jr_interest_ui,
+    COALESCE(SUM(s.spar_merchant), 0::numeric) AS spar_ui,
+    COALESCE(SUM(s.additional_interests_paid_to_fh), 0::numeric) AS fh_platform_ui
+  FROM core.mv_repmt_sku s
+  GROUP BY 1
+),
+sales AS (
+  SELECT
+    s.sku_id,
+    COALESCE(SUM(s.total_funds_inflow), 0) AS total_funds_inflow_ui,
+    COALESCE(SUM(s.sales_proceeds), 0) AS sales_proceeds,
+    COALESCE(SUM(s.merchant_top_up), 0) AS merchant_top_up,
+    COALESCE(SUM(s.disbursement_surplus), 0) AS disbursement_surplus
+  FROM core.mv_repmt_sales s
+  GROUP BY 1
+),
+level2a AS (
+  SELECT
+    COALESCE(p.sku_id, e.sku_id) AS sku_id,
+    COALESCE(p.merchant_id, e.merchant_id) AS merchant_id,
+    true AS in_level2a,
+    p.amount_received,
+    p.management_fee_paid, p.admin_fee_paid, p.additional_admin_fee_paid, p.interest_difference_paid,
+    p.sr_principal_paid, p.sr_interest_paid, p.sr_add_interest_paid, p.jr_principal_paid, p.jr_interest_paid, p.jr_add_interest_paid, p.spar_paid,
+    e.management_fee_expected, e.admin_fee_expected, e.additional_admin_fee_expected, e.interest_difference_expected,
+    e.sr_principal_expected, e.sr_interest_expected, e.sr_add_interest_expected, e.jr_principal_expected, e.jr_interest_expected, e.jr_add_interest_expected, e.spar_expected
+  FROM paid p
+  FULL OUTER JOIN expected e ON e.sku_id = p.sku_id AND e.merchant_id = p.merchant_id
+),
+keyed AS (
+  SELECT
+    COALESCE(j.sku_id, k.sku_id) AS sku_id,
+    COALESCE(j.merchant_id, k.merchant_id) AS merchant_id,
+    COALESCE(j.in_level2a, false) AS in_level2a,
+    k.sku_id IS NOT NULL AS in_sku_ref,
+    j.amount_received,
+    j.management_fee_paid, j.admin_fee_paid, j.additional_admin_fee_paid, j.interest_difference_paid,
+    j.sr_principal_paid, j.sr_interest_paid, j.sr_add_interest_paid, j.jr_principal_paid, j.jr_interest_paid, j.jr_add_interest_paid, j.spar_paid,
+    j.management_fee_expected, j.admin_fee_expected, j.additional_admin_fee_expected, j.interest_difference_expected,
+    j.sr_principal_expected, j.sr_interest_expected, j.sr_add_interest_expected, j.jr_principal_expected, j.jr_interest_expected, j.jr_add_interest_expected, j.spar_expected
+  FROM level2a j
+  FULL OUTER JOIN ref.sku k ON k.sku_id = j.sku_id AND k.merchant_id = j.merchant_id
+)
+SELECT
+  f.sku_id,
+  f.merchant_id,
+  mr.merchant_name,
+  f.in_level2a,
+  f.in_sku_ref,
+  f.amount_received,
+  f.management_fee_paid, f.admin_fee_paid, f.additional_admin_fee_paid, f.interest_difference_paid,
+  f.sr_principal_paid, f.sr_interest_paid, f.sr_add_interest_paid, f.jr_principal_paid, f.jr_interest_paid, f.jr_add_interest_paid, f.spar_paid,
+  f.management_fee_expected, f.admin_fee_expected, f.additional_admin_fee_expected, f.interest_difference_expected,
+  f.sr_principal_expected, f.sr_interest_expected, f.sr_add_interest_expected, f.jr_principal_expected, f.jr_interest_expected, f.jr_add_interest_expected, f.spar_expected,
+  u.management_fee_ui, u.admin_fee_ui, u.interest_difference_ui, u.sr_principal_ui, u.sr_interest_ui,
+  u.jr_principal_ui, u.jr_interest_ui, u.spar_ui, u.fh_platform_ui,
+  i.total_funds_inflow_ui, i.sales_proceeds, i.merchant_top_up, i.disbursement_surplus,
+  tx.transfer_out_to_other_sku,
+  tx.transfer_in_from_other_sku
+FROM keyed f
+LEFT JOIN ref.merchant mr ON mr.merchant_id = f.merchant_id
+LEFT JOIN ui_paid u ON u.sku_id = f.sku_id
+LEFT JOIN sales i ON i.sku_id = f.sku_id
+LEFT JOIN core.v_inter_sku_transfers_agg tx
+  ON tx.sku_id = f.sku_id AND tx.merchant_id = f.merchant_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_sku_facts_key ON mart.mv_sku_facts(sku_id, merchant_id);
+
+-- Ledger totals per month, SKU/merchant and VA: what the period-sliced reports
+-- (mart.level1 / level2a / level2b) sum over instead of scanning core.va_txn_flows.
+DROP MATERIALIZED VIEW IF EXISTS mart.mv_flows_period CASCADE;
+CREATE MATERIALIZED VIEW mart.mv_flows_period AS
+SELECT
+    period_ym,
+    sku_id,
+    merchant_id,
+    va_number,
+    sum(CASE WHEN direction = 'inflow'::text AND category_code = 'merchant_repayment'::text THEN signed_amount ELSE 0::numeric END) AS amount_received,
+    sum(CASE WHEN category_code = 'admin_fee'::text AND direction = 'outflow'::text THEN -signed_amount ELSE 0::numeric END) AS admin_fee_paid,
+    sum(CASE WHEN category_code = 'mgmt_fee'::text AND direction = 'outflow'::text THEN -signed_amount ELSE 0::numeric END) AS management_fee_paid,
+    sum(CASE WHEN category_code = 'int_diff'::text AND direction = 'outflow'::text THEN -signed_amount ELSE 0::numeric END) AS interest_difference_paid,
+    sum(CASE WHEN category_code = 'sr_prin'::text AND direction = 'outflow'::text THEN -signed_amount ELSE 0::numeric END) AS sr_principal_paid,
+    sum(CASE WHEN category_code = 'sr_int'::text AND direction = 'outflow'::text THEN -signed_amount ELSE 0::numeric END) AS sr_interest_paid,
+    sum(CASE WHEN category_code = 'jr_prin'::text AND direction = 'outflow'::text THEN -signed_amount ELSE 0::numeric END) AS jr_principal_paid,
+    sum(CASE WHEN category_code = 'jr_int'::text AND direction = 'outflow'::text THEN -signed_amount ELSE 0::numeric END) AS jr_interest_paid,
+    sum(CASE WHEN category_code = 'spar'::text AND direction = 'outflow'::text THEN -signed_amount ELSE 0::numeric END) AS spar_paid,
+    sum(CASE WHEN category_code = 'fh_add_admin_fee'::text AND direction = 'outflow'::text THEN -signed_amount ELSE 0::numeric END) AS additional_admin_fee_paid,
+    sum(CASE WHEN category_code = 'senior_add_investor_interest'::text AND direction = 'outflow'::text THEN -signed_amount ELSE 0::numeric END) AS sr_add_interest_paid,
+    sum(CASE WHEN category_code = 'junior_add_investor_interest'::text AND direction = 'outflow'::text THEN -signed_amount ELSE 0::numeric END) AS jr_add_interest_paid
+FROM core.va_txn_flows
+GROUP BY period_ym, sku_id, merchant_id, va_number;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_flows_period_key ON mart.mv_flows_period(period_ym, sku_id, merchant_id, va_number);
+
+-- mart.mv_sku_facts restricted to the months p_from..p_to ('YYYY-MM'; p_to
+-- defaults to p_from): paid, received and transfer totals come from those months
+-- only; expectations and the UI/sales extracts have no dates and are kept whole.
+CREATE OR REPLACE FUNCTION mart.sku_facts(p_from text, p_to text DEFAULT NULL)
+RETURNS SETOF mart.mv_sku_facts
+LANGUAGE sql
+STABLE
+AS $$
+  WITH paid AS (
+    SELECT
+      sku_id,
+      merchant_id,
+      SUM(amount_received) AS amount_received,
+      SUM(management_fee_paid) AS management_fee_paid,
+      SUM(admin_fee_paid) AS admin_fee_paid,
+      SUM(additional_admin_fee_paid) AS additional_admin_fee_paid,
+      SUM(interest_difference_paid) AS interest_difference_paid,
+      SUM(sr_principal_paid) AS sr_principal_paid,
+      SUM(sr_interest_paid) AS sr_interest_paid,
+      SUM(sr_add_interest_paid) AS sr_add_interest_paid,
+      SUM(jr_principal_paid) AS jr_principal_paid,
+      SUM(jr_interest_paid) AS jr_interest_paid,
+      SUM(jr_add_interest_paid) AS jr_add_interest_paid,
+      SUM(spar_paid) AS spar_paid
+    FROM mart.mv_flows_period
+    WHERE period_ym BETWEEN p_from AND COALESCE(p_to, p_from)
+    GROUP BY 1,2
+  ),
+  xfer AS (
+    SELECT
+      x.sku_id,
+      x.merchant_id,
+      SUM(x.out_amt) AS transfer_out_to_other_sku,
+      SUM(x.in_amt)  AS transfer_in_from_other_sku
+    FROM (
+      SELECT from_sku_id AS sku_id, from_merchant_id AS merchant_id, amount AS out_amt, 0::numeric AS in_amt
+      FROM core.v_inter_sku_transfers
+      WHERE period_ym BETWEEN p_from AND COALESCE(p_to, p_from)
+      UNION ALL
+      SELECT to_sku_id AS sku_id, to_merchant_id AS merchant_id, 0::numeric AS out_amt, amount AS in_amt
+      FROM core.v_inter_sku_transfers
+      WHERE period_ym BETWEEN p_from AND COALESCE(p_to, p_from)
+    ) x
+    GROUP BY 1,2
+  )
+  SELECT
+    f.sku_id,
+    f.merchant_id,
+    f.merchant_name,
+    p.sku_id IS NOT NULL OR f.management_fee_expected IS NOT NULL AS in_level2a,
+    f.in_sku_ref,
+    p.amount_received,
+    p.management_fee_paid, p.admin_fee_paid, p.additional_admin_fee_paid, p.interest_difference_paid,
+    p.sr_principal_paid, p.sr_interest_paid, p.sr_add_interest_paid, p.jr_principal_paid, p.jr_interest_paid, p.jr_add_interest_paid, p.spar_paid,
+    f.management_fee_expected, f.admin_fee_expected, f.additional_admin_fee_expected, f.interest_difference_expected,
+    f.sr_principal_expected, f.sr_interest_expected, f.sr_add_interest_expected, f.jr_principal_expected, f.jr_interest_expected, f.jr_add_interest_expected, f.spar_expected,
+    f.management_fee_ui, f.admin_fee_ui, f.interest_difference_ui, f.sr_principal_ui, f.sr_interest_ui,
+    f.jr_principal_ui, f.jr_interest_ui, f.spar_ui, f.fh_platform_ui,
+    f.total_funds_inflow_ui, f.sales_proceeds, f.merchant_top_up, f.disbursement_surplus,
+    tx.transfer_out_to_other_sku,
+    tx.transfer_in_from_other_sku
+  FROM mart.mv_sku_facts f
+  LEFT JOIN paid p ON p.sku_id = f.sku_id AND p.merchant_id = f.merchant_id
+  LEFT JOIN xfer tx ON tx.sku_id = f.sku_id AND tx.merchant_id = f.merchant_id;
+$$;
+
+-- mart.mv_sku_va_facts restricted to the months p_from..p_to ('YYYY-MM'; p_to
+-- defaults to p_from): pulled and received amounts come from those months only;
+-- sales proceeds come from the repayment extract, which has no dates, and the
+-- mappings and their ranks are those of the refresh.
+CREATE OR REPLACE FUNCTION mart.sku_va_facts(p_from text, p_to text DEFAULT NULL)
+RETURNS SETOF mart.mv_sku_va_facts
+LANGUAGE sql
+STABLE
+AS $$
+  WITH pulled AS (
+    SELECT
+      va_number AS account_number,
+      SUM(buy_amount) AS amount_pulled
+    FROM core.mv_external_accounts
+    WHERE period_ym BETWEEN p_from AND COALESCE(p_to, p_from)
+    GROUP BY 1
+  ),
+  received AS (
+    SELECT
+      sku_id,
+      va_number AS account_number,
+      SUM(amount_received) AS amount_received
+    FROM mart.mv_flows_period
+    WHERE period_ym BETWEEN p_from AND COALESCE(p_to, p_from)
+    GROUP BY 1,2
+  )
+  SELECT
+    u.sku_id,
+    u.account_number,
+    u.merchant_name,
+    u.sku_va_rank,
+    u.va_sku_rank,
+    CASE WHEN u.va_sku_rank = 1 THEN COALESCE(p.amount_pulled, 0) ELSE 0 END AS amount_pulled,
+    COALESCE(r.amount_received, 0)                                           AS amount_received,
+    u.sales_proceeds
+  FROM mart.mv_sku_va_facts u
+  LEFT JOIN pulled p   ON p.account_number = u.account_number
+  LEFT JOIN received r ON r.sku_id = u.sku_id AND r.account_number = u.account_number;
+$$;
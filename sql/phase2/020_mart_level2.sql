@@ -1,291 +1,318 @@
 -- sql/phase2/020_mart_level2.sql (DEFINITIVE FINAL VERSION)
 SET search_path = mart, public;
 
--- START of v_level2a definition
-CREATE OR REPLACE VIEW mart.v_level2a AS
-WITH paid AS (
-  SELECT
-    sku_id,
-    merchant_id,
-    COALESCE(amount_received, 0) AS amount_received,
-    COALESCE(management_fee_paid, 0) AS management_fee_paid,
-    COALESCE(admin_fee_paid, 0) AS admin_fee_paid,
-    COALESCE(additional_admin_fee_paid, 0) AS additional_admin_fee_paid,
-    COALESCE(interest_difference_paid, 0) AS interest_difference_paid,
-    COALESCE(sr_principal_paid, 0) AS sr_principal_paid,
-    COALESCE(sr_interest_paid, 0) AS sr_interest_paid,
-    COALESCE(sr_add_interest_paid, 0) AS sr_add_interest_paid,
-    COALESCE(jr_principal_paid, 0) AS jr_principal_paid,
-    COALESCE(jr_interest_paid, 0) AS jr_interest_paid,
-    COALESCE(jr_add_interest_paid, 0) AS jr_add_interest_paid,
-    COALESCE(spar_paid, 0) AS spar_paid
-  FROM core.v_flows_pivot
-),
-expected_raw AS (
-  SELECT
-    s.sku_id,
-    k.merchant_id,
-    s.acquirer_fees_expected AS management_fee_expected,
-    s.fh_admin_fees_expected AS admin_fee_expected,
-    s.additional_admin_fee_expected,
-    s.int_difference_expected AS interest_difference_expected,
-    s.sr_principal_expected AS sr_principal_expected,
-    s.sr_interest_expected AS sr_interest_expected,
-    s.sr_add_interest_expected,
-    s.jr_principal_expected AS jr_principal_expected,
-    s.jr_interest_expected AS jr_interest_expected,
-    s.jr_add_interest_expected,
-    s.spar_merchant AS spar_expected
-  FROM core.mv_repmt_sku s
-  JOIN ref.sku k ON k.sku_id = s.sku_id
-),
-expected AS (
-  SELECT
-    sku_id,
-    merchant_id,
-    COALESCE(SUM(management_fee_expected),0) AS management_fee_expected,
-    COALESCE(SUM(admin_fee_expected),0) AS admin_fee_expected,
-    COALESCE(SUM(additional_admin_fee_expected),0) AS additional_admin_fee_expected,
-    COALESCE(SUM(interest_difference_expected),0) AS interest_difference_expected,
-    COALESCE(SUM(sr_principal_expected),0) AS sr_principal_expected,
-    COALESCE(SUM(sr_interest_expected),0) AS sr_interest_expected,
-    COALESCE(SUM(sr_add_interest_expected),0) AS sr_add_interest_expected,
-    COALESCE(SUM(jr_principal_expected),0) AS jr_principal_expected,
-    COALESCE(SUM(jr_interest_expected),0) AS jr_interest_expected,
-    COALESCE(SUM(jr_add_interest_expected),0) AS jr_add_interest_expected,
-    COALESCE(SUM(spar_expected),0) AS spar_expected
-  FROM expected_raw
-  GROUP BY 1,2
-),
-inflow_sources AS (
-    SELECT
-        s.sku_id,
-        COALESCE(SUM(s.sales_proceeds), 0) AS sales_proceeds,
-        COALESCE(SUM(s.merchant_top_up), 0) AS merchant_top_up,
-        COALESCE(SUM(s.disbursement_surplus), 0) AS disbursement_surplus
-    FROM core.mv_repmt_sales s
-    GROUP BY 1
-),
-joined AS (
-  SELECT
-    COALESCE(p.sku_id, e.sku_id) AS sku_id,
-    COALESCE(p.merchant_id, e.merchant_id) AS merchant_id,
-    p.amount_received,
-    p.management_fee_paid, p.admin_fee_paid, p.additional_admin_fee_paid, p.interest_difference_paid,
-    p.sr_principal_paid, p.sr_interest_paid, p.sr_add_interest_paid, p.jr_principal_paid, p.jr_interest_paid, p.jr_add_interest_paid, p.spar_paid,
-    e.management_fee_expected, e.admin_fee_expected, e.additional_admin_fee_expected, e.interest_difference_expected,
-    e.sr_principal_expected, e.sr_interest_expected, e.sr_add_interest_expected, e.jr_principal_expected, e.jr_interest_expected, e.jr_add_interest_expected, e.spar_expected,
-    COALESCE(i.sales_proceeds, 0) as sales_proceeds,
-    COALESCE(i.merchant_top_up, 0) as merchant_top_up,
-    COALESCE(i.disbursement_surplus, 0) as disbursement_surplus
-  FROM paid p
-  FULL OUTER JOIN expected e ON e.sku_id = p.sku_id AND e.merchant_id = p.merchant_id
-  LEFT JOIN inflow_sources i ON i.sku_id = COALESCE(p.sku_id, e.sku_id)
-),
-final_calcs AS (
-    SELECT
-        j.*,
-        (j.management_fee_paid + j.admin_fee_paid + j.additional_admin_fee_paid + j.interest_difference_paid + j.sr_principal_paid + j.sr_interest_paid + j.sr_add_interest_paid + j.jr_principal_paid + j.jr_interest_paid + j.jr_add_interest_paid + j.spar_paid) AS amount_distributed,
-        COALESCE(tx.transfer_out_to_other_sku,0) AS fund_transferred_to_other_sku,
-        COALESCE(tx.transfer_in_from_other_sku,0) AS fund_transferred_from_other_sku
-    FROM joined j
-    LEFT JOIN core.v_inter_sku_transfers_agg tx
-      ON tx.sku_id = j.sku_id AND tx.merchant_id = j.merchant_id
+-- Each report is written once, as a function over the SKU facts: the whole
+-- refresh (mart.mv_sku_facts) when p_from is NULL, else the months p_from..p_to
+-- (mart.sku_facts, see there for what is sliced). The views call it with NULL;
+-- being plain SQL it is inlined, so they still read mart.mv_sku_facts directly.
+-- Rows come back unordered; callers that need an order add their own
+-- (export.py and parity.py sort by "SKU ID", the previews by variance).
+DROP VIEW IF EXISTS mart.v_level2a CASCADE;
+DROP VIEW IF EXISTS mart.v_level2b CASCADE;
+DROP FUNCTION IF EXISTS mart.level2a(text, text);
+DROP FUNCTION IF EXISTS mart.level2b(text, text);
+
+-- START of level2a definition
+-- Paid totals are NULL for SKUs with no flows and expected totals NULL for SKUs
+-- with no expectations, as before.
+CREATE OR REPLACE FUNCTION mart.level2a(p_from text, p_to text DEFAULT NULL)
+RETURNS TABLE (
+  "SKU ID" text,
+  "Merchant" text,
+  "Amount Received" numeric,
+  "Amount Distributed Down the Repayment Waterfall" numeric,
+  "Fund Transferred to Other SKU" numeric,
+  "Variance" numeric,
+  "Mgmt Fee Paid > Expected?" text,
+  "Admin Fee Paid > Expected?" text,
+  "Int Diff Paid > Expected?" text,
+  "Sr Principal Paid > Expected?" text,
+  "Sr Interest Paid > Expected?" text,
+  "Jr Principal Paid > Expected?" text,
+  "Jr Interest Paid > Expected?" text,
+  "Mgmt Fee Settled?" text,
+  "Admin Fee Settled?" text,
+  "Int Diff Settled?" text,
+  "Sr Principal Settled?" text,
+  "Sr Interest Settled?" text,
+  "Jr Principal Settled?" text,
+  "Jr Interest Settled?" text,
+  "Sales Proceeds" numeric,
+  "Merchant Top Up" numeric,
+  "Disbursement Surplus" numeric,
+  "Fund Transferred from Other SKU" numeric,
+  "Other" numeric,
+  "Management Fee Paid" numeric,
+  "Administrative Fee Paid" numeric,
+  "Additional Administrative Fee Paid" numeric,
+  "Interest Difference Paid" numeric,
+  "Senior Principal Paid" numeric,
+  "Senior Interest Paid" numeric,
+  "Senior Additional Interest Paid" numeric,
+  "Junior Principal Paid" numeric,
+  "Junior Interest Paid" numeric,
+  "Junior Additional Interest Paid" numeric,
+  "SPAR Paid" numeric,
+  "Management Fee Expected" numeric,
+  "Administrative Fee Expected" numeric,
+  "Additional Administrative Fee Expected" numeric,
+  "Interest Difference Expected" numeric,
+  "Senior Principal Expected" numeric,
+  "Senior Interest Expected" numeric,
+  "Senior Additional Interest Expected" numeric,
+  "Junior Principal Expected" numeric,
+  "Junior Interest Expected" numeric,
+  "Junior Additional Interest Expected" numeric,
+  "SPAR Expected" numeric,
+  "Management Fee Outstanding" numeric,
+  "Administrative Fee Outstanding" numeric,
+  "Additional Administrative Fee Outstanding" numeric,
+  "Interest Difference Outstanding" numeric,
+  "Senior Principal Outstanding" numeric,
+  "Senior Interest Outstanding" numeric,
+  "Senior Additional Interest Outstanding" numeric,
+  "Junior Principal Outstanding" numeric,
+  "Junior Interest Outstanding" numeric,
+  "Junior Additional Interest Outstanding" numeric,
+  "SPAR Outstanding" numeric
 )
-SELECT
-  fc.sku_id AS "SKU ID",
-  mr.merchant_name AS "Merchant",
-  fc.amount_received AS "Amount Received",
-  fc.amount_distributed AS "Amount Distributed Down the Repayment Waterfall",
-  fc.fund_transferred_to_other_sku AS "Fund Transferred to Other SKU",
-  (fc.amount_received + fc.fund_transferred_from_other_sku - fc.amount_distributed - fc.fund_transferred_to_other_sku) AS "Variance",
+LANGUAGE sql
+STABLE
+AS $$
+  WITH final_calcs AS (
+      SELECT
+          f.sku_id,
+          f.merchant_name,
+          f.amount_received,
+          f.management_fee_paid, f.admin_fee_paid, f.additional_admin_fee_paid, f.interest_difference_paid,
+          f.sr_principal_paid, f.sr_interest_paid, f.sr_add_interest_paid, f.jr_principal_paid, f.jr_interest_paid, f.jr_add_interest_paid, f.spar_paid,
+          f.management_fee_expected, f.admin_fee_expected, f.additional_admin_fee_expected, f.interest_difference_expected,
+          f.sr_principal_expected, f.sr_interest_expected, f.sr_add_interest_expected, f.jr_principal_expected, f.jr_interest_expected, f.jr_add_interest_expected, f.spar_expected,
+          COALESCE(f.sales_proceeds, 0) as sales_proceeds,
+          COALESCE(f.merchant_top_up, 0) as merchant_top_up,
+          COALESCE(f.disbursement_surplus, 0) as disbursement_surplus,
+          (f.management_fee_paid + f.admin_fee_paid + f.additional_admin_fee_paid + f.interest_difference_paid + f.sr_principal_paid + f.sr_interest_paid + f.sr_add_interest_paid + f.jr_principal_paid + f.jr_interest_paid + f.jr_add_interest_paid + f.spar_paid) AS amount_distributed,
+          COALESCE(f.transfer_out_to_other_sku,0) AS fund_transferred_to_other_sku,
+          COALESCE(f.transfer_in_from_other_sku,0) AS fund_transferred_from_other_sku
+      FROM (
+          SELECT * FROM mart.mv_sku_facts WHERE p_from IS NULL
+          UNION ALL
+          SELECT * FROM mart.sku_facts(p_from, p_to) WHERE p_from IS NOT NULL
+      ) f
+      WHERE f.in_level2a
+  )
+  SELECT
+    fc.sku_id AS "SKU ID",
+    fc.merchant_name AS "Merchant",
+    fc.amount_received AS "Amount Received",
+    fc.amount_distributed AS "Amount Distributed Down the Repayment Waterfall",
+    fc.fund_transferred_to_other_sku AS "Fund Transferred to Other SKU",
+    (fc.amount_received + fc.fund_transferred_from_other_sku - fc.amount_distributed - fc.fund_transferred_to_other_sku) AS "Variance",
+
+    -- Amount Paid > Amount Expected Flags
+    CASE WHEN fc.management_fee_paid > fc.management_fee_expected THEN 'Yes' ELSE 'No' END AS "Mgmt Fee Paid > Expected?",
+    CASE WHEN fc.admin_fee_paid > fc.admin_fee_expected THEN 'Yes' ELSE 'No' END AS "Admin Fee Paid > Expected?",
+    CASE WHEN fc.interest_difference_paid > fc.interest_difference_expected THEN 'Yes' ELSE 'No' END AS "Int Diff Paid > Expected?",
+    CASE WHEN fc.sr_principal_paid > fc.sr_principal_expected THEN 'Yes' ELSE 'No' END AS "Sr Principal Paid > Expected?",
+    CASE WHEN fc.sr_interest_paid > fc.sr_interest_expected THEN 'Yes' ELSE 'No' END AS "Sr Interest Paid > Expected?",
+    CASE WHEN fc.jr_principal_paid > fc.jr_principal_expected THEN 'Yes' ELSE 'No' END AS "Jr Principal Paid > Expected?",
+    CASE WHEN fc.jr_interest_paid > fc.jr_interest_expected THEN 'Yes' ELSE 'No' END AS "Jr Interest Paid > Expected?",
 
-  -- Amount Paid > Amount Expected Flags
-  CASE WHEN fc.management_fee_paid > fc.management_fee_expected THEN 'Yes' ELSE 'No' END AS "Mgmt Fee Paid > Expected?",
-  CASE WHEN fc.admin_fee_paid > fc.admin_fee_expected THEN 'Yes' ELSE 'No' END AS "Admin Fee Paid > Expected?",
-  CASE WHEN fc.interest_difference_paid > fc.interest_difference_expected THEN 'Yes' ELSE 'No' END AS "Int Diff Paid > Expected?",
-  CASE WHEN fc.sr_principal_paid > fc.sr_principal_expected THEN 'Yes' ELSE 'No' END AS "Sr Principal Paid > Expected?",
-  CASE WHEN fc.sr_interest_paid > fc.sr_interest_expected THEN 'Yes' ELSE 'No' END AS "Sr Interest Paid > Expected?",
-  CASE WHEN fc.jr_principal_paid > fc.jr_principal_expected THEN 'Yes' ELSE 'No' END AS "Jr Principal Paid > Expected?",
-  CASE WHEN fc.jr_interest_paid > fc.jr_interest_expected THEN 'Yes' ELSE 'No' END AS "Jr Interest Paid > Expected?",
+    -- Fully Settled Flags
+    CASE WHEN (fc.management_fee_expected - fc.management_fee_paid) <= 0 THEN 'Yes' ELSE 'No' END AS "Mgmt Fee Settled?",
+    CASE WHEN (fc.admin_fee_expected - fc.admin_fee_paid) <= 0 THEN 'Yes' ELSE 'No' END AS "Admin Fee Settled?",
+    CASE WHEN (fc.interest_difference_expected - fc.interest_difference_paid) <= 0 THEN 'Yes' ELSE 'No' END AS "Int Diff Settled?",
+    CASE WHEN (fc.sr_principal_expected - fc.sr_principal_paid) <= 0 THEN 'Yes' ELSE 'No' END AS "Sr Principal Settled?",
+    CASE WHEN (fc.sr_interest_expected - fc.sr_interest_paid) <= 0 THEN 'Yes' ELSE 'No' END AS "Sr Interest Settled?",
+    CASE WHEN (fc.jr_principal_expected - fc.jr_principal_paid) <= 0 THEN 'Yes' ELSE 'No' END AS "Jr Principal Settled?",
+    CASE WHEN (fc.jr_interest_expected - fc.jr_interest_paid) <= 0 THEN 'Yes' ELSE 'No' END AS "Jr Interest Settled?",
 
-  -- Fully Settled Flags
-  CASE WHEN (fc.management_fee_expected - fc.management_fee_paid) <= 0 THEN 'Yes' ELSE 'No' END AS "Mgmt Fee Settled?",
-  CASE WHEN (fc.admin_fee_expected - fc.admin_fee_paid) <= 0 THEN 'Yes' ELSE 'No' END AS "Admin Fee Settled?",
-  CASE WHEN (fc.interest_difference_expected - fc.interest_difference_paid) <= 0 THEN 'Yes' ELSE 'No' END AS "Int Diff Settled?",
-  CASE WHEN (fc.sr_principal_expected - fc.sr_principal_paid) <= 0 THEN 'Yes' ELSE 'No' END AS "Sr Principal Settled?",
-  CASE WHEN (fc.sr_interest_expected - fc.sr_interest_paid) <= 0 THEN 'Yes' ELSE 'No' END AS "Sr Interest Settled?",
-  CASE WHEN (fc.jr_principal_expected - fc.jr_principal_paid) <= 0 THEN 'Yes' ELSE 'No' END AS "Jr Principal Settled?",
-  CASE WHEN (fc.jr_interest_expected - fc.jr_interest_paid) <= 0 THEN 'Yes' ELSE 'No' END AS "Jr Interest Settled?",
+    -- Amount Received Breakdown
+    fc.sales_proceeds AS "Sales Proceeds",
+    fc.merchant_top_up AS "Merchant Top Up",
+    fc.disbursement_surplus AS "Disbursement Surplus",
+    fc.fund_transferred_from_other_sku AS "Fund Transferred from Other SKU",
+    (fc.amount_received - fc.sales_proceeds - fc.merchant_top_up - fc.disbursement_surplus) AS "Other",
 
-  -- Amount Received Breakdown
-  fc.sales_proceeds AS "Sales Proceeds",
-  fc.merchant_top_up AS "Merchant Top Up",
-  fc.disbursement_surplus AS "Disbursement Surplus",
-  fc.fund_transferred_from_other_sku AS "Fund Transferred from Other SKU",
-  (fc.amount_received - fc.sales_proceeds - fc.merchant_top_up - fc.disbursement_surplus) AS "Other",
+    -- Paid Amounts
+    fc.management_fee_paid AS "Management Fee Paid",
+    fc.admin_fee_paid AS "Administrative Fee Paid",
+    fc.additional_admin_fee_paid AS "Additional Administrative Fee Paid",
+    fc.interest_difference_paid AS "Interest Difference Paid",
+    fc.sr_principal_paid AS "Senior Principal Paid",
+    fc.sr_interest_paid AS "Senior Interest Paid",
+    fc.sr_add_interest_paid AS "Senior Additional Interest Paid",
+    fc.jr_principal_paid AS "Junior Principal Paid",
+    fc.jr_interest_paid AS "Junior Interest Paid",
+    fc.jr_add_interest_paid AS "Junior Additional Interest Paid",
+    fc.spar_paid AS "SPAR Paid",
 
-  -- Paid Amounts
-  fc.management_fee_paid AS "Management Fee Paid",
-  fc.admin_fee_paid AS "Administrative Fee Paid",
-  fc.additional_admin_fee_paid AS "Additional Administrative Fee Paid",
-  fc.interest_difference_paid AS "Interest Difference Paid",
-  fc.sr_principal_paid AS "Senior Principal Paid",
-  fc.sr_interest_paid AS "Senior Interest Paid",
-  fc.sr_add_interest_paid AS "Senior Additional Interest Paid",
-  fc.jr_principal_paid AS "Junior Principal Paid",
-  fc.jr_interest_paid AS "Junior Interest Paid",
-  fc.jr_add_interest_paid AS "Junior Additional Interest Paid",
-  fc.spar_paid AS "SPAR Paid",
+    -- Expected Amounts
+    fc.management_fee_expected AS "Management Fee Expected",
+    fc.admin_fee_expected AS "Administrative Fee Expected",
+    fc.additional_admin_fee_expected AS "Additional Administrative Fee Expected",
+    fc.interest_difference_expected AS "Interest Difference Expected",
+    fc.sr_principal_expected AS "Senior Principal Expected",
+    fc.sr_interest_expected AS "Senior Interest Expected",
+    fc.sr_add_interest_expected AS "Senior Additional Interest Expected",
+    fc.jr_principal_expected AS "Junior Principal Expected",
+    fc.jr_interest_expected AS "Junior Interest Expected",
+    fc.jr_add_interest_expected AS "Junior Additional Interest Expected",
+    fc.spar_expected AS "SPAR Expected",
 
-  -- Expected Amounts
-  fc.management_fee_expected AS "Management Fee Expected",
-  fc.admin_fee_expected AS "Administrative Fee Expected",
-  fc.additional_admin_fee_expected AS "Additional Administrative Fee Expected",
-  fc.interest_difference_expected AS "Interest Difference Expected",
-  fc.sr_principal_expected AS "Senior Principal Expected",
-  fc.sr_interest_expected AS "Senior Interest Expected",
-  fc.sr_add_interest_expected AS "Senior Additional Interest Expected",
-  fc.jr_principal_expected AS "Junior Principal Expected",
-  fc.jr_interest_expected AS "Junior Interest Expected",
-  fc.jr_add_interest_expected AS "Junior Additional Interest Expected",
-  fc.spar_expected AS "SPAR Expected",
+    -- Outstanding Amounts
+    (fc.management_fee_expected - fc.management_fee_paid) AS "Management Fee Outstanding",
+    (fc.admin_fee_expected - fc.admin_fee_paid) AS "Administrative Fee Outstanding",
+    (fc.additional_admin_fee_expected - fc.additional_admin_fee_paid) AS "Additional Administrative Fee Outstanding",
+    (fc.interest_difference_expected - fc.interest_difference_paid) AS "Interest Difference Outstanding",
+    (fc.sr_principal_expected - fc.sr_principal_paid) AS "Senior Principal Outstanding",
+    (fc.sr_interest_expected - fc.sr_interest_paid) AS "Senior Interest Outstanding",
+    (fc.sr_add_interest_expected - fc.sr_add_interest_paid) AS "Senior Additional Interest Outstanding",
+    (fc.jr_principal_expected - fc.jr_principal_paid) AS "Junior Principal Outstanding",
+    (fc.jr_interest_expected - fc.jr_interest_paid) AS "Junior Interest Outstanding",
+    (fc.jr_add_interest_expected - fc.jr_add_interest_paid) AS "Junior Additional Interest Outstanding",
+    (fc.spar_expected - fc.spar_paid) AS "SPAR Outstanding"
 
-  -- Outstanding Amounts
-  (fc.management_fee_expected - fc.management_fee_paid) AS "Management Fee Outstanding",
-  (fc.admin_fee_expected - fc.admin_fee_paid) AS "Administrative Fee Outstanding",
-  (fc.additional_admin_fee_expected - fc.additional_admin_fee_paid) AS "Additional Administrative Fee Outstanding",
-  (fc.interest_difference_expected - fc.interest_difference_paid) AS "Interest Difference Outstanding",
-  (fc.sr_principal_expected - fc.sr_principal_paid) AS "Senior Principal Outstanding",
-  (fc.sr_interest_expected - fc.sr_interest_paid) AS "Senior Interest Outstanding",
-  (fc.sr_add_interest_expected - fc.sr_add_interest_paid) AS "Senior Additional Interest Outstanding",
-  (fc.jr_principal_expected - fc.jr_principal_paid) AS "Junior Principal Outstanding",
-  (fc.jr_interest_expected - fc.jr_interest_paid) AS "Junior Interest Outstanding",
-  (fc.jr_add_interest_expected - fc.jr_add_interest_paid) AS "Junior Additional Interest Outstanding",
-  (fc.spar_expected - fc.spar_paid) AS "SPAR Outstanding"
+  FROM final_calcs fc;
+$$;
+-- END of level2a definition
 
-FROM final_calcs fc
-LEFT JOIN ref.merchant mr ON mr.merchant_id = fc.merchant_id
-ORDER BY fc.sku_id;
--- END of v_level2a definition
+CREATE OR REPLACE VIEW mart.v_level2a AS
+SELECT * FROM mart.level2a(NULL);
 
 
--- START of v_level2b definition
-CREATE OR REPLACE VIEW mart.v_level2b AS
-WITH ui_sales AS (
-  SELECT
-    s.sku_id,
-    COALESCE(SUM(s.total_funds_inflow), 0::numeric) AS total_fund_inflow_ui
-  FROM core.mv_repmt_sales s
-  GROUP BY 1
-),
-ui_paid AS (
-  SELECT
-    s.sku_id,
-    COALESCE(SUM(s.acquirer_fees_paid), 0::numeric) AS management_fee_ui,
-    COALESCE(SUM(s.fh_admin_fees_paid), 0::numeric) AS admin_fee_ui,
-    COALESCE(SUM(s.int_difference_paid), 0::numeric) AS interest_difference_ui,
-    COALESCE(SUM(s.sr_principal_paid), 0::numeric) AS sr_principal_ui,
-    COALESCE(SUM(s.sr_interest_paid), 0::numeric) AS sr_interest_ui,
-    COALESCE(SUM(s.jr_principal_paid), 0::numeric) AS jr_principal_ui,
-    COALESCE(SUM(s.jr_interest_paid), 0::numeric) AS jr_interest_ui,
-    COALESCE(SUM(s.spar_merchant), 0::numeric) AS spar_ui,
-    COALESCE(SUM(s.additional_interests_paid_to_fh), 0::numeric) AS fh_platform_ui
-  FROM core.mv_repmt_sku s
-  GROUP BY 1
-),
-cf_paid AS (
-  SELECT
-    sku_id,
-    COALESCE(amount_received, 0::numeric) AS amount_received_cf,
-    COALESCE(management_fee_paid, 0::numeric) AS management_fee_cf,
-    COALESCE(admin_fee_paid, 0::numeric) AS admin_fee_cf,
-    COALESCE(interest_difference_paid, 0::numeric) AS interest_difference_cf,
-    COALESCE(sr_principal_paid, 0::numeric) AS sr_principal_cf,
-    COALESCE(sr_interest_paid, 0::numeric) AS sr_interest_cf,
-    COALESCE(jr_principal_paid, 0::numeric) AS jr_principal_cf,
-    COALESCE(jr_interest_paid, 0::numeric) AS jr_interest_cf,
-    COALESCE(spar_paid, 0::numeric) AS spar_cf
-  FROM core.v_flows_pivot
-),
-base AS (
-  SELECT
-    sku.sku_id,
-    sku.merchant_id,
-    m.merchant_name,
-    COALESCE(us.total_fund_inflow_ui, 0::numeric) AS total_fund_inflow_ui,
-    COALESCE(cf.amount_received_cf, 0::numeric) AS amount_received_cf,
-    COALESCE(up.management_fee_ui, 0::numeric) AS management_fee_ui,
-    COALESCE(cf.management_fee_cf, 0::numeric) AS management_fee_cf,
-    COALESCE(up.admin_fee_ui, 0::numeric) AS admin_fee_ui,
-    COALESCE(cf.admin_fee_cf, 0::numeric) AS admin_fee_cf,
-    COALESCE(up.interest_difference_ui, 0::numeric) AS interest_difference_ui,
-    COALESCE(cf.interest_difference_cf, 0::numeric) AS interest_difference_cf,
-    COALESCE(up.sr_principal_ui, 0::numeric) AS sr_principal_ui,
-    COALESCE(cf.sr_principal_cf, 0::numeric) AS sr_principal_cf,
-    COALESCE(up.sr_interest_ui, 0::numeric) AS sr_interest_ui,
-    COALESCE(cf.sr_interest_cf, 0::numeric) AS sr_interest_cf,
-    COALESCE(up.jr_principal_ui, 0::numeric) AS jr_principal_ui,
-    COALESCE(cf.jr_principal_cf, 0::numeric) AS jr_principal_cf,
-    COALESCE(up.jr_interest_ui, 0::numeric) AS jr_interest_ui,
-    COALESCE(cf.jr_interest_cf, 0::numeric) AS jr_interest_cf,
-    COALESCE(up.spar_ui, 0::numeric) AS spar_ui,
-    COALESCE(cf.spar_cf, 0::numeric) AS spar_cf,
-    COALESCE(up.fh_platform_ui, 0::numeric) AS fh_platform_ui,
-    (COALESCE(cf.sr_interest_cf, 0) + COALESCE(cf.jr_interest_cf, 0)) * 0.10 AS fh_platform_cf_calc
-  FROM ref.sku sku
-  JOIN ref.merchant m ON m.merchant_id = sku.merchant_id
-  LEFT JOIN ui_sales us ON us.sku_id = sku.sku_id
-  LEFT JOIN ui_paid up ON up.sku_id = sku.sku_id
-  LEFT JOIN cf_paid cf ON cf.sku_id = sku.sku_id
+-- START of level2b definition
+-- UI and CF totals per SKU.
+CREATE OR REPLACE FUNCTION mart.level2b(p_from text, p_to text DEFAULT NULL)
+RETURNS TABLE (
+  "SKU ID" text,
+  "Merchant" text,
+  "Total Fund Inflow" numeric,
+  "Management Fee Paid" numeric,
+  "Adminstrative Fee Paid" numeric,
+  "Interest Difference Paid" numeric,
+  "Senior Principal Paid" numeric,
+  "Senior Interest Paid" numeric,
+  "Junior Principal Paid" numeric,
+  "Junior Interest Paid" numeric,
+  "SPAR" numeric,
+  "FH Platform Fee" numeric,
+  "Total Fund Inflow Variance" numeric,
+  "Management Fee Paid Variance" numeric,
+  "Administrative Fee Paid Variance" numeric,
+  "Interest Difference Paid Variance" numeric,
+  "Senior Principal Paid Variance" numeric,
+  "Senior Interest Paid Variance" numeric,
+  "Junior Principal Paid Variance" numeric,
+  "Junior Interest Paid Variance" numeric,
+  "SPAR Variance" numeric,
+  "FH Platform Fee Variance" numeric,
+  "Management Fee Paid (UI)" numeric,
+  "Management Fee Paid (CF)" numeric,
+  "Administrative Fee Paid (UI)" numeric,
+  "Administrative Fee Paid (CF)" numeric,
+  "Interest Difference Paid (UI)" numeric,
+  "Interest Difference Paid (CF)" numeric,
+  "Senior Principal Paid (UI)" numeric,
+  "Senior Principal Paid (CF)" numeric,
+  "Senior Interest Paid (UI)" numeric,
+  "Senior Interest Paid (CF)" numeric,
+  "Junior Principal Paid (UI)" numeric,
+  "Junior Principal Paid (CF)" numeric,
+  "Junior Interest Paid (UI)" numeric,
+  "Junior Interest Paid (CF)" numeric,
+  "SPAR (UI)" numeric,
+  "SPAR (CF)" numeric,
+  "FH Platform Fee (UI)" numeric,
+  "FH Platform Fee (Calc.)" numeric,
+  "Total Fund Inflow (UI)" numeric,
+  "Amount Received (CF)" numeric
 )
-SELECT
-  b.sku_id AS "SKU ID",
-  b.merchant_name AS "Merchant",
-  b.amount_received_cf AS "Total Fund Inflow",
-  b.management_fee_cf AS "Management Fee Paid",
-  b.admin_fee_cf AS "Adminstrative Fee Paid",
-  b.interest_difference_cf AS "Interest Difference Paid",
-  b.sr_principal_cf AS "Senior Principal Paid",
-  b.sr_interest_cf AS "Senior Interest Paid",
-  b.jr_principal_cf AS "Junior Principal Paid",
-  b.jr_interest_cf AS "Junior Interest Paid",
-  b.spar_cf AS "SPAR",
-  b.fh_platform_cf_calc AS "FH Platform Fee",
+LANGUAGE sql
+STABLE
+AS $$
+  WITH base AS (
+    SELECT
+      f.sku_id,
+      f.merchant_id,
+      f.merchant_name,
+      COALESCE(f.total_funds_inflow_ui, 0::numeric) AS total_fund_inflow_ui,
+      COALESCE(f.amount_received, 0::numeric) AS amount_received_cf,
+      COALESCE(f.management_fee_ui, 0::numeric) AS management_fee_ui,
+      COALESCE(f.management_fee_paid, 0::numeric) AS management_fee_cf,
+      COALESCE(f.admin_fee_ui, 0::numeric) AS admin_fee_ui,
+      COALESCE(f.admin_fee_paid, 0::numeric) AS admin_fee_cf,
+      COALESCE(f.interest_difference_ui, 0::numeric) AS interest_difference_ui,
+      COALESCE(f.interest_difference_paid, 0::numeric) AS interest_difference_cf,
+      COALESCE(f.sr_principal_ui, 0::numeric) AS sr_principal_ui,
+      COALESCE(f.sr_principal_paid, 0::numeric) AS sr_principal_cf,
+      COALESCE(f.sr_interest_ui, 0::numeric) AS sr_interest_ui,
+      COALESCE(f.sr_interest_paid, 0::numeric) AS sr_interest_cf,
+      COALESCE(f.jr_principal_ui, 0::numeric) AS jr_principal_ui,
+      COALESCE(f.jr_principal_paid, 0::numeric) AS jr_principal_cf,
+      COALESCE(f.jr_interest_ui, 0::numeric) AS jr_interest_ui,
+      COALESCE(f.jr_interest_paid, 0::numeric) AS jr_interest_cf,
+      COALESCE(f.spar_ui, 0::numeric) AS spar_ui,
+      COALESCE(f.spar_paid, 0::numeric) AS spar_cf,
+      COALESCE(f.fh_platform_ui, 0::numeric) AS fh_platform_ui,
+      (COALESCE(f.sr_interest_paid, 0) + COALESCE(f.jr_interest_paid, 0)) * 0.10 AS fh_platform_cf_calc
+    FROM (
+        SELECT * FROM mart.mv_sku_facts WHERE p_from IS NULL
+        UNION ALL
+        SELECT * FROM mart.sku_facts(p_from, p_to) WHERE p_from IS NOT NULL
+    ) f
+    WHERE f.in_sku_ref
+  )
+  SELECT
+    b.sku_id AS "SKU ID",
+    b.merchant_name AS "Merchant",
+    b.amount_received_cf AS "Total Fund Inflow",
+    b.management_fee_cf AS "Management Fee Paid",
+    b.admin_fee_cf AS "Adminstrative Fee Paid",
+    b.interest_difference_cf AS "Interest Difference Paid",
+    b.sr_principal_cf AS "Senior Principal Paid",
+    b.sr_interest_cf AS "Senior Interest Paid",
+    b.jr_principal_cf AS "Junior Principal Paid",
+    b.jr_interest_cf AS "Junior Interest Paid",
+    b.spar_cf AS "SPAR",
+    b.fh_platform_cf_calc AS "FH Platform Fee",
 
-  -- Variance Columns
-  (b.total_fund_inflow_ui - b.amount_received_cf) AS "Total Fund Inflow Variance",
-  (b.management_fee_ui - b.management_fee_cf) AS "Management Fee Paid Variance",
-  (b.admin_fee_ui - b.admin_fee_cf) AS "Administrative Fee Paid Variance",
-  (b.interest_difference_ui - b.interest_difference_cf) AS "Interest Difference Paid Variance",
-  (b.sr_principal_ui - b.sr_principal_cf) AS "Senior Principal Paid Variance",
-  (b.sr_interest_ui - b.sr_interest_cf) AS "Senior Interest Paid Variance",
-  (b.jr_principal_ui - b.jr_principal_cf) AS "Junior Principal Paid Variance",
-  (b.jr_interest_ui - b.jr_interest_cf) AS "Junior Interest Paid Variance",
-  (b.spar_ui - b.spar_cf) AS "SPAR Variance",
-  (b.fh_platform_ui - b.fh_platform_cf_calc) AS "FH Platform Fee Variance",
+    -- Variance Columns
+    (b.total_fund_inflow_ui - b.amount_received_cf) AS "Total Fund Inflow Variance",
+    (b.management_fee_ui - b.management_fee_cf) AS "Management Fee Paid Variance",
+    (b.admin_fee_ui - b.admin_fee_cf) AS "Administrative Fee Paid Variance",
+    (b.interest_difference_ui - b.interest_difference_cf) AS "Interest Difference Paid Variance",
+    (b.sr_principal_ui - b.sr_principal_cf) AS "Senior Principal Paid Variance",
+    (b.sr_interest_ui - b.sr_interest_cf) AS "Senior Interest Paid Variance",
+    (b.jr_principal_ui - b.jr_principal_cf) AS "Junior Principal Paid Variance",
+    (b.jr_interest_ui - b.jr_interest_cf) AS "Junior Interest Paid Variance",
+    (b.spar_ui - b.spar_cf) AS "SPAR Variance",
+    (b.fh_platform_ui - b.fh_platform_cf_calc) AS "FH Platform Fee Variance",
 
-  -- Comparison Columns
-  b.management_fee_ui AS "Management Fee Paid (UI)",
-  b.management_fee_cf AS "Management Fee Paid (CF)",
-  b.admin_fee_ui AS "Administrative Fee Paid (UI)",
-  b.admin_fee_cf AS "Administrative Fee Paid (CF)",
-  b.interest_difference_ui AS "Interest Difference Paid (UI)",
-  b.interest_difference_cf AS "Interest Difference Paid (CF)",
-  b.sr_principal_ui AS "Senior Principal Paid (UI)",
-  b.sr_principal_cf AS "Senior Principal Paid (CF)",
-  b.sr_interest_ui AS "Senior Interest Paid (UI)",
-  b.sr_interest_cf AS "Senior Interest Paid (CF)",
-  b.jr_principal_ui AS "Junior Principal Paid (UI)",
-  b.jr_principal_cf AS "Junior Principal Paid (CF)",
-  b.jr_interest_ui AS "Junior Interest Paid (UI)",
-  b.jr_interest_cf AS "Junior Interest Paid (CF)",
-  b.spar_ui AS "SPAR (UI)",
-  b.spar_cf AS "SPAR (CF)",
-  b.fh_platform_ui AS "FH Platform Fee (UI)",
-  b.fh_platform_cf_calc AS "FH Platform Fee (Calc.)",
-  b.total_fund_inflow_ui AS "Total Fund Inflow (UI)",
-  b.amount_received_cf AS "Amount Received (CF)"
-FROM base b
-ORDER BY b.sku_id;
--- END of v_level2b definition
+    -- Comparison Columns
+    b.management_fee_ui AS "Management Fee Paid (UI)",
+    b.management_fee_cf AS "Management Fee Paid (CF)",
+    b.admin_fee_ui AS "Administrative Fee Paid (UI)",
+    b.admin_fee_cf AS "Administrative Fee Paid (CF)",
+    b.interest_difference_ui AS "Interest Difference Paid (UI)",
+    b.interest_difference_cf AS "Interest Difference Paid (CF)",
+    b.sr_principal_ui AS "Senior Principal Paid (UI)",
+    b.sr_principal_cf AS "Senior Principal Paid (CF)",
+    b.sr_interest_ui AS "Senior Interest Paid (UI)",
+    b.sr_interest_cf AS "Senior Interest Paid (CF)",
+    b.jr_principal_ui AS "Junior Principal Paid (UI)",
+    b.jr_principal_cf AS "Junior Principal Paid (CF)",
+    b.jr_interest_ui AS "Junior Interest Paid (UI)",
+    b.jr_interest_cf AS "Junior Interest Paid (CF)",
+    b.spar_ui AS "SPAR (UI)",
+    b.spar_cf AS "SPAR (CF)",
+    b.fh_platform_ui AS "FH Platform Fee (UI)",
+    b.fh_platform_cf_calc AS "FH Platform Fee (Calc.)",
+    b.total_fund_inflow_ui AS "Total Fund Inflow (UI)",
+    b.amount_received_cf AS "Amount Received (CF)"
+  FROM base b;
+$$;
+-- END of level2b definition
+
+CREATE OR REPLACE VIEW mart.v_level2b AS
+SELECT * FROM mart.level2b(NULL);
@@ -15,6 +15,13 @@ expected[note_sku_va_map_prepped.csv]='note_id,sku_id,va_number'
 failures=0
 for file in "${!expected[@]}"; do
   path="$DATA_DIR/$file"
+  if [ ! -f "$path" ]; then
+    # Sharded output (prep.py --shards N): every shard carries the header; check the first.
+    shard=$(ls "${path%.csv}".[0-9][0-9][0-9][0-9].csv 2>/dev/null | head -n1 || true)
+    if [ -n "$shard" ]; then
+      path="$shard"
+    fi
+  fi
   if [ ! -f "$path" ]; then
     echo "[FAIL] Missing expected file: $path" >&2
     failures=$((failures+1))
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+import io
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'scripts'))
+
+import export  # noqa: E402
+
+
+def test_csv_row_count_ignores_newlines_inside_quoted_fields(monkeypatch):
+    data = b'sku_id,merchant\nSKU-1,"Acme\nHoldings"\nSKU-2,"say ""hi""\n"\nSKU-3,Beta\n'
+    monkeypatch.setattr(export, 'COPY_CHUNK', 5)  # quotes and newlines straddle chunks
+    sink = io.BytesIO()
+    assert export._copy_csv(io.BytesIO(data), sink) == 3
+    assert sink.getvalue() == data
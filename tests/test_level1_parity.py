@@ -1,14 +1,13 @@
 #!/usr/bin/env python3
 import csv
-import io
 import os
-import subprocess
+import sys
 from decimal import Decimal, ROUND_HALF_UP
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'scripts'))
 
-BASH_PATH = os.getenv('BASH_PATH', 'bash')
-PROJECT_ROOT = Path(__file__).resolve().parents[1]
+import parity  # noqa: E402
 
 REFERENCE_ENV = os.getenv('LEVEL1_REFERENCE_CSV')
 REFERENCE_CANDIDATES = [
@@ -43,30 +42,28 @@ def to_two_dec(value: Decimal) -> str:
 
 
 def build_expected_fixture(source_csv: Path) -> None:
-    rows = []
     with source_csv.open(newline='', encoding='utf-8') as f:
         reader = csv.reader(f)
-        data = list(reader)
-    header_idx = next(i for i, row in enumerate(data) if 'SKU ID' in row and 'Account Number' in row)
-    header = data[header_idx]
-    col = {name: idx for idx, name in enumerate(header)}
-    for row in data[header_idx + 1:]:
-        sku = row[col['SKU ID']].strip()
-        if not sku:
-            continue
-        account = row[col['Account Number']].strip()
-        merchant = row[col['Merchant']].strip()
-        amount_pulled = parse_decimal(row[col['Amount Pulled']])
-        amount_received = parse_decimal(row[col['Amount Received']])
-        sales_proceeds = parse_decimal(row[col['Sales Proceeds']])
-        rows.append({
-            'SKU ID': sku,
-            'Account Number': account,
-            'Merchant': merchant,
-            'Amount Pulled': to_two_dec(amount_pulled),
-            'Amount Received': to_two_dec(amount_received),
-            'Sales Proceeds': to_two_dec(sales_proceeds),
-        })
+        header = next(row for row in reader if 'SKU ID' in row and 'Account Number' in row)
+        col = {name: idx for idx, name in enumerate(header)}
+        rows = []
+        for row in reader:
+            sku = row[col['SKU ID']].strip()
+            if not sku:
+                continue
+            account = row[col['Account Number']].strip()
+            merchant = row[col['Merchant']].strip()
+            amount_pulled = parse_decimal(row[col['Amount Pulled']])
+            amount_received = parse_decimal(row[col['Amount Received']])
+            sales_proceeds = parse_decimal(row[col['Sales Proceeds']])
+            rows.append({
+                'SKU ID': sku,
+                'Account Number': account,
+                'Merchant': merchant,
+                'Amount Pulled': to_two_dec(amount_pulled),
+                'Amount Received': to_two_dec(amount_received),
+                'Sales Proceeds': to_two_dec(sales_proceeds),
+            })
     rows.sort(key=lambda r: (r['SKU ID'], r['Account Number']))
     FIXTURE_CSV.parent.mkdir(parents=True, exist_ok=True)
     with FIXTURE_CSV.open('w', newline='', encoding='utf-8') as f:
@@ -75,74 +72,46 @@ def build_expected_fixture(source_csv: Path) -> None:
         writer.writerows(rows)
 
 
-def fetch_actual() -> list[dict[str, str]]:
-    query = """
-COPY (
-  SELECT
-    sku_id AS "SKU ID",
-    account_number AS "Account Number",
-    merchant AS "Merchant",
-    to_char(amount_pulled, 'FM999999999.00')   AS "Amount Pulled",
-    to_char(amount_received, 'FM999999999.00') AS "Amount Received",
-    to_char(sales_proceeds, 'FM999999999.00')  AS "Sales Proceeds"
-  FROM mart.v_level1
-  ORDER BY 1, 2
-) TO STDOUT WITH CSV HEADER
-"""
-    cmd = [BASH_PATH, 'scripts/run_sql.sh', '-c', query]
-    env = os.environ.copy()
-    env['PGHOST'] = 'postgres'
-    env['PGPORT'] = '5432'
-    env['PGDATABASE'] = env.get('PGDATABASE', 'appdb')
-    env['PGUSER'] = env.get('PGUSER', 'appuser')
-    env['PGPASSWORD'] = env.get('PGPASSWORD', 'changeme')
-    env['PGSSLMODE'] = 'disable'
-    env['SKIP_ENV_FILE'] = '1'
-    try:
-        res = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=True,
-            cwd=PROJECT_ROOT,
-            env=env,
-        )
-    except subprocess.CalledProcessError as exc:
-        message = exc.stderr.strip() or exc.stdout.strip()
-        raise RuntimeError(f"Level 1 SQL query failed: {message}") from exc
-    reader = csv.DictReader(io.StringIO(res.stdout))
-    return list(reader)
-
-
-def compare(expected: list[dict[str, str]], actual: list[dict[str, str]]) -> None:
-    exp_map = {(row['SKU ID'], row['Account Number']): row for row in expected}
-    act_map = {(row['SKU ID'], row['Account Number']): row for row in actual}
-
-    missing = sorted(set(exp_map) - set(act_map))
-    extra = sorted(set(act_map) - set(exp_map))
-    if missing or extra:
-        raise SystemExit(f"Parity failure: missing={missing[:5]} extra={extra[:5]}")
-
-    tolerance = Decimal('0.01')
-    for key in exp_map:
-        exp_row = exp_map[key]
-        act_row = act_map[key]
-        for field in ['Amount Pulled', 'Amount Received', 'Sales Proceeds']:
-            exp_val = parse_decimal(exp_row[field])
-            act_val = parse_decimal(act_row[field])
-            if (act_val - exp_val).copy_abs() > tolerance:
-                raise SystemExit(
-                    f"Value mismatch for {key} field {field}: expected {exp_val}, actual {act_val}"
-                )
-        if exp_row['Merchant'] != act_row['Merchant']:
-            raise SystemExit(f"Merchant mismatch for {key}: expected {exp_row['Merchant']}, actual {act_row['Merchant']}")
-
-
-SOURCE_CSV = resolve_reference_csv()
+def use_compose_database() -> None:
+    """Point run_sql.sh at the compose service, as the suite runs inside its network."""
+    os.environ['PGHOST'] = 'postgres'
+    os.environ['PGPORT'] = '5432'
+    os.environ.setdefault('PGDATABASE', 'appdb')
+    os.environ.setdefault('PGUSER', 'appuser')
+    os.environ.setdefault('PGPASSWORD', 'changeme')
+    os.environ['PGSSLMODE'] = 'disable'
+    os.environ['SKIP_ENV_FILE'] = '1'
+
+
+def test_merge_diff_reports_every_difference():
+    def rows(*items):
+        return iter([((sku, va), {'SKU ID': sku, 'Account Number': va, 'Merchant': m, 'Amount Pulled': amt})
+                     for sku, va, m, amt in items])
+
+    expected = rows(('A', '1', 'M', '1,000.00'), ('B', '2', 'M', '5'), ('C', '3', 'M', '-'))
+    actual = rows(('A', '1', 'M', '1000.004'), ('B', '2', 'N', '7.5'), ('D', '4', 'M', '0'))
+    diffs = list(parity.merge_diff(expected, actual, ('SKU ID', 'Account Number'),
+                                   ['Merchant', 'Amount Pulled'], Decimal('0.01')))
+    assert [(d['kind'], d['key']['SKU ID']) for d in diffs] == [('mismatch', 'B'), ('missing', 'C'), ('extra', 'D')]
+    assert diffs[0]['fields'] == {
+        'Merchant': {'expected': 'M', 'actual': 'N', 'delta': None},
+        'Amount Pulled': {'expected': '5', 'actual': '7.5', 'delta': '2.5'},
+    }
+
+
+def test_sorted_rows_merges_spilled_runs(tmp_path):
+    items = [((str(i % 7), str(i)), {'SKU ID': str(i % 7), 'Account Number': str(i)}) for i in range(50)]
+    merged = list(parity.sorted_rows(iter(items), ['SKU ID', 'Account Number'], tmp_path, run_rows=8))
+    assert [key for key, _ in merged] == sorted(key for key, _ in items)
+    assert len(list(tmp_path.iterdir())) == 7
+
 
 if __name__ == '__main__':
-    build_expected_fixture(SOURCE_CSV)
-    expected_rows = list(csv.DictReader(FIXTURE_CSV.open()))
-    actual_rows = fetch_actual()
-    compare(expected_rows, actual_rows)
+    source = resolve_reference_csv()
+    build_expected_fixture(source)
+    use_compose_database()
+    results = parity.run(['level1'], {'level1': str(FIXTURE_CSV)}, Path('data/parity'), Decimal('0.01'))
+    parity.print_report(results, Path('data/parity'))
+    if not results[0].ok:
+        raise SystemExit('Level 1 parity failure; see data/parity/level1.diff.jsonl')
     print('Level 1 parity check passed.')
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'scripts'))
+
+import ops_report  # noqa: E402
+import refresh  # noqa: E402
+
+
+def test_plan_steps_attributes_relations_to_each_step():
+    steps = refresh.plan_steps({'mart.mv_sku_facts'}, {'mart.mv_sku_facts': {'core.va_txn_flows'}}, set(), full=False)
+    assert steps['mart.mv_sku_facts'].relations == ['mart.mv_sku_facts']
+    assert steps['mart.mv_sku_facts'].deps == {'core.va_txn_flows'}
+    assert 'core.va_txn_typed' in steps['core.va_txn_flows'].relations
+
+
+def test_findings_flag_slower_steps_and_changed_plans():
+    runs = ops_report.read_steps([
+        ['r3', '2026-10-03', 'f', 'core.mv_va_txn', 'ok', '9.0', '10', '5', '1'],
+        ['r3', '2026-10-03', 'f', 'mart.mv_sku_facts', 'ok', '1.1', '', '', ''],
+        ['r2', '2026-10-02', 'f', 'core.mv_va_txn', 'ok', '4.0', '10', '5', '1'],
+        ['r2', '2026-10-02', 'f', 'mart.mv_sku_facts', 'ok', '1.0', '', '', ''],
+        ['r1', '2026-10-01', 't', 'core.mv_va_txn', 'ok', '20.0', '10', '5', '1'],
+    ])
+    steps = ops_report.step_findings(runs, threshold=0.25, min_seconds=0.5)
+    assert [(f.name, f.baseline, f.flag) for f in steps] == [
+        ('core.mv_va_txn', 4.0, 'SLOWER'),
+        ('mart.mv_sku_facts', 1.0, ''),
+    ]
+
+    captures = ops_report.read_captures([
+        ['mart.v_level1', '2026-10-03', '120.0', '50', '0', '3', 'b'],
+        ['mart.v_level1', '2026-10-02', '100.0', '50', '0', '3', 'a'],
+        ['mart.v_level2a', '2026-10-03', '900.0', '50', '0', '3', 'a'],
+        ['mart.v_level2a', '2026-10-02', '100.0', '50', '0', '3', 'a'],
+    ])
+    plans = ops_report.plan_findings(captures, threshold=0.25, min_ms=500)
+    assert [(f.name, f.flag) for f in plans] == [
+        ('mart.v_level1', 'PLAN CHANGED'),
+        ('mart.v_level2a', 'SLOWER'),
+    ]
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+import gc
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'scripts'))
+
+import pg_copy  # noqa: E402
+import pg_session  # noqa: E402
+
+# Stands in for run_sql.sh: psql is a child of bash, not exec'd, and "commits"
+# what it read at end-of-data unless it is not valid UTF-8 (the server
+# rejecting it). Either way it records the outcome, even if bash was killed.
+FAKE_RUN_SQL = """#!/usr/bin/env bash
+python3 -c '
+import sys
+data = sys.stdin.buffer.read()
+try:
+    data.decode("utf-8")
+except UnicodeDecodeError:
+    open(sys.argv[1], "wb").write(b"rejected")
+    sys.exit(3)
+open(sys.argv[1], "wb").write(b"committed:" + data)
+' "{outcome}"
+"""
+
+
+def outcome(path: Path) -> bytes:
+    """What the stand-in psql did, once it has seen end-of-data."""
+    deadline = time.monotonic() + 10
+    while not path.exists() and time.monotonic() < deadline:
+        gc.collect()  # an abandoned pipe is only closed when collected
+        time.sleep(0.05)
+    return path.read_bytes()
+
+
+@pytest.fixture
+def fake_psql(tmp_path, monkeypatch):
+    result = tmp_path / 'outcome'
+    script = tmp_path / 'run_sql.sh'
+    script.write_text(FAKE_RUN_SQL.format(outcome=result))
+    script.chmod(0o755)
+    monkeypatch.setattr(pg_copy, 'RUN_SQL', script)
+    monkeypatch.setattr(pg_session, 'RUN_SQL', script)
+    return result
+
+
+def test_copy_in_commits_a_complete_stream(fake_psql):
+    with pg_copy.copy_in('raw.t', ['a']) as stream:
+        stream.write('1\n2\n')
+    assert outcome(fake_psql) == b'committed:1\n2\n'
+
+
+def test_copy_in_rejects_the_rows_sent_before_a_failure(fake_psql):
+    with pytest.raises(RuntimeError):
+        with pg_copy.copy_in('raw.t', ['a']) as stream:
+            stream.write('1\n2\n')
+            raise RuntimeError('source went away')
+    assert outcome(fake_psql) == b'rejected'
+
+
+def test_session_copy_from_rejects_a_failed_range(fake_psql):
+    def blocks():
+        yield b'1\n2\n'
+        raise OSError('read error mid-range')
+
+    with pytest.raises(OSError):
+        pg_session.PsqlSession().copy_from('raw.t', ['a'], blocks())
+    assert outcome(fake_psql) == b'rejected'
+
+
+def test_an_incomplete_session_backend_fails_when_instantiated():
+    class Partial(pg_session.Session):
+        def execute(self, sql):
+            pass
+
+    with pytest.raises(TypeError, match='abstract'):
+        Partial()
+    pg_session.PsqlSession()
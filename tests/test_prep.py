@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+import csv
+import struct
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'scripts'))
+
+import prep  # noqa: E402
+
+
+def write_csv(path: Path, rows: list[list[str]]) -> None:
+    with path.open('w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(rows)
+
+
+def read_csv(path: Path) -> list[list[str]]:
+    with path.open(newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))
+
+
+def test_resolve_uses_aliases_and_column_positions():
+    header = ['Created Date', 'Extra', 'Buy Amount', 'CCY', 'Beneficiary Bank Account No']
+    assert prep.EXTERNAL_ACCOUNTS.resolve(header) == [4, 2, 3, 0]
+
+
+def test_resolve_sources_skips_prepped_outputs_and_shards(tmp_path, monkeypatch):
+    import prep_batch
+
+    monkeypatch.delenv(prep.VA_TXN.env_var, raising=False)
+    for name in ['va_txn_2024.csv', 'va_txn_prepped.csv', 'va_txn_prepped.0001.csv',
+                 'va_txn_2024_prepped.csv', 'va_txn_batch_prepped.csv', 'va_txn_2024.0001.csv']:
+        (tmp_path / name).write_text('x\n')
+    expected = [tmp_path / 'va_txn_2024.0001.csv', tmp_path / 'va_txn_2024.csv']
+    assert prep.resolve_sources(prep.VA_TXN, tmp_path) == expected
+    assert prep_batch.batch_sources(prep.VA_TXN, tmp_path) == expected
+
+
+def test_resolve_reports_missing_columns():
+    with pytest.raises(prep.PrepError) as err:
+        prep.REPMT_SALES.resolve(['Merchant', 'SKU ID'])
+    assert 'total_funds_inflow' in str(err.value)
+
+
+def test_prep_file_projects_rows_and_pads_short_rows(tmp_path):
+    src = tmp_path / 'repmt_sales_2025-09.csv'
+    out = tmp_path / 'repmt_sales_prepped.csv'
+    write_csv(src, [
+        ['L2E', 'Sales Proceeds', 'SKU ID', 'Merchant', 'Total Funds Inflow'],
+        ['x', '1,000.00', 'SKU-1', 'Acme', '"quoted, value"'],
+        [],
+        ['y', '2', 'SKU-2'],
+    ])
+    assert prep.prep_file(prep.REPMT_SALES, src, out) == 2
+    assert read_csv(out) == [
+        list(prep.REPMT_SALES.columns),
+        ['Acme', 'SKU-1', '"quoted, value"', '1,000.00', 'x'],
+        ['', 'SKU-2', '', '2', 'y'],
+    ]
+
+
+def test_chunked_prep_matches_single_pass_with_quoted_newlines(tmp_path):
+    src = tmp_path / 'va_txn_2025-09.csv'
+    header = ['Sender VA Number', 'Sender Virtual Account ID', 'Sender Note ID', 'Receiver VA ID',
+              'Receiver VA Number', 'Receiver Note ID', 'Receiver Opening Balance',
+              'Receiver Closing Balance', 'Amount', 'Date', 'Remarks']
+    rows = [header]
+    for i in range(500):
+        remark = 'line one\nline "two", three' if i % 3 == 0 else f'merchant-repayment {i}'
+        rows.append([f'S{i}', f'id{i}', '', f'r{i}', f'R{i}', '', '0', '0', f'{i},000.00', '9/1/2025', remark])
+    write_csv(src, rows)
+
+    single = tmp_path / 'single.csv'
+    chunked = tmp_path / 'va_txn_prepped.csv'
+    prep.prep_file(prep.VA_TXN, src, single)
+    assert prep.run_single('va_txn', str(src), str(chunked), jobs=2, chunk_bytes=512) == 0
+    assert chunked.read_bytes() == single.read_bytes()
+
+    assert prep.run_single('va_txn', str(src), str(chunked), jobs=2, shards=4) == 0
+    shards = sorted(tmp_path.glob('va_txn_prepped.[0-9][0-9][0-9][0-9].csv'))
+    assert len(shards) == 4 and not chunked.exists()
+    merged = [row for i, shard in enumerate(shards) for row in read_csv(shard)[(1 if i else 0):]]
+    assert merged == read_csv(single)
+
+
+def test_project_chunk_streams_its_range_through_a_small_buffer(tmp_path, monkeypatch):
+    import prep_chunks
+
+    src = tmp_path / 'repmt_sales_2025-09.csv'
+    rows = [['Merchant', 'SKU ID', 'Total Funds Inflow', 'Sales Proceeds', 'L2E']]
+    rows += [[f'Café "{i}"\nÅrhus', f'SKU-{i}', str(i), '1', '2'] for i in range(200)]
+    write_csv(src, rows)
+    plan = prep_chunks.plan_chunks(src, tmp_path / 'out.csv', shards=2)
+    monkeypatch.setattr(prep_chunks, 'READ_BUFFER', 7)  # splits multi-byte characters
+    indices = prep.REPMT_SALES.resolve(list(plan.header))
+    parts = []
+    for chunk in plan.chunks:
+        part = tmp_path / f'part{chunk.index}.csv'
+        prep_chunks.project_chunk(str(src), chunk.start, chunk.end, indices, str(part), ())
+        parts += read_csv(part)
+    assert parts == rows[1:]
+
+
+def test_parquet_prep_types_amounts_and_dates_like_raw(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    src = tmp_path / 'repmt_sales_2025-09.csv'
+    out = tmp_path / 'repmt_sales_prepped.parquet'
+    write_csv(src, [
+        ['Merchant', 'SKU ID', 'Total Funds Inflow', 'Sales Proceeds', 'L2E'],
+        ['Acme', 'SKU-1', '1,000.50', '-', 'SGD 12'],
+        ['Acme', 'SKU-2', '', '(3)'],
+    ])
+    assert prep.run_single('repmt_sales', str(src), str(out), fmt='parquet') == 0
+    rows = pq.read_table(out).to_pylist()
+    assert [r['sku_id'] for r in rows] == ['SKU-1', 'SKU-2']
+    assert [(r['total_funds_inflow_num'], r['sales_proceeds_num'], r['l2e_num']) for r in rows] == [
+        (Decimal('1000.5'), None, Decimal('12')),
+        (None, Decimal('3'), None),
+    ]
+
+    import prep_arrow
+    import pyarrow as pa
+    values = pa.array(['9/1/2025', '2025-09-01 10:30', '13/1/2025', '2/30/2025', ''])
+    dates = prep_arrow.parse_date_utc(values)
+    assert [d.date().isoformat() if d else None for d in dates.to_pylist()] == [
+        '2025-09-01', '2025-09-01', '2025-01-13', None, None,
+    ]
+
+
+def test_pgcopy_output_is_binary_copy_with_empty_cells_as_null(tmp_path):
+    src = tmp_path / 'repmt_sales_2025-09.csv'
+    out = tmp_path / 'repmt_sales_prepped.pgcopy'
+    write_csv(src, [
+        ['Merchant', 'SKU ID', 'Total Funds Inflow', 'Sales Proceeds', 'L2E'],
+        ['Acmé', 'SKU-1', '1,000.50', '', 'x'],
+    ])
+    assert prep.prep_file(prep.REPMT_SALES, src, out) == 1
+    data = out.read_bytes()
+    assert data.startswith(b'PGCOPY\n\xff\r\n\x00' + b'\x00' * 8)
+    assert data.endswith(b'\xff\xff')
+    assert struct.unpack('>h', data[19:21]) == (5,)
+    fields, pos = [], 21
+    for _ in range(5):
+        (size,) = struct.unpack('>i', data[pos:pos + 4])
+        pos += 4
+        fields.append(None if size < 0 else data[pos:pos + size].decode('utf-8'))
+        pos += max(size, 0)
+    assert fields == ['Acmé', 'SKU-1', '1,000.50', None, 'x']
+
+
+def test_map_history_merges_periods_with_validity(tmp_path):
+    import gzip
+
+    from prep_note_sku_map import build_history
+
+    def reference(name, pairs, opener=open):
+        rows = [['Level 1', '', ''], ['SKU ID', 'Account Number', 'Merchant']]
+        rows += [[sku, va, 'M1'] for sku, va in pairs] + [['Total', '', '']]
+        with opener(tmp_path / name, 'wt', newline='') as f:
+            csv.writer(f).writerows(rows)
+
+    reference('level1_reference_2025-09.csv', [('SKU-1', 'VA1'), ('SKU-2', 'VA2')])
+    reference('level1_reference_2025-10.csv.gz', [('SKU-1', 'VA1'), ('SKU-3', 'VA3')], gzip.open)
+    out = tmp_path / 'out' / 'map.csv'
+
+    sources = sorted(tmp_path.glob('level1_reference_*'))
+    assert build_history(sources, out, jobs=1) == 3
+    assert read_csv(out) == [
+        ['note_id', 'sku_id', 'va_number', 'valid_from', 'valid_to'],
+        ['', 'SKU-1', 'VA1', '2025-09-01', ''],
+        ['', 'SKU-2', 'VA2', '2025-09-01', '2025-09-30'],
+        ['', 'SKU-3', 'VA3', '2025-10-01', ''],
+    ]
+
+
+def test_synthetic_exports_are_deterministic_and_prep_cleanly(tmp_path):
+    import synth_data
+
+    scale = synth_data.Scale(txns=2000, skus=12, vas_per_sku=2, merchants=3, periods=2, start='2025-12', seed=3)
+    serial = synth_data.generate(scale, tmp_path / 'a', jobs=1)
+    synth_data.generate(scale, tmp_path / 'b', jobs=2)
+    assert serial['periods'] == ['2025-12', '2026-01']
+    for name in serial['files']:
+        assert (tmp_path / 'a' / name).read_bytes() == (tmp_path / 'b' / name).read_bytes()
+
+    # The reference's Amount Received is every merchant-repayment into the VA.
+    received = {}
+    for period in serial['periods']:
+        src = tmp_path / 'a' / f'va_txn_{period}.csv'
+        assert prep.prep_file(prep.VA_TXN, src, tmp_path / 'va_txn_prepped.csv') == scale.txns // 2
+        for row in read_csv(src)[1:]:
+            if row[10] == 'merchant-repayment':
+                received[row[4]] = received.get(row[4], 0) + Decimal(row[8].replace(',', ''))
+    reference = read_csv(tmp_path / 'a' / 'level1_reference.csv')[2:]
+    assert len(reference) == scale.skus * scale.vas_per_sku
+    assert {r[1]: Decimal(r[4].replace(',', '')) for r in reference if r[1] in received} == received
+
+
+def test_batch_prep_writes_per_file_and_tagged_combined_outputs(tmp_path):
+    import prep_batch
+
+    inc = tmp_path / 'inc'
+    (inc / '2025').mkdir(parents=True)
+    write_csv(inc / 'repmt_sales_2025-08.csv', [
+        ['Merchant', 'SKU ID', 'Total Funds Inflow', 'Sales Proceeds', 'L2E'],
+        ['Acme', 'SKU-1', '1', '2', '3'],
+    ])
+    write_csv(inc / '2025' / 'repmt_sales_2025-09.csv', [
+        ['merchant', 'sku id', 'total funds inflow', 'sales proceeds', 'l2e'],
+        ['Beta', 'SKU-2', '4', '5', '6'],
+    ])
+    write_csv(inc / '2025' / 'repmt_sales_2025-10.csv', [
+        ['L2E', 'Sales Proceeds', 'SKU ID', 'Merchant', 'Total Funds Inflow'],
+        ['9', '8', 'SKU-3', 'Cora', '7'],
+    ])
+    write_csv(inc / 'repmt_sales_prepped.csv', [['merchant'], ['stale']])
+
+    rc, results = prep_batch.run_batch(inc, inc, jobs=1, recursive=True)
+    assert rc == 0 and len(results) == 3
+    assert read_csv(inc / '2025' / 'repmt_sales_2025-10_prepped.csv') == [
+        list(prep.REPMT_SALES.columns), ['Cora', 'SKU-3', '7', '8', '9'],
+    ]
+    assert read_csv(inc / 'repmt_sales_batch_prepped.csv') == [
+        ['source_file'] + list(prep.REPMT_SALES.columns),
+        ['repmt_sales_2025-09.csv', 'Beta', 'SKU-2', '4', '5', '6'],
+        ['repmt_sales_2025-10.csv', 'Cora', 'SKU-3', '7', '8', '9'],
+        ['repmt_sales_2025-08.csv', 'Acme', 'SKU-1', '1', '2', '3'],
+    ]
+    assert not list(inc.glob('*.part*'))
+    # source_file is the manifest's key, the file name that --load/--incremental use
+    assert prep.REPMT_SALES.load_target(inc / '2025' / 'repmt_sales_2025-09.csv').source_file == \
+        'repmt_sales_2025-09.csv'
+
+    write_csv(inc / 'repmt_sales_2025-10.csv', [
+        ['Merchant', 'SKU ID', 'Total Funds Inflow', 'Sales Proceeds', 'L2E'],
+        ['Dawn', 'SKU-4', '1', '1', '1'],
+    ])
+    rc, results = prep_batch.run_batch(inc, inc, jobs=1, recursive=True)
+    assert rc == 1
+    assert [r.source for r in results if r.error] == [str(inc / 'repmt_sales_2025-10.csv')]
+    assert [r[0] for r in read_csv(inc / 'repmt_sales_batch_prepped.csv')[1:]] == [
+        'repmt_sales_2025-09.csv', 'repmt_sales_2025-10.csv', 'repmt_sales_2025-08.csv',
+    ]
+    (inc / 'repmt_sales_2025-10.csv').unlink()
+
+    cache = prep_batch.HeaderCache()
+    for src in prep_batch.batch_sources(prep.REPMT_SALES, inc, recursive=True):
+        cache.resolve(prep.REPMT_SALES, prep_batch.read_header(src))
+    assert cache.layouts(prep.REPMT_SALES) == 2 and cache.hits == 1
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+import csv
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'scripts'))
+
+import prep  # noqa: E402
+import recon_offline  # noqa: E402
+
+
+def write_csv(path: Path, rows: list[list[str]]) -> None:
+    with path.open('w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(rows)
+
+
+def report(reports: recon_offline.Reports, level: str) -> list[dict]:
+    return [dict(zip(reports.header(level), row)) for row in reports.rows(level)]
+
+
+def test_seeded_rules_pick_exact_unless_a_regex_outranks_it():
+    rules = recon_offline.seed_rules()
+    assert recon_offline.Rule('merchant-repayment', 'merchant_repayment', False, 10) in rules
+    assert recon_offline.Rule(r'transfer\s*to\s*sku', 'funds_to_sku', True, 12) in rules
+    categorize = recon_offline.Categorizer(rules)
+    assert categorize('merchant-repayment') == 'merchant_repayment'
+    assert categorize('acquirer-fee') == 'mgmt_fee'
+    assert categorize('management fee q3') == 'mgmt_fee'
+    assert categorize('reversal') == 'uncategorized'
+
+    categorize = recon_offline.Categorizer(rules + [
+        recon_offline.Rule('repayment', 'other', True, 5),
+        recon_offline.Rule('spar', 'spar_exact', False, 70),
+    ])
+    assert categorize('merchant-repayment') == 'other'
+    assert categorize('spar') == 'spar'
+
+
+def test_ranks_transfers_and_level2_totals(tmp_path):
+    write_csv(tmp_path / 'repmt_sales_prepped.csv', [
+        list(prep.REPMT_SALES.columns),
+        ['Acme', 'SKU-A', '1,000.00', '900.00', ''],
+        ['Acme ', 'SKU-B', '500', '400', ''],
+    ])
+    sku_row = dict.fromkeys(prep.REPMT_SKU.columns, '')
+    sku_row.update(merchant='Acme', sku_id='SKU-A', acquirer_fees_expected='10', acquirer_fees_paid='8')
+    write_csv(tmp_path / 'repmt_sku_prepped.csv', [list(sku_row), list(sku_row.values())])
+    write_csv(tmp_path / 'external_accounts_prepped.csv', [
+        list(prep.EXTERNAL_ACCOUNTS.columns),
+        ['VA1', '300', 'SGD', '1/5/2025'],
+        ['VA2 ', '200', 'SGD', '2025-02-03'],
+    ])
+
+    def txn(sender, receiver, amount, date, remark):
+        return [f'id-{sender}', sender, '', f'id-{receiver}', receiver, '', '', '', amount, date, remark]
+
+    write_csv(tmp_path / 'va_txn_prepped.csv', [
+        list(prep.VA_TXN.columns),
+        txn('MERCH', 'VA1', '700.00', '1/10/2025', ' Merchant-Repayment '),
+        txn('VA1', 'PAYOUT', '10', '1/11/2025', 'acquirer-fee'),
+        txn('VA1', 'VA2', '50', '2025-02-01', 'note-issued-transfer-to-sku'),
+    ])
+    write_csv(tmp_path / 'note_sku_va_map_prepped.csv', [
+        ['note_id', 'sku_id', 'va_number'],
+        ['N1', 'SKU-A', 'VA1'], ['N2', 'SKU-A', 'VA2'], ['N3', 'SKU-B', 'VA2'],
+    ])
+
+    reports = recon_offline.reconcile(tmp_path)
+    level1 = report(reports, 'level1')
+    assert [(r['SKU ID'], r['Account Number'], r['Amount Pulled'], r['Amount Received'], r['Sales Proceeds'])
+            for r in level1] == [
+        ('SKU-A', 'VA1', '300', '700.00', '900.00'),
+        ('SKU-A', 'VA2', '200', '0', '0'),
+        ('SKU-B', 'VA2', '0', '0', '400'),
+    ]
+    a, b = report(reports, 'level2a')
+    assert (a['Amount Received'], a['Management Fee Paid'], a['Fund Transferred to Other SKU'], a['Variance']) == (
+        '700.00', '10', '50', '640.00')
+    assert (a['Mgmt Fee Paid > Expected?'], a['Mgmt Fee Settled?'], a['Management Fee Outstanding']) == ('No', 'Yes', '0')
+    assert (b['Fund Transferred from Other SKU'], b['Variance'], b['Management Fee Expected']) == ('50', '50', '')
+    level2b = {r['SKU ID']: r for r in report(reports, 'level2b')}
+    assert level2b['SKU-A']['Management Fee Paid Variance'] == '-2'
+    assert level2b['SKU-B']['Merchant'] == 'Acme'
+
+    february = recon_offline.reconcile(tmp_path, window=recon_offline.Window('2025-02'))
+    assert [r['Amount Pulled'] for r in report(february, 'level1')] == ['0', '200', '0']
+    a, b = report(february, 'level2a')
+    assert (a['Amount Received'], a['Variance'], b['Variance']) == ('0', '-50', '50')
+
+
+def test_reports_match_the_synthetic_level1_reference(tmp_path):
+    import prep_batch
+    import synth_data
+
+    scale = synth_data.Scale(txns=3000, skus=10, vas_per_sku=2, merchants=3, periods=2, start='2025-06', seed=5)
+    synth_data.generate(scale, tmp_path / 'src')
+    reference = tmp_path / 'src' / 'level1_reference.csv'
+    rc, _ = prep_batch.run_batch(tmp_path / 'src', tmp_path / 'prep', jobs=1, map_source=reference)
+    assert rc == 0
+
+    reports = recon_offline.reconcile(tmp_path / 'prep')
+    results = recon_offline.check(reports, ['level1'], {'level1': str(reference)}, tmp_path, Decimal('0.01'))
+    assert results[0].ok and results[0].actual_rows == scale.skus * scale.vas_per_sku
+    level2a = report(reports, 'level2a')
+    assert len(level2a) == scale.skus
+    assert sum(Decimal(r['Fund Transferred to Other SKU']) for r in level2a) == \
+        sum(Decimal(r['Fund Transferred from Other SKU']) for r in level2a)